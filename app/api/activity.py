@@ -6,20 +6,22 @@ Manages workout/activity sessions for cardiac patients.
 # =============================================================================
 # FILE MAP - QUICK NAVIGATION
 # =============================================================================
-# IMPORTS.............................. Line 25
+# IMPORTS.............................. Line 29
 #
 # ENDPOINTS - PATIENT (own sessions)
-#   - POST /activities/start........... Line 32  (Begin workout session)
-#   - POST /activities/end/{id}........ Line 69  (Complete workout session)
-#   - GET /activities.................. Line 119 (List own sessions)
-#   - GET /activities/{id}............. Line 185 (Get session details)
+#   - POST /activities/start........... Line 63  (Begin workout session)
+#   - POST /activities/end/{id}........ Line 108 (Complete workout session)
+#   - GET /activities.................. Line 182 (List own sessions)
+#   - GET /activities/{id}............. Line 260 (Get session details)
 #
 # ENDPOINTS - CLINICIAN (patient sessions)
-#   - GET /activities/user/{id}........ Line 153 (List patient's sessions)
+#   - GET /activities/user/{id}........ Line 222 (List patient's sessions)
 #
 # BUSINESS CONTEXT:
-# - Patients start/stop activity sessions from mobile app
-# - Session data feeds into ML risk prediction
+# - Patients start/stop activity sessions from mobile app; session HR,
+#   SpO2 and recovery are aggregated server-side from vital_signs on end
+# - Session data feeds into ML risk prediction (features and risk score
+#   stored when a session ends, see services/session_features.py)
 # - Clinicians review patient workout history
 # =============================================================================
 """
@@ -40,6 +42,9 @@ from app.schemas.activity import (
     ActivitySessionResponse
 )
 from app.api.auth import get_current_user, get_current_doctor_user, check_clinician_phi_access
+from app.services.patient_state import record_activity
+from app.services.session_aggregation import apply_session_aggregates
+from app.services.session_features import store_session_features
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -84,6 +89,8 @@ async def start_activity_session(
     )
     
     db.add(activity)
+    db.flush()
+    record_activity(db, activity)
     db.commit()
     db.refresh(activity)
     
@@ -108,7 +115,11 @@ async def end_activity_session(
     """
     End an activity session and record final metrics.
     
-    Updates the session with end time, final heart rates, and completion status.
+    Updates the session with end time and completion status. Heart rates,
+    SpO2 and recovery time are computed from the vitals recorded during the
+    session (client values are only kept when there are none), then the
+    session's model features and risk score are stored. Recovery is fitted
+    again once the cool-down readings after the session are in.
     """
     activity = db.query(ActivitySession).filter(
         ActivitySession.session_id == session_id,
@@ -137,9 +148,23 @@ async def end_activity_session(
     
     # Calculate duration if not set
     if activity.start_time and activity.end_time and activity.duration_minutes is None:
-        delta = activity.end_time - activity.start_time  # type: ignore
+        # SQLite returns naive timestamps (stored as UTC)
+        start, end = (
+            t if t.tzinfo else t.replace(tzinfo=timezone.utc)
+            for t in (activity.start_time, activity.end_time)
+        )
+        delta = end - start  # type: ignore
         activity.duration_minutes = int(delta.total_seconds() / 60)  # type: ignore
     
+    # HR/SpO2/recovery come from the session's recorded vitals when it has any
+    summary = apply_session_aggregates(db, current_user, activity)
+    if summary is not None:
+        logger.info(f"Session {activity.session_id} aggregated from {summary['points']} vital readings")
+    
+    # Engineer + score once; risk checks, explain and retraining read these back
+    store_session_features(current_user, activity)
+    
+    record_activity(db, activity)
     db.commit()
     db.refresh(activity)
     
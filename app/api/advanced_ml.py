@@ -8,29 +8,41 @@ prediction explainability.
 # =============================================================================
 # FILE MAP - QUICK NAVIGATION
 # =============================================================================
-# IMPORTS.............................. Line 25
-# SCHEMAS.............................. Line 60
+# IMPORTS.............................. Line 54
+# SCHEMAS.............................. Line 111
 #
 # ENDPOINTS - ANOMALY & FORECASTING
-#   - GET /anomaly-detection........... Line 87  (Detect vital anomalies)
-#   - GET /trend-forecast.............. Line 131 (Predict vital trends)
+#   - GET /anomaly-detection........... Line 168 (Detect vital anomalies)
+#   - GET /trend-forecast.............. Line 218 (Predict vital trends)
 #
 # ENDPOINTS - BASELINE OPTIMIZATION
-#   - GET /baseline-optimization....... Line 174 (Calculate optimal baselines)
-#   - POST /baseline-optimization/apply Line 213 (Apply optimized baselines)
+#   - GET /baseline-optimization....... Line 267 (Calculate optimal baselines)
+#   - POST /baseline-optimization/apply Line 312 (Apply optimized baselines)
 #
 # ENDPOINTS - RECOMMENDATIONS (A/B testing)
-#   - GET /recommendation-ranking...... Line 264 (Get ranked recommendation)
-#   - POST /recommendation-ranking/out. Line 281 (Record user outcome)
+#   - GET /recommendation-ranking...... Line 369 (Get ranked recommendation)
+#   - POST /recommendation-ranking/out. Line 392 (Record user outcome)
 #
 # ENDPOINTS - NATURAL LANGUAGE (LLM)
-#   - POST /alerts/natural-language.... Line 301 (Generate alert text)
-#   - GET /risk-summary/natural-lang... Line 319 (Risk summary in plain text)
+#   - POST /alerts/natural-language.... Line 418 (Generate alert text)
+#   - GET /risk-summary/natural-lang... Line 442 (Risk summary in plain text)
 #
 # ENDPOINTS - MODEL MANAGEMENT
-#   - GET /model/retraining-status..... Line 357 (Current retrain status)
-#   - GET /model/retraining-readiness.. Line 365 (Check if retrain needed)
-#   - POST /predict/explain............ Line 391 (SHAP explanations)
+#   - GET /model/retraining-status..... Line 486 (Current retrain status)
+#   - GET /model/retraining-readiness.. Line 500 (Check if retrain needed)
+#   - POST /model/retrain.............. Line 528 (Background retrain job)
+#   - POST /predict/explain............ Line 734 (SHAP explanations)
+#   - POST /predict/explain/batch...... Line 780 (Batch SHAP, NDJSON stream)
+#
+# ENDPOINTS - MODEL REGISTRY (admin)
+#   - GET /model/versions.............. Line 559 (Registered versions)
+#   - POST /model/versions/{v}/promote. Line 573 (Hot-swap active model)
+#   - POST /model/rollback............. Line 607 (Back to previous model)
+#   - PUT /model/shadow................ Line 633 (Start/stop shadow mode)
+#   - GET /model/shadow/report......... Line 668 (Candidate vs active)
+#
+# ENDPOINTS - EDGE MODEL EXPORT
+#   - GET /model/edge-bundle........... Line 692 (On-device model, ETag)
 #
 # BUSINESS CONTEXT:
 # - Advanced ML features for sophisticated risk analysis
@@ -41,9 +53,12 @@ prediction explainability.
 
 from datetime import datetime, timedelta, timezone
 import logging
-from typing import Optional, Dict, Any
+import json
+from typing import Optional, Dict, Any, List
 
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request
+from fastapi.responses import Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel, Field
 from sqlalchemy import desc
 from sqlalchemy.orm import Session
@@ -66,15 +81,27 @@ from app.services.natural_language_alerts import (
 from app.services.retraining_pipeline import (
     evaluate_retraining_readiness,
     get_retraining_status,
+    trigger_retraining,
 )
 from app.services.explainability import explain_prediction
+from app.services.batch_explain import (
+    MAX_BATCH_ITEMS,
+    collect_batch_items,
+    explain_batch_items,
+)
+from app.services import model_registry, shadow_eval
+from app.services.edge_bundle import get_edge_bundle_payload
 from app.services.ml_prediction import (
-    get_ml_service,
+    get_active_bundle,
     predict_risk as ml_predict_risk,
-    model as ml_model,
-    feature_columns as ml_feature_columns,
+    explain_features,
+)
+from app.api.auth import (
+    get_current_user,
+    get_current_doctor_user,
+    get_current_admin_user,
+    check_clinician_phi_access,
 )
-from app.api.auth import get_current_user, get_current_doctor_user
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -113,6 +140,21 @@ class ExplainPredictionRequest(BaseModel):
     activity_type: str = Field(default="walking")
 
 
+class BatchExplainRequest(BaseModel):
+    assessment_ids: List[int] = Field(default_factory=list, description="Stored risk assessments")
+    session_ids: List[int] = Field(default_factory=list, description="Stored activity sessions")
+
+
+class ShadowConfigRequest(BaseModel):
+    version: Optional[str] = Field(None, description="Registered version to shadow; null stops shadow mode")
+    sample_rate: Optional[float] = Field(None, ge=0.0, le=1.0, description="Share of predictions re-scored")
+
+
+class RetrainRequest(BaseModel):
+    version: Optional[str] = Field(None, description="Registry version name (default: timestamp)")
+    notes: Optional[str] = Field(None, max_length=500)
+
+
 # =============================================================================
 # Anomaly Detection
 # =============================================================================
@@ -477,14 +519,216 @@ async def check_retraining_readiness(
     return result
 
 
+# =============================================
+# START_MODEL_RETRAINING - Retrain on stored sessions
+# Used by: Admin dashboard, scheduled pipelines
+# Returns: Job state (poll /model/retraining-status)
+# Roles: ADMIN
+# =============================================
+@router.post("/model/retrain", status_code=status.HTTP_202_ACCEPTED)
+async def start_model_retraining(
+    request: Optional[RetrainRequest] = None,
+    current_user: User = Depends(get_current_admin_user),
+):
+    """
+    Retrain the risk model in the background and save it as a new
+    registry version (not promoted).
+    """
+    request = request or RetrainRequest()
+    if request.version and not model_registry.VERSION_PATTERN.match(request.version):
+        raise HTTPException(status_code=400, detail=f"Invalid model version '{request.version}'")
+    try:
+        job = trigger_retraining(version=request.version, notes=request.notes)
+    except RuntimeError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+
+    logger.info(f"Admin {current_user.user_id} started model retraining")
+    return job
+
+
+# =============================================================================
+# Model Registry (hot-swap)
+# =============================================================================
+
+# =============================================
+# LIST_MODEL_VERSIONS - Registered model versions
+# Used by: Admin dashboard model management
+# Returns: Versions with metrics, active/previous/loaded version
+# Roles: ADMIN
+# =============================================
+@router.get("/model/versions")
+async def list_model_versions(
+    current_user: User = Depends(get_current_admin_user),
+):
+    """List registered model versions (admin only)."""
+    return model_registry.list_versions()
+
+
+# =============================================
+# PROMOTE_MODEL_VERSION - Hot-swap the active model
+# Used by: Admin dashboard, deployment pipeline
+# Returns: New active version and the one it replaced
+# Roles: ADMIN
+# =============================================
+@router.post("/model/versions/{version}/promote")
+async def promote_model_version(
+    version: str,
+    current_user: User = Depends(get_current_admin_user),
+):
+    """
+    Load, warm up and activate a registered model version without a
+    restart. Requests already running finish on the old model. If the
+    new version fails to load, the old one keeps serving.
+    """
+    try:
+        result = await run_in_threadpool(model_registry.promote, version)
+    except model_registry.UnknownModelVersion:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Model version '{version}' not found",
+        )
+    except Exception as e:
+        logger.error(f"Promoting model {version} failed: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Model version '{version}' could not be loaded; active model unchanged",
+        )
+
+    logger.info(f"Admin {current_user.user_id} promoted model {version}")
+    return result
+
+
+# =============================================
+# ROLLBACK_MODEL_VERSION - Back to the previous model
+# Used by: Admin dashboard (undo a bad promote)
+# Returns: Restored active version
+# Roles: ADMIN
+# =============================================
+@router.post("/model/rollback")
+async def rollback_model_version(
+    current_user: User = Depends(get_current_admin_user),
+):
+    """Swap back to the previously active model version (admin only)."""
+    try:
+        result = await run_in_threadpool(model_registry.rollback)
+    except LookupError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    except Exception as e:
+        logger.error(f"Model rollback failed: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Previous model version could not be loaded; active model unchanged",
+        )
+
+    logger.info(f"Admin {current_user.user_id} rolled back model to {result['active']}")
+    return result
+
+
+# =============================================
+# CONFIGURE_SHADOW_MODEL - Start/stop shadow mode
+# Used by: Admin dashboard before promoting a retrained model
+# Returns: Shadow candidate, sample rate, queue state
+# Roles: ADMIN
+# =============================================
+@router.put("/model/shadow")
+async def configure_shadow_model(
+    request: ShadowConfigRequest,
+    current_user: User = Depends(get_current_admin_user),
+):
+    """
+    Have a candidate version re-score a sample of live risk predictions
+    in the background (version = null to stop).
+    """
+    try:
+        result = await run_in_threadpool(shadow_eval.configure, request.version, request.sample_rate)
+    except model_registry.UnknownModelVersion:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Model version '{request.version}' not found",
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        logger.error(f"Loading shadow model {request.version} failed: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Model version '{request.version}' could not be loaded",
+        )
+
+    logger.info(f"Admin {current_user.user_id} set shadow model to {request.version}")
+    return result
+
+
+# =============================================
+# SHADOW_MODEL_REPORT - Candidate vs active model
+# Used by: Admin dashboard promote/rollback decision
+# Returns: Disagreement rate, score deltas, latency per model
+# Roles: ADMIN
+# =============================================
+@router.get("/model/shadow/report")
+async def shadow_model_report(
+    candidate: Optional[str] = Query(None, description="Candidate version (default: current shadow)"),
+    hours: Optional[int] = Query(None, ge=1, le=24 * 90, description="Only the last N hours"),
+    current_user: User = Depends(get_current_admin_user),
+):
+    """Compare a shadowed candidate against the model(s) that were active."""
+    since = (datetime.now(timezone.utc) - timedelta(hours=hours)).timestamp() if hours else None
+    try:
+        return await run_in_threadpool(shadow_eval.build_report, candidate, since)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
 # =============================================================================
-# Explainability (SHAP-like)
+# Edge Model Export
+# =============================================================================
+
+# =============================================
+# GET_EDGE_MODEL_BUNDLE - Risk model for on-device scoring
+# Used by: Mobile app (edge risk checks between syncs)
+# Returns: Versioned forest arrays; 304 when If-None-Match matches
+# Roles: ALL authenticated users
+# =============================================
+@router.get("/model/edge-bundle")
+async def get_edge_model_bundle(
+    request: Request,
+    current_user: User = Depends(get_current_user),
+):
+    """
+    The active risk model as a compact JSON array bundle (see
+    edge_bundle.py). Clients keep the ETag and revalidate with
+    If-None-Match; a new bundle only downloads after a promote.
+    """
+    bundle = get_active_bundle()
+    if bundle is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="ML model not loaded",
+        )
+    try:
+        payload, etag = await run_in_threadpool(get_edge_bundle_payload, bundle)
+    except ValueError as e:
+        logger.error(f"Edge bundle export failed for model {bundle.version}: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Active model can't be exported for edge inference",
+        )
+
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*":
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=payload, media_type="application/json", headers=headers)
+
+
+# =============================================================================
+# Explainability (TreeSHAP)
 # =============================================================================
 
 # =============================================
 # EXPLAIN_RISK_PREDICTION - Feature importance
 # Used by: Mobile app "Why this risk?", clinician review
-# Returns: SHAP-like feature contributions
+# Returns: Exact TreeSHAP feature contributions
 # Roles: ALL authenticated users
 # =============================================
 @router.post("/predict/explain")
@@ -495,8 +739,9 @@ async def explain_risk_prediction(
     """
     Run a risk prediction and return feature importance explanations.
     """
-    service = get_ml_service()
-    if not service.is_loaded:
+    # One model version for the prediction and its explanation
+    bundle = get_active_bundle()
+    if bundle is None:
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail="ML model not loaded.",
@@ -513,12 +758,71 @@ async def explain_risk_prediction(
         duration_minutes=request.duration_minutes,
         recovery_time_minutes=request.recovery_time_minutes,
         activity_type=request.activity_type,
+        bundle=bundle,
     )
 
     explanation = explain_prediction(
         prediction_result=prediction,
-        feature_columns=ml_feature_columns or [],
-        model=ml_model,
+        feature_columns=bundle.feature_columns,
+        global_importances=bundle.feature_importances,
+        shap_values=explain_features(prediction["features_used"], bundle=bundle),
     )
 
     return explanation
+
+
+# =============================================
+# EXPLAIN_RISK_BATCH - Explain a clinician review queue
+# Used by: Clinician dashboard review queue
+# Returns: NDJSON stream, one line per assessment/session id
+# Roles: DOCTOR (PHI access required per patient)
+# =============================================
+@router.post("/predict/explain/batch")
+async def explain_risk_batch(
+    request: BatchExplainRequest,
+    current_user: User = Depends(get_current_doctor_user),
+    db: Session = Depends(get_db),
+):
+    """
+    Re-score and explain stored assessments and sessions in one pass.
+
+    Lines come back in request order (assessments, then sessions) as
+    application/x-ndjson. Ids that don't exist, have no input data, or
+    belong to a patient who stopped sharing get an "error" line instead.
+    """
+    total = len(request.assessment_ids) + len(request.session_ids)
+    if total == 0:
+        raise HTTPException(status_code=400, detail="Provide assessment_ids or session_ids")
+    if total > MAX_BATCH_ITEMS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {MAX_BATCH_ITEMS} ids per request",
+        )
+
+    if get_active_bundle() is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="ML model not loaded.",
+        )
+
+    items = collect_batch_items(db, request.assessment_ids, request.session_ids)
+
+    # Resolve access up front: the stream runs after the DB session closes
+    for item in items:
+        patient = item.pop("patient", None)
+        if patient is None:
+            continue
+        try:
+            check_clinician_phi_access(current_user, patient)
+        except HTTPException:
+            for key in list(item):
+                if key not in ("kind", "id"):
+                    del item[key]
+            item["error"] = "forbidden"
+
+    def ndjson_lines():
+        for result in explain_batch_items(items):
+            yield json.dumps(result) + "\n"
+
+    logger.info(f"Batch explain for clinician {current_user.user_id}: {total} item(s)")
+    return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
@@ -29,7 +29,7 @@ Manages health alerts and warnings for cardiac patients.
 
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import desc, and_
+from sqlalchemy import desc
 from typing import Optional
 from datetime import datetime, timedelta, timezone
 import logging
@@ -44,6 +44,10 @@ from app.schemas.alert import (
     AlertListResponse
 )
 from app.api.auth import get_current_user, get_current_doctor_user, check_clinician_phi_access
+from app.services.patient_state import record_alerts_created, adjust_unacknowledged_alerts
+from app.services.realtime_hub import publish_alerts
+from app.services.alert_cooldown import alert_cooldown
+from app.services.alert_counters import count_alerts_created, count_acknowledgement_change, get_alert_stats
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -63,6 +67,8 @@ def check_duplicate_alert(
     Check if a similar alert was created recently (within window_minutes).
     
     Prevents alert spam from triggering multiple notifications for the same issue.
+    Answers from the shared cooldown tracker's memory; only a cold
+    (user, type) pair reads the DB, via idx_alert_user_type_time.
     
     Args:
         db: Database session
@@ -73,17 +79,9 @@ def check_duplicate_alert(
     Returns:
         True if duplicate exists, False otherwise
     """
-    since = datetime.now(timezone.utc) - timedelta(minutes=window_minutes)
-    
-    existing = db.query(Alert).filter(
-        and_(
-            Alert.user_id == user_id,
-            Alert.alert_type == alert_type,
-            Alert.created_at >= since
-        )
-    ).first()
-    
-    return existing is not None
+    return alert_cooldown.is_cooling_down(
+        db, user_id, alert_type, window=timedelta(minutes=window_minutes)
+    )
 
 
 # =============================================================================
@@ -164,6 +162,9 @@ async def acknowledge_alert(
             detail="Alert not found"
         )
     
+    if not alert.acknowledged:
+        adjust_unacknowledged_alerts(db, alert.user_id, -1)
+    count_acknowledgement_change(db, alert, True)
     alert.acknowledged = True
     alert.updated_at = datetime.now(timezone.utc)  # type: ignore
     
@@ -206,6 +207,9 @@ async def resolve_alert(
     
     # Update fields
     if update_data.acknowledged is not None:
+        if bool(alert.acknowledged) != update_data.acknowledged:
+            adjust_unacknowledged_alerts(db, alert.user_id, -1 if update_data.acknowledged else 1)
+        count_acknowledgement_change(db, alert, update_data.acknowledged)
         alert.acknowledged = update_data.acknowledged
     
     if update_data.resolved_at:
@@ -263,12 +267,17 @@ async def create_alert(
         title=alert_data.title,
         action_required=alert_data.action_required,
         trigger_value=alert_data.trigger_value,
-        threshold_value=alert_data.threshold_value
+        threshold_value=alert_data.threshold_value,
+        acknowledged=False
     )
     
     db.add(alert)
+    record_alerts_created(db, alert_data.user_id, [alert])
+    count_alerts_created(db, [alert])
     db.commit()
     db.refresh(alert)
+    alert_cooldown.mark_fired(alert.user_id, alert.alert_type)
+    publish_alerts(alert_data.user_id, [alert])
     
     logger.info(f"Alert created: {alert.alert_id} for user {alert_data.user_id}")
     
@@ -338,44 +347,37 @@ async def get_user_alerts(
 # =============================================
 # GET_ALERT_STATISTICS - Alert metrics dashboard
 # Used by: Clinician/admin dashboard stats cards
-# Returns: Severity breakdown, unacknowledged count
+# Returns: Severity breakdown, unacknowledged count, daily totals
 # Roles: DOCTOR, ADMIN
 # =============================================
 @router.get("/alerts/stats")
 async def get_alert_statistics(
     days: int = Query(7, ge=1, le=90),
+    user_id: Optional[int] = Query(None, description="Limit to one patient"),
     current_user: User = Depends(get_current_doctor_user),
     db: Session = Depends(get_db)
 ):
     """
-    Get alert statistics across all users.
+    Get alert statistics across all users, or for one patient.
     
     Admin/Clinician access only. Used for dashboard metrics.
+    Reads the precomputed alert_daily_counters rows, so the cost is
+    the same for 1 day or 90 days of alerts. Days are UTC calendar days.
     """
-    since = datetime.now(timezone.utc) - timedelta(days=days)
-    
-    # Count alerts by severity
-    from sqlalchemy import func
-    severity_counts = db.query(
-        Alert.severity,
-        func.count(Alert.alert_id).label('count')
-    ).filter(
-        Alert.created_at >= since
-    ).group_by(Alert.severity).all()
-    
-    # Count unacknowledged alerts
-    unacknowledged = db.query(func.count(Alert.alert_id)).filter(
-        and_(
-            Alert.created_at >= since,
-            Alert.acknowledged == False
-        )
-    ).scalar()
+    if user_id is not None:
+        patient = db.query(User).filter(User.user_id == user_id).first()
+        if not patient:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="User not found"
+            )
+        check_clinician_phi_access(current_user, patient)
+    
+    stats = get_alert_stats(db, days, user_id=user_id)
     
     return {
         "period_days": days,
-        "severity_breakdown": {
-            severity: count for severity, count in severity_counts
-        },
-        "unacknowledged_count": unacknowledged,
+        "user_id": user_id,
+        **stats,
         "generated_at": datetime.now(timezone.utc).isoformat()
     }
@@ -41,6 +41,8 @@ import logging
 from app.database import get_db
 from app.models.user import User, UserRole
 from app.models.alert import Alert
+from app.services.patient_state import record_alerts_created
+from app.services.alert_counters import count_alerts_created
 from app.api.auth import get_current_user
 
 logger = logging.getLogger(__name__)
@@ -137,9 +139,12 @@ async def request_sharing_disable(
         title="Patient Opt-Out Request",
         message=f"Patient {current_user.full_name or current_user.email} has requested to disable data sharing.",
         action_required="Review and approve/reject this consent request.",
+        acknowledged=False,
         is_sent_to_clinician=True,
     )
     db.add(alert)
+    record_alerts_created(db, current_user.user_id, [alert])
+    count_alerts_created(db, [alert])
     db.commit()
 
     logger.info(f"Sharing disable requested by patient {current_user.user_id}")
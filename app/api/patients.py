@@ -0,0 +1,121 @@
+"""
+Patient panel routes.
+
+Clinician overview of all patients in one request.
+
+# =============================================================================
+# FILE MAP - QUICK NAVIGATION
+# =============================================================================
+# IMPORTS.............................. Line 25
+#
+# ENDPOINTS - CLINICIAN
+#   - GET /patients/overview........... Line 50  (Whole panel, one query)
+#
+# BUSINESS CONTEXT:
+# - Dashboard used to call 4 endpoints per patient (vitals, risk, alerts,
+#   activities), each re-fetching the User and re-checking PHI access
+# - This reads the denormalized patient_latest_state table instead
+# - Patients with SHARING_OFF are excluded (same rule as check_clinician_phi_access)
+# =============================================================================
+"""
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+from sqlalchemy import or_, desc, asc
+from typing import Optional
+import logging
+
+from app.database import get_db
+from app.models.user import User, UserRole
+from app.models.patient_latest_state import PatientLatestState
+from app.schemas.patient_overview import PatientOverviewItem, PatientOverviewResponse
+from app.api.auth import get_current_doctor_user
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+_SORT_COLUMNS = {
+    "risk": PatientLatestState.latest_risk_score,
+    "alerts": PatientLatestState.unacknowledged_alert_count,
+    "last_vitals": PatientLatestState.latest_vitals_at,
+}
+
+# Columns copied straight from patient_latest_state into each row
+_STATE_FIELDS = [
+    "latest_heart_rate", "latest_spo2", "latest_systolic_bp", "latest_diastolic_bp",
+    "latest_vitals_at", "latest_risk_score", "latest_risk_level", "latest_risk_at",
+    "unacknowledged_alert_count", "last_alert_at", "last_alert_severity",
+    "last_session_id", "last_activity_type", "last_activity_status", "last_activity_at",
+]
+
+
+# =============================================
+# GET_PATIENT_OVERVIEW - Clinician patient panel
+# Used by: Clinician dashboard patients page
+# Returns: PatientOverviewResponse (latest vitals/risk/alerts/activity)
+# Roles: DOCTOR (PHI access required, SHARING_OFF patients excluded)
+# =============================================
+@router.get("/patients/overview", response_model=PatientOverviewResponse)
+async def get_patient_overview(
+    page: int = Query(1, ge=1),
+    per_page: int = Query(200, ge=1, le=500),
+    sort_by: str = Query("risk", pattern="^(risk|alerts|last_vitals|name)$"),
+    risk_level: Optional[str] = Query(None, description="Filter by latest risk level"),
+    search: Optional[str] = Query(None, description="Search by name or email"),
+    current_user: User = Depends(get_current_doctor_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Get the clinician's patient panel in a single indexed query.
+
+    Each row has the latest vitals, latest risk, unacknowledged alert count,
+    and last activity. Patients with no data yet are still listed.
+    """
+    query = db.query(User, PatientLatestState)\
+        .outerjoin(PatientLatestState, PatientLatestState.user_id == User.user_id)\
+        .filter(
+            User.role == UserRole.PATIENT,
+            User.is_active.is_not(False),
+            or_(User.share_state.is_(None), User.share_state != "SHARING_OFF")
+        )
+
+    if risk_level:
+        query = query.filter(PatientLatestState.latest_risk_level == risk_level)
+
+    if search:
+        search_filter = f"%{search}%"
+        query = query.filter(
+            (User.full_name.ilike(search_filter)) | (User.email.ilike(search_filter))
+        )
+
+    total = query.count()
+
+    if sort_by == "name":
+        query = query.order_by(asc(User.full_name), User.user_id)
+    else:
+        query = query.order_by(desc(_SORT_COLUMNS[sort_by]).nulls_last(), User.user_id)
+
+    rows = query.offset((page - 1) * per_page).limit(per_page).all()
+
+    patients = []
+    for user, state in rows:
+        state_fields = {}
+        if state is not None:
+            state_fields = {field: getattr(state, field) for field in _STATE_FIELDS}
+            state_fields["unacknowledged_alert_count"] = state.unacknowledged_alert_count or 0
+        patients.append(PatientOverviewItem(
+            user_id=user.user_id,
+            full_name=user.full_name,
+            email=user.email,
+            age=user.age,
+            **state_fields
+        ))
+
+    logger.info(f"Patient overview for clinician {current_user.user_id}: {len(patients)} of {total}")
+
+    return PatientOverviewResponse(
+        patients=patients,
+        total=total,
+        page=page,
+        per_page=per_page
+    )
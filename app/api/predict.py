@@ -6,26 +6,28 @@ These endpoints use the AI model to estimate heart risk.
 # =============================================================================
 # FILE MAP - QUICK NAVIGATION
 # =============================================================================
-# IMPORTS.............................. Line 30
-# REQUEST/RESPONSE SCHEMAS............. Line 55
+# IMPORTS.............................. Line 39
+# REQUEST/RESPONSE SCHEMAS............. Line 71
 #
 # ENDPOINTS - PUBLIC/SYSTEM
-#   - GET /predict/status.............. Line 227 (Model health check)
+#   - GET /predict/status.............. Line 336 (Model health check)
 #
 # ENDPOINTS - ML PREDICTION
-#   - POST /predict/risk............... Line 245 (Predict from manual input)
-#   - GET /predict/user/{id}/risk...... Line 317 (Clinician predict for patient)
-#   - GET /predict/my-risk............. Line 405 (Patient's own prediction)
+#   - POST /predict/risk............... Line 363 (Predict from manual input)
+#   - POST /predict/what-if............ Line 447 (Risk sweep over 1-2 axes)
+#   - POST /predict/lower-risk......... Line 491 (Counterfactual plan)
+#   - GET /predict/user/{id}/risk...... Line 518 (Clinician predict for patient)
+#   - GET /predict/my-risk............. Line 616 (Patient's own prediction)
 #
 # ENDPOINTS - RISK ASSESSMENT (stored records)
-#   - POST /risk-assessments/compute... Line 518 (Compute & store patient risk)
-#   - POST /patients/{id}/risk-....... Line 604 (Clinician compute for patient)
-#   - GET /risk-assessments/latest..... Line 695 (Patient's latest assessment)
-#   - GET /patients/{id}/risk-......... Line 721 (Clinician view patient risk)
+#   - POST /risk-assessments/compute... Line 735 (Compute & store patient risk)
+#   - POST /patients/{id}/risk-....... Line 833 (Clinician compute for patient)
+#   - GET /risk-assessments/latest..... Line 936 (Patient's latest assessment)
+#   - GET /patients/{id}/risk-......... Line 968 (Clinician view patient risk)
 #
 # ENDPOINTS - RECOMMENDATIONS
-#   - GET /recommendations/latest...... Line 753 (Patient's exercise recommendation)
-#   - GET /patients/{id}/recommend..... Line 782 (Clinician view patient rec)
+#   - GET /recommendations/latest...... Line 1006 (Patient's exercise recommendation)
+#   - GET /patients/{id}/recommend..... Line 1041 (Clinician view patient rec)
 #
 # BUSINESS CONTEXT:
 # - ML model predicts cardiac risk from vitals + activity
@@ -34,11 +36,11 @@ These endpoints use the AI model to estimate heart risk.
 # =============================================================================
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
 from sqlalchemy import desc
 from pydantic import BaseModel, Field
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 import logging
 import time
 from datetime import datetime, timedelta, timezone
@@ -50,8 +52,15 @@ from app.models.activity import ActivitySession
 from app.models.risk_assessment import RiskAssessment
 from app.models.vital_signs import VitalSignRecord
 from app.models.recommendation import ExerciseRecommendation
-from app.services.ml_prediction import get_ml_service, MLPredictionService
+from app.services.ml_prediction import get_ml_service, get_active_bundle, MLPredictionService, ACTIVITY_INTENSITY
+from app.services import shadow_eval
+from app.services.prediction_cache import prediction_cache
 from app.api.auth import get_current_user, get_current_doctor_user, check_clinician_phi_access
+from app.services.patient_state import record_risk_assessment
+from app.services.risk_sweep import run_sweep
+from app.services.counterfactual import find_lower_risk_plan
+from app.services.session_features import session_inputs, session_risk
+from app.services.session_aggregation import summarize_vitals
 
 # Logger
 logger = logging.getLogger(__name__)
@@ -78,6 +87,20 @@ class RiskPredictionRequest(BaseModel):
     activity_type: str = Field(default="walking", description="Activity type")
 
 
+class SweepAxis(BaseModel):
+    """One what-if axis: an integer range over a raw session input."""
+    feature: str = Field(..., description="e.g. peak_heart_rate, duration_minutes")
+    start: int = Field(..., ge=0, le=400)
+    stop: int = Field(..., ge=0, le=400)
+    step: int = Field(default=5, ge=1, le=100)
+
+
+class RiskSweepRequest(BaseModel):
+    """Base session plus one or two axes to vary."""
+    base: RiskPredictionRequest
+    axes: List[SweepAxis] = Field(..., min_length=1, max_length=2)
+
+
 class RiskPredictionResponse(BaseModel):
     """Response from risk prediction."""
     risk_score: float = Field(..., description="Risk score 0.0 to 1.0")
@@ -135,7 +158,9 @@ def _get_recent_vitals_window(
     )
 
 
-def _aggregate_session_features_from_vitals(vitals: list[VitalSignRecord]) -> dict[str, Any]:
+def _aggregate_session_features_from_vitals(
+    vitals: list[VitalSignRecord], resting_hr: Optional[int] = None
+) -> dict[str, Any]:
     """
     Convert raw vitals into the session-style fields the ML model expects.
     If only 1 reading exists, we still produce a valid feature set.
@@ -143,23 +168,26 @@ def _aggregate_session_features_from_vitals(vitals: list[VitalSignRecord]) -> di
     if not vitals:
         raise ValueError("No vitals to aggregate")
 
-    hrs = [v.heart_rate for v in vitals]
-    spo2s = [v.spo2 for v in vitals if v.spo2 is not None]
-
     start = vitals[0].timestamp
     end = vitals[-1].timestamp
-    duration_minutes = max(1, int((end - start).total_seconds() / 60)) if start and end else 10
+    summary = summarize_vitals(
+        [(v.timestamp - start).total_seconds() for v in vitals],
+        [v.heart_rate for v in vitals],
+        [v.spo2 if v.spo2 is not None else float("nan") for v in vitals],
+        resting_hr=resting_hr,
+    )
+    duration_minutes = summary["duration_minutes"]
 
-    avg_hr = int(sum(hrs) / len(hrs))
-    peak_hr = int(max(hrs))
-    min_hr = int(min(hrs))
-    avg_spo2 = int(sum(spo2s) / len(spo2s)) if spo2s else 97
+    avg_hr = summary["avg_heart_rate"]
+    peak_hr = summary["peak_heart_rate"]
+    min_hr = summary["min_heart_rate"]
+    avg_spo2 = summary["avg_spo2"] if summary["avg_spo2"] is not None else 97
 
     activity_type = vitals[-1].activity_type or "walking"
 
-    # Recovery time is not directly observable from a vitals window.
-    # For MVP, use a safe default or infer from phase if you store it.
-    recovery_time_minutes = 5
+    # Recovery time from the HR decay after the window's peak
+    # (services/session_aggregation.py); 5 min when there's no decay to fit
+    recovery_time_minutes = summary["recovery_time_minutes"] or 5
 
     return {
         "avg_heart_rate": avg_hr,
@@ -206,12 +234,63 @@ def _build_drivers(user: User, features: dict[str, Any]) -> list[str]:
     return drivers
 
 
+def _lower_risk_plan(user: User, features: dict[str, Any], risk_level: str) -> dict[str, Any] | None:
+    """
+    Counterfactual plan for an elevated assessment, or None.
+
+    Low risk needs no change, and a failed search falls back to the
+    templates rather than failing the request.
+    """
+    if risk_level == "low":
+        return None
+    try:
+        return find_lower_risk_plan({
+            "age": user.age or 55,
+            "baseline_hr": user.baseline_hr or 72,
+            "max_safe_hr": user.max_safe_hr or (220 - (user.age or 55)),
+            "avg_heart_rate": features["avg_heart_rate"],
+            "peak_heart_rate": features["peak_heart_rate"],
+            "min_heart_rate": features["min_heart_rate"],
+            "avg_spo2": features["avg_spo2"],
+            "duration_minutes": features["duration_minutes"],
+            "recovery_time_minutes": features["recovery_time_minutes"],
+            "activity_type": features["activity_type"],
+        })
+    except Exception as e:
+        logger.error(f"Counterfactual search failed for user {user.user_id}: {e}")
+        return None
+
+
 def _generate_recommendation_payload(
-    user: User, risk_level: str, risk_score: float, drivers: list[str]
+    user: User, risk_level: str, risk_score: float, drivers: list[str],
+    plan: dict[str, Any] | None = None
 ) -> dict[str, Any]:
     baseline = user.baseline_hr or 72
     max_safe = user.max_safe_hr or (220 - (user.age or 55))
 
+    # Model-driven plan: the cheapest change the model scores below 0.5
+    suggestion = plan.get("suggestion") if plan else None
+    if suggestion and risk_level != "low":
+        target_max = suggestion["peak_heart_rate"]
+        steps = "; ".join(suggestion["changes"])
+        description = f"{steps}. Estimated risk drops to {suggestion['risk_score']:.0%}."
+        if risk_level in ("critical", "high"):
+            description = f"Stop intense activity and rest now. Next session: {description}"
+        return {
+            "title": "Lower-Risk Plan",
+            "suggested_activity": suggestion["activity_type"].title(),
+            "intensity_level": "low" if ACTIVITY_INTENSITY.get(suggestion["activity_type"], 2) == 1 else "moderate",
+            "duration_minutes": suggestion["duration_minutes"],
+            "target_heart_rate_min": min(baseline + 10, target_max),
+            "target_heart_rate_max": target_max,
+            "description": description,
+            "warnings": (
+                "If symptoms persist or worsen, contact a healthcare provider."
+                if risk_level in ("critical", "high")
+                else "Pause if dizziness, chest pain, or unusual breathlessness occurs."
+            ),
+        }
+
     # Target zone logic (simple but credible)
     if risk_level in ("critical", "high"):
         return {
@@ -268,7 +347,10 @@ async def check_model_status():
         return {
             "status": "ready" if service.is_loaded else "not_loaded",
             "model_loaded": service.is_loaded,
-            "features_count": len(service.feature_columns) if service.feature_columns else 0
+            "features_count": len(service.feature_columns) if service.feature_columns else 0,
+            "model_version": service.version,
+            "inference_backend": service.inference_backend,
+            "prediction_cache": prediction_cache.stats()
         }
     except Exception as e:
         return {
@@ -304,6 +386,8 @@ async def predict_risk(
         )
 
     # Run prediction with timing
+    # Pin the model version so the shadow comparison uses the same one
+    bundle = get_active_bundle()
     start_time = time.time()
 
     try:
@@ -322,7 +406,8 @@ async def predict_risk(
             avg_spo2=request.avg_spo2,
             duration_minutes=request.duration_minutes,
             recovery_time_minutes=request.recovery_time_minutes,
-            activity_type=request.activity_type
+            activity_type=request.activity_type,
+            bundle=bundle
         )
     except Exception as e:
         logger.error(f"Prediction failed: {e}")
@@ -338,6 +423,9 @@ async def predict_risk(
     # - Mobile app uses this to show \"computing...\" vs instant response
     inference_ms = (time.time() - start_time) * 1000
 
+    # Candidate model (if any) re-scores a sample in the background
+    shadow_eval.submit(result["features_used"], bundle)
+
     logger.info(
         f"Risk prediction for user {current_user.user_id}: "
         f"score={result['risk_score']}, level={result['risk_level']}, "
@@ -356,6 +444,77 @@ async def predict_risk(
     )
 
 
+# =============================================
+# PREDICT_RISK_SWEEP - What-if risk curve / surface
+# Used by: Mobile app "safe HR ceiling", clinician planning
+# Returns: Risk grid plus 0.5 / 0.8 crossing points
+# Roles: ALL authenticated users
+# =============================================
+@router.post("/predict/what-if")
+async def predict_risk_sweep(
+    request: RiskSweepRequest,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Vary one or two session inputs and score every combination.
+
+    The whole grid (e.g. peak HR 100-200 x duration 10-90) is built as
+    one feature matrix and scored in a single model call, instead of one
+    /predict/risk request per variant.
+    """
+    service = get_ml_service()
+    if not service.is_loaded:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="ML model not loaded. Check server logs."
+        )
+
+    start_time = time.time()
+    try:
+        result = run_sweep(
+            request.base.model_dump(),
+            [axis.model_dump() for axis in request.axes]
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    inference_ms = (time.time() - start_time) * 1000
+
+    logger.info(
+        f"Risk sweep for user {current_user.user_id}: "
+        f"{result['grid_points']} points in {inference_ms:.1f}ms"
+    )
+
+    result["inference_time_ms"] = round(inference_ms, 2)
+    return result
+
+
+# =============================================
+# PREDICT_LOWER_RISK_PLAN - Counterfactual "how to lower my risk"
+# Used by: Mobile app recommendations, clinician planning
+# Returns: Cheapest HR / duration / activity change under target risk
+# Roles: ALL authenticated users
+# =============================================
+@router.post("/predict/lower-risk")
+async def predict_lower_risk_plan(
+    request: RiskPredictionRequest,
+    target_risk: float = Query(0.5, gt=0.0, lt=1.0),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Search target HR, duration and activity type for the smallest change
+    the model scores below target_risk. Candidates are scored in large
+    batches within COUNTERFACTUAL_BUDGET_MS.
+    """
+    service = get_ml_service()
+    if not service.is_loaded:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="ML model not loaded. Check server logs."
+        )
+
+    return find_lower_risk_plan(request.model_dump(), target_risk=target_risk)
+
+
 # =============================================
 # PREDICT_USER_RISK_FROM_LATEST_SESSION - Clinician patient check
 # Used by: Clinician dashboard patient detail view
@@ -392,6 +551,13 @@ async def predict_user_risk_from_latest_session(
     - Clinician tools use this endpoint (dashboard, patient review)
     - Decouples patient-facing real-time API from clinician tools
     
+    FEATURE STORE:
+    - Sessions ended through the API carry their engineered features and
+      risk score (services/session_features.py)
+    - score_source: "stored_score" (scored by the active model at session
+      end), "stored_features" (stored features re-scored by a newer model)
+      or "recomputed" (older session, features engineered from the row)
+
     FALLBACK STRATEGY:
     - Uses 'or' defaults for missing user fields (age || 55)
     - Prevents 500 error if patient never filled profile
@@ -415,24 +581,19 @@ async def predict_user_risk_from_latest_session(
         raise HTTPException(status_code=404, detail="No activity sessions found for user")
 
     # Load ML service
-    service = get_ml_service()
-    if not service.is_loaded:
+    bundle = get_active_bundle()
+    if bundle is None:
         raise HTTPException(status_code=503, detail="ML model not loaded")
 
-    # Run prediction using user profile + session data
+    # Read the features/score stored when the session ended; sessions
+    # without them are engineered from the row as before
     start_time = time.time()
-    result = service.predict_risk(
-        age=user.age or 55,
-        baseline_hr=user.baseline_hr or 72,
-        max_safe_hr=user.max_safe_hr or (220 - (user.age or 55)),
-        avg_heart_rate=session.avg_heart_rate or 90,
-        peak_heart_rate=session.peak_heart_rate or 120,
-        min_heart_rate=session.min_heart_rate or 65,
-        avg_spo2=session.avg_spo2 or 96,
-        duration_minutes=session.duration_minutes or 30,
-        recovery_time_minutes=session.recovery_time_minutes or 8,
-        activity_type=session.activity_type or "walking"
-    )
+    result = session_risk(session, bundle)
+    if result is not None:
+        score_source = result["source"]
+    else:
+        result = get_ml_service().predict_risk(**session_inputs(user, session), bundle=bundle)
+        score_source = "recomputed"
     inference_ms = (time.time() - start_time) * 1000
 
     return {
@@ -447,6 +608,8 @@ async def predict_user_risk_from_latest_session(
             "confidence": result["confidence"],
             "recommendation": result["recommendation"]
         },
+        "model_version": bundle.version,
+        "score_source": score_source,
         "inference_time_ms": round(inference_ms, 2)
     }
 
@@ -588,9 +751,10 @@ async def compute_my_risk_assessment(
     if not vitals:
         raise HTTPException(status_code=404, detail="No recent vitals found")
 
-    features = _aggregate_session_features_from_vitals(vitals)
+    features = _aggregate_session_features_from_vitals(vitals, current_user.baseline_hr)
     drivers = _build_drivers(current_user, features)
 
+    bundle = get_active_bundle()
     start_time = time.time()
     result = service.predict_risk(
         age=current_user.age or 55,
@@ -602,9 +766,11 @@ async def compute_my_risk_assessment(
         avg_spo2=features["avg_spo2"],
         duration_minutes=features["duration_minutes"],
         recovery_time_minutes=features["recovery_time_minutes"],
-        activity_type=features["activity_type"]
+        activity_type=features["activity_type"],
+        bundle=bundle
     )
     inference_ms = (time.time() - start_time) * 1000
+    shadow_eval.submit(result["features_used"], bundle)
 
     # Store risk assessment
     ra = RiskAssessment(
@@ -626,11 +792,14 @@ async def compute_my_risk_assessment(
         generated_by="cloud_ai"
     )
     db.add(ra)
+    db.flush()
+    record_risk_assessment(db, ra)
     db.commit()
     db.refresh(ra)
 
     # Generate & store recommendation (linked)
-    rec_payload = _generate_recommendation_payload(current_user, ra.risk_level, ra.risk_score, drivers)
+    plan = _lower_risk_plan(current_user, features, ra.risk_level)
+    rec_payload = _generate_recommendation_payload(current_user, ra.risk_level, ra.risk_score, drivers, plan)
     rec = ExerciseRecommendation(
         user_id=current_user.user_id,
         title=rec_payload["title"],
@@ -687,9 +856,10 @@ async def compute_patient_risk_assessment(
     if not vitals:
         raise HTTPException(status_code=404, detail="No recent vitals found")
 
-    features = _aggregate_session_features_from_vitals(vitals)
+    features = _aggregate_session_features_from_vitals(vitals, patient.baseline_hr)
     drivers = _build_drivers(patient, features)
 
+    bundle = get_active_bundle()
     start_time = time.time()
     result = service.predict_risk(
         age=patient.age or 55,
@@ -701,9 +871,11 @@ async def compute_patient_risk_assessment(
         avg_spo2=features["avg_spo2"],
         duration_minutes=features["duration_minutes"],
         recovery_time_minutes=features["recovery_time_minutes"],
-        activity_type=features["activity_type"]
+        activity_type=features["activity_type"],
+        bundle=bundle
     )
     inference_ms = (time.time() - start_time) * 1000
+    shadow_eval.submit(result["features_used"], bundle)
 
     ra = RiskAssessment(
         user_id=user_id,
@@ -724,10 +896,13 @@ async def compute_patient_risk_assessment(
         generated_by="cloud_ai"
     )
     db.add(ra)
+    db.flush()
+    record_risk_assessment(db, ra)
     db.commit()
     db.refresh(ra)
 
-    rec_payload = _generate_recommendation_payload(patient, ra.risk_level, ra.risk_score, drivers)
+    plan = _lower_risk_plan(patient, features, ra.risk_level)
+    rec_payload = _generate_recommendation_payload(patient, ra.risk_level, ra.risk_score, drivers, plan)
     rec = ExerciseRecommendation(
         user_id=user_id,
         title=rec_payload["title"],
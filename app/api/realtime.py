@@ -0,0 +1,366 @@
+"""
+Real-time routes.
+
+Streams new vitals and alerts to the mobile app and clinician dashboard
+over WebSocket or Server-Sent Events, so they no longer poll
+/vitals/latest and /alerts. Also hosts the WebSocket ingest channel for
+high-frequency wearable streams.
+
+# =============================================================================
+# FILE MAP - QUICK NAVIGATION
+# =============================================================================
+# HELPER FUNCTIONS
+#   - _user_from_token................. Line 77  (JWT -> User for WebSockets)
+#   - _clinician_may_stream............ Line 96  (Re-check open clinician streams)
+#   - _sse_events...................... Line 134 (Hub queue -> SSE frames)
+#
+# ENDPOINTS - PATIENT (own stream)
+#   - WS  /ws/vitals................... Line 215 (WebSocket push)
+#   - GET /stream/vitals............... Line 236 (SSE push)
+#   - WS  /ws/vitals/ingest............ Line 254 (Buffered streaming ingest)
+#
+# ENDPOINTS - CLINICIAN (patient stream)
+#   - WS  /ws/patients/{id}............ Line 319 (WebSocket push)
+#   - GET /stream/patients/{id}........ Line 349 (SSE push)
+#
+# BUSINESS CONTEXT:
+# - Events: {"type": "vitals" | "alert", "user_id", "data", "published_at"}
+# - Browsers can't set headers on WebSockets, so ?token= is accepted there
+# - Clinicians are blocked when the patient has SHARING_OFF
+# - Open clinician streams re-check consent, the clinician's account and
+#   token expiry before every event and heartbeat, and close when access
+#   is gone (the dashboard reconnects with a fresh token)
+# - DB session is released after auth and after each re-check; streams
+#   can stay open for hours
+# - Ingest acks each flush: {"type": "ack", "stored", "duplicates", "rejected", "alerts"}
+# =============================================================================
+"""
+
+import asyncio
+import json
+import logging
+import time
+from typing import Awaitable, Callable, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Request, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import get_db
+from app.models.user import User, UserRole
+from app.api.auth import (
+    auth_service, get_current_user, get_current_doctor_user, check_clinician_phi_access, oauth2_scheme,
+)
+from app.services.realtime_hub import get_realtime_hub, Subscription
+from app.services.vitals_ingest import IngestBuffer, parse_readings, flush_readings
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# Idle keep-alive so proxies don't close quiet connections
+HEARTBEAT_SECONDS = 15.0
+
+# WebSocket close code for auth / permission failures
+WS_POLICY_VIOLATION = 1008
+
+# Re-checked before every event and heartbeat of an open stream
+AccessCheck = Callable[[], Awaitable[bool]]
+
+
+# =============================================================================
+# Helper Functions
+# =============================================================================
+
+def _user_from_token(db: Session, token: Optional[str]) -> Optional[User]:
+    """Resolve an access token to an active user, or None."""
+    if not token:
+        return None
+    payload = auth_service.decode_token(token)
+    if not payload or payload.get("type") != "access" or not payload.get("sub"):
+        return None
+    user = db.query(User).filter(User.user_id == int(payload["sub"])).first()
+    if not user or not user.is_active:
+        return None
+    return user
+
+
+def _token_expiry(token: Optional[str]) -> Optional[float]:
+    """The token's exp (epoch seconds), or None."""
+    payload = auth_service.decode_token(token) if token else None
+    return payload.get("exp") if payload else None
+
+
+def _clinician_may_stream(db: Session, clinician_id: int, patient_id: int, expires_at: Optional[float]) -> bool:
+    """
+    Re-run the connect-time checks for an open clinician stream: token not
+    expired, clinician still active, patient not SHARING_OFF.
+
+    Reads fresh rows and releases the DB connection again afterwards.
+    """
+    if expires_at is not None and time.time() >= expires_at:
+        return False
+    try:
+        clinician = db.get(User, clinician_id)
+        patient = db.get(User, patient_id)
+        if clinician is None or patient is None or not clinician.is_active or clinician.role != UserRole.CLINICIAN:
+            return False
+        try:
+            check_clinician_phi_access(clinician, patient)
+        except HTTPException:
+            return False
+        return True
+    finally:
+        db.close()
+
+
+def _clinician_access_check(db: Session, clinician_id: int, patient_id: int, token: Optional[str]) -> AccessCheck:
+    expires_at = _token_expiry(token)
+    return lambda: run_in_threadpool(_clinician_may_stream, db, clinician_id, patient_id, expires_at)
+
+
+def _websocket_token(websocket: WebSocket) -> Optional[str]:
+    token = websocket.query_params.get("token")
+    if token:
+        return token
+    authorization = websocket.headers.get("authorization", "")
+    if authorization.lower().startswith("bearer "):
+        return authorization[7:]
+    return None
+
+
+async def _sse_events(request: Request, subscription: Subscription, still_allowed: Optional[AccessCheck] = None):
+    """
+    Yield SSE frames from a hub subscription until the client disconnects,
+    or until still_allowed() says access is gone.
+    """
+    hub = get_realtime_hub()
+    try:
+        yield ": connected\n\n"
+        while not await request.is_disconnected():
+            event = await subscription.get(timeout=HEARTBEAT_SECONDS)
+            if still_allowed is not None and not await still_allowed():
+                logger.info(f"Stream access revoked for patient {subscription.user_id}; closing SSE stream")
+                return
+            if event is None:
+                yield ": heartbeat\n\n"
+                continue
+            yield f"event: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
+    finally:
+        hub.unsubscribe(subscription)
+
+
+async def _pump_websocket(websocket: WebSocket, user_id: int, still_allowed: Optional[AccessCheck] = None) -> None:
+    """
+    Forward hub events for user_id to an accepted WebSocket until it closes.
+
+    Closes the socket (policy violation) once still_allowed() says access
+    is gone.
+    """
+    hub = get_realtime_hub()
+    subscription = hub.subscribe(user_id)
+
+    async def watch_client():
+        # Clients don't send anything; receive() just tells us when they leave
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+
+    watcher = asyncio.create_task(watch_client())
+    try:
+        while True:
+            getter = asyncio.create_task(subscription.get(timeout=HEARTBEAT_SECONDS))
+            done, _ = await asyncio.wait({getter, watcher}, return_when=asyncio.FIRST_COMPLETED)
+            if watcher in done:
+                getter.cancel()
+                break
+            event = getter.result()
+            if still_allowed is not None and not await still_allowed():
+                logger.info(f"Stream access revoked for patient {user_id}; closing WebSocket")
+                await websocket.close(code=WS_POLICY_VIOLATION)
+                break
+            if event is None:
+                await websocket.send_json({"type": "heartbeat"})
+            else:
+                await websocket.send_text(json.dumps(event, default=str))
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        watcher.cancel()
+        hub.unsubscribe(subscription)
+
+
+def _sse_response(request: Request, user_id: int, still_allowed: Optional[AccessCheck] = None) -> StreamingResponse:
+    subscription = get_realtime_hub().subscribe(user_id)
+    return StreamingResponse(
+        _sse_events(request, subscription, still_allowed),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# =============================================================================
+# Patient Streams
+# =============================================================================
+
+# =============================================
+# WS_OWN_VITALS - Live vitals and alerts for the logged-in patient
+# Used by: Mobile app home screen (replaces polling /vitals/latest)
+# Returns: JSON events as they are stored
+# Roles: Any authenticated user (own stream)
+# =============================================
+@router.websocket("/ws/vitals")
+async def websocket_own_vitals(websocket: WebSocket, db: Session = Depends(get_db)):
+    user = _user_from_token(db, _websocket_token(websocket))
+    user_id = user.user_id if user else None
+    db.close()
+
+    if user_id is None:
+        await websocket.close(code=WS_POLICY_VIOLATION)
+        return
+
+    await websocket.accept()
+    logger.info(f"WebSocket stream opened for user {user_id}")
+    await _pump_websocket(websocket, user_id)
+
+
+# =============================================
+# SSE_OWN_VITALS - Same stream as /ws/vitals over Server-Sent Events
+# Used by: Clients behind proxies that block WebSockets
+# Returns: text/event-stream
+# Roles: Any authenticated user (own stream)
+# =============================================
+@router.get("/stream/vitals")
+async def stream_own_vitals(
+    request: Request,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Server-Sent Events stream of the current user's vitals and alerts."""
+    user_id = current_user.user_id
+    db.close()
+    return _sse_response(request, user_id)
+
+
+# =============================================
+# WS_INGEST_VITALS - Continuous reading stream from a wearable
+# Used by: Mobile app while a watch streams at ~1 Hz (replaces POST /vitals per reading)
+# Returns: {"type": "ack", ...} after each batched write
+# Roles: Any authenticated user (own data)
+# =============================================
+@router.websocket("/ws/vitals/ingest")
+async def websocket_ingest_vitals(websocket: WebSocket, db: Session = Depends(get_db)):
+    """
+    Authenticate once, then accept readings until the client disconnects.
+
+    Frames are a reading object, a list of readings, or {"readings": [...]}.
+    Readings are written in batches with threshold alerts checked inline.
+    """
+    user = _user_from_token(db, _websocket_token(websocket))
+    user_id = user.user_id if user else None
+    db.close()
+
+    if user_id is None:
+        await websocket.close(code=WS_POLICY_VIOLATION)
+        return
+
+    await websocket.accept()
+    logger.info(f"Ingest stream opened for user {user_id}")
+    buffer = IngestBuffer(settings.ingest_flush_max_readings, settings.ingest_flush_interval_ms)
+
+    async def flush() -> dict:
+        readings, rejected = buffer.drain()
+        result = await run_in_threadpool(flush_readings, db, user_id, readings)
+        result["rejected"] = rejected
+        return result
+
+    try:
+        while True:
+            try:
+                message = await asyncio.wait_for(
+                    websocket.receive_text(), timeout=buffer.seconds_until_due()
+                )
+            except asyncio.TimeoutError:
+                await websocket.send_json({"type": "ack", **(await flush())})
+                continue
+
+            readings, rejected = parse_readings(message)
+            buffer.extend(readings)
+            buffer.rejected += rejected
+            if buffer.is_full():
+                await websocket.send_json({"type": "ack", **(await flush())})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        # Don't lose what the client sent just before hanging up
+        if len(buffer):
+            try:
+                await flush()
+            except Exception as e:
+                logger.error(f"Final ingest flush failed for user {user_id}: {e}")
+                db.rollback()
+        db.close()
+        logger.info(f"Ingest stream closed for user {user_id}")
+
+
+# =============================================================================
+# Clinician Streams
+# =============================================================================
+
+# =============================================
+# WS_PATIENT_VITALS - Live vitals and alerts for one patient
+# Used by: Clinician dashboard patient detail page
+# Returns: JSON events as they are stored
+# Roles: CLINICIAN (patient must not be SHARING_OFF)
+# =============================================
+@router.websocket("/ws/patients/{user_id}")
+async def websocket_patient_vitals(websocket: WebSocket, user_id: int, db: Session = Depends(get_db)):
+    token = _websocket_token(websocket)
+    clinician = _user_from_token(db, token)
+    patient = db.query(User).filter(User.user_id == user_id).first()
+
+    allowed = clinician is not None and clinician.role == UserRole.CLINICIAN and patient is not None
+    if allowed:
+        try:
+            check_clinician_phi_access(clinician, patient)
+        except HTTPException:
+            allowed = False
+    db.close()
+
+    if not allowed:
+        await websocket.close(code=WS_POLICY_VIOLATION)
+        return
+
+    await websocket.accept()
+    logger.info(f"Clinician WebSocket stream opened for patient {user_id}")
+    # Consent, account and token are checked again for as long as it stays open
+    await _pump_websocket(websocket, user_id, _clinician_access_check(db, clinician.user_id, user_id, token))
+
+
+# =============================================
+# SSE_PATIENT_VITALS - Same stream as /ws/patients/{id} over SSE
+# Used by: Clinician dashboard (EventSource fallback)
+# Returns: text/event-stream
+# Roles: CLINICIAN (patient must not be SHARING_OFF)
+# =============================================
+@router.get("/stream/patients/{user_id}")
+async def stream_patient_vitals(
+    request: Request,
+    user_id: int,
+    current_user: User = Depends(get_current_doctor_user),
+    token: str = Depends(oauth2_scheme),
+    db: Session = Depends(get_db)
+):
+    """Server-Sent Events stream of one patient's vitals and alerts."""
+    patient = db.query(User).filter(User.user_id == user_id).first()
+    if not patient:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found"
+        )
+    check_clinician_phi_access(current_user, patient)
+    db.close()
+    return _sse_response(request, user_id, _clinician_access_check(db, current_user.user_id, user_id, token))
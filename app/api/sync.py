@@ -0,0 +1,73 @@
+"""
+Delta sync routes.
+
+Lets the mobile app refresh its local cache with only what changed since
+its last sync, instead of re-downloading history windows.
+
+# =============================================================================
+# FILE MAP - QUICK NAVIGATION
+# =============================================================================
+# IMPORTS.............................. Line 27
+#
+# ENDPOINTS - PATIENT (own data)
+#   - GET /sync/changes................ Line 48  (Changes since a cursor)
+#
+# BUSINESS CONTEXT:
+# - Covers vitals, alerts, risk assessments, recommendations and activity
+#   sessions (see services/sync_changes.py)
+# - The cursor is opaque; the app stores the last one it got and sends it
+#   back. Without one, the sync starts from the beginning
+# - Cost follows the number of changes, not the history window: a sync
+#   with nothing new returns the same cursor after two index probes
+# - Rows written in the last few seconds (SYNC_COMMIT_LAG_SECONDS) come on
+#   the next sync; realtime push covers them in the meantime
+# =============================================================================
+"""
+
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from sqlalchemy.orm import Session
+from typing import Optional
+import logging
+
+from app.database import get_db
+from app.models.user import User
+from app.schemas.sync import SyncChangesResponse
+from app.services.sync_changes import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, fetch_changes
+from app.api.auth import get_current_user
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+
+# =============================================
+# GET_SYNC_CHANGES - Rows created/updated/deleted since the app's last sync
+# Used by: Mobile app cache refresh (app start, pull-to-refresh, reconnect)
+# Returns: SyncChangesResponse (changed rows per entity, deletions, next cursor)
+# Roles: Any authenticated user (own data)
+# =============================================
+@router.get("/sync/changes", response_model=SyncChangesResponse)
+async def get_sync_changes(
+    since: Optional[str] = Query(None, max_length=100, description="Cursor from the previous sync"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Max changes per entity stream"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Get one page of the current user's changes after `since`.
+    
+    Keep calling with the returned cursor while has_more is true. Rows
+    updated several times since the cursor are returned once, as they are
+    now.
+    """
+    try:
+        changes = fetch_changes(db, current_user.user_id, since, limit)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    counts = {key: len(rows) for key, rows in changes.items() if isinstance(rows, list) and rows}
+    if counts:
+        logger.info(f"Sync for user {current_user.user_id}: {counts}")
+    return changes
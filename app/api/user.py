@@ -44,7 +44,7 @@ from app.schemas.user import (
     UserResponse, UserUpdate, MedicalHistoryUpdate,
     UserProfileResponse, UserListResponse, UserCreateAdmin
 )
-from app.services.encryption import encryption_service
+from app.services.encryption import get_encryption_service
 from app.api.auth import get_current_user, get_current_admin_user, get_current_doctor_user, get_current_admin_or_doctor_user, check_clinician_phi_access
 
 # Configure logging
@@ -195,7 +195,7 @@ async def update_medical_history(
     
     if medical_dict:
         # Encrypt the medical history
-        encrypted_history = encryption_service.encrypt_json(medical_dict)
+        encrypted_history = get_encryption_service().encrypt_json(medical_dict)
         current_user.medical_history_encrypted = encrypted_history
         
         db.commit()
@@ -532,7 +532,7 @@ async def get_user_medical_history(
     
     try:
         # Decrypt medical history
-        medical_history = encryption_service.decrypt_json(user.medical_history_encrypted)
+        medical_history = get_encryption_service().decrypt_json(user.medical_history_encrypted)
         return {"medical_history": medical_history}
     except Exception as e:
         logger.error(f"Failed to decrypt medical history for user {user_id}: {e}")
@@ -6,35 +6,45 @@ This file saves heart data from devices and lets the app read it back.
 # =============================================================================
 # FILE MAP - QUICK NAVIGATION
 # =============================================================================
-# IMPORTS.............................. Line 35
+# IMPORTS.............................. Line 46
 # HELPER FUNCTIONS
-#   - check_vitals_for_alerts.......... Line 72  (Background alert checker)
-#   - calculate_vitals_summary......... Line 165 (Stats calculation)
+#   - check_vitals_for_alerts.......... Line 93  (Background alert checker)
+#   - calculate_vitals_summary......... Line 137 (Stats calculation)
+#   - recent_hrv_windows............... Line 204 (HRV window query)
 #
 # ENDPOINTS - PATIENT (own data)
 #   --- SUBMIT VITALS ---
-#   - POST /vitals..................... Line 239 (Submit single reading)
-#   - POST /vitals/batch............... Line 332 (Submit multiple readings)
+#   - POST /vitals..................... Line 226 (Submit single reading)
+#   - POST /vitals/batch............... Line 343 (Submit multiple readings)
+#   - POST /vitals/batch/binary........ Line 441 (Columnar binary batch)
+#   - POST /vitals/rr.................. Line 482 (Raw RR intervals -> HRV)
 #
 #   --- READ VITALS ---
-#   - GET /vitals/latest............... Line 402 (Most recent reading)
-#   - GET /vitals/summary.............. Line 432 (Aggregated stats)
-#   - GET /vitals/history.............. Line 457 (Time-series data)
+#   - GET /vitals/latest............... Line 524 (Most recent reading)
+#   - GET /vitals/summary.............. Line 558 (Aggregated stats)
+#   - GET /vitals/history.............. Line 583 (Time-series data)
+#   - GET /vitals/hrv.................. Line 632 (HRV windows)
 #
 # ENDPOINTS - CLINICIAN (patient data)
-#   - GET /vitals/user/{id}/latest..... Line 510 (Patient's latest)
-#   - GET /vitals/user/{id}/summary.... Line 551 (Patient's stats)
-#   - GET /vitals/user/{id}/history.... Line 586 (Patient's history)
+#   - GET /vitals/user/{id}/latest..... Line 655 (Patient's latest)
+#   - GET /vitals/user/{id}/summary.... Line 699 (Patient's stats)
+#   - GET /vitals/user/{id}/history.... Line 734 (Patient's history)
+#   - GET /vitals/user/{id}/hrv........ Line 788 (Patient's HRV windows)
 #
 # BUSINESS CONTEXT:
 # - Patients sync vitals from wearables (Fitbit, Apple Watch)
 # - Mobile app shows latest readings on home screen
 # - Clinician dashboard shows patient vitals with time trends
 # - Alerts auto-create when thresholds exceeded (HR>180, SpO2<90)
+# - Submits are idempotent per (user, device_id, timestamp), so the app can
+#   resend an offline sync without creating duplicates
+# - Chest straps / Holter recorders upload raw RR intervals; HRV is
+#   computed server-side per 5-minute window (services/hrv.py)
 # =============================================================================
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status, Query, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, status, Query, BackgroundTasks, Request
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from sqlalchemy import func, desc
 from typing import List, Optional
@@ -44,12 +54,22 @@ import logging
 from app.database import get_db
 from app.models.user import User, UserRole
 from app.models.vital_signs import VitalSignRecord
-from app.models.alert import Alert, AlertType, SeverityLevel
+from app.models.hrv_window import HRVWindow
+from app.models.alert import Alert
 from app.schemas.vital_signs import (
     VitalSignCreate, VitalSignResponse, VitalSignBatchCreate,
-    VitalSignsSummary, VitalSignsHistoryResponse, VitalSignsStats
+    VitalSignsSummary, VitalSignsHistoryResponse, VitalSignsStats,
+    RRIntervalUpload, HRVWindowResponse, HRVUploadResponse
 )
-from app.services.encryption import encryption_service
+from app.services.hrv import decode_rr, store_hrv_windows
+from app.services.vitals_ingest import flush_columns, insert_new_vitals, stamp_missing_timestamps
+from app.services.vitals_wire import decode_vitals_batch
+from app.services.patient_state import record_vitals, record_alerts_created
+from app.services.realtime_hub import publish_vitals, publish_alerts
+from app.services.signal_quality import load_context, score_readings
+from app.services.vital_thresholds import build_threshold_alerts
+from app.services.alert_cooldown import alert_cooldown
+from app.services.alert_counters import count_alerts_created
 from app.api.auth import get_current_user, get_current_doctor_user, check_clinician_phi_access
 
 # Configure logging
@@ -68,6 +88,7 @@ router = APIRouter()
 # Used by: Called after every vital submission
 # Returns: None (creates Alert records in DB)
 # Triggers: HR>180 (critical), SpO2<90 (critical), BP>160 (warning)
+# Cooldown: one alert per type per ALERT_COOLDOWN_MINUTES
 # =============================================
 def check_vitals_for_alerts(user_id: int, vital_data: VitalSignCreate):
     """
@@ -86,72 +107,23 @@ def check_vitals_for_alerts(user_id: int, vital_data: VitalSignCreate):
     try:
         logger.info(f"Checking vitals for alerts: user {user_id}")
         
-        # Collect all alerts to create
-        new_alerts = []
-        
-        # Check for high heart rate (critical threshold: >180 BPM)
-        if vital_data.heart_rate > 180:
-            logger.warning(f"High heart rate alert for user {user_id}: {vital_data.heart_rate} BPM")
-            
-            new_alerts.append(Alert(
-                user_id=user_id,
-                alert_type=AlertType.HIGH_HEART_RATE.value,
-                severity=SeverityLevel.CRITICAL.value,
-                title="High Heart Rate Detected",
-                message=f"Heart rate of {vital_data.heart_rate} BPM exceeds safe threshold of 180 BPM",
-                action_required="Rest immediately and monitor. Contact healthcare provider if symptoms persist.",
-                trigger_value=f"{vital_data.heart_rate} BPM",
-                threshold_value="180 BPM",
-                acknowledged=False,
-                is_sent_to_user=True,
-                is_sent_to_caregiver=True,
-                is_sent_to_clinician=True
-            ))
-        
-        # Check for low oxygen (critical threshold: <90%)
-        if vital_data.spo2 and vital_data.spo2 < 90:
-            logger.warning(f"Low oxygen alert for user {user_id}: {vital_data.spo2}%")
-            
-            new_alerts.append(Alert(
-                user_id=user_id,
-                alert_type=AlertType.LOW_SPO2.value,
-                severity=SeverityLevel.CRITICAL.value,
-                title="Low Blood Oxygen Detected",
-                message=f"Blood oxygen saturation of {vital_data.spo2}% is below safe threshold of 90%",
-                action_required="Seek immediate medical attention. This may indicate respiratory distress.",
-                trigger_value=f"{vital_data.spo2}%",
-                threshold_value="90%",
-                acknowledged=False,
-                is_sent_to_user=True,
-                is_sent_to_caregiver=True,
-                is_sent_to_clinician=True
-            ))
-        
-        # Check for high blood pressure (warning threshold: systolic >160 or diastolic >100)
-        if vital_data.blood_pressure_systolic and vital_data.blood_pressure_systolic > 160:
-            # Include both systolic and diastolic in trigger value for context
-            bp_display = f"{vital_data.blood_pressure_systolic}/{vital_data.blood_pressure_diastolic or 'N/A'} mmHg"
-            logger.warning(f"High blood pressure alert for user {user_id}: {bp_display}")
-            
-            new_alerts.append(Alert(
-                user_id=user_id,
-                alert_type=AlertType.HIGH_BLOOD_PRESSURE.value,
-                severity=SeverityLevel.WARNING.value,
-                title="Elevated Blood Pressure",
-                message=f"Systolic blood pressure of {vital_data.blood_pressure_systolic} mmHg exceeds threshold",
-                action_required="Monitor blood pressure and consult healthcare provider if elevated readings persist.",
-                trigger_value=bp_display,
-                threshold_value="160/100 mmHg",
-                acknowledged=False,
-                is_sent_to_user=True,
-                is_sent_to_clinician=True
-            ))
+        # Collect all alerts to create (HR>180, SpO2<90, BP>160), skipping
+        # types that already fired for this patient within the cooldown
+        new_alerts = alert_cooldown.filter_alerts(db, build_threshold_alerts(user_id, vital_data))
         
         # Bulk insert all alerts in a single transaction
         if new_alerts:
-            db.add_all(new_alerts)
-            db.commit()
+            try:
+                db.add_all(new_alerts)
+                record_alerts_created(db, user_id, new_alerts)
+                count_alerts_created(db, new_alerts)
+                db.commit()
+            except Exception:
+                # Nothing was stored, so these types mustn't stay in cooldown
+                alert_cooldown.release(new_alerts)
+                raise
             logger.info(f"Created {len(new_alerts)} alert(s) for user {user_id}")
+            publish_alerts(user_id, new_alerts)
             
     finally:
         db.close()
@@ -224,6 +196,21 @@ def calculate_vitals_summary(
     return summary
 
 
+# =============================================
+# RECENT_HRV_WINDOWS - HRV windows over the last N days
+# Used by: Patient and clinician HRV endpoints
+# Returns: HRVWindow rows, newest first
+# =============================================
+def recent_hrv_windows(db: Session, user_id: int, days: int, limit: int) -> List[HRVWindow]:
+    """Get a user's HRV windows that start within the last `days` days."""
+    start_date = datetime.now(timezone.utc) - timedelta(days=days)
+    return db.query(HRVWindow)\
+             .filter(HRVWindow.user_id == user_id, HRVWindow.window_start >= start_date)\
+             .order_by(HRVWindow.window_start.desc())\
+             .limit(limit)\
+             .all()
+
+
 # =============================================================================
 # Vital Signs Endpoints
 # =============================================================================
@@ -250,7 +237,10 @@ async def submit_vitals(
     - Accepts readings from Fitbit, Apple Watch, Oura Ring, etc.
     - Validates data quality BEFORE storing (prevents garbage data)
     - Runs alert checking in BACKGROUND (doesn't block user response)
-    - Stores with confidence_score for future ML feature engineering
+    - Scores signal quality (flat-lines, spikes, motion artifacts, SpO2
+      dropouts) and stores confidence_score / is_valid with the reading
+    - Idempotent for readings with device_id + timestamp: a retry returns
+      the reading already stored instead of a second copy
     
     VALIDATION STRATEGY:
     - Heart rate 30-250 BPM (physiologically impossible outside this range)
@@ -295,28 +285,49 @@ async def submit_vitals(
             detail="Blood oxygen saturation out of valid range (70-100%)"
         )
     
+    # Score signal quality against the user's last few readings
+    # WHY: A single reading can only be judged as a flat-line or jump in context
+    timestamp = vital_data.timestamp or datetime.now(timezone.utc)
+    context = load_context(db, current_user.user_id, timestamp)
+    [confidence], [is_valid] = score_readings([vital_data], context, received_at=timestamp)
+
     # Create vital signs record (column names match Massoud's AWS schema)
     # Stores with system-generated timestamp defaults
-    new_vital = VitalSignRecord(
-        user_id=current_user.user_id,
-        heart_rate=vital_data.heart_rate,
-        spo2=vital_data.spo2,
-        systolic_bp=vital_data.blood_pressure_systolic,
-        diastolic_bp=vital_data.blood_pressure_diastolic,
-        hrv=vital_data.hrv,
-        source_device=vital_data.source_device,
-        device_id=vital_data.device_id,
-        timestamp=vital_data.timestamp or datetime.now(timezone.utc),
-        is_valid=True,
-        confidence_score=1.0
-    )
-    
-    db.add(new_vital)
+    # WHY insert_new_vitals: a retried request (same device + timestamp) is
+    # skipped by the natural-key index instead of stored twice
+    new_vital = insert_new_vitals(db, [{
+        "user_id": current_user.user_id,
+        "heart_rate": vital_data.heart_rate,
+        "spo2": vital_data.spo2,
+        "systolic_bp": vital_data.blood_pressure_systolic,
+        "diastolic_bp": vital_data.blood_pressure_diastolic,
+        "hrv": vital_data.hrv,
+        "source_device": vital_data.source_device,
+        "device_id": vital_data.device_id,
+        "timestamp": timestamp,
+        "is_valid": is_valid,
+        "confidence_score": confidence,
+    }], VitalSignRecord).scalars().first()
+    
+    if new_vital is None:
+        # Already stored: return the original reading, alerts already ran for it
+        existing = db.query(VitalSignRecord).filter(
+            VitalSignRecord.user_id == current_user.user_id,
+            VitalSignRecord.device_id == vital_data.device_id,
+            VitalSignRecord.timestamp == timestamp
+        ).first()
+        logger.info(f"Duplicate vital signs reading from user {current_user.user_id} skipped")
+        return existing
+    
+    # Low-quality readings are stored for audit but don't alert or become "latest"
+    if is_valid:
+        record_vitals(db, current_user.user_id, [new_vital])
     db.commit()
     db.refresh(new_vital)
-    
-    # Check for alerts in background
-    background_tasks.add_task(check_vitals_for_alerts, current_user.user_id, vital_data)
+    if is_valid:
+        publish_vitals(current_user.user_id, [new_vital])
+        # Check for alerts in background
+        background_tasks.add_task(check_vitals_for_alerts, current_user.user_id, vital_data)
     
     logger.info(f"Vital signs recorded for user {current_user.user_id}: HR={vital_data.heart_rate}")
     
@@ -326,7 +337,7 @@ async def submit_vitals(
 # =============================================
 # SUBMIT_VITALS_BATCH - Patient submits multiple readings at once
 # Used by: Mobile app bulk sync (offline data, historical imports)
-# Returns: Count of records successfully created
+# Returns: Count of records created / skipped as duplicates
 # Roles: PATIENT (own data only)
 # =============================================
 @router.post("/vitals/batch")
@@ -339,7 +350,9 @@ async def submit_vitals_batch(
     """
     Submit multiple vital signs readings in batch.
     
-    Useful for syncing historical data or bulk uploads.
+    Useful for syncing historical data or bulk uploads. Safe to resend:
+    readings with a device_id + timestamp already stored for this user are
+    skipped and counted in records_duplicate.
     """
     if not batch_data.vitals:
         raise HTTPException(
@@ -353,44 +366,153 @@ async def submit_vitals_batch(
             detail="Batch size limited to 1000 records"
         )
     
-    records_created = 0
-    
-    for vital_data in batch_data.vitals:
-        # Basic validation
-        if vital_data.heart_rate < 30 or vital_data.heart_rate > 250:
-            continue  # Skip invalid records
-        
-        new_vital = VitalSignRecord(
-            user_id=current_user.user_id,
-            heart_rate=vital_data.heart_rate,
-            spo2=vital_data.spo2,
-            systolic_bp=vital_data.blood_pressure_systolic,
-            diastolic_bp=vital_data.blood_pressure_diastolic,
-            hrv=vital_data.hrv,
-            source_device=vital_data.source_device,
-            device_id=vital_data.device_id,
-            timestamp=vital_data.timestamp or datetime.now(timezone.utc),
-            is_valid=True,
-            confidence_score=1.0
-        )
-        
-        db.add(new_vital)
-        records_created += 1
-    
+    # Basic validation
+    received_at = datetime.now(timezone.utc)
+    accepted = [v for v in batch_data.vitals if 30 <= v.heart_rate <= 250]  # Skip invalid records
+    # Distinct times for unstamped readings, or the natural key would merge them
+    stamp_missing_timestamps(accepted, received_at)
+    
+    # Score the whole batch in one pass, after the user's last stored readings
+    if accepted:
+        first = min(v.timestamp for v in accepted)
+        context = load_context(db, current_user.user_id, first)
+    else:
+        context = []
+    confidence, valid = score_readings(accepted, context, received_at=received_at)
+    
+    rows = [
+        {
+            "user_id": current_user.user_id,
+            "heart_rate": vital_data.heart_rate,
+            "spo2": vital_data.spo2,
+            "systolic_bp": vital_data.blood_pressure_systolic,
+            "diastolic_bp": vital_data.blood_pressure_diastolic,
+            "hrv": vital_data.hrv,
+            "source_device": vital_data.source_device,
+            "device_id": vital_data.device_id,
+            "timestamp": vital_data.timestamp,
+            "is_valid": is_valid,
+            "confidence_score": score,
+        }
+        for vital_data, score, is_valid in zip(accepted, confidence, valid)
+    ]
+    
+    # One multi-row INSERT; readings this user's device already synced
+    # (same device_id + timestamp) are skipped, so a retried offline sync
+    # only stores what's new
+    new_vitals = insert_new_vitals(db, rows, VitalSignRecord).scalars().all() if rows else []
+    records_created = len(new_vitals)
+    records_duplicate = len(rows) - records_created
+    
+    good = [v for v in new_vitals if v.is_valid]
+    newest = record_vitals(db, current_user.user_id, good)
+    # Alert checks run after the response; take the values before commit expires the rows
+    to_check = [VitalSignCreate.model_validate(v, from_attributes=True) for v in good]
     db.commit()
     
-    # Check for alerts on the batch
-    for vital_data in batch_data.vitals:
+    # Live listeners only need the current reading, not the whole backfill
+    if newest is not None:
+        publish_vitals(current_user.user_id, [newest])
+    
+    # Check for alerts on the new readings that passed the quality check
+    for vital_data in to_check:
         background_tasks.add_task(check_vitals_for_alerts, current_user.user_id, vital_data)
     
-    logger.info(f"Batch vitals recorded for user {current_user.user_id}: {records_created} records")
+    records_invalid = records_created - len(good)
+    logger.info(
+        f"Batch vitals recorded for user {current_user.user_id}: {records_created} records "
+        f"({records_invalid} failed quality checks, {records_duplicate} duplicates skipped)"
+    )
     
     return {
         "message": f"Successfully created {records_created} vital signs records",
-        "records_created": records_created
+        "records_created": records_created,
+        "records_duplicate": records_duplicate,
+        "records_invalid": records_invalid
     }
 
 
+# =============================================
+# SUBMIT_VITALS_BATCH_BINARY - Patient bulk sync in the binary wire format
+# Used by: Mobile app bulk sync (large offline backlogs)
+# Returns: Count of records created / duplicate / failing quality checks
+# Roles: PATIENT (own data only)
+# =============================================
+@router.post("/vitals/batch/binary")
+async def submit_vitals_batch_binary(
+    request: Request,
+    source_device: Optional[str] = Query(None, max_length=100, description="Wearable device name"),
+    device_id: Optional[str] = Query(None, max_length=255, description="Unique device identifier"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Submit a batch of readings as a columnar binary body.
+    
+    Layout documented in services/vitals_wire.py (delta-encoded
+    timestamps, uint8 HR/SpO2/BP columns). Decoded with NumPy and bulk
+    inserted without per-reading validation objects.
+    """
+    try:
+        columns = decode_vitals_batch(await request.body())
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    result = await run_in_threadpool(
+        flush_columns, db, current_user.user_id, columns, source_device, device_id
+    )
+    
+    return {
+        "message": f"Successfully created {result['stored']} vital signs records",
+        "records_created": result["stored"],
+        "records_duplicate": result["duplicates"],
+        "records_invalid": result["invalid"]
+    }
+
+
+# =============================================
+# SUBMIT_RR_INTERVALS - Patient uploads raw beat-to-beat intervals
+# Used by: Mobile app sync from chest straps / Holter-style recorders
+# Returns: HRVUploadResponse with RMSSD/SDNN/pNN50/LF-HF per 5-min window
+# Roles: PATIENT (own data only)
+# =============================================
+@router.post("/vitals/rr", response_model=HRVUploadResponse)
+async def submit_rr_intervals(
+    upload: RRIntervalUpload,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Upload RR intervals (base64 little-endian uint16, ms) and compute HRV.
+    
+    The recording is split into 5-minute windows from start_time; each
+    window's metrics and compressed raw intervals are stored.
+    """
+    try:
+        rr = decode_rr(upload.rr_intervals)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    # Up to ~100k beats: keep the NumPy work off the event loop
+    windows = await run_in_threadpool(
+        store_hrv_windows, db, current_user.user_id, upload.start_time, rr,
+        upload.source_device, upload.device_id
+    )
+    db.commit()
+    
+    return HRVUploadResponse(
+        beat_count=len(rr),
+        artifact_count=sum(w.artifact_count for w in windows),
+        windows=windows
+    )
+
+
 # --- ENDPOINTS: PATIENT READS OWN VITALS ---
 
 # =============================================
@@ -409,8 +531,12 @@ async def get_latest_vitals(
     
     Used by mobile app home screen and doctor dashboard.
     """
+    # Readings the quality stage flagged never count as "latest"
     latest = db.query(VitalSignRecord)\
-               .filter(VitalSignRecord.user_id == current_user.user_id)\
+               .filter(
+                   VitalSignRecord.user_id == current_user.user_id,
+                   VitalSignRecord.is_valid == True
+               )\
                .order_by(VitalSignRecord.timestamp.desc())\
                .first()
     
@@ -497,6 +623,25 @@ async def get_vitals_history(
     )
 
 
+# =============================================
+# GET_HRV_WINDOWS - Patient's HRV trend
+# Used by: Mobile app HRV chart
+# Returns: List of HRVWindowResponse (newest first)
+# Roles: PATIENT (own data)
+# =============================================
+@router.get("/vitals/hrv", response_model=List[HRVWindowResponse])
+async def get_hrv_windows(
+    days: int = Query(7, ge=1, le=90, description="Number of days of history"),
+    limit: int = Query(500, ge=1, le=5000, description="Maximum windows returned"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Get HRV windows computed from uploaded RR intervals.
+    """
+    return recent_hrv_windows(db, current_user.user_id, days, limit)
+
+
 # =============================================================================
 # Clinician/Admin Endpoints
 # =============================================================================
@@ -529,7 +674,10 @@ async def get_user_latest_vitals(
     check_clinician_phi_access(current_user, user)
     
     latest = db.query(VitalSignRecord)\
-               .filter(VitalSignRecord.user_id == user_id)\
+               .filter(
+                   VitalSignRecord.user_id == user_id,
+                   VitalSignRecord.is_valid == True
+               )\
                .order_by(desc(VitalSignRecord.timestamp))\
                .first()
     
@@ -628,4 +776,35 @@ async def get_user_vitals_history(
         total=total,
         page=page,
         per_page=per_page
-    )
\ No newline at end of file
+    )
+
+
+# =============================================
+# GET_USER_HRV_WINDOWS - Clinician view of patient HRV
+# Used by: Clinician dashboard patient detail (autonomic trend)
+# Returns: List of HRVWindowResponse (newest first)
+# Roles: DOCTOR, ADMIN (PHI access required)
+# =============================================
+@router.get("/vitals/user/{user_id}/hrv", response_model=List[HRVWindowResponse])
+async def get_user_hrv_windows(
+    user_id: int,
+    days: int = Query(7, ge=1, le=90),
+    limit: int = Query(500, ge=1, le=5000),
+    current_user: User = Depends(get_current_doctor_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Get HRV windows for a specific user.
+    
+    Clinician/Admin access only.
+    """
+    user = db.query(User).filter(User.user_id == user_id).first()
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found"
+        )
+    
+    check_clinician_phi_access(current_user, user)
+    
+    return recent_hrv_windows(db, user_id, days, limit)
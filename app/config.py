@@ -37,6 +37,11 @@ class Settings(BaseSettings):
         description="Database connection string"
     )
 
+    # Create missing tables (create_all) at startup. Unset = only when
+    # ENVIRONMENT=development; elsewhere the schema comes from migrations
+    # and workers skip the check to start faster
+    auto_create_tables: Optional[bool] = Field(default=None)
+
     # ---------------------------------------------------------------------
     # Authentication / JWT
     # ---------------------------------------------------------------------
@@ -78,6 +83,82 @@ class Settings(BaseSettings):
     max_login_attempts: int = Field(default=3)
     lockout_duration_minutes: int = Field(default=5)
 
+    # ---------------------------------------------------------------------
+    # Alerts
+    # ---------------------------------------------------------------------
+    # Same (patient, alert type) won't fire again within this window
+    alert_cooldown_minutes: int = Field(default=5)
+
+    # ---------------------------------------------------------------------
+    # Real-time Push (WebSocket / SSE)
+    # ---------------------------------------------------------------------
+    # "memory" works for a single worker. Use "redis" with several workers
+    # so every worker's subscribers see every event.
+    realtime_backend: str = Field(default="memory")
+    redis_url: Optional[str] = Field(default=None)
+
+    # WebSocket ingest (/ws/vitals/ingest): flush buffered readings to the
+    # database after this many readings or this many ms, whichever is first
+    ingest_flush_max_readings: int = Field(default=200)
+    ingest_flush_interval_ms: int = Field(default=1000)
+
+    # Delta sync (/sync/changes) only hands out rows written at least this
+    # many seconds ago. Ids are taken at INSERT, so this is how long a
+    # writer has to commit before a later id can move a device's cursor
+    # past its rows
+    sync_commit_lag_seconds: float = Field(default=5.0)
+
+    # ---------------------------------------------------------------------
+    # ML Model
+    # ---------------------------------------------------------------------
+    # Counterfactual "lower my risk" search returns the best plan found
+    # once this many ms have been spent scoring candidates
+    counterfactual_budget_ms: int = Field(default=250)
+
+    # Results kept per worker for repeated identical prediction inputs
+    # (LRU, keyed on model version + inputs; 0 = no cache)
+    prediction_cache_size: int = Field(default=4096)
+
+    # How often each worker checks ml_models/registry/manifest.json for a
+    # newly promoted model version (0 = only at startup)
+    model_registry_poll_seconds: int = Field(default=30)
+
+    # Opt-in: serve the forest from memory-mapped flat .npy arrays (one
+    # physical copy shared by all workers, faster single-row scoring)
+    # instead of unpickling it in every worker. Off by default because
+    # large batches (4k+ rows: risk sweep, counterfactual search) score
+    # ~2x slower than sklearn this way, and a model without arrays yet
+    # gets them written next to it on first load. Registered versions
+    # ship with their arrays
+    model_flat_artifacts: bool = Field(default=False)
+
+    # Risk model scoring: "sklearn" (the model as loaded above) or "onnx"
+    # (scaler + forest as one ONNX graph on onnxruntime; needs the onnx
+    # and onnxruntime packages, else falls back to sklearn)
+    inference_backend: str = Field(default="sklearn")
+
+    # onnxruntime threads per worker for INFERENCE_BACKEND=onnx
+    onnx_threads: int = Field(default=1)
+
+    # Share of risk predictions re-scored by the shadow candidate model
+    # when an admin starts shadow mode without giving a rate
+    shadow_sample_rate: float = Field(default=0.1)
+
+    # Retraining: rows fetched per DB round trip, most recent rows used,
+    # cores for the forest fit (-1 = all) and share kept for evaluation
+    retrain_batch_size: int = Field(default=10_000)
+    retrain_max_rows: int = Field(default=2_000_000)
+    retrain_n_jobs: int = Field(default=-1)
+    retrain_holdout_fraction: float = Field(default=0.2)
+
+    # Retraining label: a threshold alert within this many hours after a
+    # session's cool-down. Sessions more recent than that aren't used yet
+    retrain_outcome_window_hours: int = Field(default=24)
+
+    # How often each worker re-aggregates ended sessions whose post-session
+    # cool-down readings are now in (recovery fit + stored features; 0 = off)
+    session_recovery_poll_seconds: int = Field(default=60)
+
     # ---------------------------------------------------------------------
     # AWS (Optional – Production)
     # ---------------------------------------------------------------------
@@ -121,10 +121,14 @@ def init_db() -> None:
     from app.models import (
         user,
         vital_signs,
+        hrv_window,
         activity,
         risk_assessment,
         alert,
-        recommendation
+        recommendation,
+        patient_latest_state,
+        alert_counter,
+        sync_change
     )
     
     logger.info("Creating database tables...")
@@ -135,6 +139,17 @@ def init_db() -> None:
     logger.info("Database tables created successfully")
 
 
+def should_create_tables() -> bool:
+    """
+    Whether startup should run init_db().
+
+    AUTO_CREATE_TABLES wins when set; otherwise only in development.
+    """
+    if settings.auto_create_tables is not None:
+        return settings.auto_create_tables
+    return settings.environment == "development"
+
+
 def drop_db() -> None:
     """
     Drop all database tables.
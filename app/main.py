@@ -9,14 +9,20 @@ from fastapi import FastAPI, Request, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from fastapi.responses import JSONResponse
+import asyncio
 import logging
 import time
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, contextmanager
+from typing import Dict
 
 from app.config import settings
-from app.database import init_db, check_db_connection
-from app.api import auth, user, vital_signs, predict, activity, alert, advanced_ml, consent
-from app.services.ml_prediction import load_ml_model
+from app.database import init_db, check_db_connection, should_create_tables
+from app.api import auth, user, vital_signs, predict, activity, alert, advanced_ml, consent, patients, realtime, sync
+from app.services import auth_service
+from app.services.ml_prediction import is_model_loaded, load_ml_model
+from app.services.realtime_hub import get_realtime_hub
+from app.services.model_registry import start_manifest_watcher, stop_manifest_watcher, sync_with_manifest
+from app.services.session_aggregation import start_recovery_refresher, stop_recovery_refresher
 
 # Configure logging
 logging.basicConfig(
@@ -30,6 +36,29 @@ logger = logging.getLogger(__name__)
 # Application Lifecycle
 # =============================================================================
 
+# Milliseconds per startup phase, logged when the app is ready (and
+# printed by `python serve.py --startup-profile`)
+startup_timings: Dict[str, float] = {}
+
+# Background work started during startup (kept referenced until done)
+_background_tasks = set()
+
+
+@contextmanager
+def startup_phase(name: str):
+    """Record how long the enclosed startup step takes."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        startup_timings[name] = round((time.perf_counter() - started) * 1000, 1)
+
+
+def _timed(name: str, func):
+    with startup_phase(name):
+        return func()
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """
@@ -39,33 +68,75 @@ async def lifespan(app: FastAPI):
     """
     # Startup
     logger.info("Starting Adaptive Health API...")
-    
-    # Initialize database
-    try:
-        init_db()
-        logger.info("Database initialized successfully")
-    except Exception as e:
-        logger.error(f"Database initialization failed: {e}")
-        raise
+    startup_timings.clear()
+    started = time.perf_counter()
+
+    # Load ML model (Massoud's trained Random Forest) in a worker thread
+    # while the database is set up; both mostly wait on disk/network
+    model_load = None
+    if is_model_loaded():
+        # Loaded before fork by serve.py: keep the shared copy
+        logger.info("ML model preloaded by launcher")
+    else:
+        model_load = asyncio.ensure_future(asyncio.to_thread(_timed, "ml_model", load_ml_model))
+
+    # Password hashing / JWT libraries load in the background; the first
+    # login just waits for the import if it gets there first
+    preload = asyncio.ensure_future(asyncio.to_thread(auth_service.preload))
+    _background_tasks.add(preload)
+    preload.add_done_callback(_background_tasks.discard)
+
+    # Initialize database (create_all) only where migrations don't own
+    # the schema - see AUTO_CREATE_TABLES
+    if should_create_tables():
+        try:
+            with startup_phase("init_db"):
+                init_db()
+            logger.info("Database initialized successfully")
+        except Exception as e:
+            logger.error(f"Database initialization failed: {e}")
+            raise
+    else:
+        logger.info("Skipping table creation (AUTO_CREATE_TABLES is off)")
     
     # Check database connection
-    if not check_db_connection():
+    with startup_phase("db_check"):
+        db_ok = check_db_connection()
+    if not db_ok:
         logger.error("Database connection check failed")
         raise RuntimeError("Cannot connect to database")
     
-    # Load ML model (Massoud's trained Random Forest)
-    # Uses absolute paths and joblib for production safety
-    if load_ml_model():
-        logger.info("ML model loaded successfully at startup")
-    else:
-        logger.error("ML model failed to load - prediction endpoints will return 503")
+    if model_load is not None:
+        if await model_load:
+            logger.info("ML model loaded successfully at startup")
+        else:
+            logger.error("ML model failed to load - prediction endpoints will return 503")
+
+    # Pick up the shadow candidate, then follow model versions promoted
+    # by other workers
+    with startup_phase("model_registry"):
+        sync_with_manifest()
+    start_manifest_watcher()
+
+    # Re-aggregate ended sessions once their cool-down readings are in
+    start_recovery_refresher()
+    
+    # Start real-time push (Redis listener when REALTIME_BACKEND=redis)
+    realtime_hub = get_realtime_hub()
+    with startup_phase("realtime"):
+        await realtime_hub.start()
     
-    logger.info("Adaptive Health API started successfully")
+    startup_timings["total"] = round((time.perf_counter() - started) * 1000, 1)
+    phases = ", ".join(f"{name} {ms:.0f} ms" for name, ms in startup_timings.items())
+    logger.info(f"Adaptive Health API started successfully ({phases})")
     
     yield
     
     # Shutdown
     logger.info("Shutting down Adaptive Health API...")
+    await realtime_hub.stop()
+    await stop_manifest_watcher()
+    await stop_recovery_refresher()
 
 
 # =============================================================================
@@ -251,6 +322,27 @@ app.include_router(
     tags=["Consent / Data Sharing"]
 )
 
+# Clinician patient panel routes
+app.include_router(
+    patients.router,
+    prefix="/api/v1",
+    tags=["Patient Overview"]
+)
+
+# Real-time push (WebSocket / SSE)
+app.include_router(
+    realtime.router,
+    prefix="/api/v1",
+    tags=["Real-time"]
+)
+
+# Mobile delta sync
+app.include_router(
+    sync.router,
+    prefix="/api/v1",
+    tags=["Sync"]
+)
+
 
 # =============================================================================
 # Health Check Endpoints
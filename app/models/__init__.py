@@ -8,10 +8,14 @@ alerts, recommendations, etc.
 from app.models.user import User, UserRole
 from app.models.auth_credential import AuthCredential
 from app.models.vital_signs import VitalSignRecord
+from app.models.hrv_window import HRVWindow
 from app.models.activity import ActivitySession, ActivityType, ActivityPhase
 from app.models.risk_assessment import RiskAssessment, RiskLevel
 from app.models.alert import Alert, AlertType, SeverityLevel
 from app.models.recommendation import ExerciseRecommendation, IntensityLevel, RecommendationType
+from app.models.patient_latest_state import PatientLatestState
+from app.models.alert_counter import AlertDailyCounter
+from app.models.sync_change import SyncChange
 
 # Export all models for easy importing
 __all__ = [
@@ -22,6 +26,7 @@ __all__ = [
     
     # Vital Signs
     "VitalSignRecord",
+    "HRVWindow",
     
     # Activity
     "ActivitySession",
@@ -36,9 +41,16 @@ __all__ = [
     "Alert",
     "AlertType",
     "SeverityLevel",
+    "AlertDailyCounter",
     
     # Recommendation
     "ExerciseRecommendation",
     "IntensityLevel",
     "RecommendationType",
+
+    # Clinician panel
+    "PatientLatestState",
+
+    # Mobile sync
+    "SyncChange",
 ]
\ No newline at end of file
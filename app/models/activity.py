@@ -18,17 +18,19 @@ SQLAlchemy model mapped to Massoud's AWS RDS 'activity_sessions' table.
 #   - Timing Columns................... Line 70  (start_time, end_time)
 #   - Metrics Columns.................. Line 80  (avg_hr, peak_hr, calories)
 #   - User Feedback.................... Line 100 (feeling_before, notes)
-#   - Relationships.................... Line 115 (user)
+#   - Feature Store.................... Line 115 (packed features, recovery flag)
+#   - Relationships.................... Line 124 (user)
 #
 # BUSINESS CONTEXT:
 # - Workout tracking from mobile app
-# - Feeds into ML risk prediction
+# - Feeds into ML risk prediction; features and risk score are stored
+#   once when the session ends
 # - HR zones and recovery time analysis
 # =============================================================================
 """
 
 from enum import Enum
-from sqlalchemy import Column, Integer, Float, String, DateTime, ForeignKey, Text, Boolean, Index
+from sqlalchemy import Column, Integer, Float, String, DateTime, ForeignKey, Text, Boolean, Index, LargeBinary, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
@@ -109,6 +111,15 @@ class ActivitySession(Base):
     user_notes = Column(Text, nullable=True)
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
+    # -------------------------------------------------------------------------
+    # Feature store (filled when the session ends, see services/session_features.py)
+    # -------------------------------------------------------------------------
+    feature_vector = Column(LargeBinary, nullable=True)  # 17 packed little-endian float32
+    risk_model_version = Column(String(64), nullable=True)  # Model version that set risk_score
+    # Aggregated before its cool-down tail was recorded; fields and features are
+    # recomputed once the tail has elapsed (see services/session_aggregation.py)
+    recovery_pending = Column(Boolean, default=False, nullable=True)
+
     # -------------------------------------------------------------------------
     # Relationship
     # -------------------------------------------------------------------------
@@ -119,6 +130,12 @@ class ActivitySession(Base):
     # -------------------------------------------------------------------------
     __table_args__ = (
         Index('idx_activity_user_date', 'user_id', 'start_time'),
+        # The recovery refresher's queue: only sessions still waiting on their tail
+        Index(
+            'idx_activity_recovery_pending', 'end_time',
+            postgresql_where=text('recovery_pending'),
+            sqlite_where=text('recovery_pending'),
+        ),
         {'extend_existing': True}
     )
 
@@ -122,6 +122,8 @@ class Alert(Base):
     # -------------------------------------------------------------------------
     __table_args__ = (
         Index('idx_alert_user_time', 'user_id', 'created_at'),
+        # Cooldown / duplicate lookups filter on alert_type as well
+        Index('idx_alert_user_type_time', 'user_id', 'alert_type', 'created_at'),
         {'extend_existing': True}
     )
 
@@ -0,0 +1,59 @@
+"""
+=============================================================================
+ADAPTIV HEALTH - Alert Daily Counter Model
+=============================================================================
+Precomputed alert counts per patient, day, severity and acknowledged state.
+New table added to AWS RDS via migration script.
+
+# =============================================================================
+# FILE MAP - QUICK NAVIGATION
+# =============================================================================
+# CLASS: AlertDailyCounter (SQLAlchemy Model)
+#   - Primary Key...................... Line 38  (user_id, day, severity, acknowledged)
+#   - Counter.......................... Line 50  (alert_count)
+#   - Indexes.......................... Line 55  (day)
+#
+# BUSINESS CONTEXT:
+# - GET /alerts/stats sums these rows instead of scanning the alerts table
+# - Updated in the same transaction as alert create / acknowledge / resolve
+# - Can always be rebuilt from alerts (see services/alert_counters.py)
+# =============================================================================
+"""
+
+from sqlalchemy import Column, Integer, String, Date, Boolean, ForeignKey, Index
+from app.database import Base
+
+
+class AlertDailyCounter(Base):
+    """
+    Alert daily counter table - created by migration script.
+    One row per (patient, UTC day, severity, acknowledged).
+    """
+
+    __tablename__ = "alert_daily_counters"
+
+    # -------------------------------------------------------------------------
+    # Primary Key - one counter per bucket
+    # -------------------------------------------------------------------------
+    user_id = Column(
+        Integer,
+        ForeignKey("users.user_id", ondelete="CASCADE"),
+        primary_key=True
+    )
+    day = Column(Date, primary_key=True)
+    severity = Column(String(20), primary_key=True)
+    acknowledged = Column(Boolean, primary_key=True)
+
+    # -------------------------------------------------------------------------
+    # Counter
+    # -------------------------------------------------------------------------
+    alert_count = Column(Integer, nullable=False, default=0, server_default="0")
+
+    # -------------------------------------------------------------------------
+    # Indexes
+    # -------------------------------------------------------------------------
+    __table_args__ = (
+        # All-patient stats filter on day only
+        Index('idx_alert_counter_day', 'day'),
+        {'extend_existing': True}
+    )
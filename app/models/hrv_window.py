@@ -0,0 +1,87 @@
+"""
+=============================================================================
+ADAPTIV HEALTH - HRV Window Model
+=============================================================================
+Heart rate variability computed server-side from raw RR intervals, one
+row per 5-minute window, with the window's RR intervals kept compressed.
+New table added to AWS RDS via migration script.
+
+# =============================================================================
+# FILE MAP - QUICK NAVIGATION
+# =============================================================================
+# CLASS: HRVWindow (SQLAlchemy Model)
+#   - Primary Key...................... Line 40  (window_id)
+#   - Foreign Key...................... Line 45  (user_id → users)
+#   - Window Columns................... Line 54  (window_start/end, beats)
+#   - HRV Metrics...................... Line 62  (RMSSD, SDNN, pNN50, LF/HF)
+#   - Raw Data......................... Line 73  (rr_blob, device)
+#   - Indexes.......................... Line 81  (user_id, window_start)
+#
+# BUSINESS CONTEXT:
+# - Filled by POST /vitals/rr (see services/hrv.py)
+# - Metric columns are NULL when a window had too few clean beats
+# - rr_blob: zlib-compressed little-endian uint16 RR intervals (ms),
+#   artifacts included, so metrics can be recomputed later
+# =============================================================================
+"""
+
+from sqlalchemy import Column, Integer, Float, String, DateTime, ForeignKey, Index, LargeBinary
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class HRVWindow(Base):
+    """
+    HRV windows table - created by migration script.
+    """
+
+    __tablename__ = "hrv_windows"
+
+    # -------------------------------------------------------------------------
+    # Primary Key
+    # -------------------------------------------------------------------------
+    window_id = Column(Integer, primary_key=True, autoincrement=True)
+
+    # -------------------------------------------------------------------------
+    # Foreign Key
+    # -------------------------------------------------------------------------
+    user_id = Column(
+        Integer,
+        ForeignKey("users.user_id", ondelete="CASCADE"),
+        nullable=False
+    )
+
+    # -------------------------------------------------------------------------
+    # Window
+    # -------------------------------------------------------------------------
+    window_start = Column(DateTime(timezone=True), nullable=False)
+    window_end = Column(DateTime(timezone=True), nullable=False)
+    beat_count = Column(Integer, nullable=False)
+    artifact_count = Column(Integer, nullable=False, default=0)
+
+    # -------------------------------------------------------------------------
+    # HRV Metrics (ms, %, ms^2)
+    # -------------------------------------------------------------------------
+    mean_rr_ms = Column(Float, nullable=True)
+    sdnn_ms = Column(Float, nullable=True)
+    rmssd_ms = Column(Float, nullable=True)
+    pnn50 = Column(Float, nullable=True)
+    lf_power = Column(Float, nullable=True)
+    hf_power = Column(Float, nullable=True)
+    lf_hf_ratio = Column(Float, nullable=True)
+
+    # -------------------------------------------------------------------------
+    # Raw Data
+    # -------------------------------------------------------------------------
+    rr_blob = Column(LargeBinary, nullable=False)
+    source_device = Column(String(100), nullable=True)
+    device_id = Column(String(255), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=True)
+
+    # -------------------------------------------------------------------------
+    # Indexes
+    # -------------------------------------------------------------------------
+    __table_args__ = (
+        Index('idx_hrv_window_user_start', 'user_id', 'window_start'),
+        {'extend_existing': True}
+    )
@@ -0,0 +1,97 @@
+"""
+=============================================================================
+ADAPTIV HEALTH - Patient Latest State Model
+=============================================================================
+Denormalized "latest state" row per patient for the clinician panel.
+New table added to AWS RDS via migration script.
+
+# =============================================================================
+# FILE MAP - QUICK NAVIGATION
+# =============================================================================
+# CLASS: PatientLatestState (SQLAlchemy Model)
+#   - Primary Key...................... Line 45  (user_id → users)
+#   - Latest Vitals.................... Line 55  (HR, SpO2, BP, HRV, time)
+#   - Latest Risk...................... Line 65  (score, level, time)
+#   - Alerts........................... Line 72  (unacknowledged count)
+#   - Last Activity.................... Line 78  (session, type, status)
+#   - Indexes.......................... Line 88  (risk, updated_at)
+#
+# BUSINESS CONTEXT:
+# - Clinician dashboard loads a whole patient panel in one query
+# - Updated on write (vitals, alerts, risk, activity) in the same transaction
+# - Can always be rebuilt from the source tables (see services/patient_state.py)
+# =============================================================================
+"""
+
+from sqlalchemy import Column, Integer, Float, String, DateTime, ForeignKey, Index
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class PatientLatestState(Base):
+    """
+    Patient latest state table - created by migration script.
+    One row per patient, kept current by the write endpoints.
+    """
+
+    __tablename__ = "patient_latest_state"
+
+    # -------------------------------------------------------------------------
+    # Primary Key - one row per patient
+    # -------------------------------------------------------------------------
+    user_id = Column(
+        Integer,
+        ForeignKey("users.user_id", ondelete="CASCADE"),
+        primary_key=True
+    )
+
+    # -------------------------------------------------------------------------
+    # Latest vitals (copied from vital_signs)
+    # -------------------------------------------------------------------------
+    latest_reading_id = Column(Integer, nullable=True)
+    latest_heart_rate = Column(Integer, nullable=True)
+    latest_spo2 = Column(Float, nullable=True)
+    latest_systolic_bp = Column(Integer, nullable=True)
+    latest_diastolic_bp = Column(Integer, nullable=True)
+    latest_hrv = Column(Float, nullable=True)
+    latest_vitals_at = Column(DateTime(timezone=True), nullable=True)
+
+    # -------------------------------------------------------------------------
+    # Latest risk (copied from risk_assessments)
+    # -------------------------------------------------------------------------
+    latest_assessment_id = Column(Integer, nullable=True)
+    latest_risk_score = Column(Float, nullable=True)
+    latest_risk_level = Column(String(20), nullable=True)
+    latest_risk_at = Column(DateTime(timezone=True), nullable=True)
+
+    # -------------------------------------------------------------------------
+    # Alerts (counter maintained on create / acknowledge)
+    # -------------------------------------------------------------------------
+    unacknowledged_alert_count = Column(Integer, default=0, nullable=False, server_default="0")
+    last_alert_at = Column(DateTime(timezone=True), nullable=True)
+    last_alert_severity = Column(String(20), nullable=True)
+
+    # -------------------------------------------------------------------------
+    # Last activity (copied from activity_sessions)
+    # -------------------------------------------------------------------------
+    last_session_id = Column(Integer, nullable=True)
+    last_activity_type = Column(String(50), nullable=True)
+    last_activity_status = Column(String(20), nullable=True)
+    last_activity_at = Column(DateTime(timezone=True), nullable=True)
+
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    # -------------------------------------------------------------------------
+    # Indexes
+    # -------------------------------------------------------------------------
+    __table_args__ = (
+        Index('idx_latest_state_risk', 'latest_risk_score'),
+        Index('idx_latest_state_updated', 'updated_at'),
+        {'extend_existing': True}
+    )
+
+    def __repr__(self) -> str:
+        return (
+            f"<PatientLatestState(user_id={self.user_id}, hr={self.latest_heart_rate}, "
+            f"risk={self.latest_risk_level}, unack_alerts={self.unacknowledged_alert_count})>"
+        )
@@ -0,0 +1,123 @@
+"""
+=============================================================================
+ADAPTIV HEALTH - Sync Change Log Model
+=============================================================================
+Append-only log of writes to the tables the mobile app caches, read by
+GET /sync/changes. New table added to AWS RDS via migration script.
+
+# =============================================================================
+# FILE MAP - QUICK NAVIGATION
+# =============================================================================
+# CONSTANTS............................ Line 43  (SYNCED_TABLES)
+#
+# CLASS: SyncChange (SQLAlchemy Model)
+#   - Primary Key...................... Line 61  (change_id, the sync cursor)
+#   - Foreign Key...................... Line 66  (user_id → users)
+#   - Change Columns................... Line 75  (entity, entity_id, operation)
+#   - Indexes.......................... Line 83  (user_id, change_id)
+#
+# FUNCTIONS
+#   - log_synced_changes()............. Line 92  (after_flush hook)
+#
+# BUSINESS CONTEXT:
+# - One row per insert / update / delete of an alert, risk assessment,
+#   recommendation or activity session, written in the same flush (and
+#   so the same transaction) as the change itself
+# - change_id only grows, so "what changed since X" is one range scan
+# - Vitals are not logged: they are append-only and reading_id already
+#   orders them (see services/sync_changes.py)
+# - Only ORM writes are captured; Core UPDATE/DELETE statements against
+#   these tables must log their own rows
+# =============================================================================
+"""
+
+from typing import Any, Dict, List
+
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index, event
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+# Table name -> entity name used in the log and in the sync response
+SYNCED_TABLES = {
+    "alerts": "alerts",
+    "risk_assessments": "risk_assessments",
+    "exercise_recommendations": "recommendations",
+    "activity_sessions": "activities",
+}
+
+OPERATION_UPSERT = "upsert"
+OPERATION_DELETE = "delete"
+
+
+class SyncChange(Base):
+    """
+    Sync change log table - created by migration script.
+    """
+
+    __tablename__ = "sync_changes"
+
+    # -------------------------------------------------------------------------
+    # Primary Key
+    # -------------------------------------------------------------------------
+    change_id = Column(Integer, primary_key=True, autoincrement=True)
+
+    # -------------------------------------------------------------------------
+    # Foreign Key
+    # -------------------------------------------------------------------------
+    user_id = Column(
+        Integer,
+        ForeignKey("users.user_id", ondelete="CASCADE"),
+        nullable=False
+    )
+
+    # -------------------------------------------------------------------------
+    # Change
+    # -------------------------------------------------------------------------
+    entity = Column(String(30), nullable=False)
+    entity_id = Column(Integer, nullable=False)
+    operation = Column(String(10), nullable=False, default=OPERATION_UPSERT)
+    changed_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=True)
+
+    # -------------------------------------------------------------------------
+    # Indexes
+    # -------------------------------------------------------------------------
+    __table_args__ = (
+        Index('idx_sync_change_user', 'user_id', 'change_id'),
+        {'extend_existing': True}
+    )
+
+
+@event.listens_for(Session, "after_flush")
+def log_synced_changes(session: Session, flush_context) -> None:
+    """
+    Log every flushed insert, update and delete of a synced table.
+
+    Runs after the flush, so new rows already have their ids; new / dirty /
+    deleted still describe what the flush wrote.
+    """
+    deleted_users = {obj.user_id for obj in session.deleted if getattr(obj, "__tablename__", None) == "users"}
+    changes: List[Dict[str, Any]] = []
+
+    def add(obj, operation: str) -> None:
+        entity = SYNCED_TABLES.get(getattr(obj, "__tablename__", None))
+        if entity is None or obj.user_id is None:
+            return
+        if operation == OPERATION_DELETE and obj.user_id in deleted_users:
+            return  # The user's whole log goes with them (ON DELETE CASCADE)
+        entity_id = getattr(obj, obj.__mapper__.primary_key[0].key)
+        changes.append({"user_id": obj.user_id, "entity": entity, "entity_id": entity_id, "operation": operation})
+
+    for obj in session.new:
+        add(obj, OPERATION_UPSERT)
+    for obj in session.dirty:
+        if session.is_modified(obj, include_collections=False):
+            add(obj, OPERATION_UPSERT)
+    for obj in session.deleted:
+        add(obj, OPERATION_DELETE)
+
+    if changes:
+        # Core insert on the flush's connection: adding ORM objects here would
+        # need another flush
+        session.connection().execute(SyncChange.__table__.insert(), changes)
@@ -23,10 +23,11 @@ Data Flow: Wearable → BLE → Mobile App → Cloud API → This Table
 # - 50k+ rows of wearable sensor data
 # - Critical for ML risk prediction
 # - Real-time sync from mobile app
+# - (user_id, device_id, timestamp) is unique, so resending a sync is safe
 # =============================================================================
 """
 
-from sqlalchemy import Column, Integer, Float, String, DateTime, ForeignKey, Index, Boolean
+from sqlalchemy import Column, Integer, Float, String, DateTime, ForeignKey, Index, Boolean, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
@@ -89,6 +90,17 @@ class VitalSignRecord(Base):
     __table_args__ = (
         Index('idx_vital_user_timestamp', 'user_id', 'timestamp'),
         Index('idx_vital_heart_rate', 'heart_rate'),
+        # GET /sync/changes pages a user's new readings by reading_id
+        Index('idx_vital_user_reading', 'user_id', 'reading_id'),
+        # Natural key: a device reports one reading per instant, so a resent
+        # offline sync hits this index and is skipped (ON CONFLICT DO NOTHING).
+        # Readings without a device_id can't be told apart and are never deduped.
+        Index(
+            'uq_vital_user_device_timestamp', 'user_id', 'device_id', 'timestamp',
+            unique=True,
+            postgresql_where=text('device_id IS NOT NULL'),
+            sqlite_where=text('device_id IS NOT NULL'),
+        ),
         {'extend_existing': True}
     )
 
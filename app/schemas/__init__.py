@@ -61,6 +61,12 @@ from app.schemas.recommendation import (
     RecommendationListResponse
 )
 
+# Patient overview schemas
+from app.schemas.patient_overview import (
+    PatientOverviewItem,
+    PatientOverviewResponse
+)
+
 __all__ = [
     # User
     "UserResponse",
@@ -103,5 +109,8 @@ __all__ = [
     "RecommendationUpdate",
     "RecommendationResponse",
     "RecommendationListResponse",
+    # Patient overview
+    "PatientOverviewItem",
+    "PatientOverviewResponse",
 ]
 
@@ -68,7 +68,13 @@ class ActivitySessionCreate(ActivitySessionBase):
 
 
 class ActivitySessionUpdate(BaseModel):
-    """Schema for updating an activity session."""
+    """
+    Schema for updating an activity session.
+
+    On POST /activities/end the heart rate, SpO2 and recovery fields are
+    recomputed from the session's vital_signs; the values sent here are
+    only kept for sessions without recorded vitals.
+    """
     end_time: Optional[datetime] = None
     activity_type: Optional[str] = None
     avg_heart_rate: Optional[int] = None
@@ -90,6 +96,7 @@ class ActivitySessionResponse(ActivitySessionBase):
     start_time: datetime
     end_time: Optional[datetime] = None
     risk_score: Optional[float] = None
+    risk_model_version: Optional[str] = None
     status: Optional[str] = None
     baseline_heart_rate: Optional[int] = None
     recovery_score: Optional[float] = None
@@ -0,0 +1,58 @@
+"""
+Patient overview schemas (clinician panel).
+
+# =============================================================================
+# FILE MAP - QUICK NAVIGATION
+# =============================================================================
+# SCHEMAS
+#   - PatientOverviewItem.............. Line 20  (One patient row)
+#   - PatientOverviewResponse.......... Line 50  (Paginated panel)
+#
+# BUSINESS CONTEXT:
+# - Clinician dashboard patient list in a single request
+# - Backed by the patient_latest_state table
+# =============================================================================
+"""
+
+from pydantic import BaseModel, Field
+from typing import Optional, List
+from datetime import datetime
+
+
+class PatientOverviewItem(BaseModel):
+    """Latest vitals, risk, alerts, and activity for one patient."""
+    user_id: int
+    full_name: Optional[str] = None
+    email: str
+    age: Optional[int] = None
+
+    # Latest vitals
+    latest_heart_rate: Optional[int] = None
+    latest_spo2: Optional[float] = None
+    latest_systolic_bp: Optional[int] = None
+    latest_diastolic_bp: Optional[int] = None
+    latest_vitals_at: Optional[datetime] = None
+
+    # Latest risk
+    latest_risk_score: Optional[float] = None
+    latest_risk_level: Optional[str] = None
+    latest_risk_at: Optional[datetime] = None
+
+    # Alerts
+    unacknowledged_alert_count: int = 0
+    last_alert_at: Optional[datetime] = None
+    last_alert_severity: Optional[str] = None
+
+    # Last activity
+    last_session_id: Optional[int] = None
+    last_activity_type: Optional[str] = None
+    last_activity_status: Optional[str] = None
+    last_activity_at: Optional[datetime] = None
+
+
+class PatientOverviewResponse(BaseModel):
+    """Paginated clinician patient panel."""
+    patients: List[PatientOverviewItem] = Field(..., description="Patient rows")
+    total: int
+    page: int
+    per_page: int
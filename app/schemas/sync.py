@@ -0,0 +1,43 @@
+"""
+Delta sync schemas (mobile app cache refresh).
+
+# =============================================================================
+# FILE MAP - QUICK NAVIGATION
+# =============================================================================
+# SCHEMAS
+#   - SyncDeletion..................... Line 28  (Row removed since the cursor)
+#   - SyncChangesResponse.............. Line 34  (One page of changes)
+#
+# BUSINESS CONTEXT:
+# - Rows use the same shapes as the per-resource endpoints, so the app can
+#   upsert them into its cache by id
+# - Backed by the sync_changes log and vital_signs.reading_id
+# =============================================================================
+"""
+
+from pydantic import BaseModel, Field
+from typing import List
+
+from app.schemas.activity import ActivitySessionResponse
+from app.schemas.alert import AlertResponse
+from app.schemas.recommendation import RecommendationResponse
+from app.schemas.risk_assessment import RiskAssessmentResponse
+from app.schemas.vital_signs import VitalSignResponse
+
+
+class SyncDeletion(BaseModel):
+    """A cached row to drop."""
+    entity: str = Field(..., description="alerts, risk_assessments, recommendations or activities")
+    id: int = Field(..., description="Primary key of the deleted row")
+
+
+class SyncChangesResponse(BaseModel):
+    """Rows created or updated after the cursor, oldest change first."""
+    cursor: str = Field(..., description="Send back as ?since= on the next sync")
+    has_more: bool = Field(..., description="More changes are waiting; sync again right away")
+    vitals: List[VitalSignResponse] = Field(default_factory=list)
+    alerts: List[AlertResponse] = Field(default_factory=list)
+    risk_assessments: List[RiskAssessmentResponse] = Field(default_factory=list)
+    recommendations: List[RecommendationResponse] = Field(default_factory=list)
+    activities: List[ActivitySessionResponse] = Field(default_factory=list)
+    deleted: List[SyncDeletion] = Field(default_factory=list)
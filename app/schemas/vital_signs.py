@@ -9,19 +9,22 @@ looks like when sent to the API. Checks that all numbers are reasonable
 # FILE MAP - QUICK NAVIGATION
 # =============================================================================
 # REQUEST SCHEMAS
-#   - VitalSignBase.................... Line 35  (Common fields)
-#   - VitalSignCreate.................. Line 60  (Single reading input)
-#   - VitalSignBatchCreate............. Line 75  (Batch sync input)
+#   - VitalSignBase.................... Line 44  (Common fields)
+#   - VitalSignCreate.................. Line 77  (Single reading input)
+#   - VitalSignBatchCreate............. Line 89  (Batch sync input)
+#   - RRIntervalUpload................. Line 101 (Raw RR intervals input)
 #
 # RESPONSE SCHEMAS
-#   - VitalSignResponse................ Line 90  (Single reading output)
-#   - VitalSignsSummary................ Line 115 (Aggregated stats)
-#   - VitalSignsHistoryResponse........ Line 135 (Paginated history)
-#   - VitalSignsStats.................. Line 150 (Min/max/avg per metric)
-#   - RealTimeVitals................... Line 170 (WebSocket format)
+#   - VitalSignResponse................ Line 116 (Single reading output)
+#   - VitalSignsSummary................ Line 142 (Aggregated stats)
+#   - VitalSignsHistoryResponse........ Line 163 (Paginated history)
+#   - VitalSignsStats.................. Line 179 (Min/max/avg per metric)
+#   - HRVWindowResponse................ Line 198 (HRV metrics per window)
+#   - HRVUploadResponse................ Line 221 (RR upload result)
+#   - RealTimeVitals................... Line 234 (WebSocket format)
 #
 # UTILITY SCHEMAS
-#   - VitalSignsExportRequest.......... Line 185 (Data export params)
+#   - VitalSignsExportRequest.......... Line 250 (Data export params)
 #
 # BUSINESS CONTEXT:
 # - Field ranges match medical validity
@@ -91,6 +94,21 @@ class VitalSignBatchCreate(BaseModel):
     vitals: List[VitalSignCreate] = Field(..., description="List of vital sign records")
 
 
+# =============================================================================
+# RR Interval Upload Schema
+# =============================================================================
+
+class RRIntervalUpload(BaseModel):
+    """
+    Schema for uploading raw beat-to-beat RR intervals.
+    HRV is computed server-side per 5-minute window.
+    """
+    start_time: datetime = Field(..., description="Start of the first RR interval (UTC)")
+    rr_intervals: str = Field(..., description="Base64 of little-endian uint16 RR intervals in ms")
+    source_device: Optional[str] = Field(None, max_length=100, description="Wearable device name (e.g., 'Polar H10')")
+    device_id: Optional[str] = Field(None, max_length=255, description="Unique device identifier")
+
+
 # =============================================================================
 # Vital Sign Response Schema
 # =============================================================================
@@ -173,6 +191,42 @@ class VitalSignsStats(BaseModel):
     alerts_summary: dict = Field(..., description="Alerts summary")
 
 
+# =============================================================================
+# HRV Window Schemas
+# =============================================================================
+
+class HRVWindowResponse(BaseModel):
+    """
+    Schema for HRV metrics of one window of RR intervals.
+    Metrics are None when the window had too few clean beats.
+    """
+    window_id: int = Field(..., description="Window ID")
+    window_start: datetime = Field(..., description="Window start")
+    window_end: datetime = Field(..., description="Window end")
+    beat_count: int = Field(..., description="RR intervals in the window")
+    artifact_count: int = Field(..., description="Intervals excluded as artifacts/ectopic beats")
+    mean_rr_ms: Optional[float] = Field(None, description="Mean NN interval (ms)")
+    sdnn_ms: Optional[float] = Field(None, description="SDNN (ms)")
+    rmssd_ms: Optional[float] = Field(None, description="RMSSD (ms)")
+    pnn50: Optional[float] = Field(None, description="pNN50 (%)")
+    lf_power: Optional[float] = Field(None, description="LF power, 0.04-0.15 Hz (ms^2)")
+    hf_power: Optional[float] = Field(None, description="HF power, 0.15-0.40 Hz (ms^2)")
+    lf_hf_ratio: Optional[float] = Field(None, description="LF/HF ratio")
+    source_device: Optional[str] = Field(None, description="Wearable device name")
+
+    class Config:
+        from_attributes = True
+
+
+class HRVUploadResponse(BaseModel):
+    """
+    Schema for the result of an RR interval upload.
+    """
+    beat_count: int = Field(..., description="RR intervals received")
+    artifact_count: int = Field(..., description="Intervals excluded from the metrics")
+    windows: List[HRVWindowResponse] = Field(..., description="Stored windows")
+
+
 # =============================================================================
 # Real-time Vital Signs Schema
 # =============================================================================
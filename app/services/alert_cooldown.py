@@ -0,0 +1,167 @@
+"""
+Alert cooldown tracker.
+
+Suppresses repeat alerts of the same type for the same patient within a
+cooldown window, so a sustained episode (e.g. 20 minutes of tachycardia
+at 1 Hz) raises one alert instead of one per reading.
+
+# =============================================================================
+# FILE MAP - QUICK NAVIGATION
+# =============================================================================
+# CLASSES
+#   - AlertCooldownTracker............. Line 55  (Last-fired map)
+#       - is_cooling_down()............ Line 95  (Single check)
+#       - filter_alerts().............. Line 109 (Drop suppressed, mark kept)
+#       - mark_fired()................. Line 135 (Record a stored alert)
+#       - release().................... Line 145 (Undo marks of unstored alerts)
+#
+# MODULE INSTANCE
+#   - alert_cooldown................... Line 167 (Shared tracker)
+#
+# BUSINESS CONTEXT:
+# - Memory first: one dict lookup per check on the hot path
+# - DB fallback on a cold key (new worker, restart) reads the newest
+#   alert via idx_alert_user_type_time (user_id, alert_type, created_at)
+# - Each worker keeps its own map, so across N workers at most N copies
+#   of an alert can slip through per window
+# - Marks are made before the caller commits (so two tasks can't both
+#   fire); a failed commit release()s them so the alert isn't suppressed
+# - ALERT_COOLDOWN_MINUTES sets the window (default 5)
+# =============================================================================
+"""
+
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.alert import Alert
+
+logger = logging.getLogger(__name__)
+
+# Marks a key we looked up in the DB and found no alert for
+_NEVER = datetime.min.replace(tzinfo=timezone.utc)
+
+
+def _as_utc(value: datetime) -> datetime:
+    """SQLite hands back naive datetimes; treat them as UTC."""
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+class AlertCooldownTracker:
+    """
+    In-memory last-fired time per (user_id, alert_type), with DB fallback.
+
+    Thread-safe: check-and-mark happens under one lock, so two background
+    tasks for the same patient can't both fire the same alert.
+    """
+
+    def __init__(self, cooldown_minutes: float, max_entries: int = 100_000):
+        self.cooldown = timedelta(minutes=cooldown_minutes)
+        self.max_entries = max_entries
+        self._last_fired: Dict[Tuple[int, str], datetime] = {}
+        self._lock = threading.Lock()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._last_fired.clear()
+
+    def _load_from_db(self, db: Session, user_id: int, alert_type: str) -> datetime:
+        last = db.query(func.max(Alert.created_at)).filter(
+            Alert.user_id == user_id,
+            Alert.alert_type == alert_type
+        ).scalar()
+        return _as_utc(last) if last else _NEVER
+
+    def _last_fired_at(self, db: Optional[Session], user_id: int, alert_type: str) -> Optional[datetime]:
+        key = (user_id, alert_type)
+        with self._lock:
+            cached = self._last_fired.get(key)
+        if cached is not None or db is None:
+            return cached
+
+        loaded = self._load_from_db(db, user_id, alert_type)
+        with self._lock:
+            # Another thread may have fired while we were querying
+            current = self._last_fired.get(key)
+            if current is None or loaded > current:
+                self._last_fired[key] = loaded
+            return self._last_fired[key]
+
+    def is_cooling_down(
+        self,
+        db: Optional[Session],
+        user_id: int,
+        alert_type: str,
+        now: Optional[datetime] = None,
+        window: Optional[timedelta] = None
+    ) -> bool:
+        """True if this alert type fired for the patient within the window."""
+        now = now or datetime.now(timezone.utc)
+        window = self.cooldown if window is None else window
+        last = self._last_fired_at(db, user_id, alert_type)
+        return last is not None and now - last < window
+
+    def filter_alerts(self, db: Optional[Session], alerts: Iterable[Alert]) -> List[Alert]:
+        """
+        Drop alerts still in cooldown and mark the rest as fired.
+
+        Call right before storing the returned alerts, and release() them
+        if the commit fails.
+        """
+        now = datetime.now(timezone.utc)
+        alerts = list(alerts)
+        # Warm cold keys from the DB outside the check-and-mark lock
+        for alert in alerts:
+            self._last_fired_at(db, alert.user_id, alert.alert_type)
+
+        kept: List[Alert] = []
+        with self._lock:
+            for alert in alerts:
+                key = (alert.user_id, alert.alert_type)
+                last = self._last_fired.get(key)
+                if last is not None and now - last < self.cooldown:
+                    logger.info(f"Alert {alert.alert_type} for user {alert.user_id} suppressed (cooldown)")
+                    continue
+                self._last_fired[key] = now
+                kept.append(alert)
+            self._prune(now)
+        return kept
+
+    def mark_fired(self, user_id: int, alert_type: str, when: Optional[datetime] = None) -> None:
+        """Record that an alert was stored outside filter_alerts()."""
+        when = _as_utc(when) if when else datetime.now(timezone.utc)
+        with self._lock:
+            key = (user_id, alert_type)
+            current = self._last_fired.get(key)
+            if current is None or when > current:
+                self._last_fired[key] = when
+            self._prune(when)
+
+    def release(self, alerts: Iterable[Alert]) -> None:
+        """
+        Undo filter_alerts() marks for alerts that were never stored.
+
+        The keys are dropped rather than restored, so the next check reads
+        the newest stored alert from the DB.
+        """
+        with self._lock:
+            for alert in alerts:
+                self._last_fired.pop((alert.user_id, alert.alert_type), None)
+
+    def _prune(self, now: datetime) -> None:
+        """Drop expired entries once the map grows large. Caller holds the lock."""
+        if len(self._last_fired) <= self.max_entries:
+            return
+        cutoff = now - self.cooldown
+        expired = [key for key, fired in self._last_fired.items() if fired < cutoff]
+        for key in expired:
+            del self._last_fired[key]
+
+
+# Shared tracker for every alert-creation path in this worker
+alert_cooldown = AlertCooldownTracker(settings.alert_cooldown_minutes)
@@ -0,0 +1,178 @@
+"""
+Alert counter service.
+
+Keeps alert_daily_counters in step with the alerts table and answers
+GET /alerts/stats from it.
+
+# =============================================================================
+# FILE MAP - QUICK NAVIGATION
+# =============================================================================
+# FUNCTIONS
+#   - count_alerts_created()........... Line 92  (+1 per new alert)
+#   - count_acknowledgement_change()... Line 104 (Move between ack buckets)
+#   - get_alert_stats()................ Line 118 (Sum counters for a period)
+#   - rebuild_alert_counters()......... Line 159 (Recompute from alerts)
+#
+# BUSINESS CONTEXT:
+# - Functions only modify the caller's session; the caller commits, so the
+#   counters change in the same transaction as the alert itself
+# - Upserts use INSERT ... ON CONFLICT DO UPDATE (PostgreSQL and SQLite),
+#   so concurrent writers never race on a missing row
+# - Stats cover the last N UTC calendar days (today included)
+# =============================================================================
+"""
+
+import logging
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.models.alert import Alert
+from app.models.alert_counter import AlertDailyCounter
+
+logger = logging.getLogger(__name__)
+
+# Bucket used for legacy alerts stored without a severity
+UNKNOWN_SEVERITY = "unknown"
+
+CounterKey = Tuple[int, date, str, bool]
+
+
+def _day_of(created_at: Optional[datetime]) -> date:
+    """UTC calendar day of an alert (SQLite returns naive UTC datetimes)."""
+    if created_at is None:
+        return datetime.now(timezone.utc).date()
+    if created_at.tzinfo is not None:
+        created_at = created_at.astimezone(timezone.utc)
+    return created_at.date()
+
+
+def _key(alert: Alert, acknowledged: bool) -> CounterKey:
+    return (alert.user_id, _day_of(alert.created_at), alert.severity or UNKNOWN_SEVERITY, acknowledged)
+
+
+def _apply(db: Session, deltas: Dict[CounterKey, int]) -> None:
+    """Add deltas to counter rows, creating missing rows."""
+    rows = [
+        {"user_id": k[0], "day": k[1], "severity": k[2], "acknowledged": k[3], "alert_count": delta}
+        for k, delta in deltas.items() if delta
+    ]
+    if not rows:
+        return
+
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        insert = None
+
+    if insert is not None:
+        stmt = insert(AlertDailyCounter)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["user_id", "day", "severity", "acknowledged"],
+            set_={"alert_count": AlertDailyCounter.alert_count + stmt.excluded.alert_count},
+        )
+        db.execute(stmt, rows)
+        return
+
+    # Other databases: read-modify-write through the ORM
+    for row in rows:
+        counter = db.get(AlertDailyCounter, (row["user_id"], row["day"], row["severity"], row["acknowledged"]))
+        if counter is None:
+            db.add(AlertDailyCounter(**row))
+        else:
+            counter.alert_count = (counter.alert_count or 0) + row["alert_count"]
+
+
+def count_alerts_created(db: Session, alerts: Iterable[Alert]) -> None:
+    """Count newly stored alerts. Call before the caller commits."""
+    now = datetime.now(timezone.utc)
+    deltas: Dict[CounterKey, int] = defaultdict(int)
+    for alert in alerts:
+        if alert.created_at is None:
+            # Pin the timestamp so the row's day matches the counter's day
+            alert.created_at = now
+        deltas[_key(alert, bool(alert.acknowledged))] += 1
+    _apply(db, deltas)
+
+
+def count_acknowledgement_change(db: Session, alert: Alert, acknowledged: bool) -> None:
+    """
+    Move an alert between the acknowledged / unacknowledged buckets.
+
+    Call with the new state before changing alert.acknowledged.
+    """
+    if bool(alert.acknowledged) == acknowledged:
+        return
+    _apply(db, {
+        _key(alert, not acknowledged): -1,
+        _key(alert, acknowledged): 1,
+    })
+
+
+def get_alert_stats(db: Session, days: int, user_id: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Alert totals for the last `days` UTC days, optionally for one patient.
+
+    Reads at most days x patients x severities x 2 counter rows.
+    """
+    today = datetime.now(timezone.utc).date()
+    since = today - timedelta(days=days - 1)
+
+    query = db.query(
+        AlertDailyCounter.day,
+        AlertDailyCounter.severity,
+        AlertDailyCounter.acknowledged,
+        func.sum(AlertDailyCounter.alert_count)
+    ).filter(AlertDailyCounter.day >= since)
+    if user_id is not None:
+        query = query.filter(AlertDailyCounter.user_id == user_id)
+    rows = query.group_by(
+        AlertDailyCounter.day,
+        AlertDailyCounter.severity,
+        AlertDailyCounter.acknowledged
+    ).all()
+
+    severity_breakdown: Dict[str, int] = defaultdict(int)
+    daily_counts: Dict[str, int] = defaultdict(int)
+    unacknowledged = 0
+    for day, severity, acknowledged, count in rows:
+        count = int(count or 0)
+        severity_breakdown[severity] += count
+        daily_counts[day.isoformat()] += count
+        if not acknowledged:
+            unacknowledged += count
+
+    return {
+        "severity_breakdown": {k: v for k, v in severity_breakdown.items() if v},
+        "unacknowledged_count": unacknowledged,
+        "total_alerts": sum(severity_breakdown.values()),
+        "daily_counts": dict(sorted(daily_counts.items())),
+    }
+
+
+def rebuild_alert_counters(db: Session, user_id: Optional[int] = None) -> int:
+    """
+    Recompute counters from the alerts table.
+
+    Used to backfill or repair drift. Caller commits. Returns rows written.
+    """
+    delete_query = db.query(AlertDailyCounter)
+    alert_query = db.query(Alert.user_id, Alert.created_at, Alert.severity, Alert.acknowledged)
+    if user_id is not None:
+        delete_query = delete_query.filter(AlertDailyCounter.user_id == user_id)
+        alert_query = alert_query.filter(Alert.user_id == user_id)
+    delete_query.delete(synchronize_session=False)
+
+    deltas: Dict[CounterKey, int] = defaultdict(int)
+    for uid, created_at, severity, acknowledged in alert_query.yield_per(5000):
+        deltas[(uid, _day_of(created_at), severity or UNKNOWN_SEVERITY, bool(acknowledged))] += 1
+    _apply(db, deltas)
+
+    logger.info(f"Rebuilt {len(deltas)} alert counter rows")
+    return len(deltas)
@@ -6,16 +6,16 @@ This file handles password hashing and token creation.
 # =============================================================================
 # FILE MAP - QUICK NAVIGATION
 # =============================================================================
-# IMPORTS.............................. Line 20
-# PASSWORD HASHING CONFIG.............. Line 35
-# OAUTH2 SCHEME....................... Line 45
+# IMPORTS.............................. Line 27
+# PASSWORD HASHING CONFIG.............. Line 41
+# OAUTH2 SCHEME....................... Line 77
 #
 # CLASS: AuthService
-#   - hash_password().................. Line 68  (PBKDF2 hash)
-#   - verify_password()................ Line 83  (Check password match)
-#   - create_access_token()............ Line 106 (JWT access token)
-#   - create_refresh_token()........... Line 153 (JWT refresh token)
-#   - decode_token()................... Line 186 (JWT validation)
+#   - hash_password().................. Line 111 (PBKDF2 hash)
+#   - verify_password()................ Line 126 (Check password match)
+#   - create_access_token()............ Line 149 (JWT access token)
+#   - create_refresh_token()........... Line 197 (JWT refresh token)
+#   - decode_token()................... Line 231 (JWT validation)
 #
 # BUSINESS CONTEXT:
 # - PBKDF2 with 200k rounds (OWASP recommended)
@@ -26,8 +26,6 @@ This file handles password hashing and token creation.
 
 from datetime import datetime, timedelta, timezone
 from typing import Optional
-from jose import JWTError, jwt
-from passlib.context import CryptContext
 from fastapi import HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 import logging
@@ -43,12 +41,37 @@ logger = logging.getLogger(__name__)
 # Password Hashing Configuration
 # =============================================================================
 
-# Use PBKDF2 for password hashing (safe and compatible).
-pwd_context = CryptContext(
-    schemes=["pbkdf2_sha256"],
-    deprecated="auto",
-    pbkdf2_sha256__default_rounds=200000  # OWASP recommended minimum
-)
+# passlib and python-jose are imported on first use (or by preload()
+# while the app starts), so they don't slow down importing the app
+_pwd_context = None
+
+
+def get_pwd_context():
+    """Password hasher, created on first use."""
+    global _pwd_context
+    if _pwd_context is None:
+        from passlib.context import CryptContext
+
+        # Use PBKDF2 for password hashing (safe and compatible).
+        _pwd_context = CryptContext(
+            schemes=["pbkdf2_sha256"],
+            deprecated="auto",
+            pbkdf2_sha256__default_rounds=200000  # OWASP recommended minimum
+        )
+    return _pwd_context
+
+
+def preload() -> None:
+    """Import the hashing/JWT libraries ahead of the first login."""
+    get_pwd_context()
+    import jose.jwt  # noqa: F401
+
+
+def __getattr__(name: str):
+    # Older scripts import pwd_context directly
+    if name == "pwd_context":
+        return get_pwd_context()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # =============================================================================
 # OAuth2 Scheme
@@ -97,7 +120,7 @@ class AuthService:
         Returns:
             Hashed password string suitable for storage in auth_credentials table
         """
-        return pwd_context.hash(password)
+        return get_pwd_context().hash(password)
     
     @staticmethod
     def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -113,7 +136,7 @@ class AuthService:
             True if password matches hash, False if mismatch or error
         """
         try:
-            return pwd_context.verify(plain_password, hashed_password)
+            return get_pwd_context().verify(plain_password, hashed_password)
         except Exception as e:
             logger.error(f"Password verification error: {e}")
             return False
@@ -161,6 +184,7 @@ class AuthService:
             to_encode["type"] = "access"
         
         # Encode the token with the app's secret key.
+        from jose import jwt
         encoded_jwt = jwt.encode(
             to_encode,
             settings.secret_key,
@@ -196,6 +220,7 @@ class AuthService:
         })
         
         # Encode and return the token.
+        from jose import jwt
         return jwt.encode(
             to_encode,
             settings.secret_key,
@@ -214,6 +239,7 @@ class AuthService:
         Returns:
             Decoded payload dict if valid, None if expired/invalid/tampered
         """
+        from jose import JWTError, jwt
         try:
             # Decode and validate the token.
             payload = jwt.decode(
@@ -0,0 +1,265 @@
+"""
+Batch explanation service.
+
+Loads stored risk assessments and activity sessions for a clinician
+review queue, rebuilds their model features and scores + attributes
+them all in one vectorized pass.
+
+# =============================================================================
+# FILE MAP - QUICK NAVIGATION
+# =============================================================================
+# CONSTANTS............................ Line 52
+#
+# FUNCTIONS
+#   - session_features()............... Line 62  (Session row -> features)
+#   - load_window_vitals()............. Line 80  (One vitals query per patient)
+#   - window_features()................ Line 106 (Vitals window -> features)
+#   - collect_batch_items()............ Line 148 (Ids -> feature rows)
+#   - explain_batch_items()............ Line 227 (Score + TreeSHAP, chunked)
+#
+# BUSINESS CONTEXT:
+# - Sessions use the features stored when they ended (feature store);
+#   older sessions are engineered from their aggregates with the same
+#   defaults as GET /predict/user/{id}/risk
+# - Assessments use their linked session; vitals-window assessments
+#   re-aggregate the 30 minutes of valid vitals before assessment_date
+#   (same summary, incl. recovery-time fit, as the compute endpoints).
+#   Each patient's windows come from one query spanning all of them,
+#   sliced in memory
+# - Items are returned in request order: assessments first, then sessions
+# - Missing ids become error items instead of failing the whole batch
+# =============================================================================
+"""
+
+import logging
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.models.activity import ActivitySession
+from app.models.risk_assessment import RiskAssessment
+from app.models.user import User
+from app.models.vital_signs import VitalSignRecord
+from app.services.ml_prediction import engineer_features, explain_features_batch, get_active_bundle
+from app.services.session_aggregation import summarize_vitals
+from app.services.session_features import session_inputs, stored_features
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on assessment_ids + session_ids per request
+MAX_BATCH_ITEMS = 1000
+
+# Rows scored per model call; results stream out after each chunk
+EXPLAIN_CHUNK_SIZE = 256
+
+# Same window as POST /risk-assessments/compute
+WINDOW_MINUTES = 30
+
+
+def session_features(user: User, session: ActivitySession) -> Dict[str, float]:
+    """
+    Features for a stored session: the ones saved when it ended, or
+    engineered from the row (defaults match predict.py) for older sessions.
+    """
+    return stored_features(session) or engineer_features(**session_inputs(user, session))
+
+
+def _as_utc(value: datetime) -> datetime:
+    """SQLite hands back naive datetimes; treat them as UTC."""
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def _window_end(assessment: RiskAssessment) -> Optional[datetime]:
+    end = assessment.assessment_date or assessment.created_at
+    return _as_utc(end) if end is not None else None
+
+
+def load_window_vitals(
+    db: Session, user_id: int, assessments: List[RiskAssessment]
+) -> Tuple[List[datetime], List[Tuple]]:
+    """
+    A patient's valid readings covering every assessment's window.
+
+    One query from the earliest window start to the latest assessment.
+    Returns (UTC timestamps for bisecting, rows) in time order.
+    """
+    ends = [end for end in map(_window_end, assessments) if end is not None]
+    if not ends:
+        return [], []
+    rows = db.execute(
+        select(VitalSignRecord.timestamp, VitalSignRecord.heart_rate,
+               VitalSignRecord.spo2, VitalSignRecord.activity_type)
+        .where(
+            VitalSignRecord.user_id == user_id,
+            VitalSignRecord.timestamp >= min(ends) - timedelta(minutes=WINDOW_MINUTES),
+            VitalSignRecord.timestamp <= max(ends),
+            VitalSignRecord.is_valid == True,
+        )
+        .order_by(VitalSignRecord.timestamp.asc())
+    ).all()
+    return [_as_utc(row[0]) for row in rows], rows
+
+
+def window_features(
+    user: User, assessment: RiskAssessment, timestamps: List[datetime], vitals: List[Tuple]
+) -> Optional[Dict[str, float]]:
+    """
+    Engineered features for a vitals-window assessment.
+
+    Slices the window's readings before assessment_date out of
+    load_window_vitals() output and summarizes them like the compute
+    endpoints do (incl. the recovery-time fit). None when the window is
+    empty.
+    """
+    end = _window_end(assessment)
+    if end is None:
+        return None
+    lo = bisect_left(timestamps, end - timedelta(minutes=WINDOW_MINUTES))
+    rows = vitals[lo:bisect_right(timestamps, end)]
+    if not rows:
+        return None
+
+    first_at = rows[0][0]
+    summary = summarize_vitals(
+        [(ts - first_at).total_seconds() for ts, _, _, _ in rows],
+        [hr for _, hr, _, _ in rows],
+        [spo2 if spo2 is not None else float("nan") for _, _, spo2, _ in rows],
+        resting_hr=user.baseline_hr,
+    )
+
+    age = user.age or 55
+    return engineer_features(
+        age=age,
+        baseline_hr=user.baseline_hr or 72,
+        max_safe_hr=user.max_safe_hr or (220 - age),
+        avg_heart_rate=summary["avg_heart_rate"],
+        peak_heart_rate=summary["peak_heart_rate"],
+        min_heart_rate=summary["min_heart_rate"],
+        avg_spo2=summary["avg_spo2"] if summary["avg_spo2"] is not None else 97,
+        duration_minutes=summary["duration_minutes"],
+        recovery_time_minutes=summary["recovery_time_minutes"] or 5,
+        activity_type=rows[-1][3] or "walking",
+    )
+
+
+def collect_batch_items(
+    db: Session, assessment_ids: List[int], session_ids: List[int]
+) -> List[Dict[str, Any]]:
+    """
+    Resolve ids to items ready for scoring.
+
+    Each item has kind, id and either an "error" or user_id, session_id,
+    stored_risk_score, features and the patient User (for access checks).
+    Three IN queries load every assessment, session and patient, plus one
+    vitals query per patient with vitals-window assessments.
+    """
+    assessments = {
+        ra.assessment_id: ra
+        for ra in db.query(RiskAssessment).filter(RiskAssessment.assessment_id.in_(assessment_ids))
+    } if assessment_ids else {}
+
+    wanted_sessions = set(session_ids)
+    wanted_sessions.update(ra.activity_session_id for ra in assessments.values() if ra.activity_session_id)
+    sessions = {
+        s.session_id: s
+        for s in db.query(ActivitySession).filter(ActivitySession.session_id.in_(wanted_sessions))
+    } if wanted_sessions else {}
+
+    user_ids = {ra.user_id for ra in assessments.values()} | {s.user_id for s in sessions.values()}
+    users = {
+        u.user_id: u for u in db.query(User).filter(User.user_id.in_(user_ids))
+    } if user_ids else {}
+
+    # Assessments without a (still existing) session are scored from their window
+    by_user: Dict[int, List[RiskAssessment]] = {}
+    for ra in assessments.values():
+        if ra.activity_session_id not in sessions and ra.user_id in users:
+            by_user.setdefault(ra.user_id, []).append(ra)
+    window_vitals = {user_id: load_window_vitals(db, user_id, ras) for user_id, ras in by_user.items()}
+
+    items: List[Dict[str, Any]] = []
+    for assessment_id in assessment_ids:
+        ra = assessments.get(assessment_id)
+        user = users.get(ra.user_id) if ra else None
+        if ra is None or user is None:
+            items.append({"kind": "assessment", "id": assessment_id, "error": "not_found"})
+            continue
+        session = sessions.get(ra.activity_session_id)
+        features = (
+            session_features(user, session) if session
+            else window_features(user, ra, *window_vitals[ra.user_id])
+        )
+        if features is None:
+            items.append({"kind": "assessment", "id": assessment_id, "error": "no_input_data"})
+            continue
+        items.append({
+            "kind": "assessment",
+            "id": assessment_id,
+            "user_id": ra.user_id,
+            "session_id": session.session_id if session else None,
+            "stored_risk_score": ra.risk_score,
+            "features": features,
+            "patient": user,
+        })
+
+    for session_id in session_ids:
+        session = sessions.get(session_id)
+        user = users.get(session.user_id) if session else None
+        if session is None or user is None:
+            items.append({"kind": "session", "id": session_id, "error": "not_found"})
+            continue
+        items.append({
+            "kind": "session",
+            "id": session_id,
+            "user_id": session.user_id,
+            "session_id": session_id,
+            "stored_risk_score": session.risk_score,
+            "features": session_features(user, session),
+            "patient": user,
+        })
+
+    return items
+
+
+def explain_batch_items(items: List[Dict[str, Any]], top_n: int = 3) -> Iterator[Dict[str, Any]]:
+    """
+    Yield one result per item, in order.
+
+    Scorable items go through explain_features_batch EXPLAIN_CHUNK_SIZE at
+    a time, so the first results are ready before the whole batch is done.
+    The whole stream is scored by the model version active when it started.
+    """
+    bundle = get_active_bundle()
+    for start in range(0, len(items), EXPLAIN_CHUNK_SIZE):
+        chunk = items[start:start + EXPLAIN_CHUNK_SIZE]
+        scorable = [item for item in chunk if "error" not in item]
+        results = iter(explain_features_batch([item["features"] for item in scorable], bundle=bundle))
+
+        for item in chunk:
+            if "error" in item:
+                yield {"kind": item["kind"], "id": item["id"], "error": item["error"]}
+                continue
+            result = next(results)
+            contributions = result["contributions"]
+            top_features = sorted(
+                contributions, key=lambda name: abs(contributions[name]), reverse=True
+            )[:top_n] if contributions else []
+            yield {
+                "kind": item["kind"],
+                "id": item["id"],
+                "user_id": item["user_id"],
+                "session_id": item["session_id"],
+                "stored_risk_score": item["stored_risk_score"],
+                "risk_score": result["risk_score"],
+                "risk_level": result["risk_level"],
+                "confidence": result["confidence"],
+                "base_value": result["base_value"],
+                "contributions": (
+                    {name: round(value, 6) for name, value in contributions.items()}
+                    if contributions else None
+                ),
+                "top_features": top_features,
+            }
@@ -0,0 +1,224 @@
+"""
+Counterfactual "how to lower my risk" search.
+
+Starting from a session, finds the smallest change to what the patient
+controls (target heart rate, duration, activity type) that the model
+scores below a risk threshold.
+
+# =============================================================================
+# FILE MAP - QUICK NAVIGATION
+# =============================================================================
+# CONSTANTS............................ Line 49
+#
+# FUNCTIONS
+#   - build_candidates()............... Line 64  (Actionable grid + cost)
+#   - find_lower_risk_plan()........... Line 125 (Cheapest plan under target)
+#   - _describe_changes().............. Line 210 (Plan -> readable steps)
+#
+# BUSINESS CONTEXT:
+# - Age, resting HR, max safe HR, SpO2 and recovery are not actionable
+# - Lowering the target HR lowers peak and average HR by the same bpm
+# - Cost = relative HR drop + relative duration cut + 0.15 per activity
+#   intensity level changed; the cheapest candidate under target wins
+# - Candidates are scored cheapest-first in batches of BATCH_SIZE, so the
+#   first batch with a hit holds the optimum and the search stops there
+# - COUNTERFACTUAL_BUDGET_MS caps the time per request; when it runs out
+#   the best plan so far is returned with complete = False
+# =============================================================================
+"""
+
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.config import settings
+from app.services.ml_prediction import (
+    ACTIVITY_INTENSITY,
+    ModelBundle,
+    classify_risk,
+    engineer_feature_arrays,
+    get_active_bundle,
+    predict_proba_matrix,
+)
+
+logger = logging.getLogger(__name__)
+
+# Candidates scored per model call
+BATCH_SIZE = 4096
+
+# Activity suggested for each intensity level
+ACTIVITY_FOR_INTENSITY = {1: "walking", 2: "cycling", 3: "swimming"}
+
+# Cost of moving one intensity level (e.g. jogging -> walking)
+ACTIVITY_CHANGE_COST = 0.15
+
+# Shortest session we would suggest
+MIN_DURATION_MINUTES = 5
+
+# Target HR never goes below resting HR + this
+MIN_HR_ABOVE_BASELINE = 10
+
+
+def build_candidates(session: Dict[str, Any], hr_step: int = 2, duration_step: int = 1) -> Dict[str, np.ndarray]:
+    """
+    Every (activity, peak HR, duration) combination at or below today's
+    effort, flattened and with a cost per candidate.
+    """
+    peak = int(session["peak_heart_rate"])
+    duration = int(session["duration_minutes"])
+    floor = min(peak, int(session["baseline_hr"]) + MIN_HR_ABOVE_BASELINE)
+    intensity = ACTIVITY_INTENSITY.get(session.get("activity_type", "walking"), 2)
+
+    peaks = np.arange(peak, floor - 1, -max(1, hr_step))
+    durations = np.arange(duration, min(duration, MIN_DURATION_MINUTES) - 1, -max(1, duration_step))
+    intensities = np.array(sorted(ACTIVITY_FOR_INTENSITY))
+
+    grid_i, grid_p, grid_d = np.meshgrid(intensities, peaks, durations, indexing="ij")
+    grid_i, grid_p, grid_d = grid_i.ravel(), grid_p.ravel(), grid_d.ravel()
+
+    cost = (
+        (peak - grid_p) / max(peak, 1)
+        + (duration - grid_d) / max(duration, 1)
+        + ACTIVITY_CHANGE_COST * np.abs(grid_i - intensity)
+    )
+    return {"intensity": grid_i, "peak": grid_p, "duration": grid_d, "cost": cost}
+
+
+def _score(
+    session: Dict[str, Any],
+    intensity: np.ndarray,
+    peak: np.ndarray,
+    duration: np.ndarray,
+    bundle: Optional[ModelBundle] = None,
+) -> np.ndarray:
+    """Risk for a batch of candidates; one engineer + predict_proba call per intensity."""
+    # A lower target moves average HR down by the same bpm (not below
+    # resting HR); the unchanged session keeps its readings as they are
+    drop = session["peak_heart_rate"] - peak
+    lowered = drop > 0
+    shifted = np.minimum(np.maximum(session["avg_heart_rate"] - drop, session["baseline_hr"]), peak)
+    avg = np.where(lowered, shifted, session["avg_heart_rate"])
+    low = np.where(lowered, np.minimum(session["min_heart_rate"], avg), session["min_heart_rate"])
+
+    risk = np.empty(len(peak), dtype=np.float64)
+    for level in np.unique(intensity):
+        rows = intensity == level
+        matrix = engineer_feature_arrays(
+            age=session["age"],
+            baseline_hr=session["baseline_hr"],
+            max_safe_hr=session["max_safe_hr"],
+            avg_heart_rate=avg[rows],
+            peak_heart_rate=peak[rows],
+            min_heart_rate=low[rows],
+            avg_spo2=session["avg_spo2"],
+            duration_minutes=duration[rows],
+            recovery_time_minutes=session["recovery_time_minutes"],
+            activity_type=ACTIVITY_FOR_INTENSITY[int(level)],
+            bundle=bundle,
+        )
+        risk[rows] = predict_proba_matrix(matrix, bundle=bundle)
+    return risk
+
+
+def find_lower_risk_plan(
+    session: Dict[str, Any],
+    target_risk: float = 0.5,
+    budget_ms: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Cheapest actionable change that brings risk below target_risk.
+
+    session: the engineer_features() inputs (incl. activity_type).
+    Returns current risk, the suggestion (or None), how many candidates
+    were scored and whether the search finished inside the budget.
+    """
+    budget_ms = settings.counterfactual_budget_ms if budget_ms is None else budget_ms
+    started = time.perf_counter()
+    deadline = started + budget_ms / 1000.0
+    # One model version for the whole search, even across a hot-swap
+    bundle = get_active_bundle()
+
+    intensity = ACTIVITY_INTENSITY.get(session.get("activity_type", "walking"), 2)
+    current_risk = float(_score(
+        session,
+        np.array([intensity]),
+        np.array([session["peak_heart_rate"]]),
+        np.array([session["duration_minutes"]]),
+        bundle=bundle,
+    )[0])
+
+    result: Dict[str, Any] = {
+        "current": {
+            "risk_score": round(current_risk, 4),
+            "risk_level": classify_risk(current_risk)[0],
+            "activity_type": session.get("activity_type", "walking"),
+            "peak_heart_rate": int(session["peak_heart_rate"]),
+            "duration_minutes": int(session["duration_minutes"]),
+        },
+        "target_risk": target_risk,
+        "found": current_risk < target_risk,
+        "complete": True,
+        "evaluated": 1,
+        "suggestion": None,
+        "model_version": bundle.version,
+    }
+    if result["found"]:
+        result["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        return result
+
+    candidates = build_candidates(session)
+    order = np.argsort(candidates["cost"], kind="stable")
+
+    for start in range(0, len(order), BATCH_SIZE):
+        if time.perf_counter() > deadline:
+            result["complete"] = False
+            break
+        batch = order[start:start + BATCH_SIZE]
+        risk = _score(session, candidates["intensity"][batch], candidates["peak"][batch], candidates["duration"][batch], bundle=bundle)
+        result["evaluated"] += len(batch)
+
+        hits = np.flatnonzero(risk < target_risk)
+        if len(hits):
+            # Batches are in cost order, so the first hit is the cheapest overall
+            best = int(batch[hits[0]])
+            best_risk = float(risk[hits[0]])
+            level = int(candidates["intensity"][best])
+            suggestion = {
+                "activity_type": (
+                    result["current"]["activity_type"] if level == intensity else ACTIVITY_FOR_INTENSITY[level]
+                ),
+                "peak_heart_rate": int(candidates["peak"][best]),
+                "duration_minutes": int(candidates["duration"][best]),
+                "risk_score": round(best_risk, 4),
+                "risk_level": classify_risk(best_risk)[0],
+            }
+            suggestion["changes"] = _describe_changes(result["current"], suggestion)
+            result["found"] = True
+            result["suggestion"] = suggestion
+            break
+
+    result["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    logger.info(
+        f"Counterfactual search: {result['evaluated']} candidates in {result['elapsed_ms']}ms, "
+        f"found={result['found']}, complete={result['complete']}"
+    )
+    return result
+
+
+def _describe_changes(current: Dict[str, Any], suggestion: Dict[str, Any]) -> List[str]:
+    changes = []
+    if suggestion["peak_heart_rate"] != current["peak_heart_rate"]:
+        changes.append(
+            f"Keep heart rate under {suggestion['peak_heart_rate']} bpm "
+            f"(was {current['peak_heart_rate']})"
+        )
+    if suggestion["duration_minutes"] != current["duration_minutes"]:
+        changes.append(
+            f"Limit the session to {suggestion['duration_minutes']} min "
+            f"(was {current['duration_minutes']})"
+        )
+    if suggestion["activity_type"] != current["activity_type"]:
+        changes.append(f"Switch to {suggestion['activity_type']} instead of {current['activity_type']}")
+    return changes
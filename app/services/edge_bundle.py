@@ -0,0 +1,215 @@
+"""
+Edge model bundle export.
+
+Turns the active risk model (forest + scaler + feature order) into one
+compact JSON document the mobile app can evaluate on the device, so
+routine risk checks don't need a round trip to the server.
+edge_evaluator.py is the reference implementation for reading it.
+
+# =============================================================================
+# FILE MAP - QUICK NAVIGATION
+# =============================================================================
+# CONSTANTS............................ Line 50
+#
+# FUNCTIONS
+#   - build_edge_bundle().............. Line 104 (ModelBundle -> dict)
+#   - get_edge_bundle_payload()........ Line 201 (Cached bytes + ETag)
+#
+# BUSINESS CONTEXT:
+# - The scaler is folded into the thresholds: a split "scaled x <= t"
+#   becomes "raw x <= t * scale + mean", so the device skips scaling
+# - Thresholds are int16 per feature: raw = offset[f] + q * step[f],
+#   with step = (feature's threshold range) / 65534. Codes are picked so
+#   whole-number inputs (and age / 70) split exactly as on the server
+# - Trees are stored breadth-first so right = left + 1; "left" is an
+#   int16 index inside the tree (-1 = leaf). roots[i] is where tree i
+#   starts in the node arrays
+# - Leaves hold P(high risk) as uint16 (p * 65535); the risk score is
+#   the mean over trees, same as predict_proba
+# - Arrays are base64 little-endian; "dtype" uses NumPy notation
+# - The payload is built once per model version and is byte-for-byte
+#   the same in every worker; its ETag is a hash of those bytes, so
+#   clients revalidate with If-None-Match
+# =============================================================================
+"""
+
+import base64
+import hashlib
+import json
+import logging
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from app.services.flat_forest import sibling_order
+from app.services.ml_prediction import ACTIVITY_INTENSITY, ModelBundle
+
+logger = logging.getLogger(__name__)
+
+EDGE_FORMAT = "adaptiv-edge-forest"
+EDGE_FORMAT_VERSION = 1
+
+# classify_risk() cut-offs, shipped so the device labels scores the same way
+RISK_LEVEL_THRESHOLDS = {"moderate": 0.5, "high": 0.8}
+
+# Activity types missing from ACTIVITY_INTENSITY (engineer_features default)
+DEFAULT_ACTIVITY_INTENSITY = 2
+
+# Features that are whole numbers divided by a constant (engineer_features);
+# every other feature is treated as whole-number valued when quantizing
+VALUE_DIVISORS = {"age_risk_factor": 70}
+
+THRESHOLD_LEVELS = 65534   # int16 codes -32767..32767
+LEAF_SCALE = 65535         # uint16 leaf probabilities
+
+_cache_lock = threading.Lock()
+_cached: Optional[Tuple[ModelBundle, bytes, str]] = None
+
+
+def _encode(array: np.ndarray, dtype: str) -> Dict[str, Any]:
+    data = np.ascontiguousarray(array, dtype=np.dtype(dtype))
+    return {"dtype": dtype, "length": int(data.size), "data": base64.b64encode(data.tobytes()).decode("ascii")}
+
+
+def _high_risk_column(model) -> int:
+    classes = [c.item() if hasattr(c, "item") else c for c in model.classes_]
+    if len(classes) != 2 or 1 not in classes:
+        raise ValueError(f"Edge export needs a binary model with class 1 = high risk (classes: {classes})")
+    return classes.index(1)
+
+
+def _quantize(raw: np.ndarray, on_grid: np.ndarray, on_grid_left: np.ndarray,
+              offset: np.ndarray, step: np.ndarray) -> np.ndarray:
+    """
+    int16 codes for raw thresholds.
+
+    Inputs are mostly whole numbers, so sklearn thresholds often sit
+    1e-7 away from a value devices actually send (6 vs 6.0000001); plain
+    rounding could move the threshold across it. Each code is the nearest
+    one that sends the on-grid value nearest the threshold the way the
+    server does (error <= 2 * step).
+    """
+    exact = (raw - offset) / step
+    best = np.rint(exact)
+    found = np.zeros(len(raw), dtype=bool)
+    for delta in (0, 1, -1, 2, -2):
+        candidate = np.clip(np.rint(exact) + delta, -32767, 32767)
+        ok = ~found & ((on_grid <= offset + candidate * step) == on_grid_left)
+        best = np.where(ok, candidate, best)
+        found |= ok
+    return best
+
+
+def build_edge_bundle(bundle: ModelBundle) -> Dict[str, Any]:
+    """
+    Edge bundle for one loaded model version.
+
+    Raises ValueError if the model can't be expressed in the format
+    (not binary, > 255 features, a tree with 32k+ nodes, no mean/scale).
+    """
+    model, scaler = bundle.model, bundle.scaler
+    n_features = len(bundle.feature_columns)
+    if n_features > 255:
+        raise ValueError("Edge export supports at most 255 features")
+    mean = getattr(scaler, "mean_", None)
+    scale = getattr(scaler, "scale_", None)
+    if mean is None or scale is None:
+        raise ValueError("Edge export needs a StandardScaler-style scaler (mean_/scale_)")
+    mean, scale = np.asarray(mean, dtype=np.float64), np.asarray(scale, dtype=np.float64)
+    positive = _high_risk_column(model)
+
+    divisor = np.array([VALUE_DIVISORS.get(col, 1) for col in bundle.feature_columns], dtype=np.float64)
+
+    lefts, features, thresholds, on_grid, on_grid_left, leaves, roots = [], [], [], [], [], [], []
+    offset = 0
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        order = sibling_order(tree)
+        if len(order) > 32767:
+            raise ValueError(f"Tree with {len(order)} nodes is too large for int16 node indices")
+        position = np.empty_like(order)
+        position[order] = np.arange(len(order))
+        children = np.asarray(tree.children_left)[order]
+        is_leaf = children == -1
+        feature = np.asarray(tree.feature)[order]
+        value = np.asarray(tree.value)[order, 0, :].astype(np.float64)
+        totals = value.sum(axis=1)
+
+        roots.append(offset)
+        lefts.append(np.where(is_leaf, -1, position[np.maximum(children, 0)]))
+        features.append(np.where(is_leaf, 0, feature))
+        # Back to raw feature units (scaler folded in)
+        f = np.maximum(feature, 0)
+        scaled_threshold = np.asarray(tree.threshold)[order]
+        raw = scaled_threshold * scale[f] + mean[f]
+        thresholds.append(np.where(is_leaf, np.nan, raw))
+        # Where the server sends the input value nearest the threshold (it
+        # compares float32 scaled values, so 6 can pass "<= 5.9999999")
+        nearest = np.rint(np.where(is_leaf, 0.0, raw) * divisor[f]) / divisor[f]
+        on_grid.append(nearest)
+        on_grid_left.append(((nearest - mean[f]) / scale[f]).astype(np.float32) <= scaled_threshold)
+        leaves.append(np.where(is_leaf, value[:, positive] / np.where(totals > 0, totals, 1.0), 0.0))
+        offset += len(order)
+
+    left = np.concatenate(lefts)
+    feature = np.concatenate(features)
+    threshold = np.concatenate(thresholds)
+    is_split = left != -1
+
+    # Per-feature int16 grid spanning that feature's thresholds
+    threshold_offset = np.zeros(n_features)
+    threshold_step = np.ones(n_features)
+    for f in range(n_features):
+        values = threshold[is_split & (feature == f)]
+        if len(values) == 0:
+            continue
+        lo, hi = float(values.min()), float(values.max())
+        threshold_offset[f] = (lo + hi) / 2
+        if hi > lo:
+            threshold_step[f] = (hi - lo) / THRESHOLD_LEVELS
+    codes = np.zeros(len(left), dtype=np.int16)
+    codes[is_split] = _quantize(
+        threshold[is_split], np.concatenate(on_grid)[is_split], np.concatenate(on_grid_left)[is_split],
+        threshold_offset[feature[is_split]], threshold_step[feature[is_split]],
+    )
+
+    return {
+        "format": EDGE_FORMAT,
+        "format_version": EDGE_FORMAT_VERSION,
+        "model_version": bundle.version,
+        "model_info": dict(bundle.model_info),
+        "feature_columns": list(bundle.feature_columns),
+        "activity_intensity": dict(ACTIVITY_INTENSITY),
+        "default_activity_intensity": DEFAULT_ACTIVITY_INTENSITY,
+        "risk_level_thresholds": dict(RISK_LEVEL_THRESHOLDS),
+        "n_trees": len(roots),
+        "n_nodes": int(len(left)),
+        "threshold_offset": [float(v) for v in threshold_offset],
+        "threshold_step": [float(v) for v in threshold_step],
+        "leaf_scale": LEAF_SCALE,
+        "arrays": {
+            "roots": _encode(np.array(roots), "<i4"),
+            "left": _encode(left, "<i2"),
+            "feature": _encode(feature, "|u1"),
+            "threshold": _encode(codes, "<i2"),
+            "leaf": _encode(np.rint(np.concatenate(leaves) * LEAF_SCALE), "<u2"),
+        },
+    }
+
+
+def get_edge_bundle_payload(bundle: ModelBundle) -> Tuple[bytes, str]:
+    """
+    (JSON bytes, ETag) for a model version; built once per loaded bundle.
+    """
+    global _cached
+    with _cache_lock:
+        if _cached is not None and _cached[0] is bundle:
+            return _cached[1], _cached[2]
+
+    payload = json.dumps(build_edge_bundle(bundle), separators=(",", ":")).encode("utf-8")
+    etag = f'"{bundle.version}-{hashlib.sha256(payload).hexdigest()[:16]}"'
+    with _cache_lock:
+        _cached = (bundle, payload, etag)
+    logger.info(f"Built edge bundle for model {bundle.version} ({len(payload)} bytes)")
+    return payload, etag
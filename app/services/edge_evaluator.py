@@ -0,0 +1,137 @@
+"""
+Reference evaluator for the edge model bundle.
+
+Standard library only, so it reads like the code a device port needs:
+decode the arrays, engineer the 17 features, walk each tree, average.
+Tests check it against predict_risk(); a mobile implementation can be
+checked against it the same way.
+
+# =============================================================================
+# FILE MAP - QUICK NAVIGATION
+# =============================================================================
+# CLASSES
+#   - EdgeForest....................... Line 49  (Loaded edge bundle)
+#       - engineer_features().......... Line 84  (Raw session -> features)
+#       - risk_score()................. Line 110 (Features -> P(high risk))
+#       - predict_risk()............... Line 122 (Same fields as the server)
+#
+# BUSINESS CONTEXT:
+# - Feature formulas must match ml_prediction.engineer_features(); the
+#   activity mapping and risk cut-offs come from the bundle itself
+# - A split sends x left when x <= offset[f] + q * step[f], in raw
+#   (unscaled) feature units
+# - Quantization moves each threshold by at most 2 * step (never across a
+#   whole-number input) and each leaf by at most 1/131070, so scores
+#   match the server to ~1e-5
+# =============================================================================
+"""
+
+import array
+import base64
+import json
+import sys
+from typing import Any, Dict, List
+
+# NumPy dtype string -> array module typecode
+_TYPECODES = {"<i4": "i", "<i2": "h", "|u1": "B", "<u2": "H"}
+
+
+def _decode(spec: Dict[str, Any]) -> array.array:
+    values = array.array(_TYPECODES[spec["dtype"]])
+    values.frombytes(base64.b64decode(spec["data"]))
+    if sys.byteorder == "big" and values.itemsize > 1:
+        values.byteswap()
+    if len(values) != spec["length"]:
+        raise ValueError(f"Edge bundle array has {len(values)} values, expected {spec['length']}")
+    return values
+
+
+class EdgeForest:
+    """An edge bundle decoded for scoring."""
+
+    SUPPORTED_FORMAT_VERSION = 1
+
+    def __init__(self, bundle: Dict[str, Any]):
+        if bundle.get("format") != "adaptiv-edge-forest":
+            raise ValueError("Not an edge forest bundle")
+        if bundle.get("format_version") != self.SUPPORTED_FORMAT_VERSION:
+            raise ValueError(f"Unsupported edge bundle version {bundle.get('format_version')}")
+
+        self.model_version = bundle["model_version"]
+        self.model_info = bundle.get("model_info", {})
+        self.feature_columns: List[str] = bundle["feature_columns"]
+        self.activity_intensity: Dict[str, int] = bundle["activity_intensity"]
+        self.default_activity_intensity = bundle["default_activity_intensity"]
+        self.moderate_at = bundle["risk_level_thresholds"]["moderate"]
+        self.high_at = bundle["risk_level_thresholds"]["high"]
+
+        arrays = bundle["arrays"]
+        self.roots = list(_decode(arrays["roots"]))
+        self.left = list(_decode(arrays["left"]))
+        self.feature = list(_decode(arrays["feature"]))
+        offsets, steps = bundle["threshold_offset"], bundle["threshold_step"]
+        # Dequantize once: raw threshold per node (unused at leaves)
+        self.threshold = [
+            offsets[f] + q * steps[f] for f, q in zip(self.feature, _decode(arrays["threshold"]))
+        ]
+        leaf_scale = bundle["leaf_scale"]
+        self.leaf = [q / leaf_scale for q in _decode(arrays["leaf"])]
+
+    @classmethod
+    def from_json(cls, text) -> "EdgeForest":
+        return cls(json.loads(text))
+
+    def engineer_features(self, age, baseline_hr, max_safe_hr, avg_heart_rate, peak_heart_rate,
+                          min_heart_rate, avg_spo2, duration_minutes, recovery_time_minutes,
+                          activity_type="walking") -> List[float]:
+        """Feature values in bundle order (same formulas as the server)."""
+        hr_pct_of_max = peak_heart_rate / max_safe_hr if max_safe_hr > 0 else 0
+        values = {
+            "age": age,
+            "baseline_hr": baseline_hr,
+            "max_safe_hr": max_safe_hr,
+            "avg_heart_rate": avg_heart_rate,
+            "peak_heart_rate": peak_heart_rate,
+            "min_heart_rate": min_heart_rate,
+            "avg_spo2": avg_spo2,
+            "duration_minutes": duration_minutes,
+            "recovery_time_minutes": recovery_time_minutes,
+            "hr_pct_of_max": hr_pct_of_max,
+            "hr_elevation": avg_heart_rate - baseline_hr,
+            "hr_range": peak_heart_rate - min_heart_rate,
+            "duration_intensity": duration_minutes * hr_pct_of_max,
+            "recovery_efficiency": recovery_time_minutes / duration_minutes if duration_minutes > 0 else 0,
+            "spo2_deviation": 98 - avg_spo2,
+            "age_risk_factor": age / 70,
+            "activity_intensity": self.activity_intensity.get(activity_type, self.default_activity_intensity),
+        }
+        return [float(values[col]) for col in self.feature_columns]
+
+    def risk_score(self, x: List[float]) -> float:
+        """Mean P(high risk) over the trees for one feature vector."""
+        left, feature, threshold, leaf = self.left, self.feature, self.threshold, self.leaf
+        total = 0.0
+        for root in self.roots:
+            node = root
+            while left[node] != -1:
+                # Children are adjacent: left, then right
+                node = root + left[node] + (x[feature[node]] > threshold[node])
+            total += leaf[node]
+        return total / len(self.roots)
+
+    def predict_risk(self, **session) -> Dict[str, Any]:
+        """risk_score / risk_level / high_risk / confidence for raw session inputs."""
+        score = self.risk_score(self.engineer_features(**session))
+        if score >= self.high_at:
+            level = "high"
+        elif score >= self.moderate_at:
+            level = "moderate"
+        else:
+            level = "low"
+        return {
+            "risk_score": round(score, 4),
+            "risk_level": level,
+            "high_risk": score > 0.5,
+            "confidence": round(max(score, 1 - score), 4),
+            "model_version": self.model_version,
+        }
@@ -7,21 +7,23 @@ that can be stored in a database.
 # =============================================================================
 # FILE MAP - QUICK NAVIGATION
 # =============================================================================
-# IMPORTS.............................. Line 20
+# IMPORTS.............................. Line 30
 #
 # CLASS: EncryptionService
-#   - __init__()...................... Line 30  (Load/validate key)
-#   - encrypt_text()................... Line 50  (Encrypt string)
-#   - decrypt_text()................... Line 60  (Decrypt string)
-#   - encrypt_json()................... Line 73  (Encrypt dict as JSON)
-#   - decrypt_json()................... Line 80  (Decrypt JSON to dict)
+#   - __init__()...................... Line 44  (Load/validate key)
+#   - encrypt_text()................... Line 65  (Encrypt string)
+#   - decrypt_text()................... Line 75  (Decrypt string)
+#   - encrypt_json()................... Line 88  (Encrypt dict as JSON)
+#   - decrypt_json()................... Line 95  (Decrypt JSON to dict)
 #
-# SINGLETON: encryption_service........ Line 95  (Module-level instance)
+# SINGLETON: get_encryption_service().. Line 105 (Created on first use)
 #
 # BUSINESS CONTEXT:
 # - AES-256-GCM encryption for PHI (HIPAA compliant)
 # - Key from PHI_ENCRYPTION_KEY env var
 # - Used for medical_history_encrypted field
+# - Created on first use, so a missing key only fails the calls that
+#   need it, not app start-up
 # =============================================================================
 """
 
@@ -30,8 +32,6 @@ import json
 import os
 from typing import Any, Dict, Optional
 
-from cryptography.hazmat.primitives.ciphers.aead import AESGCM
-
 from app.config import settings
 
 
@@ -59,6 +59,7 @@ class EncryptionService:
             )
 
         # Create the encryption tool with the key.
+        from cryptography.hazmat.primitives.ciphers.aead import AESGCM
         self._aesgcm = AESGCM(key)
 
     def encrypt_text(self, plaintext: Optional[str]) -> Optional[str]:
@@ -121,5 +122,9 @@ def decrypt_phi_json(value: Optional[str]) -> Optional[Dict[str, Any]]:
     return get_encryption_service().decrypt_json(value)
 
 
-# Export an instance for convenience
-encryption_service = get_encryption_service()
+def __getattr__(name: str):
+    # `from app.services.encryption import encryption_service` still works,
+    # but the key is only read on first use, not when the app is imported
+    if name == "encryption_service":
+        return get_encryption_service()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
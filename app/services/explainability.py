@@ -1,28 +1,30 @@
 """
 Explainability service.
 
-Provides SHAP-like feature importance explanations for ML predictions.
-Uses tree-based feature importance from the Random Forest model
-and per-prediction contribution analysis.
+Provides feature importance explanations for ML predictions.
+Uses exact TreeSHAP contributions when they are supplied (see
+ml_prediction.explain_features), otherwise falls back to global
+Random Forest importance weighted by deviation from typical values.
 
 # =============================================================================
 # FILE MAP - QUICK NAVIGATION
 # =============================================================================
 # FUNCTIONS
-#   - compute_feature_importance()..... Line 30  (Per-prediction importance)
-#   - explain_prediction()............. Line 90  (Full explanation builder)
-#   - _estimate_contributions()........ Line 130 (Contribution calculation)
-#   - _normalize_contributions()....... Line 160 (Scale to sum=1.0)
+#   - compute_feature_importance()..... Line 32  (Per-prediction importance)
+#   - explain_prediction()............. Line 91  (Full explanation builder)
+#   - _estimate_contributions()........ Line 175 (Fallback: deviation x importance)
+#   - _shap_contributions()............ Line 214 (Exact TreeSHAP values)
 #
 # BUSINESS CONTEXT:
-# - SHAP-like explanations for transparency
+# - SHAP explanations for transparency
 # - "Why this risk?" feature for mobile app
-# - Uses Random Forest built-in importance
+# - Global importances are cached at model load; pass them in rather
+#   than the model so they aren't recomputed per request
 # =============================================================================
 """
 
 import logging
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 
 logger = logging.getLogger(__name__)
 
@@ -31,18 +33,29 @@ def compute_feature_importance(
     features_used: Dict[str, float],
     feature_columns: List[str],
     model=None,
+    global_importances: Optional[Dict[str, float]] = None,
+    shap_values: Optional[Dict[str, Any]] = None,
 ) -> Dict[str, Any]:
     """
     Compute feature importance for a single prediction.
+
+    shap_values is the output of ml_prediction.explain_features(); when
+    given, contributions are exact SHAP values in risk-score units.
     """
-    global_importances: Dict[str, float] = {}
-    if model is not None and hasattr(model, "feature_importances_"):
-        importances = model.feature_importances_
-        for i, col in enumerate(feature_columns):
-            if i < len(importances):
-                global_importances[col] = round(float(importances[i]), 4)
+    if global_importances is None:
+        global_importances = {}
+        if model is not None and hasattr(model, "feature_importances_"):
+            importances = model.feature_importances_
+            for i, col in enumerate(feature_columns):
+                if i < len(importances):
+                    global_importances[col] = round(float(importances[i]), 4)
 
-    contributions = _estimate_contributions(features_used, feature_columns, global_importances)
+    if shap_values is not None:
+        contributions = _shap_contributions(features_used, feature_columns, shap_values["contributions"])
+        method = "tree_shap_path_dependent"
+    else:
+        contributions = _estimate_contributions(features_used, feature_columns, global_importances)
+        method = "tree_importance_with_deviation_analysis"
 
     sorted_contributions = sorted(
         contributions.items(),
@@ -56,25 +69,31 @@ def compute_feature_importance(
             {
                 "feature": feat_name,
                 "value": info["value"],
-                "contribution": info["contribution"],
+                "contribution": round(info["contribution"], 4),
                 "direction": info["direction"],
                 "explanation": info["explanation"],
                 "global_importance": global_importances.get(feat_name, 0.0),
             }
         )
 
-    return {
+    result = {
         "top_features": top_features,
         "global_importances": global_importances,
         "feature_count": len(feature_columns),
-        "method": "tree_importance_with_deviation_analysis",
+        "method": method,
     }
+    if shap_values is not None:
+        result["base_value"] = round(shap_values["base_value"], 4)
+        result["shap_values"] = {col: round(info["contribution"], 4) for col, info in contributions.items()}
+    return result
 
 
 def explain_prediction(
     prediction_result: Dict[str, Any],
     feature_columns: List[str],
     model=None,
+    global_importances: Optional[Dict[str, float]] = None,
+    shap_values: Optional[Dict[str, Any]] = None,
 ) -> Dict[str, Any]:
     """
     Generate a full explanation for a prediction result.
@@ -83,7 +102,11 @@ def explain_prediction(
     risk_score = prediction_result.get("risk_score", 0.0)
     risk_level = prediction_result.get("risk_level", "unknown")
 
-    importance = compute_feature_importance(features_used, feature_columns, model)
+    importance = compute_feature_importance(
+        features_used, feature_columns, model,
+        global_importances=global_importances,
+        shap_values=shap_values,
+    )
 
     explanation_parts = []
     for feat in importance["top_features"][:3]:
@@ -188,6 +211,42 @@ def _estimate_contributions(
     return contributions
 
 
+def _shap_contributions(
+    features: Dict[str, float],
+    feature_columns: List[str],
+    shap_contributions: Dict[str, float],
+) -> Dict[str, Dict[str, Any]]:
+    """Wrap exact SHAP values in the same shape as _estimate_contributions."""
+    contributions: Dict[str, Dict[str, Any]] = {}
+
+    for col in feature_columns:
+        value = features.get(col, 0.0)
+        contribution = float(shap_contributions.get(col, 0.0))
+
+        if contribution > 1e-6:
+            direction = "increasing"
+        elif contribution < -1e-6:
+            direction = "decreasing"
+        else:
+            direction = "neutral"
+
+        name = _feature_to_readable(col)
+        if direction == "neutral":
+            explanation = f"{name} had little effect on this score."
+        else:
+            verb = "raised" if direction == "increasing" else "lowered"
+            explanation = f"{name} {verb} the risk score by {abs(contribution):.2f}."
+
+        contributions[col] = {
+            "value": round(float(value), 4) if isinstance(value, float) else value,
+            "contribution": contribution,
+            "direction": direction,
+            "explanation": explanation,
+        }
+
+    return contributions
+
+
 def _generate_feature_explanation(feature: str, value: float, typical: float, direction: str) -> str:
     name = _feature_to_readable(feature)
     if direction == "increasing":
@@ -0,0 +1,287 @@
+"""
+Flat, memory-mapped random forest.
+
+Stores every tree of a fitted RandomForestClassifier as a handful of
+concatenated .npy arrays and scores from them with NumPy. Loaded with
+mmap_mode="r", the arrays live in the OS page cache, so N workers share
+one physical copy instead of each unpickling its own.
+
+# =============================================================================
+# FILE MAP - QUICK NAVIGATION
+# =============================================================================
+# CONSTANTS............................ Line 52
+#
+# FUNCTIONS
+#   - has_flat_artifacts()............. Line 73  (Flat export present/fresh?)
+#   - export_flat().................... Line 90  (Fitted forest -> .npy files)
+#   - export_scaler().................. Line 168 (StandardScaler -> JSON)
+#
+# CLASSES
+#   - FlatForest....................... Line 191 (Drop-in for predict/proba)
+#   - FlatScaler....................... Line 269 (Drop-in for transform)
+#
+# BUSINESS CONTEXT:
+# - sklearn's Tree copies its node arrays into private memory on unpickle,
+#   so joblib.load(mmap_mode="r") can't share a forest; these flat arrays
+#   can
+# - All trees share one node index space, stored breadth-first so a
+#   node's right child is left + 1; leaves point at themselves with an
+#   +inf threshold. Scoring is max_depth rounds of
+#   node = left[node] + (x > threshold[node]) over (n_rows, n_trees)
+# - Scores match sklearn exactly: inputs go through float32 like
+#   sklearn's, and per-tree class fractions are averaged over trees
+# - estimators_[i].tree_ views let TreeExplainer build from a FlatForest
+# - The scaler's mean/scale go to flat/scaler.json, so serving never
+#   has to import sklearn (about a second of worker start-up)
+# =============================================================================
+"""
+
+import json
+import logging
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Dict, List
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Sub-directory of a model version holding the flat arrays
+FLAT_DIRNAME = "flat"
+
+# Array files; all node arrays are indexed by global node id
+FLAT_ARRAYS = (
+    "left",          # int64: left child; right child is left + 1 (leaf: itself)
+    "feature",       # int64: split feature (leaf: 0)
+    "threshold",     # float64: go left if x <= threshold (leaf: +inf)
+    "value",         # float64 (n_classes, n_nodes): class fractions
+    "cover",         # float64: weighted training samples at the node
+    "roots",         # int64 (n_trees,): node id of each tree's root
+    "importances",   # float64 (n_features,): feature_importances_
+)
+
+# Scaler export (mean_/scale_ of a fitted StandardScaler)
+SCALER_FILE = "scaler.json"
+
+# Forest settings kept so retraining can reuse them
+KEPT_PARAMS = ("n_estimators", "max_depth", "max_features", "min_samples_leaf", "class_weight", "random_state")
+
+
+def has_flat_artifacts(directory: Path, source_file: Path, name: str = "meta.json") -> bool:
+    """True when directory/flat/<name> exists and is newer than the pickle it came from."""
+    exported = directory / FLAT_DIRNAME / name
+    if not exported.exists():
+        return False
+    return not source_file.exists() or exported.stat().st_mtime >= source_file.stat().st_mtime
+
+
+def sibling_order(tree) -> np.ndarray:
+    """Breadth-first node order, so every node's two children are adjacent."""
+    order = [0]
+    for node in order:
+        if tree.children_left[node] != -1:
+            order.extend((tree.children_left[node], tree.children_right[node]))
+    return np.asarray(order, dtype=np.int64)
+
+
+def export_flat(model, directory: Path) -> Path:
+    """
+    Write a fitted RandomForestClassifier to directory/flat/.
+
+    Written to a temporary directory and renamed, so a reader never sees
+    a partial export (a concurrent exporter just loses the rename). An
+    older export is moved aside before it is deleted, so workers already
+    reading it keep their open files and mappings.
+    """
+    trees = [est.tree_ for est in model.estimators_]
+    orders = [sibling_order(tree) for tree in trees]
+    sizes = np.array([tree.node_count for tree in trees])
+    offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+
+    left, feature, threshold, values, cover = [], [], [], [], []
+    for tree, order, offset in zip(trees, orders, offsets):
+        # order[new_id] = sklearn node id; position[sklearn id] = new id
+        position = np.empty_like(order)
+        position[order] = np.arange(len(order))
+        is_leaf = tree.children_left[order] == -1
+        new_ids = np.arange(len(order))
+        left.append(np.where(is_leaf, new_ids, position[np.maximum(tree.children_left[order], 0)]) + offset)
+        feature.append(np.where(is_leaf, 0, tree.feature[order]))
+        # Leaves compare against +inf, so "go left" keeps a row on its leaf
+        threshold.append(np.where(is_leaf, np.inf, tree.threshold[order]))
+        values.append(tree.value[order, 0, :])
+        cover.append(tree.weighted_n_node_samples[order])
+
+    values = np.concatenate(values).astype(np.float64)
+    totals = values.sum(axis=1, keepdims=True)
+    arrays = {
+        # Index arrays are stored as intp so NumPy can gather with them
+        # straight from the mapping, without a converted private copy
+        "left": np.concatenate(left).astype(np.intp),
+        "feature": np.concatenate(feature).astype(np.intp),
+        "threshold": np.concatenate(threshold).astype(np.float64),
+        "value": np.divide(values, totals, out=np.zeros_like(values), where=totals > 0).T,
+        "cover": np.concatenate(cover).astype(np.float64),
+        "roots": offsets.astype(np.intp),
+        "importances": np.asarray(model.feature_importances_, dtype=np.float64),
+    }
+    params = model.get_params()
+    meta = {
+        "n_trees": len(trees),
+        "n_nodes": int(sizes.sum()),
+        "max_depth": int(max(tree.max_depth for tree in trees)),
+        "n_features": int(model.n_features_in_),
+        "classes": [c.item() if hasattr(c, "item") else c for c in model.classes_],
+        "params": {key: params[key] for key in KEPT_PARAMS if key in params},
+    }
+
+    target = directory / FLAT_DIRNAME
+    staging = Path(tempfile.mkdtemp(dir=directory, prefix=f".{FLAT_DIRNAME}-"))
+    retired = None
+    try:
+        for name, array in arrays.items():
+            np.save(staging / f"{name}.npy", np.ascontiguousarray(array))
+        # meta.json last: its presence marks a complete export
+        with open(staging / "meta.json", "w") as f:
+            json.dump(meta, f)
+        if target.exists():
+            if (target / SCALER_FILE).exists():
+                shutil.copy2(target / SCALER_FILE, staging / SCALER_FILE)
+            retired = Path(tempfile.mkdtemp(dir=directory, prefix=f".{FLAT_DIRNAME}-old-"))
+            os.rename(target, retired / FLAT_DIRNAME)
+        os.rename(staging, target)
+    except OSError:
+        # Another process finished its export first; theirs is identical
+        shutil.rmtree(staging, ignore_errors=True)
+        if not (target / "meta.json").exists():
+            raise
+    finally:
+        if retired is not None:
+            shutil.rmtree(retired, ignore_errors=True)
+    logger.info(f"Exported flat forest to {target} ({meta['n_trees']} trees, {meta['n_nodes']} nodes)")
+    return target
+
+
+def export_scaler(scaler, directory: Path) -> Path:
+    """
+    Write a fitted StandardScaler's mean_/scale_ to directory/flat/scaler.json.
+
+    JSON keeps float64 values exactly; replaced atomically.
+    """
+    n_features = int(scaler.n_features_in_)
+    mean = scaler.mean_ if getattr(scaler, "with_mean", True) and scaler.mean_ is not None else np.zeros(n_features)
+    scale = scaler.scale_ if getattr(scaler, "with_std", True) and scaler.scale_ is not None else np.ones(n_features)
+    target = directory / FLAT_DIRNAME
+    target.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=target, prefix=".scaler-", suffix=".json")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump({"mean": [float(v) for v in mean], "scale": [float(v) for v in scale]}, f)
+        os.replace(tmp_path, target / SCALER_FILE)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    return target / SCALER_FILE
+
+
+class FlatForest:
+    """
+    Read-only forest over flat node arrays.
+
+    Provides what the app uses of RandomForestClassifier: predict,
+    predict_proba, classes_, n_features_in_, feature_importances_,
+    get_params and estimators_[i].tree_.
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray], meta: Dict[str, Any]):
+        self._arrays = arrays
+        self.left = arrays["left"]
+        self.feature, self.threshold = arrays["feature"], arrays["threshold"]
+        self.value, self.cover, self.roots = arrays["value"], arrays["cover"], arrays["roots"]
+        self.feature_importances_ = arrays["importances"]
+        self.classes_ = np.asarray(meta["classes"])
+        self.n_features_in_ = meta["n_features"]
+        self.n_estimators = meta["n_trees"]
+        self.max_depth = meta["max_depth"]
+        self._params = dict(meta.get("params") or {})
+        self._estimators = None
+
+    @classmethod
+    def load(cls, directory: Path, mmap: bool = True) -> "FlatForest":
+        """Open directory/flat/; arrays are memory-mapped unless mmap=False."""
+        flat = directory / FLAT_DIRNAME
+        with open(flat / "meta.json", "r") as f:
+            meta = json.load(f)
+        arrays = {
+            name: np.load(flat / f"{name}.npy", mmap_mode="r" if mmap else None)
+            for name in FLAT_ARRAYS
+        }
+        return cls(arrays, meta)
+
+    def get_params(self, deep: bool = True) -> Dict[str, Any]:
+        return dict(self._params)
+
+    def leaves(self, X) -> np.ndarray:
+        """(n_rows, n_trees) global leaf id reached by each row in each tree."""
+        # Same rounding as sklearn: float32 input compared to float64 threshold
+        X = np.asarray(X, dtype=np.float32).astype(np.float64)
+        flat_x = X.ravel()
+        row_start = (np.arange(len(X)) * X.shape[1])[:, None]
+        node = np.broadcast_to(self.roots, (len(X), self.n_estimators))
+        for _ in range(self.max_depth):
+            go_right = flat_x[row_start + self.feature[node]] > self.threshold[node]
+            node = self.left[node] + go_right
+        return node
+
+    def predict_proba(self, X) -> np.ndarray:
+        node = self.leaves(X)
+        return np.column_stack([column[node].mean(axis=1) for column in self.value])
+
+    def predict(self, X) -> np.ndarray:
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+    @property
+    def estimators_(self) -> List[SimpleNamespace]:
+        """Per-tree views with the sklearn tree_ attributes TreeExplainer reads."""
+        if self._estimators is None:
+            ends = list(self.roots[1:]) + [len(self.left)]
+            estimators = []
+            for start, end in zip(self.roots, ends):
+                ids = np.arange(start, end)
+                left = np.asarray(self.left[start:end])
+                is_leaf = left == ids
+                estimators.append(SimpleNamespace(tree_=SimpleNamespace(
+                    children_left=np.where(is_leaf, -1, left - start),
+                    children_right=np.where(is_leaf, -1, left + 1 - start),
+                    feature=np.where(is_leaf, -2, np.asarray(self.feature[start:end])),
+                    threshold=np.asarray(self.threshold[start:end]),
+                    value=np.asarray(self.value[:, start:end]).T[:, None, :],
+                    weighted_n_node_samples=np.asarray(self.cover[start:end]),
+                )))
+            self._estimators = estimators
+        return self._estimators
+
+
+class FlatScaler:
+    """StandardScaler.transform() from exported mean/scale; same float64 arithmetic."""
+
+    def __init__(self, mean, scale):
+        self.mean_ = np.asarray(mean, dtype=np.float64)
+        self.scale_ = np.asarray(scale, dtype=np.float64)
+        self.n_features_in_ = len(self.mean_)
+
+    @classmethod
+    def load(cls, directory: Path) -> "FlatScaler":
+        with open(directory / FLAT_DIRNAME / SCALER_FILE, "r") as f:
+            data = json.load(f)
+        return cls(data["mean"], data["scale"])
+
+    def transform(self, X) -> np.ndarray:
+        X = np.array(X, dtype=np.float64)
+        X -= self.mean_
+        X /= self.scale_
+        return X
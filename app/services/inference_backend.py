@@ -0,0 +1,258 @@
+"""
+Pluggable inference backends for the risk model.
+
+A backend turns raw (unscaled) feature rows into class probabilities.
+Every ModelBundle carries one; predict_risk() and the batch/sweep paths
+score through it, while TreeSHAP keeps using the trees themselves.
+
+# =============================================================================
+# FILE MAP - QUICK NAVIGATION
+# =============================================================================
+# CONSTANTS............................ Line 50
+#
+# CLASSES
+#   - InferenceBackend................. Line 62  (Default: scaler + forest)
+#   - OnnxInferenceBackend............. Line 84  (onnxruntime session)
+#
+# FUNCTIONS
+#   - build_onnx_model()............... Line 112 (Scaler + forest -> graph)
+#   - export_onnx().................... Line 210 (Write risk_model.onnx)
+#   - create_backend()................. Line 231 (INFERENCE_BACKEND factory)
+#
+# BUSINESS CONTEXT:
+# - INFERENCE_BACKEND=sklearn (default) scores with the bundle's model
+#   and scaler as loaded: flat arrays, or the sklearn pickle when
+#   MODEL_FLAT_ARTIFACTS is off
+# - INFERENCE_BACKEND=onnx runs scaler + forest as one ONNX graph on
+#   onnxruntime (CPU). Optional: pip install onnx onnxruntime. If they
+#   are missing or the export fails, the default backend is used
+# - The graph scales in float64 like StandardScaler, rounds to float32
+#   like sklearn's trees, then compares against the float64 thresholds
+#   and sums float64 leaf values, so scores match sklearn exactly
+# - risk_model.onnx is written next to risk_model.pkl on first use and
+#   rebuilt when the pickle is newer
+# =============================================================================
+"""
+
+import logging
+import os
+import tempfile
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Graph file kept in each model version directory
+ONNX_FILE = "risk_model.onnx"
+ONNX_INPUT = "features"
+ONNX_OUTPUT = "probabilities"
+
+# Opsets the graph is written for (ai.onnx.ml 5 = TreeEnsemble with
+# float64 thresholds and leaf weights; onnxruntime 1.20+)
+ONNX_OPSET = 17
+ONNX_ML_OPSET = 5
+# Pinned so older onnxruntime releases can load graphs from newer onnx
+ONNX_IR_VERSION = 8
+
+
+class InferenceBackend:
+    """Default backend: scaler.transform then model.predict_proba."""
+
+    backend = "sklearn"
+
+    def __init__(self, model, scaler):
+        self.model = model
+        self.scaler = scaler
+        self.classes_ = np.asarray(model.classes_)
+
+    def predict_proba(self, X) -> np.ndarray:
+        """(n, n_classes) probabilities for raw feature rows."""
+        return self.model.predict_proba(self.scaler.transform(X))
+
+    def describe(self) -> dict:
+        return {
+            "backend": self.backend,
+            "model_class": type(self.model).__name__,
+            "scaler_class": type(self.scaler).__name__,
+        }
+
+
+class OnnxInferenceBackend(InferenceBackend):
+    """Scaler + forest as one ONNX graph run by onnxruntime on CPU."""
+
+    backend = "onnx"
+
+    def __init__(self, model_bytes: bytes, classes, threads: int = 1):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        # Workers are the parallelism; one thread each avoids oversubscription
+        options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(model_bytes, options, providers=["CPUExecutionProvider"])
+        self.classes_ = np.asarray(classes)
+        self.threads = threads
+
+    def predict_proba(self, X) -> np.ndarray:
+        X = np.ascontiguousarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        return self.session.run([ONNX_OUTPUT], {ONNX_INPUT: X})[0]
+
+    def describe(self) -> dict:
+        import onnxruntime as ort
+
+        return {"backend": self.backend, "onnxruntime": ort.__version__, "threads": self.threads}
+
+
+def build_onnx_model(model, scaler):
+    """
+    ONNX ModelProto computing predict_proba(scaler.transform(X)) for a
+    binary forest.
+
+    Works from estimators_[i].tree_ arrays, so a FlatForest exports the
+    same graph as the sklearn forest it came from. Raises ValueError for
+    non-binary models or scalers without mean_/scale_.
+    """
+    import onnx
+    from onnx import TensorProto, helper, numpy_helper
+
+    mean = getattr(scaler, "mean_", None)
+    scale = getattr(scaler, "scale_", None)
+    if mean is None or scale is None:
+        raise ValueError("ONNX export needs a StandardScaler-style scaler (mean_/scale_)")
+    classes = [int(c) for c in model.classes_]
+    if len(classes) != 2:
+        raise ValueError(f"ONNX export supports binary models only (classes: {classes})")
+    positive = classes.index(1) if 1 in classes else 1
+    estimators = model.estimators_
+
+    # TreeEnsemble lists interior nodes and leaves separately; children
+    # point at one or the other (nodes_trueleafs / nodes_falseleafs)
+    features, splits, roots = [], [], []
+    true_ids, true_leafs, false_ids, false_leafs = [], [], [], []
+    leaf_weights = []
+    for estimator in estimators:
+        tree = estimator.tree_
+        left = np.asarray(tree.children_left)
+        right = np.asarray(tree.children_right)
+        is_leaf = left == -1
+        value = np.asarray(tree.value)[:, 0, :].astype(np.float64)
+        totals = value.sum(axis=1)
+        high = np.divide(value[:, positive], totals, out=np.zeros_like(totals), where=totals > 0)
+
+        interior = np.flatnonzero(~is_leaf)
+        leaves = np.flatnonzero(is_leaf)
+        index = np.empty(len(left), dtype=np.int64)
+        index[interior] = len(features) + np.arange(len(interior))
+        index[leaves] = len(leaf_weights) + np.arange(len(leaves))
+
+        if is_leaf[0]:
+            raise ValueError("ONNX export needs trees with at least one split")
+        roots.append(int(index[0]))
+        features.extend(np.asarray(tree.feature)[interior].tolist())
+        splits.extend(np.asarray(tree.threshold, dtype=np.float64)[interior].tolist())
+        true_ids.extend(index[left[interior]].tolist())
+        true_leafs.extend(is_leaf[left[interior]].astype(int).tolist())
+        false_ids.extend(index[right[interior]].tolist())
+        false_leafs.extend(is_leaf[right[interior]].astype(int).tolist())
+        leaf_weights.extend(high[leaves].tolist())
+
+    nodes = [
+        helper.make_node("Sub", [ONNX_INPUT, "mean"], ["centered"]),
+        helper.make_node("Div", ["centered", "scale"], ["scaled"]),
+        # sklearn trees compare float32 inputs against float64 thresholds
+        helper.make_node("Cast", ["scaled"], ["scaled32"], to=TensorProto.FLOAT),
+        helper.make_node("Cast", ["scaled32"], ["tree_input"], to=TensorProto.DOUBLE),
+        helper.make_node(
+            "TreeEnsemble", ["tree_input"], ["high_sum"], domain="ai.onnx.ml",
+            nodes_featureids=features,
+            nodes_splits=numpy_helper.from_array(np.asarray(splits, dtype=np.float64)),
+            nodes_modes=numpy_helper.from_array(np.zeros(len(features), dtype=np.uint8)),  # BRANCH_LEQ
+            nodes_truenodeids=true_ids, nodes_trueleafs=true_leafs,
+            nodes_falsenodeids=false_ids, nodes_falseleafs=false_leafs,
+            tree_roots=roots,
+            leaf_targetids=[0] * len(leaf_weights),
+            leaf_weights=numpy_helper.from_array(np.asarray(leaf_weights, dtype=np.float64)),
+            n_targets=1, aggregate_function=1, post_transform=0,  # SUM, NONE
+        ),
+        # Mean over trees, as sklearn: sum of fractions / n_trees
+        helper.make_node("Div", ["high_sum", "n_trees"], ["high"]),
+        helper.make_node("Sub", ["one", "high"], ["low"]),
+        helper.make_node("Concat", ["low", "high"] if positive == 1 else ["high", "low"], [ONNX_OUTPUT], axis=1),
+    ]
+    graph = helper.make_graph(
+        nodes,
+        "adaptiv_risk_model",
+        [helper.make_tensor_value_info(ONNX_INPUT, TensorProto.DOUBLE, [None, len(mean)])],
+        [helper.make_tensor_value_info(ONNX_OUTPUT, TensorProto.DOUBLE, [None, 2])],
+        initializer=[
+            numpy_helper.from_array(np.asarray(mean, dtype=np.float64), "mean"),
+            numpy_helper.from_array(np.asarray(scale, dtype=np.float64), "scale"),
+            numpy_helper.from_array(np.array(len(estimators), dtype=np.float64), "n_trees"),
+            numpy_helper.from_array(np.array(1.0, dtype=np.float64), "one"),
+        ],
+    )
+    onnx_model = helper.make_model(
+        graph,
+        opset_imports=[helper.make_opsetid("", ONNX_OPSET), helper.make_opsetid("ai.onnx.ml", ONNX_ML_OPSET)],
+        producer_name="adaptiv-health",
+        ir_version=ONNX_IR_VERSION,
+    )
+    onnx.checker.check_model(onnx_model)
+    return onnx_model
+
+
+def export_onnx(model, scaler, directory: Path) -> bytes:
+    """
+    Serialized graph for a model version; also saved as directory/risk_model.onnx
+    (atomically) when the directory is writable.
+    """
+    data = build_onnx_model(model, scaler).SerializeToString()
+    try:
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".onnx-", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, directory / ONNX_FILE)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+    except OSError as e:
+        logger.warning(f"Cannot write {ONNX_FILE} in {directory} ({e}); using it from memory")
+    return data
+
+
+def create_backend(directory: Optional[Path], model, scaler, name: Optional[str] = None) -> InferenceBackend:
+    """
+    Backend named by INFERENCE_BACKEND (or `name`) for a loaded model.
+
+    Falls back to the default backend, with an error logged, when the
+    ONNX backend can't be built.
+    """
+    name = (name or settings.inference_backend).lower()
+    if name == InferenceBackend.backend:
+        return InferenceBackend(model, scaler)
+    if name != OnnxInferenceBackend.backend:
+        logger.error(f"Unknown INFERENCE_BACKEND '{name}'; using {InferenceBackend.backend}")
+        return InferenceBackend(model, scaler)
+
+    try:
+        onnx_file = directory / ONNX_FILE if directory is not None else None
+        source = directory / "risk_model.pkl" if directory is not None else None
+        if (onnx_file is not None and onnx_file.exists()
+                and (not source.exists() or onnx_file.stat().st_mtime >= source.stat().st_mtime)):
+            data = onnx_file.read_bytes()
+        elif directory is not None:
+            data = export_onnx(model, scaler, directory)
+        else:
+            data = build_onnx_model(model, scaler).SerializeToString()
+        return OnnxInferenceBackend(data, model.classes_, threads=settings.onnx_threads)
+    except Exception as e:
+        logger.error(f"ONNX backend unavailable ({e}); using {InferenceBackend.backend}")
+        return InferenceBackend(model, scaler)
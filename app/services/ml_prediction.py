@@ -6,31 +6,49 @@ This loads the trained model and returns a risk score.
 # =============================================================================
 # FILE MAP - QUICK NAVIGATION
 # =============================================================================
-# IMPORTS/CONSTANTS.................... Line 25
-# MODEL STATE (globals)................ Line 35
+# IMPORTS/CONSTANTS.................... Line 46
+# MODEL STATE (globals)................ Line 70
 #
 # FUNCTIONS
-#   - load_ml_model().................. Line 42  (Load model files on startup)
-#   - is_model_loaded()................ Line 82  (Check model state)
-#   - engineer_features().............. Line 88  (Calculate derived features)
-#   - predict_risk()................... Line 145 (Core prediction function)
+#   - ModelBundle...................... Line 84  (One loaded model version)
+#   - _load_forest()................... Line 154 (Flat mmap or pickle)
+#   - _load_scaler()................... Line 184 (Flat mean/scale or pickle)
+#   - activate_bundle()................ Line 208 (Atomic hot-swap)
+#   - load_ml_model().................. Line 231 (Load model files on startup)
+#   - is_model_loaded()................ Line 261 (Check model state)
+#   - engineer_features().............. Line 266 (Calculate derived features)
+#   - engineer_feature_arrays()........ Line 317 (Vectorized feature matrix)
+#   - predict_proba_matrix()........... Line 384 (One model call for n rows)
+#   - classify_risk().................. Line 390 (Score -> level + advice)
+#   - predict_risk()................... Line 402 (Core prediction function)
+#   - explain_features()............... Line 473 (TreeSHAP attributions)
+#   - build_feature_matrix()........... Line 504 (Feature dicts -> array)
+#   - explain_features_batch()......... Line 514 (Batch score + TreeSHAP)
 #
 # CLASS
-#   - MLPredictionService.............. Line 218 (Wrapper for DI)
-#   - get_ml_service()................. Line 229 (Singleton factory)
+#   - MLPredictionService.............. Line 555 (Wrapper for DI)
+#   - get_ml_service()................. Line 578 (Singleton factory)
 #
 # BUSINESS CONTEXT:
 # - Random Forest model predicts cardiac risk 0.0-1.0
 # - Uses 17 engineered features (HR ratios, reserves, zones)
 # - Loaded once at startup, shared across all requests
+# - Feature importances and TreeSHAP arrays are built once per version
+# - New versions are promoted by swapping the whole ModelBundle
+#   (see services/model_registry.py); no restart needed
+# - predict_risk()/explain_features() answer repeated inputs from an LRU
+#   (services/prediction_cache.py), emptied on every swap
+# - Scoring goes through bundle.backend (INFERENCE_BACKEND: sklearn or
+#   onnx, see services/inference_backend.py); TreeSHAP uses the trees
 # =============================================================================
 """
 
 import json
 import logging
 from pathlib import Path
-from typing import Optional, Dict, Any
-import joblib
+from typing import Optional, Dict, Any, List, Tuple
+
+from app.services.prediction_cache import prediction_cache
 
 # Logger setup
 logger = logging.getLogger(__name__)
@@ -42,43 +60,189 @@ MODEL_PATH = BASE_DIR / "ml_models" / "risk_model.pkl"
 SCALER_PATH = BASE_DIR / "ml_models" / "scaler.pkl"
 FEATURES_PATH = BASE_DIR / "ml_models" / "feature_columns.json"
 
+# ---- Activity type encoding (same mapping as train_model.py) ----
+ACTIVITY_INTENSITY = {
+    'walking': 1, 'yoga': 1,
+    'jogging': 2, 'cycling': 2,
+    'swimming': 3
+}
+
 # ---- Global ML model state ----
-# Loaded once on app startup, reused for all requests
+# The active ModelBundle is replaced as one reference (see activate_bundle),
+# so a request that took a bundle keeps a consistent model/scaler/columns
+# set even if a new version is promoted mid-request
+_active_bundle: Optional["ModelBundle"] = None
+
+# Mirrors of the active bundle for older callers; prefer get_active_bundle()
 model = None
 scaler = None
 feature_columns = None
+feature_importances: Optional[Dict[str, float]] = None  # global RF importances
+tree_explainer = None  # TreeSHAP path arrays
 
 
-def load_ml_model() -> bool:
+class ModelBundle:
     """
-    Load the model files from disk on app startup.
-    
-    Uses absolute paths to avoid working directory issues.
-    Loads once and stores in module-level globals.
+    One model version: model, scaler, feature order and derived data.
 
-    Returns:
-        True if successful, False on any file/parsing error
+    Never mutated after construction; promoting a version swaps the whole
+    bundle.
     """
-    global model, scaler, feature_columns
-    
-    try:
-        # Load pre-trained Random Forest model using joblib (more efficient than pickle)
-        model = joblib.load(MODEL_PATH)
-        logger.info(f"Loaded model from {MODEL_PATH}")
+
+    def __init__(self, version: str, model, scaler, feature_columns: List[str],
+                 metadata: Optional[Dict[str, Any]] = None, backend=None):
+        self.version = version
+        self.model = model
+        self.scaler = scaler
+        # Scores raw feature rows (scaler + model); see inference_backend.py
+        if backend is None:
+            from app.services.inference_backend import InferenceBackend
+            backend = InferenceBackend(model, scaler)
+        self.backend = backend
+        self.feature_columns = list(feature_columns)
+        self.metadata = dict(metadata or {})
+
+        accuracy = self.metadata.get("accuracy")
+        self.model_info = {
+            "name": self.metadata.get("model_name", "RandomForest"),
+            "version": version,
+            "accuracy": f"{accuracy * 100:.1f}%" if isinstance(accuracy, (int, float)) else (accuracy or "unknown"),
+        }
+
+        # Cache explainability data with the model
+        # WHY: feature_importances_ re-aggregates all 100 trees on every access
+        self.feature_importances = {
+            col: round(float(imp), 4)
+            for col, imp in zip(self.feature_columns, getattr(model, "feature_importances_", []))
+        }
+        try:
+            from app.services.tree_shap import TreeExplainer
+            self.tree_explainer = TreeExplainer(model)
+        except Exception as e:
+            # Explanations fall back to importance-based estimates
+            self.tree_explainer = None
+            logger.error(f"TreeSHAP setup failed for model {version}: {e}")
+
+    @classmethod
+    def load(cls, directory: Path, version: str, metadata: Optional[Dict[str, Any]] = None) -> "ModelBundle":
+        """Load risk_model.pkl, scaler.pkl and feature_columns.json from a directory."""
+        model = _load_forest(directory)
 
         # Load feature scaler (StandardScaler or similar)
         # WHY: Tree models don't need scaling, but other models might
-        # Loaded for future compatibility if model architecture changes
-        scaler = joblib.load(SCALER_PATH)
-        logger.info(f"Loaded scaler from {SCALER_PATH}")
+        scaler = _load_scaler(directory)
 
         # Load feature column names
         # WHY: Model expects 17 features in specific order
-        # Loading from JSON makes it easy to change without code edits
-        with open(FEATURES_PATH, 'r') as f:
-            feature_columns = json.load(f)
-        logger.info(f"Loaded {len(feature_columns)} feature columns")
+        with open(directory / FEATURES_PATH.name, 'r') as f:
+            columns = json.load(f)
+
+        from app.services.inference_backend import create_backend
+        backend = create_backend(directory, model, scaler)
+
+        logger.info(f"Loaded model {version} from {directory} ({len(columns)} features, {backend.backend} backend)")
+        return cls(version, model, scaler, columns, metadata, backend)
+
+    def warm_up(self) -> None:
+        """Score and explain one row so the first real request doesn't pay for it."""
+        row = engineer_feature_arrays(55, 72, 165, 110, 130, 70, 97, 30, 5, "walking", bundle=self)
+        self.backend.predict_proba(row)
+        if self.tree_explainer is not None:
+            self.tree_explainer.explain_batch(self.scaler.transform(row))
+
+
+def _load_forest(directory: Path):
+    """
+    The forest unpickled into this process, or as memory-mapped flat
+    arrays (shared by all workers) when MODEL_FLAT_ARTIFACTS is on.
+    """
+    # joblib (and sklearn, when unpickling) only load on this path
+    import joblib
+    from app.config import settings
+
+    model_file = directory / MODEL_PATH.name
+    if not settings.model_flat_artifacts:
+        # Load pre-trained Random Forest model using joblib (more efficient than pickle)
+        return joblib.load(model_file)
+
+    from app.services.flat_forest import FlatForest, export_flat, has_flat_artifacts
+    if not has_flat_artifacts(directory, model_file):
+        # First load of this version: derive the flat arrays once
+        try:
+            export_flat(joblib.load(model_file), directory)
+        except OSError as e:
+            logger.warning(f"Cannot write flat model arrays in {directory} ({e}); loading pickle")
+            return joblib.load(model_file)
+    try:
+        return FlatForest.load(directory)
+    except OSError as e:
+        # e.g. another worker swapped in a fresh export mid-read
+        logger.warning(f"Cannot open flat model arrays in {directory} ({e}); loading pickle")
+        return joblib.load(model_file)
+
+
+def _load_scaler(directory: Path):
+    """The scaler as exported mean/scale (no sklearn import), or unpickled."""
+    import joblib
+    from app.config import settings
+
+    scaler_file = directory / SCALER_PATH.name
+    if not settings.model_flat_artifacts:
+        return joblib.load(scaler_file)
 
+    from app.services.flat_forest import SCALER_FILE, FlatScaler, export_scaler, has_flat_artifacts
+    try:
+        if not has_flat_artifacts(directory, scaler_file, SCALER_FILE):
+            export_scaler(joblib.load(scaler_file), directory)
+        return FlatScaler.load(directory)
+    except OSError as e:
+        logger.warning(f"Cannot use flat scaler in {directory} ({e}); loading pickle")
+        return joblib.load(scaler_file)
+
+
+def get_active_bundle() -> Optional[ModelBundle]:
+    """The bundle serving predictions right now (None before startup)."""
+    return _active_bundle
+
+
+def activate_bundle(bundle: ModelBundle) -> None:
+    """
+    Make a loaded bundle the active model.
+
+    A single reference assignment: in-flight requests finish on the
+    bundle they already hold, new requests get this one.
+    """
+    global _active_bundle, model, scaler, feature_columns, feature_importances, tree_explainer
+    _active_bundle = bundle
+    model, scaler, feature_columns = bundle.model, bundle.scaler, bundle.feature_columns
+    feature_importances, tree_explainer = bundle.feature_importances, bundle.tree_explainer
+    # Cached results belong to the previous model
+    prediction_cache.invalidate()
+    logger.info(f"Active model version: {bundle.version}")
+
+
+def _require_bundle(bundle: Optional[ModelBundle] = None) -> ModelBundle:
+    bundle = bundle or _active_bundle
+    if bundle is None:
+        raise RuntimeError("ML model not loaded. Server startup failed.")
+    return bundle
+
+
+def load_ml_model() -> bool:
+    """
+    Load the active model version on app startup.
+
+    Reads the registry manifest (ml_models/registry/manifest.json); without
+    one, the files directly in ml_models/ are version 1.0.
+
+    Returns:
+        True if successful, False on any file/parsing error
+    """
+    try:
+        from app.services.model_registry import load_active_bundle
+        bundle = load_active_bundle()
+        bundle.warm_up()
+        activate_bundle(bundle)
         return True
 
     except FileNotFoundError as e:
@@ -96,7 +260,8 @@ def load_ml_model() -> bool:
 
 def is_model_loaded() -> bool:
     """Check if the model is loaded and ready."""
-    return model is not None and scaler is not None and feature_columns is not None
+    return _active_bundle is not None
+
 
 def engineer_features(
     age: int,
@@ -126,12 +291,7 @@ def engineer_features(
     age_risk_factor = age / 70
 
     # Activity type encoding (same mapping as train_model.py)
-    activity_mapping = {
-        'walking': 1, 'yoga': 1,
-        'jogging': 2, 'cycling': 2,
-        'swimming': 3
-    }
-    activity_intensity = activity_mapping.get(activity_type, 2)
+    activity_intensity = ACTIVITY_INTENSITY.get(activity_type, 2)
 
     return {
         'age': age,
@@ -154,6 +314,91 @@ def engineer_features(
     }
 
 
+def engineer_feature_arrays(
+    age,
+    baseline_hr,
+    max_safe_hr,
+    avg_heart_rate,
+    peak_heart_rate,
+    min_heart_rate,
+    avg_spo2,
+    duration_minutes,
+    recovery_time_minutes,
+    activity_type: str = "walking",
+    bundle: Optional[ModelBundle] = None,
+    activity_intensity=None,
+    feature_columns: Optional[List[str]] = None,
+    out=None
+):
+    """
+    Vectorized engineer_features(): any argument may be a NumPy array.
+
+    Inputs broadcast together; returns the (n, 17) matrix in model order.
+    activity_intensity (per-row codes) overrides activity_type; out, if
+    given, is an (n, 17) array to fill instead of allocating a new one.
+    Must stay in step with engineer_features().
+    """
+    import numpy as np
+    columns = feature_columns or _require_bundle(bundle).feature_columns
+    raw = np.broadcast_arrays(*(np.asarray(v, dtype=np.float64) for v in (
+        age, baseline_hr, max_safe_hr, avg_heart_rate, peak_heart_rate,
+        min_heart_rate, avg_spo2, duration_minutes, recovery_time_minutes
+    )))
+    age, baseline_hr, max_safe_hr, avg_hr, peak_hr, min_hr, avg_spo2, duration, recovery = (
+        a.reshape(-1) for a in raw
+    )
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        hr_pct_of_max = np.where(max_safe_hr > 0, peak_hr / max_safe_hr, 0.0)
+        recovery_efficiency = np.where(duration > 0, recovery / duration, 0.0)
+
+    features = {
+        'age': age,
+        'baseline_hr': baseline_hr,
+        'max_safe_hr': max_safe_hr,
+        'avg_heart_rate': avg_hr,
+        'peak_heart_rate': peak_hr,
+        'min_heart_rate': min_hr,
+        'avg_spo2': avg_spo2,
+        'duration_minutes': duration,
+        'recovery_time_minutes': recovery,
+        'hr_pct_of_max': hr_pct_of_max,
+        'hr_elevation': avg_hr - baseline_hr,
+        'hr_range': peak_hr - min_hr,
+        'duration_intensity': duration * hr_pct_of_max,
+        'recovery_efficiency': recovery_efficiency,
+        'spo2_deviation': 98 - avg_spo2,
+        'age_risk_factor': age / 70,
+        'activity_intensity': (
+            np.full(len(age), ACTIVITY_INTENSITY.get(activity_type, 2), dtype=np.float64)
+            if activity_intensity is None else np.asarray(activity_intensity, dtype=np.float64)
+        ),
+    }
+    if out is None:
+        return np.column_stack([features[col] for col in columns])
+    for j, col in enumerate(columns):
+        out[:, j] = features[col]
+    return out
+
+
+def predict_proba_matrix(feature_matrix, bundle: Optional[ModelBundle] = None):
+    """High-risk probability for every row of an (n, 17) feature matrix, in one model call."""
+    bundle = _require_bundle(bundle)
+    return bundle.backend.predict_proba(feature_matrix)[:, 1]
+
+
+def classify_risk(risk_score: float) -> Tuple[str, str]:
+    """Map a probability to (risk_level, recommendation)."""
+    if risk_score >= 0.80:
+        # High risk.
+        return "high", "STOP activity immediately. Rest and monitor symptoms."
+    if risk_score >= 0.50:
+        # Medium risk.
+        return "moderate", "Reduce intensity. Consider taking a break."
+    # Low risk.
+    return "low", "Safe to continue at current intensity."
+
+
 def predict_risk(
     age: int,
     baseline_hr: int,
@@ -164,7 +409,8 @@ def predict_risk(
     avg_spo2: int,
     duration_minutes: int,
     recovery_time_minutes: int,
-    activity_type: str = "walking"
+    activity_type: str = "walking",
+    bundle: Optional[ModelBundle] = None
 ) -> Dict[str, Any]:
     """
     Predict heart risk for a workout session.
@@ -172,8 +418,17 @@ def predict_risk(
     
     Requires: load_ml_model() must have been called (done by FastAPI startup)
     """
-    if model is None or scaler is None or feature_columns is None:
-        raise RuntimeError("ML model not loaded. Server startup failed.")
+    # Take the active bundle once so every step uses the same version
+    bundle = _require_bundle(bundle)
+
+    # Same model version + same inputs = same answer
+    cache_key = (
+        "risk", bundle.version, age, baseline_hr, max_safe_hr, avg_heart_rate, peak_heart_rate,
+        min_heart_rate, avg_spo2, duration_minutes, recovery_time_minutes, activity_type,
+    )
+    cached = prediction_cache.get(cache_key)
+    if cached is not None:
+        return _copy_result(cached)
 
     # Step 1: build the features from the raw readings.
     features = engineer_features(
@@ -185,44 +440,114 @@ def predict_risk(
 
     # Step 2: put features in the exact order the model expects.
     import numpy as np
-    feature_array = np.array([[features[col] for col in feature_columns]])
-
-    # Step 3: scale values if needed.
-    feature_scaled = scaler.transform(feature_array)
+    feature_array = np.array([[features[col] for col in bundle.feature_columns]])
 
-    # Step 4: ask the model for a prediction.
-    prediction = model.predict(feature_scaled)[0]  # 0 or 1
-    probabilities = model.predict_proba(feature_scaled)[0]  # [prob_low, prob_high]
+    # Step 3 + 4: scale values and ask the model for a prediction
+    # (one call into the configured inference backend).
+    probabilities = bundle.backend.predict_proba(feature_array)[0]  # [prob_low, prob_high]
+    # Same as model.predict(), without scoring the forest a second time
+    prediction = bundle.backend.classes_[np.argmax(probabilities)]  # 0 or 1
 
     # Step 5: turn the score into a simple risk label.
     risk_score = float(probabilities[1])  # probability of high risk class
+    risk_level, recommendation = classify_risk(risk_score)
 
-    if risk_score >= 0.80:
-        # High risk.
-        risk_level = "high"
-        recommendation = "STOP activity immediately. Rest and monitor symptoms."
-    elif risk_score >= 0.50:
-        # Medium risk.
-        risk_level = "moderate"
-        recommendation = "Reduce intensity. Consider taking a break."
-    else:
-        # Low risk.
-        risk_level = "low"
-        recommendation = "Safe to continue at current intensity."
-
-    return {
+    result = {
         "risk_score": round(risk_score, 4),
         "risk_level": risk_level,
         "high_risk": bool(prediction == 1),
         "confidence": round(float(max(probabilities)), 4),
         "features_used": features,
         "recommendation": recommendation,
-        "model_info": {
-            "name": "RandomForest",
-            "version": "1.0",
-            "accuracy": "96.9%"
-        }
+        "model_info": dict(bundle.model_info)
     }
+    prediction_cache.put(cache_key, result)
+    return _copy_result(result)
+
+
+def _copy_result(result: Dict[str, Any]) -> Dict[str, Any]:
+    # Callers may add keys; the cached dict must stay as computed
+    return {**result, "features_used": dict(result["features_used"]), "model_info": dict(result["model_info"])}
+
+
+def explain_features(
+    features: Dict[str, float], bundle: Optional[ModelBundle] = None
+) -> Optional[Dict[str, Any]]:
+    """
+    Exact TreeSHAP attributions for one engineered feature dict.
+
+    Returns {"contributions": {feature: phi}, "base_value", "risk_score"},
+    where base_value + sum(contributions) == risk_score, or None if the
+    explainer isn't available.
+    """
+    bundle = bundle or _active_bundle
+    if bundle is None or bundle.tree_explainer is None:
+        return None
+
+    values = tuple(features[col] for col in bundle.feature_columns)
+    cache_key = ("explain", bundle.version, values)
+    explanation = prediction_cache.get(cache_key)
+    if explanation is None:
+        import numpy as np
+        feature_array = np.array([values])
+        phi, base_value = bundle.tree_explainer.explain(bundle.scaler.transform(feature_array)[0])
+        explanation = {
+            "contributions": {col: float(phi[i]) for i, col in enumerate(bundle.feature_columns)},
+            "base_value": base_value,
+            "risk_score": base_value + float(phi.sum()),
+        }
+        prediction_cache.put(cache_key, explanation)
+
+    return {**explanation, "contributions": dict(explanation["contributions"])}
+
+
+def build_feature_matrix(feature_rows: List[Dict[str, float]], bundle: Optional[ModelBundle] = None):
+    """Stack engineered feature dicts into an (n, 17) array in model order."""
+    import numpy as np
+    columns = _require_bundle(bundle).feature_columns
+    return np.array(
+        [[row[col] for col in columns] for row in feature_rows],
+        dtype=np.float64,
+    ).reshape(len(feature_rows), len(columns))
+
+
+def explain_features_batch(
+    feature_rows: List[Dict[str, float]], bundle: Optional[ModelBundle] = None
+) -> List[Dict[str, Any]]:
+    """
+    Score and attribute many engineered feature dicts in one pass.
+
+    One backend call and one batched TreeSHAP call for the whole list. Each result has risk_score, risk_level,
+    confidence, recommendation, base_value, contributions (None when the
+    explainer isn't available) and model_version.
+    """
+    bundle = _require_bundle(bundle)
+    if not feature_rows:
+        return []
+
+    explainer = bundle.tree_explainer
+    matrix = build_feature_matrix(feature_rows, bundle=bundle)
+    probabilities = bundle.backend.predict_proba(matrix)
+    phi = explainer.explain_batch(bundle.scaler.transform(matrix)) if explainer is not None else None
+    base_value = explainer.base_value if explainer is not None else None
+
+    results = []
+    for i, probs in enumerate(probabilities):
+        risk_score = float(probs[1])
+        risk_level, recommendation = classify_risk(risk_score)
+        results.append({
+            "risk_score": round(risk_score, 4),
+            "risk_level": risk_level,
+            "confidence": round(float(max(probs)), 4),
+            "recommendation": recommendation,
+            "base_value": base_value,
+            "contributions": (
+                {col: float(phi[i, j]) for j, col in enumerate(bundle.feature_columns)}
+                if phi is not None else None
+            ),
+            "model_version": bundle.version,
+        })
+    return results
 
 
 # ---- Dummy service class for backwards compatibility with predict.py ----
@@ -233,6 +558,18 @@ class MLPredictionService:
     @property
     def is_loaded(self) -> bool:
         return is_model_loaded()
+
+    @property
+    def feature_columns(self) -> Optional[List[str]]:
+        return _active_bundle.feature_columns if _active_bundle else None
+
+    @property
+    def version(self) -> Optional[str]:
+        return _active_bundle.version if _active_bundle else None
+
+    @property
+    def inference_backend(self) -> Optional[Dict[str, Any]]:
+        return _active_bundle.backend.describe() if _active_bundle else None
     
     def predict_risk(self, **kwargs) -> Dict[str, Any]:
         return predict_risk(**kwargs)
@@ -0,0 +1,320 @@
+"""
+Forest compression.
+
+Builds smaller versions of a registered forest and measures what each
+one costs and saves: holdout accuracy/AUC, agreement with the original,
+single-row and batch latency, artifact size. The chosen candidate is
+registered as a new (not active) registry version, to be shadowed or
+promoted like a retrained one. compress_model.py is the command line.
+
+# =============================================================================
+# FILE MAP - QUICK NAVIGATION
+# =============================================================================
+# CONSTANTS............................ Line 59
+#
+# FUNCTIONS - COMPRESSION
+#   - limit_depth().................... Line 108 (Cut every tree at a depth)
+#   - prune_trees().................... Line 122 (Keep the n most useful trees)
+#   - distill_forest()................. Line 156 (Smaller forest, teacher labels)
+#
+# FUNCTIONS - EVALUATION
+#   - measure_latency()................ Line 198 (p50/p99 single row, batch)
+#   - evaluate_candidate()............. Line 223 (Metrics + latency + size)
+#   - compare_candidates()............. Line 251 (Full report for a sweep)
+#   - pick_candidate()................. Line 292 (Fastest within AUC budget)
+#   - register_candidate()............. Line 310 (Save as registry version)
+#
+# BUSINESS CONTEXT:
+# - Latency and memory grow linearly with the number of trees (and
+#   nodes); this shows how many the risk model needs
+# - limit_depth cuts trees without retraining: a node at the depth limit
+#   becomes a leaf with the class fractions sklearn already stores there
+# - prune_trees picks, greedily, the trees whose average best reproduces
+#   the full forest's scores on the training rows (labels unused, so the
+#   holdout stays unseen)
+# - distill_forest fits a smaller forest to the original's probabilities
+#   (each row twice, as class 1 with weight p and class 0 with 1 - p),
+#   on the training rows plus jittered copies
+# - Latency is measured the way the model is served (flat arrays when
+#   MODEL_FLAT_ARTIFACTS is on)
+# =============================================================================
+"""
+
+import copy
+import logging
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.config import settings
+from app.services.flat_forest import FlatForest, FlatScaler, export_flat
+from app.services.retraining_pipeline import holdout_metrics
+
+logger = logging.getLogger(__name__)
+
+# Rows used when choosing trees for prune_trees (greedy cost is n_trees^2 * rows)
+PRUNE_SAMPLE_ROWS = 20_000
+
+# Single-row calls timed per candidate, and the batch size timed
+LATENCY_SINGLE_CALLS = 300
+LATENCY_BATCH_ROWS = 1024
+
+# sklearn tree constants (sklearn.tree._tree.TREE_LEAF / TREE_UNDEFINED)
+_TREE_LEAF = -1
+_TREE_UNDEFINED = -2
+
+
+def _truncated_tree(estimator, max_depth: int):
+    """Copy of a fitted DecisionTreeClassifier cut at max_depth."""
+    state = estimator.tree_.__getstate__()
+    nodes, values = state["nodes"], state["values"]
+
+    # Breadth-first over the kept nodes; old -> new ids
+    kept, depth = [0], [0]
+    new_id = {0: 0}
+    for old, d in zip(kept, depth):
+        left, right = nodes[old]["left_child"], nodes[old]["right_child"]
+        if left != _TREE_LEAF and d < max_depth:
+            for child in (left, right):
+                new_id[child] = len(kept)
+                kept.append(child)
+                depth.append(d + 1)
+
+    new_nodes = nodes[kept].copy()
+    for i, old in enumerate(kept):
+        left = nodes[old]["left_child"]
+        if left == _TREE_LEAF or depth[i] >= max_depth:
+            new_nodes[i]["left_child"] = new_nodes[i]["right_child"] = _TREE_LEAF
+            new_nodes[i]["feature"] = _TREE_UNDEFINED
+            new_nodes[i]["threshold"] = _TREE_UNDEFINED
+        else:
+            new_nodes[i]["left_child"] = new_id[left]
+            new_nodes[i]["right_child"] = new_id[nodes[old]["right_child"]]
+
+    tree = copy.deepcopy(estimator)
+    tree.tree_.__setstate__({
+        "max_depth": int(max(depth)),
+        "node_count": len(kept),
+        "nodes": new_nodes,
+        "values": values[kept].copy(),
+    })
+    tree.max_depth = max_depth
+    return tree
+
+
+def limit_depth(model, max_depth: int):
+    """
+    Copy of a fitted forest with every tree cut at max_depth.
+
+    No retraining; trees already shallower than max_depth are unchanged.
+    """
+    if max_depth < 1:
+        raise ValueError("max_depth must be at least 1")
+    compressed = copy.copy(model)
+    compressed.estimators_ = [_truncated_tree(est, max_depth) for est in model.estimators_]
+    compressed.max_depth = max_depth
+    return compressed
+
+
+def prune_trees(model, n_trees: int, X_scaled: np.ndarray):
+    """
+    Copy of a fitted forest keeping n_trees of its trees.
+
+    Trees are added one at a time, each time the one that brings the
+    average closest (squared error) to the full forest's P(high risk)
+    on X_scaled.
+    """
+    if not 1 <= n_trees <= len(model.estimators_):
+        raise ValueError(f"n_trees must be between 1 and {len(model.estimators_)}")
+    if len(X_scaled) > PRUNE_SAMPLE_ROWS:
+        rows = np.random.default_rng(0).choice(len(X_scaled), PRUNE_SAMPLE_ROWS, replace=False)
+        X_scaled = X_scaled[rows]
+
+    positive = list(model.classes_).index(1)
+    X32 = np.asarray(X_scaled, dtype=np.float32)
+    per_tree = np.stack([est.predict_proba(X32)[:, positive] for est in model.estimators_])
+    target = per_tree.mean(axis=0)
+
+    chosen: List[int] = []
+    remaining = list(range(len(per_tree)))
+    total = np.zeros_like(target)
+    for k in range(1, n_trees + 1):
+        errors = (((total + per_tree[remaining]) / k - target) ** 2).mean(axis=1)
+        best = remaining.pop(int(np.argmin(errors)))
+        chosen.append(best)
+        total += per_tree[best]
+
+    compressed = copy.copy(model)
+    compressed.estimators_ = [model.estimators_[i] for i in sorted(chosen)]
+    compressed.n_estimators = n_trees
+    return compressed
+
+
+def distill_forest(model, X_scaled: np.ndarray, n_estimators: int, max_depth: int,
+                   augment: int = 1, noise: float = 0.1, random_state: int = 42):
+    """
+    New forest of n_estimators trees (max_depth) trained to reproduce
+    model's P(high risk) on X_scaled plus `augment` jittered copies
+    (Gaussian noise, in scaled units).
+    """
+    from sklearn.ensemble import RandomForestClassifier
+
+    rng = np.random.default_rng(random_state)
+    X = np.asarray(X_scaled, dtype=np.float32)
+    X = np.vstack([X] + [X + rng.normal(0, noise, X.shape).astype(np.float32) for _ in range(augment)])
+    positive = list(model.classes_).index(1)
+    p = model.predict_proba(X)[:, positive]
+
+    # Soft labels: each row as class 1 (weight p) and class 0 (weight 1 - p)
+    params = {key: value for key, value in model.get_params().items() if key in ("max_features", "min_samples_leaf")}
+    student = RandomForestClassifier(
+        n_estimators=n_estimators, max_depth=max_depth, random_state=random_state,
+        n_jobs=settings.retrain_n_jobs, **params,
+    )
+    student.fit(
+        np.vstack([X, X]),
+        np.concatenate([np.ones(len(X), dtype=np.int8), np.zeros(len(X), dtype=np.int8)]),
+        sample_weight=np.concatenate([p, 1 - p]),
+    )
+    return student
+
+
+def _served(model, scaler, workdir: Path):
+    """(model, scaler) as they would be served, pickle bytes, flat array bytes."""
+    import joblib
+
+    pickle_file = workdir / "risk_model.pkl"
+    joblib.dump(model, pickle_file)
+    flat_dir = export_flat(model, workdir)
+    flat_bytes = sum(f.stat().st_size for f in flat_dir.iterdir())
+    if settings.model_flat_artifacts:
+        model, scaler = FlatForest.load(workdir, mmap=False), FlatScaler(scaler.mean_, scaler.scale_)
+    return model, scaler, pickle_file.stat().st_size, flat_bytes
+
+
+def measure_latency(model, scaler, X: np.ndarray, single_calls: int = LATENCY_SINGLE_CALLS,
+                    batch_rows: int = LATENCY_BATCH_ROWS) -> Dict[str, float]:
+    """p50/p99 ms for one-row scoring (scaler + model) and ms per batch."""
+    rows = X[np.arange(single_calls) % len(X)]
+    model.predict_proba(scaler.transform(rows[:1]))  # first-call overhead
+    timings = []
+    for i in range(single_calls):
+        start = time.perf_counter()
+        model.predict_proba(scaler.transform(rows[i:i + 1]))
+        timings.append(time.perf_counter() - start)
+
+    batch = X[np.arange(batch_rows) % len(X)]
+    batch_timings = []
+    for _ in range(3):
+        start = time.perf_counter()
+        model.predict_proba(scaler.transform(batch))
+        batch_timings.append(time.perf_counter() - start)
+
+    return {
+        "p50_ms": round(float(np.percentile(timings, 50)) * 1000, 3),
+        "p99_ms": round(float(np.percentile(timings, 99)) * 1000, 3),
+        f"batch_{batch_rows}_ms": round(min(batch_timings) * 1000, 2),
+    }
+
+
+def evaluate_candidate(name: str, method: str, model, scaler, X_test: np.ndarray,
+                       y_test: np.ndarray, reference: Optional[np.ndarray] = None) -> Dict[str, Any]:
+    """
+    One report row: size, holdout metrics, agreement with the reference
+    scores (the original model's P(high risk)) and latency.
+    """
+    with tempfile.TemporaryDirectory(prefix="compress-") as workdir:
+        served, served_scaler, pickle_bytes, flat_bytes = _served(model, scaler, Path(workdir))
+        positive = list(model.classes_).index(1)
+        scores = served.predict_proba(served_scaler.transform(X_test))[:, positive]
+        row = {
+            "name": name,
+            "method": method,
+            "n_trees": len(model.estimators_),
+            "max_depth": int(max(est.tree_.max_depth for est in model.estimators_)),
+            "n_nodes": int(sum(est.tree_.node_count for est in model.estimators_)),
+            **holdout_metrics(model, scaler, X_test, y_test),
+        }
+        if reference is not None:
+            row["agreement"] = round(float(np.mean((scores >= 0.5) == (reference >= 0.5))), 4)
+            row["max_score_diff"] = round(float(np.max(np.abs(scores - reference))), 4)
+        row.update(measure_latency(served, served_scaler, X_test))
+        row["pickle_kb"] = round(pickle_bytes / 1024, 1)
+        row["flat_kb"] = round(flat_bytes / 1024, 1)
+        del served
+    return row
+
+
+def compare_candidates(
+    model,
+    scaler,
+    X_train: np.ndarray,
+    X_test: np.ndarray,
+    y_test: np.ndarray,
+    trees: Sequence[int] = (),
+    depths: Sequence[int] = (),
+    distill: Sequence[Tuple[int, int]] = (),
+) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Build and evaluate every requested candidate next to the original.
+
+    trees: prune to each tree count; depths: cut at each depth;
+    distill: (n_estimators, max_depth) student forests.
+    Returns (report rows, {name: fitted model}); "original" is first.
+    """
+    X_train_scaled = scaler.transform(X_train)
+    models = {"original": model}
+    methods = {"original": "none"}
+    for n in trees:
+        models[f"prune-{n}"] = prune_trees(model, n, X_train_scaled)
+        methods[f"prune-{n}"] = f"prune to {n} trees"
+    for depth in depths:
+        models[f"depth-{depth}"] = limit_depth(model, depth)
+        methods[f"depth-{depth}"] = f"cut trees at depth {depth}"
+    for n, depth in distill:
+        started = time.perf_counter()
+        models[f"distill-{n}x{depth}"] = distill_forest(model, X_train_scaled, n, depth)
+        methods[f"distill-{n}x{depth}"] = f"distill into {n} trees of depth {depth}"
+        logger.info(f"Distilled {n}x{depth} forest in {time.perf_counter() - started:.1f}s")
+
+    positive = list(model.classes_).index(1)
+    reference = model.predict_proba(scaler.transform(X_test))[:, positive]
+    report = [
+        evaluate_candidate(name, methods[name], candidate, scaler, X_test, y_test, reference)
+        for name, candidate in models.items()
+    ]
+    return report, models
+
+
+def pick_candidate(report: List[Dict[str, Any]], max_auc_drop: float = 0.005) -> Optional[Dict[str, Any]]:
+    """
+    Fastest candidate (batch latency; single-row time is mostly fixed
+    per-call overhead) whose holdout AUC (accuracy if AUC is undefined)
+    is within max_auc_drop of the original; None if none qualifies.
+    """
+    original = report[0]
+    metric = "roc_auc" if original.get("roc_auc") is not None else "accuracy"
+    eligible = [
+        row for row in report[1:]
+        if row.get(metric) is not None and row[metric] >= original[metric] - max_auc_drop
+    ]
+    if not eligible:
+        return None
+    batch_key = next(key for key in original if key.startswith("batch_"))
+    return min(eligible, key=lambda row: (row[batch_key], row["n_nodes"]))
+
+
+def register_candidate(version: str, row: Dict[str, Any], model, scaler,
+                       feature_columns: List[str], source_version: str) -> Dict[str, Any]:
+    """Save a candidate as a registry version (not promoted)."""
+    from app.services import model_registry
+
+    metrics = {key: value for key, value in row.items() if key not in ("name", "method")}
+    metrics["compressed_from"] = source_version
+    return model_registry.register_version(
+        version, model, scaler, feature_columns, metrics=metrics,
+        notes=f"Compressed from {source_version}: {row['method']}",
+    )
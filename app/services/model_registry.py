@@ -0,0 +1,362 @@
+"""
+Versioned model registry with hot-swap.
+
+Each model version lives in its own directory under ml_models/registry/
+with a manifest.json saying which one is active. Promoting a version
+loads and warms it up off to the side, then swaps it in as one
+reference, so predictions never stop and never mix two versions.
+
+# =============================================================================
+# FILE MAP - QUICK NAVIGATION
+# =============================================================================
+# CONSTANTS............................ Line 63
+#
+# FUNCTIONS
+#   - read_manifest().................. Line 103 (Manifest or bootstrap)
+#   - list_versions().................. Line 133 (For GET /model/versions)
+#   - register_version()............... Line 156 (Write artifacts + entry)
+#   - load_bundle().................... Line 214 (Version -> ModelBundle)
+#   - load_training_artifacts()........ Line 223 (Version -> sklearn objects)
+#   - load_active_bundle()............. Line 237 (Used at startup)
+#   - promote()........................ Line 252 (Load, warm up, swap)
+#   - rollback()....................... Line 274 (Back to previous version)
+#   - set_shadow()..................... Line 290 (Shadow candidate in manifest)
+#   - sync_with_manifest()............. Line 300 (Pick up other workers' swaps)
+#   - start_manifest_watcher()......... Line 343 (Background poll task)
+#
+# BUSINESS CONTEXT:
+# - Layout: ml_models/registry/manifest.json and
+#   ml_models/registry/<version>/{risk_model.pkl, scaler.pkl,
+#   feature_columns.json, metadata.json, flat/} (flat/ = mmap-able
+#   forest arrays and scaler values, see flat_forest.py)
+# - The original files directly in ml_models/ are version 1.0; with no
+#   manifest yet, that is the active version
+# - manifest.json is replaced atomically (write temp file + os.replace),
+#   so a reader sees the old or the new manifest, never half of one
+# - Each worker process holds its own bundle; the watcher polls the
+#   manifest every MODEL_REGISTRY_POLL_SECONDS so a promote on one worker
+#   reaches the others without a restart
+# - The manifest also names the shadow candidate (see shadow_eval.py)
+# - RiskAssessment.model_version records the bundle that scored it
+# =============================================================================
+"""
+
+import asyncio
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.services import ml_prediction
+from app.services.flat_forest import export_flat, export_scaler
+from app.services.ml_prediction import FEATURES_PATH, MODEL_PATH, SCALER_PATH, ModelBundle
+
+logger = logging.getLogger(__name__)
+
+MODEL_DIR = MODEL_PATH.parent
+REGISTRY_DIR = MODEL_DIR / "registry"
+MANIFEST_NAME = "manifest.json"
+
+# Version the top-level ml_models/ files are registered as
+LEGACY_VERSION = "1.0"
+
+# Letters, digits, dot, dash, underscore; also keeps versions inside REGISTRY_DIR
+VERSION_PATTERN = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._-]{0,63}$")
+
+# Serializes promote/rollback/register within a process
+_lock = threading.Lock()
+
+_watcher_task: Optional[asyncio.Task] = None
+
+
+class UnknownModelVersion(KeyError):
+    """Raised when a version isn't in the manifest."""
+
+
+def _manifest_path() -> Path:
+    return REGISTRY_DIR / MANIFEST_NAME
+
+
+def _bootstrap_manifest() -> Dict[str, Any]:
+    return {
+        "active": LEGACY_VERSION,
+        "previous": None,
+        "versions": {
+            LEGACY_VERSION: {
+                "path": ".",
+                "model_name": "RandomForest",
+                "created_at": None,
+                "metrics": {"accuracy": 0.969},
+                "notes": "Initial model",
+            }
+        },
+    }
+
+
+def read_manifest() -> Dict[str, Any]:
+    """Current manifest; the legacy single-model layout if none was written yet."""
+    path = _manifest_path()
+    if not path.exists():
+        return _bootstrap_manifest()
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def _write_manifest(manifest: Dict[str, Any]) -> None:
+    REGISTRY_DIR.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=REGISTRY_DIR, prefix=".manifest-", suffix=".json")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, _manifest_path())
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def _version_dir(manifest: Dict[str, Any], version: str) -> Path:
+    entry = manifest["versions"].get(version)
+    if entry is None:
+        raise UnknownModelVersion(version)
+    path = entry.get("path") or version
+    return MODEL_DIR if path == "." else REGISTRY_DIR / path
+
+
+def list_versions() -> Dict[str, Any]:
+    """All registered versions, newest first, with the active/previous flags."""
+    manifest = read_manifest()
+    loaded = ml_prediction.get_active_bundle()
+    versions: List[Dict[str, Any]] = []
+    for version, entry in manifest["versions"].items():
+        versions.append({
+            "version": version,
+            "model_name": entry.get("model_name"),
+            "created_at": entry.get("created_at"),
+            "metrics": entry.get("metrics") or {},
+            "notes": entry.get("notes"),
+            "active": version == manifest["active"],
+        })
+    versions.sort(key=lambda v: v["created_at"] or "", reverse=True)
+    return {
+        "active": manifest["active"],
+        "previous": manifest.get("previous"),
+        "loaded": loaded.version if loaded else None,
+        "versions": versions,
+    }
+
+
+def register_version(
+    version: str,
+    model,
+    scaler,
+    feature_columns: List[str],
+    metrics: Optional[Dict[str, Any]] = None,
+    notes: Optional[str] = None,
+    model_name: str = "RandomForest",
+) -> Dict[str, Any]:
+    """
+    Save a trained model as a new registry version (not activated).
+
+    Artifacts go to a temporary directory first and are renamed into
+    place, so a half-written version is never visible.
+    Raises ValueError for bad or already-registered version names.
+    """
+    if not VERSION_PATTERN.match(version):
+        raise ValueError(f"Invalid model version '{version}'")
+
+    metrics = metrics or {}
+    entry = {
+        "path": version,
+        "model_name": model_name,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "metrics": metrics,
+        "notes": notes,
+    }
+
+    import joblib
+
+    with _lock:
+        manifest = read_manifest()
+        if version in manifest["versions"] or (REGISTRY_DIR / version).exists():
+            raise ValueError(f"Model version '{version}' already exists")
+
+        REGISTRY_DIR.mkdir(parents=True, exist_ok=True)
+        staging = Path(tempfile.mkdtemp(dir=REGISTRY_DIR, prefix=f".{version}-"))
+        try:
+            joblib.dump(model, staging / MODEL_PATH.name)
+            export_flat(model, staging)
+            joblib.dump(scaler, staging / SCALER_PATH.name)
+            export_scaler(scaler, staging)
+            with open(staging / FEATURES_PATH.name, "w") as f:
+                json.dump(list(feature_columns), f)
+            with open(staging / "metadata.json", "w") as f:
+                json.dump({"version": version, **entry}, f, indent=2)
+            os.rename(staging, REGISTRY_DIR / version)
+        except Exception:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+        manifest["versions"][version] = entry
+        _write_manifest(manifest)
+
+    logger.info(f"Registered model version {version} ({metrics})")
+    return {"version": version, **entry}
+
+
+def load_bundle(version: str, manifest: Optional[Dict[str, Any]] = None) -> ModelBundle:
+    """Load one version's artifacts (not activated). Raises UnknownModelVersion."""
+    manifest = manifest or read_manifest()
+    directory = _version_dir(manifest, version)
+    entry = manifest["versions"][version]
+    metadata = {"model_name": entry.get("model_name", "RandomForest"), **(entry.get("metrics") or {})}
+    return ModelBundle.load(directory, version, metadata)
+
+
+def load_training_artifacts(version: str) -> Tuple[Any, Any, List[str]]:
+    """
+    (sklearn forest, sklearn scaler, feature columns) of a version, as
+    pickled; for tools that rebuild a model (load_bundle may give flat
+    arrays instead). Raises UnknownModelVersion.
+    """
+    import joblib
+
+    directory = _version_dir(read_manifest(), version)
+    with open(directory / FEATURES_PATH.name, "r") as f:
+        feature_columns = json.load(f)
+    return joblib.load(directory / MODEL_PATH.name), joblib.load(directory / SCALER_PATH.name), feature_columns
+
+
+def load_active_bundle() -> ModelBundle:
+    """Bundle for the manifest's active version."""
+    manifest = read_manifest()
+    return load_bundle(manifest["active"], manifest)
+
+
+def _swap_to(version: str, manifest: Dict[str, Any]) -> ModelBundle:
+    # Load and warm up before touching the active bundle: if this fails
+    # the current model keeps serving
+    bundle = load_bundle(version, manifest)
+    bundle.warm_up()
+    ml_prediction.activate_bundle(bundle)
+    return bundle
+
+
+def promote(version: str) -> Dict[str, Any]:
+    """
+    Make a registered version the active model in this process and in
+    the manifest (other workers follow via the watcher).
+
+    Blocking (loads from disk); call from a worker thread.
+    """
+    with _lock:
+        manifest = read_manifest()
+        if version not in manifest["versions"]:
+            raise UnknownModelVersion(version)
+        previous = manifest["active"]
+        _swap_to(version, manifest)
+        if version != previous:
+            manifest["previous"] = previous
+            manifest["active"] = version
+            _write_manifest(manifest)
+
+    logger.info(f"Promoted model {version} (previous: {previous})")
+    return {"active": version, "previous": previous}
+
+
+def rollback() -> Dict[str, Any]:
+    """Swap back to the previously active version. Raises LookupError if there is none."""
+    with _lock:
+        manifest = read_manifest()
+        target = manifest.get("previous")
+        if not target or target not in manifest["versions"]:
+            raise LookupError("No previous model version to roll back to")
+        current = manifest["active"]
+        _swap_to(target, manifest)
+        manifest["active"], manifest["previous"] = target, current
+        _write_manifest(manifest)
+
+    logger.info(f"Rolled back model {current} -> {target}")
+    return {"active": target, "previous": current}
+
+
+def set_shadow(shadow: Optional[Dict[str, Any]]) -> None:
+    """Record the shadow candidate ({"version", "sample_rate"} or None) in the manifest."""
+    with _lock:
+        manifest = read_manifest()
+        if shadow and shadow["version"] not in manifest["versions"]:
+            raise UnknownModelVersion(shadow["version"])
+        manifest["shadow"] = shadow
+        _write_manifest(manifest)
+
+
+def sync_with_manifest() -> bool:
+    """
+    Load the manifest's active version if this process serves another one,
+    and follow its shadow candidate.
+
+    Returns True when a swap happened. Load errors are logged and the
+    current model keeps serving.
+    """
+    try:
+        manifest = read_manifest()
+    except Exception as e:
+        logger.error(f"Could not read model manifest: {e}")
+        return False
+
+    from app.services import shadow_eval
+    shadow_eval.sync(manifest.get("shadow"))
+
+    loaded = ml_prediction.get_active_bundle()
+    if loaded is not None and loaded.version == manifest["active"]:
+        return False
+    try:
+        with _lock:
+            _swap_to(manifest["active"], manifest)
+        return True
+    except Exception as e:
+        logger.error(f"Failed to load model {manifest['active']} from manifest: {e}")
+        return False
+
+
+async def _watch_manifest(poll_seconds: float) -> None:
+    last_mtime = None
+    while True:
+        await asyncio.sleep(poll_seconds)
+        try:
+            mtime = _manifest_path().stat().st_mtime
+        except FileNotFoundError:
+            continue
+        if mtime != last_mtime:
+            last_mtime = mtime
+            # Loading a model takes a while; keep the event loop free
+            await asyncio.to_thread(sync_with_manifest)
+
+
+def start_manifest_watcher() -> None:
+    """Poll the manifest in the background (MODEL_REGISTRY_POLL_SECONDS; 0 = off)."""
+    global _watcher_task
+    if settings.model_registry_poll_seconds <= 0 or _watcher_task is not None:
+        return
+    _watcher_task = asyncio.get_running_loop().create_task(
+        _watch_manifest(settings.model_registry_poll_seconds)
+    )
+
+
+async def stop_manifest_watcher() -> None:
+    global _watcher_task
+    if _watcher_task is None:
+        return
+    _watcher_task.cancel()
+    try:
+        await _watcher_task
+    except asyncio.CancelledError:
+        pass
+    _watcher_task = None
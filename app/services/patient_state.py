@@ -0,0 +1,239 @@
+"""
+Patient latest-state service.
+
+Keeps the denormalized patient_latest_state table current when vitals,
+alerts, risk assessments, and activity sessions are written.
+
+# =============================================================================
+# FILE MAP - QUICK NAVIGATION
+# =============================================================================
+# FUNCTIONS
+#   - get_or_create_state()............ Line 58  (Fetch/create the row)
+#   - record_vitals().................. Line 73  (Newest reading wins)
+#   - record_risk_assessment()......... Line 102 (Latest risk)
+#   - _add_to_alert_count()............ Line 115 (SQL-side counter update)
+#   - record_alerts_created().......... Line 140 (Bump unacknowledged count)
+#   - adjust_unacknowledged_alerts()... Line 154 (Acknowledge / un-acknowledge)
+#   - record_activity()................ Line 165 (Last session)
+#   - rebuild_patient_state().......... Line 180 (Recompute from source tables)
+#
+# BUSINESS CONTEXT:
+# - Functions only modify the caller's session; the caller commits, so the
+#   state row is written in the same transaction as the source record
+# - The unacknowledged alert counter is bumped with SQL-side UPDATEs, so
+#   concurrent writers for one patient don't lose each other's changes
+# - Clinician /patients/overview reads this table instead of 4 queries/patient
+# =============================================================================
+"""
+
+import logging
+from datetime import datetime, timezone
+from typing import Iterable, Optional
+
+from sqlalchemy import case, desc, func, inspect, update
+from sqlalchemy.orm import Session
+
+from app.models.patient_latest_state import PatientLatestState
+
+logger = logging.getLogger(__name__)
+
+
+def _as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """SQLite hands back naive datetimes; treat them as UTC for comparisons."""
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def _is_newer(candidate: Optional[datetime], current: Optional[datetime]) -> bool:
+    if candidate is None:
+        return current is None
+    if current is None:
+        return True
+    return _as_utc(candidate) >= _as_utc(current)
+
+
+def get_or_create_state(db: Session, user_id: int) -> PatientLatestState:
+    """Return the patient's state row, adding a new one to the session if missing."""
+    state = db.get(PatientLatestState, user_id)
+    if state is None:
+        # Sessions use autoflush=False, so a row added earlier in this
+        # transaction is only visible in session.new
+        for pending in db.new:
+            if isinstance(pending, PatientLatestState) and pending.user_id == user_id:
+                return pending
+    if state is None:
+        state = PatientLatestState(user_id=user_id, unacknowledged_alert_count=0)
+        db.add(state)
+    return state
+
+
+def record_vitals(db: Session, user_id: int, vitals: Iterable):
+    """
+    Update latest vitals from one or more VitalSignRecord rows.
+
+    Only the newest reading (by timestamp) is copied, and only if it is newer
+    than what the row already holds, so out-of-order batch syncs are safe.
+    Returns the newest reading in `vitals` (None if empty).
+    """
+    newest = None
+    for vital in vitals:
+        if newest is None or _is_newer(vital.timestamp, newest.timestamp):
+            newest = vital
+    if newest is None:
+        return None
+
+    state = get_or_create_state(db, user_id)
+    if not _is_newer(newest.timestamp, state.latest_vitals_at):
+        return newest
+
+    state.latest_reading_id = newest.reading_id
+    state.latest_heart_rate = newest.heart_rate
+    state.latest_spo2 = newest.spo2
+    state.latest_systolic_bp = newest.systolic_bp
+    state.latest_diastolic_bp = newest.diastolic_bp
+    state.latest_hrv = newest.hrv
+    state.latest_vitals_at = newest.timestamp
+    return newest
+
+
+def record_risk_assessment(db: Session, assessment) -> None:
+    """Copy a newly stored RiskAssessment into the state row."""
+    state = get_or_create_state(db, assessment.user_id)
+    assessed_at = assessment.assessment_date or datetime.now(timezone.utc)
+    if not _is_newer(assessed_at, state.latest_risk_at):
+        return
+
+    state.latest_assessment_id = assessment.assessment_id
+    state.latest_risk_score = assessment.risk_score
+    state.latest_risk_level = assessment.risk_level
+    state.latest_risk_at = assessed_at
+
+
+def _add_to_alert_count(db: Session, state: PatientLatestState, delta: int) -> None:
+    """
+    Add delta to the unacknowledged counter, floored at zero.
+
+    A stored row is changed by a SQL-side UPDATE, so concurrent ingest
+    flushes and acknowledgements don't overwrite each other's counts.
+    """
+    if delta == 0:
+        return
+    if inspect(state).pending:
+        # Not in the DB yet: the INSERT carries the count
+        state.unacknowledged_alert_count = max(0, (state.unacknowledged_alert_count or 0) + delta)
+        return
+
+    count = func.coalesce(PatientLatestState.unacknowledged_alert_count, 0) + delta
+    db.execute(
+        update(PatientLatestState)
+        .where(PatientLatestState.user_id == state.user_id)
+        .values(unacknowledged_alert_count=case((count < 0, 0), else_=count))
+        .execution_options(synchronize_session=False)
+    )
+    # Re-read the new value on next access
+    db.expire(state, ["unacknowledged_alert_count"])
+
+
+def record_alerts_created(db: Session, user_id: int, alerts: Iterable) -> None:
+    """Count new unacknowledged alerts and remember the most recent one."""
+    alerts = list(alerts)
+    if not alerts:
+        return
+
+    state = get_or_create_state(db, user_id)
+    _add_to_alert_count(db, state, sum(1 for a in alerts if not a.acknowledged))
+
+    latest = alerts[-1]
+    state.last_alert_at = latest.created_at or datetime.now(timezone.utc)
+    state.last_alert_severity = latest.severity
+
+
+def adjust_unacknowledged_alerts(db: Session, user_id: int, delta: int) -> None:
+    """
+    Apply an acknowledge (-1) or un-acknowledge (+1) to the counter.
+
+    Never lets the counter go below zero.
+    """
+    if delta == 0:
+        return
+    _add_to_alert_count(db, get_or_create_state(db, user_id), delta)
+
+
+def record_activity(db: Session, session) -> None:
+    """Copy a started/ended ActivitySession into the state row."""
+    state = get_or_create_state(db, session.user_id)
+    started_at = session.start_time
+    if state.last_session_id not in (None, session.session_id) and not _is_newer(
+        started_at, state.last_activity_at
+    ):
+        return
+
+    state.last_session_id = session.session_id
+    state.last_activity_type = session.activity_type
+    state.last_activity_status = session.status
+    state.last_activity_at = session.end_time or started_at
+
+
+def rebuild_patient_state(db: Session, user_id: int) -> PatientLatestState:
+    """
+    Recompute the state row from the source tables.
+
+    Used to backfill existing patients or repair drift. Caller commits.
+    """
+    from app.models.vital_signs import VitalSignRecord
+    from app.models.risk_assessment import RiskAssessment
+    from app.models.alert import Alert
+    from app.models.activity import ActivitySession
+
+    state = get_or_create_state(db, user_id)
+
+    # Same rule as the write path: only valid readings become "latest"
+    vital = (
+        db.query(VitalSignRecord)
+        .filter(VitalSignRecord.user_id == user_id, VitalSignRecord.is_valid == True)
+        .order_by(desc(VitalSignRecord.timestamp))
+        .first()
+    )
+    state.latest_vitals_at = None
+    if vital:
+        record_vitals(db, user_id, [vital])
+
+    assessment = (
+        db.query(RiskAssessment)
+        .filter(RiskAssessment.user_id == user_id)
+        .order_by(desc(RiskAssessment.assessment_date))
+        .first()
+    )
+    state.latest_risk_at = None
+    if assessment:
+        record_risk_assessment(db, assessment)
+
+    state.unacknowledged_alert_count = db.query(func.count(Alert.alert_id)).filter(
+        Alert.user_id == user_id,
+        Alert.acknowledged.is_not(True)
+    ).scalar() or 0
+    last_alert = (
+        db.query(Alert)
+        .filter(Alert.user_id == user_id)
+        .order_by(desc(Alert.created_at))
+        .first()
+    )
+    state.last_alert_at = last_alert.created_at if last_alert else None
+    state.last_alert_severity = last_alert.severity if last_alert else None
+
+    session = (
+        db.query(ActivitySession)
+        .filter(ActivitySession.user_id == user_id)
+        .order_by(desc(ActivitySession.start_time))
+        .first()
+    )
+    state.last_session_id = None
+    state.last_activity_at = None
+    if session:
+        record_activity(db, session)
+
+    logger.info(f"Rebuilt latest state for user {user_id}")
+    return state
@@ -0,0 +1,99 @@
+"""
+Prediction result cache.
+
+Dashboards and the mobile app send the same inputs again and again (a
+clinician refresh re-scores the same latest session). Results are kept
+in a small LRU keyed on the model version plus the exact inputs, so a
+repeat skips feature engineering and inference.
+
+# =============================================================================
+# FILE MAP - QUICK NAVIGATION
+# =============================================================================
+# CLASSES
+#   - PredictionCache.................. Line 37  (LRU + hit/miss counters)
+#       - get()........................ Line 54  (Lookup, counts hit/miss)
+#       - put()........................ Line 67  (Store, evicts oldest)
+#       - invalidate()................. Line 77  (Drop all on model swap)
+#       - stats()...................... Line 83  (For GET /predict/status)
+#
+# MODULE INSTANCE
+#   - prediction_cache................. Line 99  (Shared cache)
+#
+# BUSINESS CONTEXT:
+# - Keys include the model version, and activate_bundle() empties the
+#   cache, so a promoted model never serves the old model's answers
+# - Callers get copies; cached dicts are never handed out
+# - Each worker has its own cache; PREDICTION_CACHE_SIZE=0 turns it off
+# =============================================================================
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+from app.config import settings
+
+
+class PredictionCache:
+    """
+    Thread-safe LRU of computed results.
+
+    Hit/miss/eviction counters are kept since start-up (not reset when
+    the cache is invalidated).
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Cached value or None; refreshes the entry's LRU position."""
+        if self.max_entries <= 0:
+            return None
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self) -> None:
+        """Forget every entry (called when the active model changes)."""
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.max_entries > 0,
+                "size": len(self._entries),
+                "max_size": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+# Shared by predict_risk() and explain_features() in this worker
+prediction_cache = PredictionCache(settings.prediction_cache_size)
@@ -0,0 +1,287 @@
+"""
+Real-time pub/sub hub.
+
+Fans out newly stored vitals and alerts to WebSocket / SSE subscribers so
+the mobile app and dashboard don't have to poll.
+
+# =============================================================================
+# FILE MAP - QUICK NAVIGATION
+# =============================================================================
+# CLASSES
+#   - Subscription..................... Line 52  (One listener's queue)
+#   - RealtimeHub...................... Line 85  (In-process pub/sub)
+#   - RedisRealtimeHub................. Line 137 (Redis pub/sub, multi-worker)
+#
+# FUNCTIONS
+#   - get_realtime_hub()............... Line 241 (Singleton factory)
+#   - publish_vitals() / publish_alerts() Line 268 (Helpers for write paths)
+#
+# BUSINESS CONTEXT:
+# - One channel per patient (user_id); patients listen to their own,
+#   clinicians to patients that pass check_clinician_phi_access
+# - publish() is thread-safe: background tasks run in a worker thread
+# - Slow listeners drop their oldest events instead of blocking writers
+# - Redis publishes go through a queue to one thread per worker, so
+#   writers (incl. async endpoints) never wait on the network
+# - REALTIME_BACKEND=redis shares events across uvicorn/gunicorn workers
+# =============================================================================
+"""
+
+import asyncio
+import json
+import logging
+import queue
+import threading
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Optional, Set
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Events buffered per listener before the oldest is dropped
+SUBSCRIBER_QUEUE_SIZE = 100
+
+REDIS_CHANNEL_PREFIX = "adaptiv:patient:"
+
+# Events waiting for the Redis publisher thread before new ones are dropped
+PUBLISH_QUEUE_SIZE = 10_000
+
+
+class Subscription:
+    """A single listener on one patient's channel."""
+
+    def __init__(self, user_id: int, loop: asyncio.AbstractEventLoop):
+        self.user_id = user_id
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+
+    def _put(self, event: Dict[str, Any]) -> None:
+        """Runs on the subscriber's loop. Drops the oldest event when full."""
+        if self.queue.full():
+            try:
+                self.queue.get_nowait()
+            except asyncio.QueueEmpty:
+                pass
+        self.queue.put_nowait(event)
+
+    def deliver(self, event: Dict[str, Any]) -> None:
+        """Hand an event to this listener from any thread."""
+        try:
+            self.loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:
+            # Loop already closed (client went away during shutdown)
+            pass
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Wait for the next event, or None on timeout."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class RealtimeHub:
+    """
+    In-process pub/sub keyed by patient user_id.
+
+    Good for a single worker. Use RedisRealtimeHub when running several.
+    """
+
+    backend = "memory"
+
+    def __init__(self):
+        self._subscribers: Dict[int, Set[Subscription]] = defaultdict(set)
+        self._lock = threading.Lock()
+
+    async def start(self) -> None:
+        """Nothing to start for the in-process hub."""
+
+    async def stop(self) -> None:
+        """Nothing to stop for the in-process hub."""
+
+    def subscribe(self, user_id: int) -> Subscription:
+        """Register a listener for a patient's channel (call from async code)."""
+        subscription = Subscription(user_id, asyncio.get_running_loop())
+        with self._lock:
+            self._subscribers[user_id].add(subscription)
+        logger.info(f"Realtime subscriber added for user {user_id}")
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            listeners = self._subscribers.get(subscription.user_id)
+            if listeners is not None:
+                listeners.discard(subscription)
+                if not listeners:
+                    del self._subscribers[subscription.user_id]
+
+    def subscriber_count(self, user_id: Optional[int] = None) -> int:
+        with self._lock:
+            if user_id is not None:
+                return len(self._subscribers.get(user_id, ()))
+            return sum(len(s) for s in self._subscribers.values())
+
+    def _deliver_local(self, user_id: int, event: Dict[str, Any]) -> None:
+        with self._lock:
+            listeners = list(self._subscribers.get(user_id, ()))
+        for subscription in listeners:
+            subscription.deliver(event)
+
+    def publish(self, user_id: int, event: Dict[str, Any]) -> None:
+        """Send an event to everyone listening on this patient. Thread-safe."""
+        self._deliver_local(user_id, event)
+
+
+class RedisRealtimeHub(RealtimeHub):
+    """
+    Pub/sub through Redis so every worker sees every event.
+
+    publish() goes to Redis only; each worker's listener task receives the
+    message back and delivers it to its own local subscribers. The Redis
+    round trip happens on a publisher thread, so publish() never blocks the
+    event loop or the write that called it.
+    """
+
+    backend = "redis"
+
+    def __init__(self, redis_url: str):
+        super().__init__()
+        self.redis_url = redis_url
+        self._publisher = None
+        self._listener_task: Optional[asyncio.Task] = None
+        self._outbox: queue.Queue = queue.Queue(maxsize=PUBLISH_QUEUE_SIZE)
+        self._publisher_thread: Optional[threading.Thread] = None
+
+    def _get_publisher(self):
+        if self._publisher is None:
+            import redis
+            self._publisher = redis.Redis.from_url(self.redis_url)
+        return self._publisher
+
+    async def start(self) -> None:
+        if self._listener_task is None:
+            self._listener_task = asyncio.create_task(self._listen())
+            logger.info(f"Realtime hub listening on Redis {self.redis_url}")
+
+    async def stop(self) -> None:
+        if self._listener_task is not None:
+            self._listener_task.cancel()
+            try:
+                await self._listener_task
+            except asyncio.CancelledError:
+                pass
+            self._listener_task = None
+        thread = self._publisher_thread
+        if thread is not None:
+            # Let queued events go out, then end the thread (it's a daemon,
+            # so a hung Redis can't hold up shutdown)
+            try:
+                self._outbox.put_nowait(None)
+            except queue.Full:
+                pass
+            await asyncio.to_thread(thread.join, 5.0)
+            self._publisher_thread = None
+
+    def _drain_outbox(self) -> None:
+        """Publisher thread: send queued (channel, message) pairs in order."""
+        while True:
+            item = self._outbox.get()
+            if item is None:
+                return
+            channel, message = item
+            try:
+                self._get_publisher().publish(channel, message)
+            except Exception as e:
+                # Never fail a write because the push channel is down
+                logger.error(f"Realtime publish to Redis failed: {e}")
+
+    async def _listen(self) -> None:
+        import redis.asyncio as aioredis
+
+        while True:
+            client = aioredis.Redis.from_url(self.redis_url)
+            pubsub = client.pubsub()
+            try:
+                await pubsub.psubscribe(f"{REDIS_CHANNEL_PREFIX}*")
+                async for message in pubsub.listen():
+                    if message.get("type") != "pmessage":
+                        continue
+                    channel = message["channel"]
+                    if isinstance(channel, bytes):
+                        channel = channel.decode()
+                    user_id = int(channel[len(REDIS_CHANNEL_PREFIX):])
+                    self._deliver_local(user_id, json.loads(message["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Redis restarted or network blip - reconnect after a pause
+                logger.error(f"Realtime Redis listener error: {e}")
+                await asyncio.sleep(1.0)
+            finally:
+                await pubsub.aclose()
+                await client.aclose()
+
+    def publish(self, user_id: int, event: Dict[str, Any]) -> None:
+        """Queue an event for the publisher thread. Thread-safe, never waits on Redis."""
+        with self._lock:
+            if self._publisher_thread is None:
+                self._publisher_thread = threading.Thread(
+                    target=self._drain_outbox, name="realtime-redis-publisher", daemon=True
+                )
+                self._publisher_thread.start()
+        try:
+            self._outbox.put_nowait((f"{REDIS_CHANNEL_PREFIX}{user_id}", json.dumps(event, default=str)))
+        except queue.Full:
+            logger.warning(f"Realtime publish queue full; dropped event for user {user_id}")
+
+
+# ---- Singleton ----
+_hub: Optional[RealtimeHub] = None
+_hub_lock = threading.Lock()
+
+
+def get_realtime_hub() -> RealtimeHub:
+    """Get the process-wide hub, built from REALTIME_BACKEND on first use."""
+    global _hub
+    if _hub is None:
+        with _hub_lock:
+            if _hub is None:
+                if settings.realtime_backend == "redis" and settings.redis_url:
+                    _hub = RedisRealtimeHub(settings.redis_url)
+                else:
+                    _hub = RealtimeHub()
+    return _hub
+
+
+def _event(event_type: str, user_id: int, data: Any) -> Dict[str, Any]:
+    return {
+        "type": event_type,
+        "user_id": user_id,
+        "data": data,
+        "published_at": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+def _has_listeners(hub: RealtimeHub, user_id: int) -> bool:
+    # Redis can't tell us about listeners in other workers, so always publish
+    return hub.backend != "memory" or hub.subscriber_count(user_id) > 0
+
+
+def publish_vitals(user_id: int, vitals: Iterable) -> None:
+    """Push stored VitalSignRecord rows to the patient's channel."""
+    hub = get_realtime_hub()
+    if not _has_listeners(hub, user_id):
+        return
+    for vital in vitals:
+        hub.publish(user_id, _event("vitals", user_id, vital.to_dict()))
+
+
+def publish_alerts(user_id: int, alerts: Iterable) -> None:
+    """Push stored Alert rows to the patient's channel."""
+    hub = get_realtime_hub()
+    if not _has_listeners(hub, user_id):
+        return
+    for alert in alerts:
+        hub.publish(user_id, _event("alert", user_id, alert.to_dict()))
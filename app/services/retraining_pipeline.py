@@ -8,32 +8,94 @@ track model versions, and manage model artifacts.
 # FILE MAP - QUICK NAVIGATION
 # =============================================================================
 # CONSTANTS
-#   - MODEL_DIR........................ Line 30  (Path to model files)
+#   - MODEL_DIR........................ Line 77  (Path to model files)
 #
 # FUNCTIONS
-#   - evaluate_retraining_readiness().. Line 35  (Check if retrain needed)
-#   - get_retraining_status().......... Line 80  (Current model metadata)
-#   - trigger_retraining()............. Line 110 (Start retrain job)
-#   - _save_model_version()............ Line 135 (Version management)
+#   - evaluate_retraining_readiness().. Line 100 (Check if retrain needed)
+#   - get_retraining_status().......... Line 170 (Current model metadata)
+#   - save_retraining_metadata()....... Line 215 (Last retrain record)
+#   - _later_outcomes()................ Line 292 (Post-session outcome labels)
+#   - load_training_matrix()........... Line 341 (DB -> preallocated X, y)
+#   - split_holdout().................. Line 392 (Seeded train/holdout split)
+#   - holdout_metrics()................ Line 408 (Accuracy, AUC on holdout)
+#   - run_retraining()................. Line 422 (Fit, evaluate, register)
+#   - trigger_retraining()............. Line 498 (Start retrain job)
 #
 # BUSINESS CONTEXT:
 # - Automated model retraining pipeline
 # - Minimum 100 records + 7 days since last train
 # - Version tracking for audit/rollback
+# - Training rows = ended sessions joined to their user; label = whether a
+#   vital-sign threshold alert (OUTCOME_ALERT_TYPES) fired in the
+#   RETRAIN_OUTCOME_WINDOW_HOURS after the session's cool-down tail. Alerts
+#   during the session or cool-down are thresholds on the very readings
+#   behind peak/avg HR, SpO2 and recovery, so labelling with them would
+#   teach the forest the alert rule and inflate its holdout AUC. The model's
+#   own risk assessments are never labels either
+# - Sessions whose outcome window hasn't passed yet are left out rather
+#   than counted as negatives
+# - The app records no clinician confirmation yet: an alert raised on a
+#   bad reading still counts as a positive
+# - Rows stream from a server-side cursor in RETRAIN_BATCH_SIZE batches
+#   into a float32 matrix sized by COUNT, so memory is the matrix itself
+#   (~68 MB per million rows); each batch's labels are one alert query
+# - Sessions ended through the API bring their stored feature vectors
+#   (services/session_features.py); only older rows are engineered here
+# - New models are registered, not promoted: shadow or promote them via
+#   the /model endpoints (see model_registry.py, shadow_eval.py)
 # =============================================================================
 """
 
 import json
 import logging
+import threading
+import time
 from pathlib import Path
-from typing import Dict, Any, List, Optional
-from datetime import datetime, timezone
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.activity import ActivitySession
+from app.models.alert import Alert, AlertType
+from app.models.user import User
+from app.services.ml_prediction import (
+    ACTIVITY_INTENSITY,
+    FEATURES_PATH,
+    engineer_feature_arrays,
+    get_active_bundle,
+)
+from app.services.session_aggregation import RECOVERY_TAIL_MINUTES
+from app.services.session_features import FEATURE_BYTES, stored_feature_rows
 
 logger = logging.getLogger(__name__)
 
 BASE_DIR = Path(__file__).resolve().parent.parent.parent
 MODEL_DIR = BASE_DIR / "ml_models"
 
+# Threshold alerts that make a session the positive (high risk) class when
+# they fire after its cool-down (see _later_outcomes)
+OUTCOME_ALERT_TYPES = (
+    AlertType.HIGH_HEART_RATE.value,
+    AlertType.LOW_HEART_RATE.value,
+    AlertType.LOW_SPO2.value,
+    AlertType.HIGH_BLOOD_PRESSURE.value,
+    AlertType.IRREGULAR_RHYTHM.value,
+)
+
+# Fewest labelled sessions worth training on
+MIN_TRAINING_ROWS = 50
+
+# Forest settings of the shipped model (used if no model is loaded)
+DEFAULT_FOREST_PARAMS = {"n_estimators": 100, "max_depth": 10, "random_state": 42}
+
+# Last/current background retraining run (one at a time per process)
+_job_lock = threading.Lock()
+_job: Dict[str, Any] = {"status": "idle"}
+
 
 def evaluate_retraining_readiness(
     new_records_count: int,
@@ -124,6 +186,15 @@ def get_retraining_status() -> Dict[str, Any]:
         status["model_size_bytes"] = stat.st_size
         status["model_modified"] = datetime.fromtimestamp(stat.st_mtime, tz=timezone.utc).isoformat()
 
+    status["last_job"] = get_retraining_job()
+
+    # Version actually serving predictions (see model_registry)
+    try:
+        from app.services.model_registry import read_manifest
+        status["active_version"] = read_manifest()["active"]
+    except Exception:
+        status["active_version"] = None
+
     if metadata_path.exists():
         try:
             with open(metadata_path, "r") as f:
@@ -167,3 +238,299 @@ def save_retraining_metadata(
         metadata["save_error"] = str(e)
 
     return metadata
+
+
+# =============================================================================
+# Retraining job
+# =============================================================================
+
+def _training_query(max_rows: int, ended_before: datetime):
+    """
+    One row per session ended before ended_before: raw model inputs, the
+    session's stored feature_vector (None for older sessions), user_id and
+    end_time (for the label, see _later_outcomes).
+
+    User/session gaps use the same defaults as
+    session_features.session_inputs. Newest sessions first so max_rows
+    keeps the most recent data.
+    """
+    age = func.coalesce(User.age, 55)
+    return (
+        select(
+            age,
+            func.coalesce(User.baseline_hr, 72),
+            func.coalesce(User.max_safe_hr, 220 - age),
+            ActivitySession.avg_heart_rate,
+            ActivitySession.peak_heart_rate,
+            func.coalesce(ActivitySession.min_heart_rate, 65),
+            func.coalesce(ActivitySession.avg_spo2, 96),
+            ActivitySession.duration_minutes,
+            func.coalesce(ActivitySession.recovery_time_minutes, 8),
+            ActivitySession.activity_type,
+            ActivitySession.feature_vector,
+            ActivitySession.user_id,
+            ActivitySession.end_time,
+        )
+        .join(User, ActivitySession.user_id == User.user_id)
+        .where(
+            ActivitySession.avg_heart_rate.isnot(None),
+            ActivitySession.peak_heart_rate.isnot(None),
+            ActivitySession.duration_minutes.isnot(None),
+            ActivitySession.end_time.isnot(None),
+            ActivitySession.end_time <= ended_before,
+        )
+        .order_by(ActivitySession.session_id.desc())
+        .limit(max_rows)
+    )
+
+
+def _as_utc(value: datetime) -> datetime:
+    """SQLite hands back naive datetimes; treat them as UTC."""
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def _later_outcomes(db: Session, user_ids: Tuple[int, ...], ended_at: Tuple[datetime, ...]) -> np.ndarray:
+    """
+    Labels for one batch of sessions: 1 where an outcome alert fired in the
+    window after the session's cool-down tail.
+
+    One query (idx_alert_user_type_time) for the batch's patients over the
+    batch's time span, then a sorted search per session.
+    """
+    tail = timedelta(minutes=RECOVERY_TAIL_MINUTES)
+    window = timedelta(hours=settings.retrain_outcome_window_hours)
+    ends = [_as_utc(value) for value in ended_at]
+    alerts = db.execute(
+        select(Alert.user_id, Alert.created_at)
+        .where(
+            Alert.user_id.in_(set(user_ids)),
+            Alert.alert_type.in_(OUTCOME_ALERT_TYPES),
+            Alert.created_at > min(ends) + tail,
+            Alert.created_at <= max(ends) + window,
+        )
+    ).all()
+
+    fired: Dict[int, List[float]] = {}
+    for user_id, created_at in alerts:
+        if created_at is not None:
+            fired.setdefault(user_id, []).append(_as_utc(created_at).timestamp())
+    times = {user_id: np.sort(np.array(stamps)) for user_id, stamps in fired.items()}
+
+    labels = np.zeros(len(ends), dtype=np.int8)
+    for i, (user_id, end) in enumerate(zip(user_ids, ends)):
+        stamps = times.get(user_id)
+        if stamps is None:
+            continue
+        first = np.searchsorted(stamps, (end + tail).timestamp(), side="right")
+        last = np.searchsorted(stamps, (end + window).timestamp(), side="right")
+        labels[i] = last > first
+    return labels
+
+
+def stream_training_batches(
+    db: Session, batch_size: int, max_rows: int, ended_before: datetime
+) -> Iterator[List[Tuple]]:
+    """Yield lists of raw rows, batch_size at a time, from a server-side cursor."""
+    result = db.execute(
+        _training_query(max_rows, ended_before).execution_options(stream_results=True, yield_per=batch_size)
+    )
+    for partition in result.partitions(batch_size):
+        yield partition
+
+
+def load_training_matrix(
+    db: Session,
+    feature_columns: List[str],
+    batch_size: Optional[int] = None,
+    max_rows: Optional[int] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Build (X, y) for training without holding ORM objects.
+
+    X is float32 (what the forest uses internally) and allocated once from
+    a COUNT. Sessions with stored features are copied in as stored; the
+    rest of each streamed batch is engineered straight into its slice.
+    """
+    batch_size = batch_size or settings.retrain_batch_size
+    max_rows = max_rows or settings.retrain_max_rows
+    # Only sessions whose outcome window has fully passed
+    ended_before = datetime.now(timezone.utc) - timedelta(
+        minutes=RECOVERY_TAIL_MINUTES, hours=settings.retrain_outcome_window_hours
+    )
+    expected = db.execute(
+        select(func.count()).select_from(_training_query(max_rows, ended_before).subquery())
+    ).scalar_one()
+
+    X = np.empty((expected, len(feature_columns)), dtype=np.float32)
+    y = np.empty(expected, dtype=np.int8)
+    filled = 0
+    for rows in stream_training_batches(db, batch_size, max_rows, ended_before):
+        # Rows added since the COUNT don't fit the preallocated matrix
+        rows = rows[:expected - filled]
+        if not rows:
+            break
+        columns = list(zip(*rows))
+        end = filled + len(rows)
+        block = X[filled:end]
+        stored = np.array([blob is not None and len(blob) == FEATURE_BYTES for blob in columns[10]])
+        if stored.any():
+            block[stored] = stored_feature_rows(
+                [blob for blob, keep in zip(columns[10], stored) if keep], feature_columns
+            )
+        if not stored.all():
+            numeric = np.array(columns[:9], dtype=np.float64)[:, ~stored]
+            intensity = [ACTIVITY_INTENSITY.get(a or "walking", 2) for a, keep in zip(columns[9], stored) if not keep]
+            block[~stored] = engineer_feature_arrays(
+                *numeric, activity_intensity=intensity, feature_columns=feature_columns,
+            )
+        y[filled:end] = _later_outcomes(db, columns[11], columns[12])
+        filled = end
+
+    return X[:filled], y[:filled]
+
+
+def split_holdout(X: np.ndarray, y: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    (X_train, X_test, y_train, y_test) as retraining splits them.
+
+    Fixed seed, so tools scoring a retrained model on the same data
+    (model_compression.py) get the rows it never saw.
+    """
+    from sklearn.model_selection import train_test_split
+
+    positives = int(y.sum())
+    stratify = y if min(positives, len(y) - positives) >= 2 else None
+    return train_test_split(
+        X, y, test_size=settings.retrain_holdout_fraction, random_state=42, stratify=stratify
+    )
+
+
+def holdout_metrics(model, scaler, X: np.ndarray, y: np.ndarray) -> Dict[str, Any]:
+    """Accuracy / precision / recall / ROC AUC of a model on raw feature rows."""
+    from sklearn.metrics import accuracy_score, precision_score, recall_score, roc_auc_score
+
+    scores = model.predict_proba(scaler.transform(X))[:, 1]
+    predicted = (scores >= 0.5).astype(np.int8)
+    return {
+        "accuracy": round(float(accuracy_score(y, predicted)), 4),
+        "precision": round(float(precision_score(y, predicted, zero_division=0)), 4),
+        "recall": round(float(recall_score(y, predicted, zero_division=0)), 4),
+        "roc_auc": round(float(roc_auc_score(y, scores)), 4) if len(np.unique(y)) == 2 else None,
+    }
+
+
+def run_retraining(
+    db: Session,
+    version: Optional[str] = None,
+    notes: Optional[str] = None,
+    batch_size: Optional[int] = None,
+    max_rows: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Retrain the forest on stored sessions and save it as a registry version.
+
+    The new version is registered but not promoted; shadow it or promote
+    it from the /model endpoints. Raises ValueError when there isn't
+    enough labelled data.
+    """
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.preprocessing import StandardScaler
+
+    from app.services import model_registry
+
+    started = time.perf_counter()
+    active = get_active_bundle()
+    if active is not None:
+        feature_columns = active.feature_columns
+    else:
+        with open(FEATURES_PATH, "r") as f:
+            feature_columns = json.load(f)
+
+    X, y = load_training_matrix(db, feature_columns, batch_size, max_rows)
+    load_seconds = time.perf_counter() - started
+    positives = int(y.sum())
+    if len(y) < MIN_TRAINING_ROWS:
+        raise ValueError(f"Only {len(y)} labelled sessions (need {MIN_TRAINING_ROWS})")
+    if positives == 0 or positives == len(y):
+        raise ValueError("Training data has only one outcome class")
+
+    X_train, X_test, y_train, y_test = split_holdout(X, y)
+
+    # Scale the training split in place; X_test stays raw for the scalers
+    scaler = StandardScaler().fit(X_train)
+    X_train = scaler.transform(X_train, copy=False)
+    params = dict(DEFAULT_FOREST_PARAMS)
+    if active is not None and hasattr(active.model, "get_params"):
+        params.update({
+            key: value for key, value in active.model.get_params().items()
+            if key in ("n_estimators", "max_depth", "max_features", "min_samples_leaf", "class_weight", "random_state")
+        })
+    model = RandomForestClassifier(**params, n_jobs=settings.retrain_n_jobs)
+    model.fit(X_train, y_train)
+    fit_seconds = time.perf_counter() - started - load_seconds
+
+    metrics = holdout_metrics(model, scaler, X_test, y_test)
+    metrics.update({
+        "train_rows": int(len(y_train)),
+        "holdout_rows": int(len(y_test)),
+        "positive_rate": round(positives / len(y), 4),
+        "load_seconds": round(load_seconds, 2),
+        "fit_seconds": round(fit_seconds, 2),
+    })
+    if active is not None:
+        # Same holdout scored by the model in service, for comparison
+        metrics["active_version"] = active.version
+        metrics["active_holdout"] = holdout_metrics(active.model, active.scaler, X_test, y_test)
+
+    version = version or datetime.now(timezone.utc).strftime("%Y%m%d.%H%M%S")
+    entry = model_registry.register_version(
+        version, model, scaler, feature_columns, metrics=metrics, notes=notes or "Retrained from stored sessions"
+    )
+    save_retraining_metadata(version, metrics["accuracy"], int(len(y)), notes=notes)
+
+    logger.info(
+        f"Retrained model {version}: {len(y)} rows, accuracy={metrics['accuracy']}, "
+        f"auc={metrics['roc_auc']}, load={load_seconds:.1f}s, fit={fit_seconds:.1f}s"
+    )
+    return entry
+
+
+def trigger_retraining(version: Optional[str] = None, notes: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Start run_retraining on a background thread with its own DB session.
+
+    Returns the job state; raises RuntimeError if a run is in progress.
+    """
+    global _job
+    with _job_lock:
+        if _job["status"] == "running":
+            raise RuntimeError("A retraining run is already in progress")
+        _job = {
+            "status": "running",
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "requested_version": version,
+        }
+        job = _job
+
+    def _run():
+        from app.database import SessionLocal
+
+        db = SessionLocal()
+        try:
+            job["result"] = run_retraining(db, version=version, notes=notes)
+            job["status"] = "completed"
+        except Exception as e:
+            logger.error(f"Retraining failed: {e}")
+            job["status"] = "failed"
+            job["error"] = str(e)
+        finally:
+            db.close()
+            job["finished_at"] = datetime.now(timezone.utc).isoformat()
+
+    threading.Thread(target=_run, name="model-retraining", daemon=True).start()
+    return dict(job)
+
+
+def get_retraining_job() -> Dict[str, Any]:
+    """State of the last background retraining run in this process."""
+    return dict(_job)
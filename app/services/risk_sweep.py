@@ -0,0 +1,130 @@
+"""
+What-if risk sweep.
+
+Scores a grid of variations around one session (e.g. peak HR 100-200 x
+duration 10-90) with a single model call, so the app can draw a risk
+curve or surface and show where risk turns moderate or high.
+
+# =============================================================================
+# FILE MAP - QUICK NAVIGATION
+# =============================================================================
+# CONSTANTS............................ Line 38
+#
+# FUNCTIONS
+#   - axis_values().................... Line 57  (start/stop/step -> values)
+#   - first_crossing()................. Line 65  (Where a curve reaches t)
+#   - run_sweep()...................... Line 84  (Grid -> surface + bounds)
+#
+# BUSINESS CONTEXT:
+# - Axes are raw session inputs; derived features (hr_pct_of_max,
+#   duration_intensity, ...) are recomputed for every grid point
+# - Surface is indexed [i][j] = risk at axes[0][i], axes[1][j]
+# - Boundaries are read along the first axis: the lowest value where risk
+#   reaches 0.5 / 0.8, interpolated between grid points (one value, or a
+#   list with one per second-axis value). None = never reached in range
+# =============================================================================
+"""
+
+import logging
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+
+from app.services.ml_prediction import engineer_feature_arrays, get_active_bundle, predict_proba_matrix
+
+logger = logging.getLogger(__name__)
+
+# Raw inputs that can be swept (everything engineer_features takes but activity_type)
+SWEEPABLE_FEATURES = (
+    "age",
+    "baseline_hr",
+    "max_safe_hr",
+    "avg_heart_rate",
+    "peak_heart_rate",
+    "min_heart_rate",
+    "avg_spo2",
+    "duration_minutes",
+    "recovery_time_minutes",
+)
+
+# Largest grid scored in one request
+MAX_GRID_POINTS = 20_000
+
+# Same cut-offs as classify_risk(): moderate, high
+RISK_THRESHOLDS = (0.5, 0.8)
+
+
+def axis_values(start: int, stop: int, step: int) -> np.ndarray:
+    """Inclusive integer range; step sign follows start -> stop."""
+    step = abs(step) or 1
+    if stop < start:
+        step = -step
+    return np.arange(start, stop + (1 if step > 0 else -1), step, dtype=np.float64)
+
+
+def first_crossing(values: np.ndarray, risks: np.ndarray, threshold: float) -> Optional[float]:
+    """
+    First axis value at which risk reaches threshold.
+
+    Linear interpolation between the last grid point below and the first
+    at or above. Returns values[0] if the curve starts above it.
+    """
+    above = np.flatnonzero(risks >= threshold)
+    if len(above) == 0:
+        return None
+    i = int(above[0])
+    if i == 0:
+        return float(values[0])
+    lo_v, hi_v = values[i - 1], values[i]
+    lo_r, hi_r = risks[i - 1], risks[i]
+    fraction = (threshold - lo_r) / (hi_r - lo_r)
+    return float(lo_v + fraction * (hi_v - lo_v))
+
+
+def run_sweep(base: Dict[str, Any], axes: Sequence[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Score every grid point in one predict_proba call.
+
+    base: the engineer_features() inputs (incl. activity_type).
+    axes: one or two {"feature", "start", "stop", "step"} dicts.
+    Raises ValueError for unknown features, repeats or oversized grids.
+    """
+    if not 1 <= len(axes) <= 2:
+        raise ValueError("Provide one or two axes")
+    names = [axis["feature"] for axis in axes]
+    unknown = [name for name in names if name not in SWEEPABLE_FEATURES]
+    if unknown:
+        raise ValueError(f"Cannot sweep {', '.join(unknown)}; choose from {', '.join(SWEEPABLE_FEATURES)}")
+    if len(set(names)) != len(names):
+        raise ValueError("Axes must use different features")
+
+    grids = [axis_values(axis["start"], axis["stop"], axis["step"]) for axis in axes]
+    shape = tuple(len(grid) for grid in grids)
+    if int(np.prod(shape)) > MAX_GRID_POINTS:
+        raise ValueError(f"Grid has {int(np.prod(shape))} points; the limit is {MAX_GRID_POINTS}")
+
+    # Broadcast each axis along its own dimension; the rest stay scalar
+    inputs = {name: base[name] for name in SWEEPABLE_FEATURES}
+    for dim, (name, grid) in enumerate(zip(names, grids)):
+        inputs[name] = grid.reshape([-1 if d == dim else 1 for d in range(len(grids))])
+    bundle = get_active_bundle()
+    matrix = engineer_feature_arrays(activity_type=base.get("activity_type", "walking"), bundle=bundle, **inputs)
+    risk = predict_proba_matrix(matrix, bundle=bundle).reshape(shape)
+
+    curves = risk if risk.ndim == 2 else risk[:, None]
+    boundaries: Dict[str, Any] = {}
+    for threshold in RISK_THRESHOLDS:
+        crossings = [
+            first_crossing(grids[0], curves[:, j], threshold) for j in range(curves.shape[1])
+        ]
+        crossings = [None if c is None else round(c, 1) for c in crossings]
+        # One axis: a single value; two axes: one per second-axis value
+        boundaries[str(threshold)] = crossings if risk.ndim == 2 else crossings[0]
+
+    return {
+        "axes": [{"feature": name, "values": grid.astype(int).tolist()} for name, grid in zip(names, grids)],
+        "risk": np.round(risk, 4).tolist(),
+        "boundaries": boundaries,
+        "grid_points": int(risk.size),
+        "model_version": bundle.version,
+    }
@@ -0,0 +1,309 @@
+"""
+Server-side session aggregation from raw vitals.
+
+Turns the vital_signs readings of a workout into the session fields the
+risk model uses (avg/peak/min HR, avg SpO2, recovery time), so the
+model sees what the sensors recorded rather than what the client sent.
+
+# =============================================================================
+# FILE MAP - QUICK NAVIGATION
+# =============================================================================
+# CONSTANTS............................ Line 58
+#
+# FUNCTIONS
+#   - estimate_recovery_minutes()...... Line 91  (Post-peak HR decay fit)
+#   - summarize_vitals()............... Line 128 (Arrays -> session fields)
+#   - aggregate_session_vitals()....... Line 162 (One query + one pass)
+#   - apply_session_aggregates()....... Line 208 (Ending session <- vitals)
+#   - refresh_recovery_tails()......... Line 233 (Re-aggregate after cool-down)
+#   - start_recovery_refresher()....... Line 290 (Background poll)
+#
+# BUSINESS CONTEXT:
+# - POST /activities/end/{id} overwrites the client's HR/SpO2/recovery
+#   values with these whenever the session has valid readings; sessions
+#   without readings keep what the client sent
+# - Recovery time: HR from the (last) peak down to 20% of the peak's
+#   excess over resting HR is fitted as HR(t) = resting + A * exp(-t / tau)
+#   (log-linear least squares); recovery is when the fitted excess falls
+#   to 10% of the peak's (tau * ln 10 for a clean decay). Readings logged
+#   up to RECOVERY_TAIL_MINUTES after the session ends (cool-down) count
+#   toward the fit
+# - A session ended "now" has no cool-down readings yet, so it is flagged
+#   recovery_pending; once the tail has elapsed, refresh_recovery_tails()
+#   (polled every SESSION_RECOVERY_POLL_SECONDS) aggregates it again and
+#   re-stores its features. Every worker polls; two refreshing the same
+#   session compute the same values
+# - No estimate (None) when the peak is too close to resting HR, too few
+#   readings follow it, or HR isn't falling; callers keep their default
+# =============================================================================
+"""
+
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.activity import ActivitySession
+from app.models.user import User
+from app.models.vital_signs import VitalSignRecord
+from app.services.session_features import store_session_features
+
+logger = logging.getLogger(__name__)
+
+# Readings the decay fit needs between the peak and the 20%-of-peak mark
+MIN_DECAY_POINTS = 3
+
+# Readings within this of the maximum count as the peak; the decay starts
+# at the last of them, so a plateau of hard exercise isn't "recovery"
+PEAK_TOLERANCE_BPM = 3
+
+# Peak must be this far above resting HR for recovery to mean anything
+MIN_ELEVATION_BPM = 10
+
+# Only the part of the decay above this share of the peak's excess is
+# fitted; closer to resting HR the sensor noise dominates the log
+FIT_FLOOR_FRACTION = 0.20
+
+# "Recovered" = fitted excess over resting HR down to this share of the peak's
+RECOVERY_FRACTION = 0.10
+
+# Estimates are clipped to this range (minutes)
+MIN_RECOVERY_MINUTES = 1
+MAX_RECOVERY_MINUTES = 60
+
+# Cool-down readings after end_time that still belong to the session
+RECOVERY_TAIL_MINUTES = 15
+
+# Sessions re-aggregated per refresh_recovery_tails() call
+REFRESH_BATCH_SIZE = 200
+
+# ActivitySession columns set from the readings when a session ends
+AGGREGATED_FIELDS = (
+    "avg_heart_rate", "peak_heart_rate", "min_heart_rate", "avg_spo2", "recovery_time_minutes",
+)
+
+
+def estimate_recovery_minutes(seconds, heart_rates, resting_hr: Optional[float] = None) -> Optional[float]:
+    """
+    Minutes from the HR peak until the fitted decay is back within
+    RECOVERY_FRACTION of the peak's elevation over resting HR.
+
+    seconds: reading times (any origin, ascending); heart_rates: bpm.
+    resting_hr defaults to the lowest reading. None when there is no
+    usable decay after the peak.
+    """
+    t = np.asarray(seconds, dtype=np.float64)
+    hr = np.asarray(heart_rates, dtype=np.float64)
+    if len(hr) == 0:
+        return None
+
+    resting = float(hr.min()) if resting_hr is None else float(resting_hr)
+    elevation = hr.max() - resting
+    if elevation < MIN_ELEVATION_BPM:
+        return None
+    peak = int(np.flatnonzero(hr >= hr.max() - PEAK_TOLERANCE_BPM)[-1])
+
+    # Fit from the peak until HR first drops under the fit floor
+    t_after = t[peak:] - t[peak]
+    excess = hr[peak:] - resting
+    below = np.flatnonzero(excess < FIT_FLOOR_FRACTION * elevation)
+    n = below[0] if len(below) else len(excess)
+    if n < MIN_DECAY_POINTS:
+        return None
+
+    # log(excess) = log(A) - t / tau
+    slope, intercept = np.polyfit(t_after[:n], np.log(excess[:n]), 1)
+    if slope >= 0:
+        return None
+
+    recovered_at = (intercept - np.log(RECOVERY_FRACTION * elevation)) / -slope
+    return float(np.clip(recovered_at / 60, MIN_RECOVERY_MINUTES, MAX_RECOVERY_MINUTES))
+
+
+def summarize_vitals(seconds, heart_rates, spo2s=None, resting_hr: Optional[float] = None,
+                     session_end: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Session fields from reading arrays in one vectorized pass.
+
+    Readings after session_end (same clock as seconds) only feed the
+    recovery fit. avg_spo2 / recovery_time_minutes are None when there is
+    no SpO2 reading / no decay to fit.
+    """
+    t = np.asarray(seconds, dtype=np.float64)
+    hr = np.asarray(heart_rates, dtype=np.float64)
+    spo2 = np.asarray(spo2s if spo2s is not None else np.full(len(hr), np.nan), dtype=np.float64)
+    in_session = t <= session_end if session_end is not None else np.ones(len(t), dtype=bool)
+    if not in_session.any():
+        raise ValueError("No vitals to aggregate")
+
+    session_t, session_hr, session_spo2 = t[in_session], hr[in_session], spo2[in_session]
+    # Decay fit starts at the session's peak and may run into the cool-down tail
+    peak_at = session_t[np.argmax(session_hr)]
+    after_peak = t >= peak_at
+    recovery = estimate_recovery_minutes(t[after_peak], hr[after_peak], resting_hr)
+    has_spo2 = ~np.isnan(session_spo2)
+
+    return {
+        "avg_heart_rate": int(session_hr.mean()),
+        "peak_heart_rate": int(session_hr.max()),
+        "min_heart_rate": int(session_hr.min()),
+        "avg_spo2": int(session_spo2[has_spo2].mean()) if has_spo2.any() else None,
+        "duration_minutes": max(1, int((session_t[-1] - session_t[0]) / 60)),
+        "recovery_time_minutes": round(recovery) if recovery is not None else None,
+        "points": int(in_session.sum()),
+    }
+
+
+def aggregate_session_vitals(
+    db: Session,
+    user_id: int,
+    start: datetime,
+    end: datetime,
+    resting_hr: Optional[float] = None,
+) -> Optional[Dict[str, Any]]:
+    """
+    summarize_vitals() over a user's valid readings from start to end
+    (plus RECOVERY_TAIL_MINUTES of cool-down for the recovery fit).
+
+    One query for three columns, no ORM objects. None without readings.
+    """
+    rows = db.execute(
+        select(VitalSignRecord.timestamp, VitalSignRecord.heart_rate, VitalSignRecord.spo2)
+        .where(
+            VitalSignRecord.user_id == user_id,
+            VitalSignRecord.timestamp >= start,
+            VitalSignRecord.timestamp <= end + timedelta(minutes=RECOVERY_TAIL_MINUTES),
+            VitalSignRecord.is_valid == True,
+        )
+        .order_by(VitalSignRecord.timestamp.asc())
+    ).all()
+    if not rows:
+        return None
+
+    timestamps, heart_rates, spo2s = zip(*rows)
+    # Offsets from the first reading (SQLite hands back naive UTC timestamps)
+    origin = timestamps[0]
+    if origin.tzinfo is None and end.tzinfo is not None:
+        end = end.astimezone(timezone.utc).replace(tzinfo=None)
+    elif origin.tzinfo is not None and end.tzinfo is None:
+        end = end.replace(tzinfo=timezone.utc)
+    seconds = np.fromiter(((ts - origin).total_seconds() for ts in timestamps), dtype=np.float64, count=len(rows))
+    end_offset = (end - origin).total_seconds()
+    if end_offset < 0:
+        return None
+    spo2 = np.array([np.nan if v is None else v for v in spo2s], dtype=np.float64)
+    return summarize_vitals(seconds, heart_rates, spo2, resting_hr=resting_hr, session_end=end_offset)
+
+
+def _as_utc(value: datetime) -> datetime:
+    """SQLite hands back naive datetimes; treat them as UTC."""
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def apply_session_aggregates(db: Session, user, session, now: Optional[datetime] = None) -> Optional[Dict[str, Any]]:
+    """
+    Overwrite an ending ActivitySession's AGGREGATED_FIELDS with values
+    computed from its vitals. Fields the readings can't give (no SpO2,
+    no decay to fit) keep their current value. Returns the summary, or
+    None (session untouched) when there are no readings. Sets
+    recovery_pending while the cool-down tail is still to come. Caller
+    commits.
+    """
+    if session.start_time is None or session.end_time is None:
+        return None
+    summary = aggregate_session_vitals(
+        db, session.user_id, session.start_time, session.end_time, resting_hr=user.baseline_hr
+    )
+    now = now or datetime.now(timezone.utc)
+    tail_end = _as_utc(session.end_time) + timedelta(minutes=RECOVERY_TAIL_MINUTES)
+    session.recovery_pending = summary is not None and now < tail_end
+    if summary is None:
+        return None
+    for field in AGGREGATED_FIELDS:
+        if summary[field] is not None:
+            setattr(session, field, summary[field])
+    return summary
+
+
+def refresh_recovery_tails(db: Session, now: Optional[datetime] = None, limit: int = REFRESH_BATCH_SIZE) -> int:
+    """
+    Aggregate again the recovery_pending sessions whose cool-down tail has
+    elapsed, and re-store their features.
+
+    Oldest first, up to `limit` per call, one commit. Returns the number
+    of sessions refreshed.
+    """
+    now = now or datetime.now(timezone.utc)
+    sessions = (
+        db.query(ActivitySession)
+        .filter(
+            ActivitySession.recovery_pending == True,
+            ActivitySession.end_time <= now - timedelta(minutes=RECOVERY_TAIL_MINUTES),
+        )
+        .order_by(ActivitySession.end_time.asc())
+        .limit(limit)
+        .all()
+    )
+    if not sessions:
+        return 0
+
+    users = {
+        u.user_id: u
+        for u in db.query(User).filter(User.user_id.in_({s.user_id for s in sessions}))
+    }
+    for session in sessions:
+        user = users[session.user_id]
+        apply_session_aggregates(db, user, session, now=now)
+        store_session_features(user, session)
+    db.commit()
+
+    logger.info(f"Re-aggregated {len(sessions)} session(s) with their cool-down readings")
+    return len(sessions)
+
+
+def _refresh_in_new_session() -> int:
+    from app.database import SessionLocal
+    db = SessionLocal()
+    try:
+        return refresh_recovery_tails(db)
+    finally:
+        db.close()
+
+
+async def _poll_recovery_tails(poll_seconds: float) -> None:
+    while True:
+        await asyncio.sleep(poll_seconds)
+        try:
+            await asyncio.to_thread(_refresh_in_new_session)
+        except Exception as e:
+            logger.error(f"Session recovery refresh failed: {e}")
+
+
+_refresher_task: Optional[asyncio.Task] = None
+
+
+def start_recovery_refresher() -> None:
+    """Poll for sessions whose cool-down is in (SESSION_RECOVERY_POLL_SECONDS; 0 = off)."""
+    global _refresher_task
+    if settings.session_recovery_poll_seconds <= 0 or _refresher_task is not None:
+        return
+    _refresher_task = asyncio.get_running_loop().create_task(
+        _poll_recovery_tails(settings.session_recovery_poll_seconds)
+    )
+
+
+async def stop_recovery_refresher() -> None:
+    global _refresher_task
+    if _refresher_task is None:
+        return
+    _refresher_task.cancel()
+    try:
+        await _refresher_task
+    except asyncio.CancelledError:
+        pass
+    _refresher_task = None
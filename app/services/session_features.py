@@ -0,0 +1,240 @@
+"""
+Session feature store.
+
+Engineers the model features and risk score of an activity session once,
+when it ends, and keeps them on the session row. Clinician risk checks,
+batch explanations and retraining read them back instead of re-deriving
+all 17 features from the session and patient rows.
+
+# =============================================================================
+# FILE MAP - QUICK NAVIGATION
+# =============================================================================
+# CONSTANTS............................ Line 54
+#
+# FUNCTIONS
+#   - session_inputs()................. Line 70  (Session + user -> raw inputs)
+#   - pack_features()/unpack_features() Line 90  (float32 blob <-> array)
+#   - stored_feature_rows()............ Line 107 (Blobs -> matrix in model order)
+#   - stored_features()................ Line 123 (Blob -> feature dict)
+#   - store_session_features()......... Line 131 (Compute + save at session end)
+#   - session_risk()................... Line 161 (Risk without re-engineering)
+#   - backfill_session_features()...... Line 191 (Fill older sessions)
+#
+# BUSINESS CONTEXT:
+# - feature_vector holds the 17 features as little-endian float32 (68
+#   bytes) in SESSION_FEATURES order, so any model version can read them
+#   whatever its feature_columns order
+# - Features are a snapshot: the patient's age/baseline/max HR when the
+#   session ended, not whatever the profile says later
+# - risk_score is only reused while risk_model_version is the active
+#   model; after a promote the stored features are re-scored instead
+# - Sessions without stored features (older rows, or ended while no model
+#   was loaded) fall back to engineering from the row
+# =============================================================================
+"""
+
+import logging
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.models.activity import ActivitySession
+from app.models.user import User
+from app.services.ml_prediction import (
+    ACTIVITY_INTENSITY,
+    ModelBundle,
+    classify_risk,
+    engineer_feature_arrays,
+    get_active_bundle,
+)
+
+logger = logging.getLogger(__name__)
+
+# Storage order of feature_vector (engineer_features() key order)
+SESSION_FEATURES = (
+    "age", "baseline_hr", "max_safe_hr", "avg_heart_rate", "peak_heart_rate",
+    "min_heart_rate", "avg_spo2", "duration_minutes", "recovery_time_minutes",
+    "hr_pct_of_max", "hr_elevation", "hr_range", "duration_intensity",
+    "recovery_efficiency", "spo2_deviation", "age_risk_factor", "activity_intensity",
+)
+# The first nine are the raw session/profile inputs
+RAW_INPUTS = SESSION_FEATURES[:9]
+FEATURE_DTYPE = np.dtype("<f4")
+FEATURE_BYTES = len(SESSION_FEATURES) * FEATURE_DTYPE.itemsize
+
+# Sessions engineered and scored per model call when backfilling
+BACKFILL_BATCH_SIZE = 500
+
+
+def session_inputs(user: User, session: ActivitySession) -> Dict[str, Any]:
+    """
+    engineer_features() inputs for a stored session; gaps get the same
+    defaults GET /predict/user/{id}/risk has always used.
+    """
+    age = user.age or 55
+    return {
+        "age": age,
+        "baseline_hr": user.baseline_hr or 72,
+        "max_safe_hr": user.max_safe_hr or (220 - age),
+        "avg_heart_rate": session.avg_heart_rate or 90,
+        "peak_heart_rate": session.peak_heart_rate or 120,
+        "min_heart_rate": session.min_heart_rate or 65,
+        "avg_spo2": session.avg_spo2 or 96,
+        "duration_minutes": session.duration_minutes or 30,
+        "recovery_time_minutes": session.recovery_time_minutes or 8,
+        "activity_type": session.activity_type or "walking",
+    }
+
+
+def pack_features(matrix: np.ndarray) -> List[bytes]:
+    """One feature_vector blob per row of an (n, 17) SESSION_FEATURES matrix."""
+    packed = np.ascontiguousarray(matrix, dtype=FEATURE_DTYPE)
+    return [row.tobytes() for row in packed]
+
+
+def unpack_features(blobs: List[bytes]) -> np.ndarray:
+    """
+    (n, 17) float32 matrix in SESSION_FEATURES order.
+
+    Raises ValueError for a blob of the wrong size.
+    """
+    if any(len(blob) != FEATURE_BYTES for blob in blobs):
+        raise ValueError(f"feature_vector must be {FEATURE_BYTES} bytes")
+    return np.frombuffer(b"".join(blobs), dtype=FEATURE_DTYPE).reshape(len(blobs), len(SESSION_FEATURES))
+
+
+def stored_feature_rows(blobs: List[bytes], feature_columns: List[str]) -> np.ndarray:
+    """Stored vectors as an (n, len(feature_columns)) matrix in model order."""
+    index = [SESSION_FEATURES.index(col) for col in feature_columns]
+    return unpack_features(blobs)[:, index]
+
+
+def _stored_vector(session: ActivitySession) -> Optional[np.ndarray]:
+    if session.feature_vector is None:
+        return None
+    try:
+        return unpack_features([session.feature_vector])[0]
+    except ValueError:
+        logger.warning(f"Ignoring malformed feature_vector on session {session.session_id}")
+        return None
+
+
+def stored_features(session: ActivitySession) -> Optional[Dict[str, float]]:
+    """The session's stored features as an engineer_features()-style dict, or None."""
+    vector = _stored_vector(session)
+    if vector is None:
+        return None
+    return {name: float(value) for name, value in zip(SESSION_FEATURES, vector)}
+
+
+def store_session_features(user: User, session: ActivitySession, bundle: Optional[ModelBundle] = None) -> bool:
+    """
+    Engineer, score and save the features of a finished session.
+
+    Sets feature_vector, risk_score and risk_model_version on the row;
+    the caller commits. Returns False (row untouched) when no model is
+    loaded or scoring fails, so ending a session never fails on the model.
+    """
+    bundle = bundle or get_active_bundle()
+    if bundle is None:
+        logger.warning(f"No model loaded; session {session.session_id} ends without stored features")
+        return False
+
+    inputs = session_inputs(user, session)
+    activity_type = inputs.pop("activity_type")
+    try:
+        # float64 features score exactly like predict_risk(); float32 is only the storage format
+        matrix = engineer_feature_arrays(**inputs, activity_type=activity_type, feature_columns=list(SESSION_FEATURES))
+        index = [SESSION_FEATURES.index(col) for col in bundle.feature_columns]
+        probabilities = bundle.backend.predict_proba(matrix[:, index])[0]
+    except Exception as e:
+        logger.error(f"Storing features for session {session.session_id} failed: {e}")
+        return False
+
+    session.feature_vector = pack_features(matrix)[0]
+    session.risk_score = float(probabilities[1])
+    session.risk_model_version = bundle.version
+    return True
+
+
+def session_risk(session: ActivitySession, bundle: ModelBundle) -> Optional[Dict[str, Any]]:
+    """
+    Risk of a session from the feature store, or None if it has no stored features.
+
+    Uses the stored risk_score when the active model produced it,
+    otherwise scores the stored features (one backend call, no feature
+    engineering). "source" says which.
+    """
+    if session.risk_score is not None and session.risk_model_version == bundle.version:
+        risk_score, source = float(session.risk_score), "stored_score"
+    else:
+        vector = _stored_vector(session)
+        if vector is None:
+            return None
+        index = [SESSION_FEATURES.index(col) for col in bundle.feature_columns]
+        risk_score = float(bundle.backend.predict_proba(vector[index].reshape(1, -1))[0, 1])
+        source = "stored_features"
+
+    risk_level, recommendation = classify_risk(risk_score)
+    return {
+        "risk_score": round(risk_score, 4),
+        "risk_level": risk_level,
+        "high_risk": risk_score > 0.5,  # A tie is low risk, as in predict_risk
+        "confidence": round(max(risk_score, 1 - risk_score), 4),
+        "recommendation": recommendation,
+        "model_version": bundle.version,
+        "source": source,
+    }
+
+
+def backfill_session_features(db: Session, limit: Optional[int] = None,
+                              batch_size: int = BACKFILL_BATCH_SIZE) -> int:
+    """
+    Store features and scores for ended sessions that have none.
+
+    Engineers and scores each batch in one vectorized pass and commits
+    per batch. Returns the number of sessions filled.
+    """
+    bundle = get_active_bundle()
+    if bundle is None:
+        raise RuntimeError("ML model not loaded")
+    index = [SESSION_FEATURES.index(col) for col in bundle.feature_columns]
+
+    filled, last_id = 0, 0
+    while limit is None or filled < limit:
+        size = batch_size if limit is None else min(batch_size, limit - filled)
+        rows = (
+            db.query(ActivitySession, User)
+            .join(User, ActivitySession.user_id == User.user_id)
+            .filter(
+                ActivitySession.feature_vector.is_(None),
+                ActivitySession.end_time.isnot(None),
+                ActivitySession.session_id > last_id,
+            )
+            .order_by(ActivitySession.session_id)
+            .limit(size)
+            .all()
+        )
+        if not rows:
+            break
+
+        inputs = [session_inputs(user, session) for session, user in rows]
+        matrix = engineer_feature_arrays(
+            *(np.array([row[key] for row in inputs], dtype=np.float64) for key in RAW_INPUTS),
+            activity_intensity=[ACTIVITY_INTENSITY.get(row["activity_type"], 2) for row in inputs],
+            feature_columns=list(SESSION_FEATURES),
+        )
+        scores = bundle.backend.predict_proba(matrix[:, index])[:, 1]
+        for (session, _), blob, score in zip(rows, pack_features(matrix), scores):
+            session.feature_vector = blob
+            session.risk_score = float(score)
+            session.risk_model_version = bundle.version
+        db.commit()
+
+        filled += len(rows)
+        last_id = rows[-1][0].session_id
+        logger.info(f"Stored features for {filled} sessions (up to session {last_id})")
+
+    return filled
+
@@ -0,0 +1,256 @@
+"""
+Shadow-model evaluation.
+
+While a candidate model version is in shadow mode, a sample of live risk
+predictions is re-scored by the candidate on a background thread. The
+patient only ever sees the active model's answer; the comparison is
+written to a small append-only file for the report endpoint.
+
+# =============================================================================
+# FILE MAP - QUICK NAVIGATION
+# =============================================================================
+# CONSTANTS............................ Line 55
+#
+# FUNCTIONS
+#   - configure()...................... Line 85  (Set/clear the candidate)
+#   - sync()........................... Line 102 (Follow manifest "shadow")
+#   - get_status()..................... Line 124 (Candidate, rate, queue)
+#   - submit()......................... Line 133 (Called by predict endpoints)
+#   - drain().......................... Line 155 (Wait for queued jobs)
+#   - read_records()................... Line 190 (Append-only store reader)
+#   - build_report()................... Line 213 (Disagreement/delta/latency)
+#
+# BUSINESS CONTEXT:
+# - Candidate + sample rate live in the registry manifest ("shadow"), so
+#   every worker shadows the same version
+# - submit() only draws a random number and queues a job: no model work
+#   on the request path. At most MAX_PENDING jobs wait; extra samples are
+#   dropped (and counted) instead of building a backlog
+# - The job times the active and the candidate model on the same feature
+#   vector (each bundle's inference backend), so latencies are comparable
+# - One file per (active, candidate) pair of fixed 24-byte records;
+#   small O_APPEND writes are safe across worker processes
+# - Disagreement = the two scores fall in different risk levels
+# =============================================================================
+"""
+
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.config import settings
+from app.services import model_registry
+from app.services.ml_prediction import ModelBundle
+
+logger = logging.getLogger(__name__)
+
+# One comparison: when, both scores, both latencies
+RECORD_DTYPE = np.dtype([
+    ("timestamp", "<f8"),
+    ("active_score", "<f4"),
+    ("shadow_score", "<f4"),
+    ("active_ms", "<f4"),
+    ("shadow_ms", "<f4"),
+])
+
+# Jobs allowed to wait for the shadow thread before samples are dropped
+MAX_PENDING = 64
+
+# Directory name inside the registry (versions can't start with ".")
+STORE_DIRNAME = ".shadow"
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shadow-model")
+_state_lock = threading.Lock()
+_candidate: Optional[ModelBundle] = None
+_sample_rate = 0.0
+_pending = 0
+_dropped = 0
+
+
+def _store_dir() -> Path:
+    return model_registry.REGISTRY_DIR / STORE_DIRNAME
+
+
+def _store_path(active_version: str, candidate_version: str) -> Path:
+    return _store_dir() / f"{active_version}__{candidate_version}.bin"
+
+
+def configure(version: Optional[str], sample_rate: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Start shadowing a registered version (or stop with version=None).
+
+    Records the choice in the manifest for the other workers. Blocking
+    (loads the candidate); raises UnknownModelVersion / ValueError.
+    """
+    rate = settings.shadow_sample_rate if sample_rate is None else sample_rate
+    if not 0.0 <= rate <= 1.0:
+        raise ValueError("sample_rate must be between 0 and 1")
+    shadow = {"version": version, "sample_rate": rate} if version else None
+    bundle = model_registry.load_bundle(version) if version else None
+    model_registry.set_shadow(shadow)
+    _activate(bundle, rate if version else 0.0)
+    return get_status()
+
+
+def sync(shadow: Optional[Dict[str, Any]]) -> None:
+    """Match this worker's candidate to the manifest's "shadow" entry."""
+    version = (shadow or {}).get("version")
+    rate = float((shadow or {}).get("sample_rate", 0.0))
+    current = _candidate.version if _candidate else None
+    if version == current:
+        _activate(_candidate, rate if version else 0.0)
+        return
+    try:
+        _activate(model_registry.load_bundle(version) if version else None, rate)
+    except Exception as e:
+        logger.error(f"Failed to load shadow model {version}: {e}")
+
+
+def _activate(bundle: Optional[ModelBundle], rate: float) -> None:
+    global _candidate, _sample_rate
+    with _state_lock:
+        _candidate, _sample_rate = bundle, rate
+    if bundle is not None:
+        logger.info(f"Shadow model {bundle.version} at sample rate {rate}")
+
+
+def get_status() -> Dict[str, Any]:
+    return {
+        "candidate": _candidate.version if _candidate else None,
+        "sample_rate": _sample_rate,
+        "pending": _pending,
+        "dropped": _dropped,
+    }
+
+
+def submit(features: Dict[str, float], active: Optional[ModelBundle]) -> bool:
+    """
+    Maybe queue a shadow comparison for one prediction.
+
+    features: the engineered features the active model scored
+    (predict_risk()["features_used"]). Returns True if queued.
+    """
+    global _pending, _dropped
+    candidate, rate = _candidate, _sample_rate
+    if candidate is None or active is None or candidate.version == active.version:
+        return False
+    if rate <= 0.0 or random.random() >= rate:
+        return False
+    with _state_lock:
+        if _pending >= MAX_PENDING:
+            _dropped += 1
+            return False
+        _pending += 1
+    _executor.submit(_run_comparison, dict(features), active, candidate)
+    return True
+
+
+def drain(timeout: float = 10.0) -> None:
+    """Block until every job queued so far has run (single worker, FIFO)."""
+    _executor.submit(lambda: None).result(timeout=timeout)
+
+
+def _score(bundle: ModelBundle, features: Dict[str, float]) -> tuple:
+    row = np.array([[features[col] for col in bundle.feature_columns]])
+    started = time.perf_counter()
+    score = bundle.backend.predict_proba(row)[0, 1]
+    return float(score), (time.perf_counter() - started) * 1000
+
+
+def _run_comparison(features: Dict[str, float], active: ModelBundle, candidate: ModelBundle) -> None:
+    global _pending
+    try:
+        active_score, active_ms = _score(active, features)
+        shadow_score, shadow_ms = _score(candidate, features)
+        record = np.array(
+            [(time.time(), active_score, shadow_score, active_ms, shadow_ms)], dtype=RECORD_DTYPE
+        )
+        path = _store_path(active.version, candidate.version)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # One write() per record on an O_APPEND descriptor
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        try:
+            os.write(fd, record.tobytes())
+        finally:
+            os.close(fd)
+    except Exception as e:
+        logger.error(f"Shadow comparison {active.version} vs {candidate.version} failed: {e}")
+    finally:
+        with _state_lock:
+            _pending -= 1
+
+
+def read_records(active_version: str, candidate_version: str, since: Optional[float] = None) -> np.ndarray:
+    """All stored comparisons for one pair (optionally newer than a UNIX time)."""
+    path = _store_path(active_version, candidate_version)
+    if not path.exists():
+        return np.empty(0, dtype=RECORD_DTYPE)
+    # Ignore a trailing partial record if a write is in progress
+    count = path.stat().st_size // RECORD_DTYPE.itemsize
+    records = np.fromfile(path, dtype=RECORD_DTYPE, count=count)
+    if since is not None:
+        records = records[records["timestamp"] >= since]
+    return records
+
+
+def _risk_levels(scores: np.ndarray) -> np.ndarray:
+    # Same cut-offs as classify_risk(): 0 = low, 1 = moderate, 2 = high
+    return np.searchsorted([0.5, 0.8], scores, side="right")
+
+
+def _latency(values: np.ndarray) -> Dict[str, float]:
+    p50, p95 = np.percentile(values, [50, 95])
+    return {"mean": round(float(values.mean()), 3), "p50": round(float(p50), 3), "p95": round(float(p95), 3)}
+
+
+def build_report(candidate_version: Optional[str] = None, since: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Comparison per (active, candidate) pair with stored samples.
+
+    candidate_version defaults to the current shadow candidate. Raises
+    ValueError for a name that isn't a registry version (it goes into a
+    file glob).
+    """
+    if candidate_version is not None and not model_registry.VERSION_PATTERN.match(candidate_version):
+        raise ValueError(f"Invalid model version '{candidate_version}'")
+    candidate_version = candidate_version or (_candidate.version if _candidate else None)
+    pairs: List[Dict[str, Any]] = []
+    if candidate_version and _store_dir().exists():
+        for path in sorted(_store_dir().glob(f"*__{candidate_version}.bin")):
+            active_version = path.stem.rsplit("__", 1)[0]
+            records = read_records(active_version, candidate_version, since)
+            if len(records) == 0:
+                continue
+            active_scores = records["active_score"].astype(np.float64)
+            shadow_scores = records["shadow_score"].astype(np.float64)
+            delta = shadow_scores - active_scores
+            abs_delta = np.abs(delta)
+            pairs.append({
+                "active_version": active_version,
+                "candidate_version": candidate_version,
+                "samples": int(len(records)),
+                "first_at": float(records["timestamp"].min()),
+                "last_at": float(records["timestamp"].max()),
+                "disagreement_rate": round(float(
+                    (_risk_levels(active_scores) != _risk_levels(shadow_scores)).mean()
+                ), 4),
+                "high_risk_flips": int(((active_scores >= 0.5) != (shadow_scores >= 0.5)).sum()),
+                "score_delta": {
+                    "mean": round(float(delta.mean()), 4),
+                    "mean_abs": round(float(abs_delta.mean()), 4),
+                    "p95_abs": round(float(np.percentile(abs_delta, 95)), 4),
+                    "max_abs": round(float(abs_delta.max()), 4),
+                },
+                "latency_ms": {
+                    "active": _latency(records["active_ms"].astype(np.float64)),
+                    "candidate": _latency(records["shadow_ms"].astype(np.float64)),
+                },
+            })
+    return {"candidate": candidate_version, "status": get_status(), "pairs": pairs}
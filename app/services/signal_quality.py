@@ -0,0 +1,259 @@
+"""
+Ingest-time signal quality scoring for vital sign readings.
+
+Scores a batch of readings in one vectorized pass and sets each one's
+confidence_score and is_valid before it is stored. Latest-reading
+lookups, summaries, the patient overview, realtime push, anomaly
+detection, trends, session aggregation and risk all filter on is_valid,
+so flagged readings stay out of them without any query-time scoring.
+The history endpoints still return flagged rows, with is_valid and
+confidence_score on each, so charts can show or grey them out.
+
+# =============================================================================
+# FILE MAP - QUICK NAVIGATION
+# =============================================================================
+# CONSTANTS............................ Line 53
+#
+# FUNCTIONS
+#   - score_signal()................... Line 111 (Arrays -> confidence/valid)
+#   - flag_names()..................... Line 178 (Bitmask -> names)
+#   - load_context()................... Line 183 (Recent valid readings)
+#   - score_columns()/score_readings(). Line 207 (Ingest entry points)
+#
+# BUSINESS CONTEXT:
+# - Checks (all on the time-ordered batch plus a few earlier readings):
+#   - out_of_range: HR outside 30-250 bpm
+#   - flatline: the same HR for 10+ readings over 60+ s (stuck sensor)
+#   - spike: an HR jump faster than any heart can manage that reverses
+#     on the next reading; a one-way jump (step) only lowers confidence
+#   - motion: HR zig-zagging up and down by 8+ bpm reading after reading
+#   - spo2_spike / spo2_step: SpO2 moving faster than blood can
+#     desaturate; spo2_dropout: SpO2 missing between readings that have it
+# - confidence_score = product of the failed checks' factors;
+#   is_valid = confidence_score >= 0.5 and HR in range
+# - Readings with is_valid=False are still stored (audit, device
+#   debugging) but raise no alerts and don't become the patient's latest
+#   vitals
+# =============================================================================
+"""
+
+import logging
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.models.vital_signs import VitalSignRecord
+
+logger = logging.getLogger(__name__)
+
+# Same range POST /vitals has always enforced
+HR_MIN_BPM = 30
+HR_MAX_BPM = 250
+
+# Stuck sensor: identical HR for this many readings spanning this long
+FLATLINE_MIN_READINGS = 10
+FLATLINE_MIN_SECONDS = 60
+
+# Impossible HR change: at least this big and this fast
+HR_JUMP_BPM = 25
+HR_MAX_RATE_BPM_PER_S = 4.0
+
+# Motion artifact: HR direction flips with swings of this size, this many
+# times within MOTION_WINDOW consecutive readings
+MOTION_MIN_SWING_BPM = 8
+MOTION_WINDOW = 6
+MOTION_MIN_FLIPS = 3
+
+# SpO2 can't fall/rise this much this fast physiologically
+SPO2_JUMP_PCT = 4.0
+SPO2_MAX_RATE_PCT_PER_S = 0.5
+
+# Gaps between readings are floored at this (duplicate/missing timestamps)
+MIN_INTERVAL_SECONDS = 1.0
+
+# Earlier readings loaded to judge the first readings of a batch
+CONTEXT_READINGS = 10
+
+# Below this confidence a reading is stored with is_valid=False
+MIN_VALID_CONFIDENCE = 0.5
+
+# Check name -> (bit, confidence factor)
+QUALITY_CHECKS = {
+    "out_of_range": (1, 0.0),
+    "flatline": (2, 0.2),
+    "spike": (4, 0.1),
+    "step": (8, 0.7),
+    "motion": (16, 0.4),
+    "spo2_spike": (32, 0.4),
+    "spo2_step": (64, 0.8),
+    "spo2_dropout": (128, 0.9),
+}
+
+
+def _jumps(values: np.ndarray, dt: np.ndarray, min_jump: float,
+           max_rate: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Per reading: (impossible jump into it, spike = jump in that reverses straight out)."""
+    delta = np.diff(values)
+    jump = (np.abs(delta) >= min_jump) & (np.abs(delta) / dt > max_rate)
+    jump_in = np.concatenate([[False], jump])
+    jump_out = np.concatenate([jump, [False]])
+    delta_in = np.concatenate([[0.0], delta])
+    delta_out = np.concatenate([delta, [0.0]])
+    spike = jump_in & jump_out & (np.sign(delta_in) != np.sign(delta_out))
+    # The reading after a spike is the return to normal, not a step
+    after_spike = np.concatenate([[False], spike[:-1]])
+    return jump_in & ~spike & ~after_spike, spike
+
+
+def score_signal(seconds, heart_rates, spo2s=None) -> Dict[str, np.ndarray]:
+    """
+    Quality of time-ordered readings.
+
+    seconds: reading times (ascending); heart_rates: bpm; spo2s: % with
+    NaN for missing. Returns "confidence" (0-1), "is_valid" (bool) and
+    "flags" (QUALITY_CHECKS bitmask) arrays, one entry per reading.
+    """
+    t = np.asarray(seconds, dtype=np.float64)
+    hr = np.asarray(heart_rates, dtype=np.float64)
+    spo2 = np.asarray(spo2s if spo2s is not None else np.full(len(hr), np.nan), dtype=np.float64)
+    n = len(hr)
+    checks: Dict[str, np.ndarray] = {}
+
+    checks["out_of_range"] = (hr < HR_MIN_BPM) | (hr > HR_MAX_BPM)
+
+    if n > 1:
+        dt = np.maximum(np.diff(t), MIN_INTERVAL_SECONDS)
+
+        # Runs of identical HR: length and time span of the run each reading is in
+        starts = np.concatenate([[0], np.flatnonzero(np.diff(hr) != 0) + 1])
+        ends = np.concatenate([starts[1:], [n]])
+        lengths = ends - starts
+        spans = t[ends - 1] - t[starts]
+        checks["flatline"] = (
+            np.repeat(lengths, lengths) >= FLATLINE_MIN_READINGS
+        ) & (np.repeat(spans, lengths) >= FLATLINE_MIN_SECONDS)
+
+        checks["step"], checks["spike"] = _jumps(hr, dt, HR_JUMP_BPM, HR_MAX_RATE_BPM_PER_S)
+
+        # Direction flips with a big swing on both sides, counted per window
+        delta = np.diff(hr)
+        flips = (delta[:-1] * delta[1:] < 0) & (np.abs(delta[:-1]) >= MOTION_MIN_SWING_BPM) \
+            & (np.abs(delta[1:]) >= MOTION_MIN_SWING_BPM)
+        window = MOTION_WINDOW - 2  # flips that fit in MOTION_WINDOW readings
+        motion = np.zeros(n, dtype=bool)
+        if len(flips) >= window:
+            busy = np.convolve(flips, np.ones(window, dtype=int), mode="valid") >= MOTION_MIN_FLIPS
+            # Window k covers readings k .. k + MOTION_WINDOW - 1
+            covered = np.convolve(busy, np.ones(MOTION_WINDOW, dtype=int), mode="full")[:n] > 0
+            motion[:len(covered)] = covered
+        checks["motion"] = motion
+
+        has_spo2 = ~np.isnan(spo2)
+        checks["spo2_dropout"] = ~has_spo2 & (
+            np.concatenate([[False], has_spo2[:-1]]) & np.concatenate([has_spo2[1:], [False]])
+        )
+        spo2_step, spo2_spike = np.zeros(n, dtype=bool), np.zeros(n, dtype=bool)
+        measured = np.flatnonzero(has_spo2)
+        if len(measured) > 1:
+            # Compare each SpO2 with the previous reading that had one
+            gaps = np.maximum(np.diff(t[measured]), MIN_INTERVAL_SECONDS)
+            step, spike = _jumps(spo2[measured], gaps, SPO2_JUMP_PCT, SPO2_MAX_RATE_PCT_PER_S)
+            spo2_step[measured], spo2_spike[measured] = step, spike
+        checks["spo2_step"], checks["spo2_spike"] = spo2_step, spo2_spike
+
+    confidence = np.ones(n)
+    flags = np.zeros(n, dtype=np.uint8)
+    for name, hit in checks.items():
+        bit, factor = QUALITY_CHECKS[name]
+        confidence[hit] *= factor
+        flags[hit] |= bit
+    confidence = np.round(confidence, 3)
+    is_valid = (confidence >= MIN_VALID_CONFIDENCE) & ~checks["out_of_range"]
+    return {"confidence": confidence, "is_valid": is_valid, "flags": flags}
+
+
+def flag_names(flags: int) -> List[str]:
+    """Names of the checks set in a flags bitmask."""
+    return [name for name, (bit, _) in QUALITY_CHECKS.items() if flags & bit]
+
+
+def load_context(db: Session, user_id: int, before: datetime,
+                 limit: int = CONTEXT_READINGS) -> List[Tuple[datetime, int, Optional[float]]]:
+    """
+    The user's last valid readings before a batch, oldest first, as
+    (timestamp, heart_rate, spo2). One indexed query on (user_id, timestamp).
+    """
+    rows = db.execute(
+        select(VitalSignRecord.timestamp, VitalSignRecord.heart_rate, VitalSignRecord.spo2)
+        .where(
+            VitalSignRecord.user_id == user_id,
+            VitalSignRecord.timestamp < before,
+            VitalSignRecord.is_valid == True,
+        )
+        .order_by(VitalSignRecord.timestamp.desc())
+        .limit(limit)
+    ).all()
+    return [tuple(row) for row in reversed(rows)]
+
+
+def _utc_seconds(ts: datetime) -> float:
+    # SQLite hands back naive timestamps (stored as UTC)
+    return (ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)).timestamp()
+
+
+def score_columns(
+    seconds: np.ndarray,
+    heart_rates: np.ndarray,
+    spo2s: np.ndarray,
+    context: Sequence[Tuple[datetime, int, Optional[float]]] = (),
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (confidence_score, is_valid) arrays for readings given as columns
+    (epoch seconds, bpm, SpO2 with NaN for missing), in input order.
+
+    Readings are scored in timestamp order after `context` (see load_context()).
+    """
+    t = np.concatenate([[_utc_seconds(ts) for ts, _, _ in context], np.asarray(seconds, dtype=np.float64)])
+    hr = np.concatenate([[hr for _, hr, _ in context], np.asarray(heart_rates, dtype=np.float64)])
+    spo2 = np.concatenate([
+        [np.nan if v is None else v for _, _, v in context], np.asarray(spo2s, dtype=np.float64)
+    ])
+
+    # Stable sort keeps arrival order for equal timestamps; context sorts first
+    order = np.argsort(t, kind="stable")
+    scores = score_signal(t[order], hr[order], spo2[order])
+    confidence = np.empty(len(t))
+    is_valid = np.empty(len(t), dtype=bool)
+    confidence[order] = scores["confidence"]
+    is_valid[order] = scores["is_valid"]
+
+    new = slice(len(context), None)
+    flagged = int((~is_valid[new]).sum())
+    if flagged:
+        logger.info(f"Signal quality: {flagged} of {len(t) - len(context)} readings marked invalid")
+    return confidence[new], is_valid[new]
+
+
+def score_readings(
+    readings: Sequence,
+    context: Sequence[Tuple[datetime, int, Optional[float]]] = (),
+    received_at: Optional[datetime] = None,
+) -> Tuple[List[float], List[bool]]:
+    """
+    (confidence_score, is_valid) for each VitalSignCreate, in input order.
+
+    See score_columns(); readings without a timestamp count as received_at.
+    """
+    if not readings:
+        return [], []
+    received_at = received_at or datetime.now(timezone.utc)
+    confidence, is_valid = score_columns(
+        np.array([_utc_seconds(r.timestamp or received_at) for r in readings]),
+        np.array([r.heart_rate for r in readings], dtype=np.float64),
+        np.array([np.nan if r.spo2 is None else r.spo2 for r in readings], dtype=np.float64),
+        context,
+    )
+    return confidence.tolist(), is_valid.tolist()
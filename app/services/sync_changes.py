@@ -0,0 +1,170 @@
+"""
+Delta sync for the mobile app's local cache.
+
+Answers "what changed for this patient since cursor X" so the app stops
+re-downloading /vitals/history, /alerts and /activities windows.
+
+# =============================================================================
+# FILE MAP - QUICK NAVIGATION
+# =============================================================================
+# CONSTANTS............................ Line 52
+#
+# FUNCTIONS
+#   - encode_cursor().................. Line 63  (Positions -> opaque token)
+#   - decode_cursor().................. Line 69  (Token -> positions)
+#   - _settled_prefix()................ Line 87  (Commit-lag page cut)
+#   - fetch_changes().................. Line 100 (One page of changes)
+#
+# BUSINESS CONTEXT:
+# - The cursor holds two positions: the last sync_changes.change_id seen
+#   (alerts, risk assessments, recommendations, activity sessions) and the
+#   last vital_signs.reading_id seen (vitals are append-only, so their own
+#   id orders them and they skip the change log)
+# - Both are keyset scans on (user_id, id) indexes: a sync with nothing
+#   new is two index probes, whatever the size of the history
+# - Several changes to one row within a page come back once, as the row's
+#   current state; rows deleted since come back in "deleted"
+# - No cursor = from the beginning (first sync of a new device)
+# - Ids are handed out at INSERT, before commit, so a later id can become
+#   visible first. A page stops at the first row written less than
+#   sync_commit_lag_seconds ago and the cursor never moves past it, so a
+#   transaction that finishes within the lag is never passed over; the
+#   newest rows just wait for the next sync
+# =============================================================================
+"""
+
+import base64
+import binascii
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.activity import ActivitySession
+from app.models.alert import Alert
+from app.models.recommendation import ExerciseRecommendation
+from app.models.risk_assessment import RiskAssessment
+from app.models.sync_change import OPERATION_DELETE, SyncChange
+from app.models.vital_signs import VitalSignRecord
+
+# Entity name in sync_changes -> model
+ENTITY_MODELS = {
+    "alerts": Alert,
+    "risk_assessments": RiskAssessment,
+    "recommendations": ExerciseRecommendation,
+    "activities": ActivitySession,
+}
+
+DEFAULT_PAGE_SIZE = 500
+MAX_PAGE_SIZE = 1000
+
+
+def encode_cursor(change_id: int, reading_id: int) -> str:
+    """Opaque cursor for the client to send back as ?since=."""
+    token = f"{change_id}.{reading_id}".encode()
+    return base64.urlsafe_b64encode(token).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> Tuple[int, int]:
+    """
+    (change_id, reading_id) positions of a cursor; (0, 0) when None.
+
+    Raises ValueError for a token this server didn't issue.
+    """
+    if not cursor:
+        return 0, 0
+    try:
+        token = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        change_id, reading_id = (int(part) for part in token.split("."))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError("Invalid sync cursor")
+    if change_id < 0 or reading_id < 0:
+        raise ValueError("Invalid sync cursor")
+    return change_id, reading_id
+
+
+def _settled_prefix(rows: List[Any], written_at: str, settled_before: datetime) -> List[Any]:
+    """Rows up to (not including) the first one written after settled_before."""
+    for i, row in enumerate(rows):
+        stamp = getattr(row, written_at)
+        if stamp is None:
+            continue
+        if stamp.tzinfo is None:
+            stamp = stamp.replace(tzinfo=timezone.utc)
+        if stamp > settled_before:
+            return rows[:i]
+    return rows
+
+
+def fetch_changes(
+    db: Session,
+    user_id: int,
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+) -> Dict[str, Any]:
+    """
+    One page of a patient's changes after the cursor.
+
+    Up to `limit` change-log entries and up to `limit` new readings.
+    Returns the changed rows per entity ("vitals", "alerts",
+    "risk_assessments", "recommendations", "activities"), "deleted"
+    ({"entity", "id"} per row), the next "cursor" and "has_more" (call
+    again with the new cursor). Raises ValueError for a bad cursor.
+
+    Rows newer than settings.sync_commit_lag_seconds are left for a later
+    call (see BUSINESS CONTEXT).
+    """
+    change_id, reading_id = decode_cursor(cursor)
+    settled_before = datetime.now(timezone.utc) - timedelta(seconds=settings.sync_commit_lag_seconds)
+
+    entries = (
+        db.query(
+            SyncChange.change_id, SyncChange.entity, SyncChange.entity_id, SyncChange.operation,
+            SyncChange.changed_at,
+        )
+        .filter(SyncChange.user_id == user_id, SyncChange.change_id > change_id)
+        .order_by(SyncChange.change_id)
+        .limit(limit + 1)
+        .all()
+    )
+    vitals = (
+        db.query(VitalSignRecord)
+        .filter(VitalSignRecord.user_id == user_id, VitalSignRecord.reading_id > reading_id)
+        .order_by(VitalSignRecord.reading_id)
+        .limit(limit + 1)
+        .all()
+    )
+    # End each page at the first row too recent to be sure every lower id
+    # has committed
+    entries = _settled_prefix(entries, "changed_at", settled_before)
+    vitals = _settled_prefix(vitals, "created_at", settled_before)
+    has_more = len(entries) > limit or len(vitals) > limit
+    entries, vitals = entries[:limit], vitals[:limit]
+
+    # Last operation per row wins
+    latest: Dict[Tuple[str, int], str] = {}
+    for entry in entries:
+        latest[(entry.entity, entry.entity_id)] = entry.operation
+
+    changes: Dict[str, Any] = {"vitals": vitals}
+    for entity, model in ENTITY_MODELS.items():
+        ids = [entity_id for (name, entity_id), op in latest.items() if name == entity and op != OPERATION_DELETE]
+        rows: List[Any] = []
+        if ids:
+            key = model.__mapper__.primary_key[0]
+            # A row missing here was deleted after this page; its delete entry comes later
+            rows = db.query(model).filter(key.in_(ids), model.user_id == user_id).order_by(key).all()
+        changes[entity] = rows
+    changes["deleted"] = [
+        {"entity": entity, "id": entity_id}
+        for (entity, entity_id), op in latest.items()
+        if op == OPERATION_DELETE
+    ]
+
+    changes["cursor"] = encode_cursor(
+        entries[-1].change_id if entries else change_id,
+        vitals[-1].reading_id if vitals else reading_id,
+    )
+    changes["has_more"] = has_more
+    return changes
@@ -0,0 +1,165 @@
+"""
+Vital sign threshold alerts.
+
+Builds the Alert rows for readings that cross fixed safety thresholds.
+Shared by the POST /vitals background check, the WebSocket ingest
+channel and the binary batch upload so all raise the same alerts.
+
+# =============================================================================
+# FILE MAP - QUICK NAVIGATION
+# =============================================================================
+# CONSTANTS............................ Line 36  (Thresholds)
+# FUNCTIONS
+#   - heart_rate_alert()............... Line 42  (HR > 180, critical)
+#   - spo2_alert()..................... Line 63  (SpO2 < 90, critical)
+#   - blood_pressure_alert()........... Line 84  (Systolic > 160, warning)
+#   - build_threshold_alerts()......... Line 106 (One reading)
+#   - build_batch_threshold_alerts()... Line 116 (Worst reading per type)
+#   - build_column_threshold_alerts().. Line 142 (Same, from NumPy columns)
+#
+# BUSINESS CONTEXT:
+# - Returned alerts are NOT added to a session; callers store them
+# - A batch raises at most one alert per type (its most extreme reading),
+#   so a burst of 1 Hz readings doesn't write one alert per second
+# =============================================================================
+"""
+
+import logging
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from app.models.alert import Alert, AlertType, SeverityLevel
+
+logger = logging.getLogger(__name__)
+
+# Safety thresholds
+HIGH_HEART_RATE_BPM = 180
+LOW_SPO2_PERCENT = 90
+HIGH_SYSTOLIC_MMHG = 160
+
+
+def heart_rate_alert(user_id: int, heart_rate: Optional[int]) -> Optional[Alert]:
+    """Critical alert when heart rate exceeds 180 BPM."""
+    if heart_rate is None or heart_rate <= HIGH_HEART_RATE_BPM:
+        return None
+    logger.warning(f"High heart rate alert for user {user_id}: {heart_rate} BPM")
+    return Alert(
+        user_id=user_id,
+        alert_type=AlertType.HIGH_HEART_RATE.value,
+        severity=SeverityLevel.CRITICAL.value,
+        title="High Heart Rate Detected",
+        message=f"Heart rate of {heart_rate} BPM exceeds safe threshold of 180 BPM",
+        action_required="Rest immediately and monitor. Contact healthcare provider if symptoms persist.",
+        trigger_value=f"{heart_rate} BPM",
+        threshold_value="180 BPM",
+        acknowledged=False,
+        is_sent_to_user=True,
+        is_sent_to_caregiver=True,
+        is_sent_to_clinician=True
+    )
+
+
+def spo2_alert(user_id: int, spo2: Optional[float]) -> Optional[Alert]:
+    """Critical alert when blood oxygen drops below 90%."""
+    if not spo2 or spo2 >= LOW_SPO2_PERCENT:
+        return None
+    logger.warning(f"Low oxygen alert for user {user_id}: {spo2}%")
+    return Alert(
+        user_id=user_id,
+        alert_type=AlertType.LOW_SPO2.value,
+        severity=SeverityLevel.CRITICAL.value,
+        title="Low Blood Oxygen Detected",
+        message=f"Blood oxygen saturation of {spo2}% is below safe threshold of 90%",
+        action_required="Seek immediate medical attention. This may indicate respiratory distress.",
+        trigger_value=f"{spo2}%",
+        threshold_value="90%",
+        acknowledged=False,
+        is_sent_to_user=True,
+        is_sent_to_caregiver=True,
+        is_sent_to_clinician=True
+    )
+
+
+def blood_pressure_alert(user_id: int, systolic: Optional[int], diastolic: Optional[int]) -> Optional[Alert]:
+    """Warning alert when systolic pressure exceeds 160 mmHg."""
+    if not systolic or systolic <= HIGH_SYSTOLIC_MMHG:
+        return None
+    # Include both systolic and diastolic in trigger value for context
+    bp_display = f"{systolic}/{diastolic or 'N/A'} mmHg"
+    logger.warning(f"High blood pressure alert for user {user_id}: {bp_display}")
+    return Alert(
+        user_id=user_id,
+        alert_type=AlertType.HIGH_BLOOD_PRESSURE.value,
+        severity=SeverityLevel.WARNING.value,
+        title="Elevated Blood Pressure",
+        message=f"Systolic blood pressure of {systolic} mmHg exceeds threshold",
+        action_required="Monitor blood pressure and consult healthcare provider if elevated readings persist.",
+        trigger_value=bp_display,
+        threshold_value="160/100 mmHg",
+        acknowledged=False,
+        is_sent_to_user=True,
+        is_sent_to_clinician=True
+    )
+
+
+def build_threshold_alerts(user_id: int, vital_data) -> List[Alert]:
+    """Alerts for a single VitalSignCreate-style reading."""
+    candidates = [
+        heart_rate_alert(user_id, vital_data.heart_rate),
+        spo2_alert(user_id, vital_data.spo2),
+        blood_pressure_alert(user_id, vital_data.blood_pressure_systolic, vital_data.blood_pressure_diastolic),
+    ]
+    return [alert for alert in candidates if alert is not None]
+
+
+def build_batch_threshold_alerts(user_id: int, readings: Sequence) -> List[Alert]:
+    """
+    Alerts for a batch of readings, at most one per alert type.
+
+    Each alert reports the batch's most extreme value for that metric.
+    """
+    if not readings:
+        return []
+
+    peak_hr = max(r.heart_rate for r in readings)
+    spo2_values = [r.spo2 for r in readings if r.spo2]
+    bp_readings = [r for r in readings if r.blood_pressure_systolic]
+    worst_bp = max(bp_readings, key=lambda r: r.blood_pressure_systolic) if bp_readings else None
+
+    candidates = [
+        heart_rate_alert(user_id, peak_hr),
+        spo2_alert(user_id, min(spo2_values) if spo2_values else None),
+        blood_pressure_alert(
+            user_id,
+            worst_bp.blood_pressure_systolic if worst_bp else None,
+            worst_bp.blood_pressure_diastolic if worst_bp else None,
+        ),
+    ]
+    return [alert for alert in candidates if alert is not None]
+
+
+def build_column_threshold_alerts(user_id: int, heart_rates, spo2s, systolic, diastolic) -> List[Alert]:
+    """
+    build_batch_threshold_alerts() for readings given as NumPy columns
+    (NaN = missing), without building a reading object per row.
+    """
+    if len(heart_rates) == 0:
+        return []
+
+    spo2s = np.asarray(spo2s, dtype=np.float64)
+    systolic = np.asarray(systolic, dtype=np.float64)
+    measured_spo2 = spo2s[~np.isnan(spo2s) & (spo2s > 0)]
+    worst_bp = int(np.nanargmax(systolic)) if not np.isnan(systolic).all() else None
+    diastolic_at_worst = diastolic[worst_bp] if worst_bp is not None else np.nan
+
+    candidates = [
+        heart_rate_alert(user_id, int(np.max(heart_rates))),
+        spo2_alert(user_id, float(measured_spo2.min()) if len(measured_spo2) else None),
+        blood_pressure_alert(
+            user_id,
+            int(systolic[worst_bp]) if worst_bp is not None else None,
+            None if np.isnan(diastolic_at_worst) else int(diastolic_at_worst),
+        ),
+    ]
+    return [alert for alert in candidates if alert is not None]
@@ -0,0 +1,319 @@
+"""
+Streaming vitals ingest.
+
+Buffers readings arriving on the WebSocket ingest channel and writes them
+to vital_signs in batches, instead of one HTTP request + commit per
+reading.
+
+# =============================================================================
+# FILE MAP - QUICK NAVIGATION
+# =============================================================================
+# CLASSES
+#   - IngestBuffer..................... Line 61  (Size/time flush trigger)
+#
+# FUNCTIONS
+#   - stamp_missing_timestamps()....... Line 98  (Distinct receive times)
+#   - parse_readings()................. Line 111 (JSON frame -> readings)
+#   - insert_new_vitals().............. Line 147 (INSERT ... ON CONFLICT DO NOTHING)
+#   - flush_readings()................. Line 167 (Bulk insert + alerts)
+#   - flush_columns().................. Line 234 (Same, from binary columns)
+#
+# BUSINESS CONTEXT:
+# - Auth happens once per connection, not once per reading
+# - A flush is one quality-scoring pass (see signal_quality), one
+#   multi-row INSERT, one alert check over the batch's valid readings, one
+#   latest-state update and one commit
+# - Inserts skip readings already stored for the same user, device and
+#   timestamp, so a client can resend a batch it isn't sure arrived
+# - Alerts go through the shared cooldown, so a sustained episode alerts
+#   once per window rather than once per flush
+# - Flush every INGEST_FLUSH_MAX_READINGS readings or
+#   INGEST_FLUSH_INTERVAL_MS after the first buffered reading
+# =============================================================================
+"""
+
+import json
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Result
+from sqlalchemy.orm import Session
+
+from app.models.vital_signs import VitalSignRecord
+from app.schemas.vital_signs import VitalSignCreate
+from app.services.patient_state import record_vitals, record_alerts_created
+from app.services.realtime_hub import publish_vitals, publish_alerts
+from app.services.signal_quality import load_context, score_columns, score_readings
+from app.services.vital_thresholds import build_batch_threshold_alerts, build_column_threshold_alerts
+from app.services.alert_cooldown import alert_cooldown
+from app.services.alert_counters import count_alerts_created
+
+logger = logging.getLogger(__name__)
+
+
+class IngestBuffer:
+    """Readings waiting to be written, with size and age flush triggers."""
+
+    def __init__(self, max_readings: int, interval_ms: int):
+        self.max_readings = max(1, max_readings)
+        self.interval_seconds = max(0, interval_ms) / 1000.0
+        self.readings: List[VitalSignCreate] = []
+        self.rejected = 0
+        self._first_at: Optional[float] = None
+
+    def __len__(self) -> int:
+        return len(self.readings)
+
+    def extend(self, readings: List[VitalSignCreate]) -> None:
+        if readings and self._first_at is None:
+            self._first_at = time.monotonic()
+        self.readings.extend(readings)
+
+    def is_full(self) -> bool:
+        return len(self.readings) >= self.max_readings
+
+    def seconds_until_due(self) -> Optional[float]:
+        """Time left before a timed flush, or None when the buffer is empty."""
+        if self._first_at is None:
+            return None
+        elapsed = time.monotonic() - self._first_at
+        return max(0.0, self.interval_seconds - elapsed)
+
+    def drain(self) -> Tuple[List[VitalSignCreate], int]:
+        """Take everything buffered (readings, rejected count) and reset."""
+        readings, rejected = self.readings, self.rejected
+        self.readings = []
+        self.rejected = 0
+        self._first_at = None
+        return readings, rejected
+
+
+def stamp_missing_timestamps(readings: List[VitalSignCreate], received_at: datetime) -> None:
+    """
+    Give readings sent without a timestamp the receive time, 1 ms apart.
+
+    Readings of one request share received_at; without the offset, several
+    from one device would collide on (user_id, device_id, timestamp) and
+    all but the first would be skipped as duplicates.
+    """
+    for index, reading in enumerate(readings):
+        if reading.timestamp is None:
+            reading.timestamp = received_at + timedelta(milliseconds=index)
+
+
+def parse_readings(message: str) -> Tuple[List[VitalSignCreate], int]:
+    """
+    Parse one WebSocket text frame into validated readings.
+
+    Accepts a single reading object, a list of readings, or
+    {"readings": [...]}. Returns (valid readings, rejected count).
+    Readings without a timestamp are stamped with the receive time (see
+    stamp_missing_timestamps()).
+    """
+    try:
+        payload = json.loads(message)
+    except ValueError:
+        return [], 1
+
+    if isinstance(payload, dict) and "readings" in payload:
+        payload = payload["readings"]
+    items = payload if isinstance(payload, list) else [payload]
+
+    received_at = datetime.now(timezone.utc)
+    readings: List[VitalSignCreate] = []
+    rejected = 0
+    for item in items:
+        try:
+            reading = VitalSignCreate.model_validate(item)
+        except ValidationError:
+            rejected += 1
+            continue
+        if reading.spo2 is not None and reading.spo2 < 70:
+            # Same rule as POST /vitals: below 70% is a sensor error
+            rejected += 1
+            continue
+        readings.append(reading)
+    stamp_missing_timestamps(readings, received_at)
+    return readings, rejected
+
+
+def insert_new_vitals(db: Session, rows: List[Dict[str, Any]], *returning) -> Result:
+    """
+    Multi-row INSERT into vital_signs that skips readings already stored.
+
+    A reading is a duplicate when its (user_id, device_id, timestamp) is
+    taken (uq_vital_user_device_timestamp), e.g. an offline sync resent
+    after a dropped response. Duplicates are left out with
+    ON CONFLICT DO NOTHING, so RETURNING only yields the inserted rows, in
+    the order given.
+    """
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        stmt = postgresql_insert(VitalSignRecord).on_conflict_do_nothing()
+    elif dialect == "sqlite":
+        stmt = sqlite_insert(VitalSignRecord).on_conflict_do_nothing()
+    else:
+        stmt = insert(VitalSignRecord)
+    return db.execute(stmt.returning(*returning, sort_by_parameter_order=True), rows)
+
+
+def flush_readings(db: Session, user_id: int, readings: List[VitalSignCreate]) -> Dict[str, Any]:
+    """
+    Write a batch of readings and raise any threshold alerts.
+
+    Runs synchronously (call it from a threadpool in async code) and
+    commits the caller's session. Readings already stored are counted
+    as duplicates and don't alert again.
+    """
+    if not readings:
+        return {"stored": 0, "duplicates": 0, "alerts": 0}
+
+    context = load_context(db, user_id, min(r.timestamp for r in readings))
+    confidence, valid = score_readings(readings, context)
+    rows = [
+        {
+            "user_id": user_id,
+            "heart_rate": r.heart_rate,
+            "spo2": r.spo2,
+            "systolic_bp": r.blood_pressure_systolic,
+            "diastolic_bp": r.blood_pressure_diastolic,
+            "hrv": r.hrv,
+            "source_device": r.source_device,
+            "device_id": r.device_id,
+            "timestamp": r.timestamp,
+            "is_valid": is_valid,
+            "confidence_score": score,
+        }
+        for r, score, is_valid in zip(readings, confidence, valid)
+    ]
+
+    # One multi-row INSERT ... RETURNING instead of one ORM add per reading
+    stored = insert_new_vitals(db, rows, VitalSignRecord).scalars().all()
+
+    # Readings that failed the quality check are kept but don't alert or become "latest"
+    good = [row for row in stored if row.is_valid]
+    newest = record_vitals(db, user_id, good)
+    alerts = alert_cooldown.filter_alerts(db, build_batch_threshold_alerts(user_id, good))
+    try:
+        if alerts:
+            db.add_all(alerts)
+            record_alerts_created(db, user_id, alerts)
+            count_alerts_created(db, alerts)
+        db.commit()
+    except Exception:
+        # Nothing was stored, so these types mustn't stay in cooldown
+        alert_cooldown.release(alerts)
+        raise
+
+    if newest is not None:
+        publish_vitals(user_id, [newest])
+    if alerts:
+        publish_alerts(user_id, alerts)
+
+    duplicates = len(readings) - len(stored)
+    logger.info(
+        f"Ingest flush for user {user_id}: {len(stored)} readings ({len(stored) - len(good)} invalid, "
+        f"{duplicates} duplicate), {len(alerts)} alert(s)"
+    )
+    return {"stored": len(stored), "duplicates": duplicates, "alerts": len(alerts)}
+
+
+def _nullable(values: np.ndarray, cast) -> List[Any]:
+    """Column as Python values with None for NaN (bulk insert parameters)."""
+    missing = np.isnan(values)
+    return [None if gap else cast(v) for v, gap in zip(values.tolist(), missing.tolist())]
+
+
+def flush_columns(
+    db: Session,
+    user_id: int,
+    columns: Dict[str, np.ndarray],
+    source_device: Optional[str] = None,
+    device_id: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Write readings decoded by vitals_wire.decode_vitals_batch().
+
+    Same steps as flush_readings() (quality scoring, one multi-row
+    INSERT skipping duplicates, batch alerts, latest state, one commit)
+    but straight from the column arrays, without a VitalSignCreate per
+    reading.
+    """
+    timestamps_ms = columns["timestamp_ms"]
+    n = len(timestamps_ms)
+    if n == 0:
+        return {"stored": 0, "duplicates": 0, "invalid": 0, "alerts": 0}
+
+    seconds = timestamps_ms / 1000.0
+    first = datetime.fromtimestamp(float(seconds.min()), timezone.utc)
+    confidence, valid = score_columns(
+        seconds, columns["heart_rate"], columns["spo2"], load_context(db, user_id, first)
+    )
+
+    timestamps = [datetime.fromtimestamp(ms / 1000.0, timezone.utc) for ms in timestamps_ms.tolist()]
+    params = {
+        "timestamp": timestamps,
+        "heart_rate": columns["heart_rate"].tolist(),
+        "spo2": _nullable(columns["spo2"], float),
+        "systolic_bp": _nullable(columns["systolic_bp"], int),
+        "diastolic_bp": _nullable(columns["diastolic_bp"], int),
+        "hrv": _nullable(columns["hrv"], float),
+        "is_valid": valid.tolist(),
+        "confidence_score": confidence.tolist(),
+    }
+    rows = [
+        dict(zip(params, values), user_id=user_id, source_device=source_device, device_id=device_id)
+        for values in zip(*params.values())
+    ]
+    # Inserted rows come back with their alerting columns (duplicates don't);
+    # the newest valid row is loaded alone for the latest state
+    inserted = insert_new_vitals(
+        db, rows,
+        VitalSignRecord.reading_id, VitalSignRecord.timestamp, VitalSignRecord.is_valid,
+        VitalSignRecord.heart_rate, VitalSignRecord.spo2,
+        VitalSignRecord.systolic_bp, VitalSignRecord.diastolic_bp,
+    ).all()
+    good = [row for row in inserted if row.is_valid]
+
+    newest = None
+    if good:
+        newest_row = max(good, key=lambda row: row.timestamp)
+        newest = record_vitals(db, user_id, [db.get(VitalSignRecord, newest_row.reading_id)])
+    # dtype=float turns NULL columns back into NaN
+    alerts = alert_cooldown.filter_alerts(db, build_column_threshold_alerts(
+        user_id,
+        np.array([row.heart_rate for row in good], dtype=np.int64),
+        np.array([row.spo2 for row in good], dtype=np.float64),
+        np.array([row.systolic_bp for row in good], dtype=np.float64),
+        np.array([row.diastolic_bp for row in good], dtype=np.float64),
+    ))
+    try:
+        if alerts:
+            db.add_all(alerts)
+            record_alerts_created(db, user_id, alerts)
+            count_alerts_created(db, alerts)
+        db.commit()
+    except Exception:
+        # Nothing was stored, so these types mustn't stay in cooldown
+        alert_cooldown.release(alerts)
+        raise
+
+    if newest is not None:
+        publish_vitals(user_id, [newest])
+    if alerts:
+        publish_alerts(user_id, alerts)
+
+    stored = len(inserted)
+    invalid = stored - len(good)
+    logger.info(
+        f"Binary batch for user {user_id}: {stored} readings ({invalid} invalid, "
+        f"{n - stored} duplicate), {len(alerts)} alert(s)"
+    )
+    return {"stored": stored, "duplicates": n - stored, "invalid": invalid, "alerts": len(alerts)}
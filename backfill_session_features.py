@@ -0,0 +1,39 @@
+"""
+Store model features and risk scores for ended sessions that have none.
+
+Sessions ended through POST /activities/end/{id} get them automatically;
+this fills older rows (run after migrations/add_session_feature_store.sql)
+using the active model version.
+
+Usage:
+    python backfill_session_features.py [--limit N] [--batch-size 500]
+"""
+
+import argparse
+import logging
+
+from app.database import SessionLocal
+from app.services.ml_prediction import get_active_bundle, load_ml_model
+from app.services.session_features import BACKFILL_BATCH_SIZE, backfill_session_features
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--limit", type=int, help="Stop after this many sessions")
+    parser.add_argument("--batch-size", type=int, default=BACKFILL_BATCH_SIZE)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    if not load_ml_model():
+        raise SystemExit("ML model could not be loaded")
+
+    db = SessionLocal()
+    try:
+        filled = backfill_session_features(db, limit=args.limit, batch_size=args.batch_size)
+    finally:
+        db.close()
+    print(f"Stored features for {filled} sessions (model {get_active_bundle().version})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Latency and throughput of the risk model inference backends.
+
+Scores the same engineered feature rows with each backend at batch
+sizes 1, 64 and 4096 and prints median / p99 ms per call and rows/s:
+
+    sklearn-pickle  INFERENCE_BACKEND=sklearn, MODEL_FLAT_ARTIFACTS=false
+    sklearn-flat    INFERENCE_BACKEND=sklearn, MODEL_FLAT_ARTIFACTS=true
+    onnx            INFERENCE_BACKEND=onnx (needs onnx + onnxruntime)
+
+Also checks every backend returns the same probabilities as the pickle.
+
+Usage:
+    python benchmark_inference_backends.py --model-dir ml_models --seconds 1
+"""
+
+import argparse
+import json
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+BATCH_SIZES = (1, 64, 4096)
+
+
+def random_rows(n: int, feature_columns, seed: int = 0) -> np.ndarray:
+    from app.services.ml_prediction import engineer_feature_arrays
+
+    rng = np.random.default_rng(seed)
+    return engineer_feature_arrays(
+        rng.integers(20, 90, n), rng.integers(50, 100, n), rng.integers(120, 200, n),
+        rng.integers(60, 170, n), rng.integers(80, 210, n), rng.integers(40, 100, n),
+        rng.integers(85, 100, n), rng.integers(5, 90, n), rng.integers(1, 20, n),
+        activity_intensity=rng.integers(1, 4, n), feature_columns=feature_columns,
+    )
+
+
+def build_backends(model_dir: Path, workdir: Path):
+    import joblib
+
+    from app.services.flat_forest import FlatForest, FlatScaler, export_flat
+    from app.services.inference_backend import InferenceBackend, OnnxInferenceBackend, build_onnx_model
+
+    model = joblib.load(model_dir / "risk_model.pkl")
+    scaler = joblib.load(model_dir / "scaler.pkl")
+    export_flat(model, workdir)
+    backends = {
+        "sklearn-pickle": InferenceBackend(model, scaler),
+        "sklearn-flat": InferenceBackend(FlatForest.load(workdir), FlatScaler(scaler.mean_, scaler.scale_)),
+    }
+    try:
+        graph = build_onnx_model(model, scaler).SerializeToString()
+        backends["onnx"] = OnnxInferenceBackend(graph, model.classes_)
+    except ImportError as e:
+        print(f"onnx backend skipped ({e})")
+    return backends
+
+
+def time_backend(backend, X: np.ndarray, batch: int, seconds: float) -> dict:
+    batches = [X[i:i + batch] for i in range(0, len(X) - batch + 1, batch)] or [X[:batch]]
+    backend.predict_proba(batches[0])  # first-call overhead
+    timings = []
+    deadline = time.perf_counter() + seconds
+    i = 0
+    while time.perf_counter() < deadline or len(timings) < 5:
+        rows = batches[i % len(batches)]
+        start = time.perf_counter()
+        backend.predict_proba(rows)
+        timings.append(time.perf_counter() - start)
+        i += 1
+    timings = np.array(timings)
+    return {
+        "p50_ms": float(np.percentile(timings, 50) * 1000),
+        "p99_ms": float(np.percentile(timings, 99) * 1000),
+        "rows_per_s": float(batch / np.median(timings)),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--model-dir", default="ml_models")
+    parser.add_argument("--seconds", type=float, default=1.0, help="Time per backend and batch size")
+    args = parser.parse_args()
+
+    model_dir = Path(args.model_dir)
+    with open(model_dir / "feature_columns.json", "r") as f:
+        feature_columns = json.load(f)
+    X = random_rows(16_384, feature_columns)
+
+    with tempfile.TemporaryDirectory(prefix="backends-") as workdir:
+        backends = build_backends(model_dir, Path(workdir))
+        reference = backends["sklearn-pickle"].predict_proba(X)
+        for name, backend in backends.items():
+            diff = np.abs(backend.predict_proba(X) - reference).max()
+            print(f"{name:<15} max |p - sklearn| over {len(X)} rows: {diff:.2e}")
+
+        print(f"\n{'backend':<15}{'batch':>7}{'p50 ms':>11}{'p99 ms':>11}{'rows/s':>14}")
+        for batch in BATCH_SIZES:
+            for name, backend in backends.items():
+                r = time_backend(backend, X, batch, args.seconds)
+                print(f"{name:<15}{batch:>7}{r['p50_ms']:>11.3f}{r['p99_ms']:>11.3f}{r['rows_per_s']:>14,.0f}")
+
+
+if __name__ == "__main__":
+    main()
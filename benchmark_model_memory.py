@@ -0,0 +1,144 @@
+"""
+Memory per worker: separate model copies vs one shared copy.
+
+before: N independent processes (what `uvicorn --workers N` does), each
+        importing the app and unpickling risk_model.pkl itself
+after:  serve.py's way - the master loads the model (flat arrays,
+        memory-mapped) and forks N workers
+
+Every worker scores a batch so the model pages are really touched, then
+reports its Rss / Pss / private memory from /proc/self/smaps_rollup.
+Pss splits shared pages between the processes using them, so sum(Pss)
+is the real total for the group (plus the master, for "after").
+
+Usage:
+    python benchmark_model_memory.py --workers 4
+"""
+
+import argparse
+import gc
+import json
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+
+def read_memory_kb() -> dict:
+    fields = {}
+    with open("/proc/self/smaps_rollup", "r") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1])
+    return {
+        "rss": fields["Rss"],
+        "pss": fields["Pss"],
+        "private": fields["Private_Clean"] + fields["Private_Dirty"],
+    }
+
+
+def touch_model() -> None:
+    from app.services.ml_prediction import get_active_bundle
+
+    bundle = get_active_bundle()
+    X = np.random.default_rng(os.getpid()).normal(size=(256, len(bundle.feature_columns)))
+    bundle.model.predict_proba(bundle.scaler.transform(X))
+
+
+def child_main() -> None:
+    """One "before" worker: import the app and load the model on its own."""
+    import app.main  # noqa: F401  (same imports a real worker has)
+    from app.services.ml_prediction import load_ml_model
+
+    assert load_ml_model()
+    touch_model()
+    print(json.dumps(read_memory_kb()), flush=True)
+    sys.stdin.read()  # stay alive until every worker has reported
+
+
+def run_before(workers: int) -> list:
+    env = dict(os.environ, MODEL_FLAT_ARTIFACTS="false")
+    procs = [
+        subprocess.Popen(
+            [sys.executable, __file__, "--child"],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, env=env, text=True,
+        )
+        for _ in range(workers)
+    ]
+    # Read every report while all workers are still alive
+    results = [json.loads(p.stdout.readline()) for p in procs]
+    for p in procs:
+        p.stdin.close()
+        p.wait()
+    return results
+
+
+def run_after(workers: int) -> tuple:
+    import app.main  # noqa: F401
+    from app.services.ml_prediction import load_ml_model
+
+    assert load_ml_model()
+    gc.collect()
+    gc.freeze()
+
+    release_r, release_w = os.pipe()
+    reports = []
+    pids = []
+    for _ in range(workers):
+        report_r, report_w = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(release_w)
+            touch_model()
+            os.write(report_w, json.dumps(read_memory_kb()).encode())
+            os.close(report_w)
+            os.read(release_r, 1)  # blocks until the parent closes the pipe
+            os._exit(0)
+        os.close(report_w)
+        reports.append(report_r)
+        pids.append(pid)
+    results = []
+    for fd in reports:
+        results.append(json.loads(os.read(fd, 4096)))
+        os.close(fd)
+    # The master's share of the pages counts too
+    master = read_memory_kb()
+    os.close(release_w)
+    for pid in pids:
+        os.waitpid(pid, 0)
+    return results, master
+
+
+def summarize(label: str, results: list, master: dict = None) -> None:
+    mb = lambda kb: kb / 1024  # noqa: E731
+    rss = np.array([r["rss"] for r in results])
+    pss = np.array([r["pss"] for r in results])
+    private = np.array([r["private"] for r in results])
+    total = pss.sum() + (master["pss"] if master else 0)
+    print(
+        f"{label:<7} workers={len(results)}  "
+        f"RSS/worker={mb(rss.mean()):7.1f} MB  "
+        f"PSS/worker={mb(pss.mean()):7.1f} MB  "
+        f"private/worker={mb(private.mean()):7.1f} MB  "
+        f"total PSS={mb(total):7.1f} MB" + (" (incl. master)" if master else "")
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child_main()
+        return
+
+    summarize("before", run_before(args.workers))
+    summarize("after", *run_after(args.workers))
+
+
+if __name__ == "__main__":
+    main()
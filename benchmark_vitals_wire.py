@@ -0,0 +1,105 @@
+"""
+Wire size and parse time of batch vitals: JSON vs the binary columnar format.
+
+For each batch size, builds the same readings as the JSON body of
+POST /vitals/batch and as the binary body of POST /vitals/batch/binary,
+then prints bytes on the wire (raw and gzip) and median parse time:
+
+    json    json.loads + VitalSignBatchCreate validation (what FastAPI does)
+    binary  vitals_wire.decode_vitals_batch (np.frombuffer per column)
+
+Usage:
+    python benchmark_vitals_wire.py --sizes 100 1000 10000 --seconds 1
+"""
+
+import argparse
+import gzip
+import json
+import os
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+os.environ.setdefault("SECRET_KEY", "benchmark-secret-key-thats-long-enough-32chars")
+os.environ.setdefault("PHI_ENCRYPTION_KEY", "dGVzdC1lbmNyeXB0aW9uLWtleS0zMmJ5dGVzISEhISE=")
+
+DEFAULT_SIZES = (100, 1000, 10000)
+
+
+def readings(n: int, seed: int = 0) -> dict:
+    """n one-second readings from one device as columns."""
+    rng = np.random.default_rng(seed)
+    start = datetime(2026, 1, 15, 14, 30, tzinfo=timezone.utc)
+    return {
+        "timestamp_ms": int(start.timestamp() * 1000) + np.arange(n, dtype=np.int64) * 1000,
+        "heart_rate": np.clip(np.round(80 + 10 * np.sin(np.arange(n) / 60) + rng.normal(0, 2, n)), 30, 250),
+        "spo2": np.clip(np.round(97 + rng.normal(0, 1, n)), 70, 100),
+    }
+
+
+def json_body(columns: dict) -> bytes:
+    vitals = [
+        {
+            "heart_rate": int(hr),
+            "spo2": float(spo2),
+            "device_id": "polar_h10_abc123",
+            "source_device": "Polar H10",
+            "timestamp": datetime.fromtimestamp(ms / 1000, timezone.utc).isoformat(),
+        }
+        for ms, hr, spo2 in zip(columns["timestamp_ms"].tolist(), columns["heart_rate"], columns["spo2"])
+    ]
+    return json.dumps({"vitals": vitals}).encode()
+
+
+def time_call(fn, payload: bytes, seconds: float) -> float:
+    fn(payload)  # first-call overhead
+    timings = []
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline or len(timings) < 5:
+        start = time.perf_counter()
+        fn(payload)
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings) * 1000)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES))
+    parser.add_argument("--seconds", type=float, default=1.0, help="Timing budget per case")
+    args = parser.parse_args()
+
+    from app.schemas.vital_signs import VitalSignBatchCreate
+    from app.services.vitals_wire import MAX_BINARY_READINGS, decode_vitals_batch, encode_vitals_batch
+
+    def parse_json(payload: bytes):
+        return VitalSignBatchCreate.model_validate(json.loads(payload))
+
+    def parse_binary(payload: bytes):
+        return decode_vitals_batch(payload, max_readings=max(args.sizes + [MAX_BINARY_READINGS]))
+
+    print(f"{'readings':>9} {'format':>7} {'bytes':>10} {'gzip':>9} {'B/reading':>10} {'parse ms':>9} {'speedup':>8}")
+    for n in args.sizes:
+        columns = readings(n)
+        bodies = {
+            "json": json_body(columns),
+            "binary": encode_vitals_batch(columns["timestamp_ms"], columns["heart_rate"], columns["spo2"]),
+        }
+        # Same readings either way
+        decoded = parse_binary(bodies["binary"])
+        assert np.array_equal(decoded["heart_rate"], columns["heart_rate"])
+        assert len(parse_json(bodies["json"]).vitals) == n
+
+        results = {
+            "json": time_call(parse_json, bodies["json"], args.seconds),
+            "binary": time_call(parse_binary, bodies["binary"], args.seconds),
+        }
+        for name, body in bodies.items():
+            print(
+                f"{n:>9} {name:>7} {len(body):>10} {len(gzip.compress(body)):>9} "
+                f"{len(body) / n:>10.1f} {results[name]:>9.3f} {results['json'] / results[name]:>7.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
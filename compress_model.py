@@ -0,0 +1,123 @@
+"""
+Compress the risk forest: fewer trees, shallower trees or a distilled one.
+
+Every candidate is scored on the retraining holdout split (the rows a
+retrained model never saw) next to the original: accuracy, ROC AUC,
+agreement, p50/p99 single-row latency, batch latency, artifact size.
+With --register the chosen candidate becomes a new registry version
+(not promoted; shadow or promote it from the /model endpoints).
+
+Labelled rows come from the database (sessions joined to their risk
+assessments, like retraining) or from an .npz file with X (raw feature
+rows in feature_columns.json order) and y (1 = high risk).
+
+Usage:
+    python compress_model.py --trees 10,25,50 --depth 6,8 --distill 25x8
+    python compress_model.py --data holdout.npz --trees 25 --register 1.0-p25
+"""
+
+import argparse
+import json
+import logging
+
+import numpy as np
+
+
+def parse_ints(text: str):
+    return [int(v) for v in text.split(",") if v.strip()] if text else []
+
+
+def parse_distill(text: str):
+    """"25x8,10x6" -> [(25, 8), (10, 6)]"""
+    pairs = []
+    for item in (text or "").split(","):
+        if item.strip():
+            n, depth = item.lower().split("x")
+            pairs.append((int(n), int(depth)))
+    return pairs
+
+
+def load_rows(data_file, feature_columns):
+    if data_file:
+        with np.load(data_file) as data:
+            X, y = np.asarray(data["X"], dtype=np.float32), np.asarray(data["y"], dtype=np.int8)
+        if X.shape[1] != len(feature_columns):
+            raise SystemExit(f"{data_file}: X has {X.shape[1]} columns, model expects {len(feature_columns)}")
+        return X, y
+
+    from app.database import SessionLocal
+    from app.services.retraining_pipeline import load_training_matrix
+
+    db = SessionLocal()
+    try:
+        return load_training_matrix(db, feature_columns)
+    finally:
+        db.close()
+
+
+def print_report(report) -> None:
+    batch_key = next(key for key in report[0] if key.startswith("batch_"))
+    print(
+        f"{'candidate':<16}{'trees':>6}{'depth':>6}{'nodes':>8}{'acc':>8}{'auc':>8}{'agree':>8}"
+        f"{'p50 ms':>9}{'p99 ms':>9}{batch_key:>16}{'pickle KB':>11}{'flat KB':>9}"
+    )
+    for row in report:
+        auc = f"{row['roc_auc']:.4f}" if row.get("roc_auc") is not None else "-"
+        print(
+            f"{row['name']:<16}{row['n_trees']:>6}{row['max_depth']:>6}{row['n_nodes']:>8}"
+            f"{row['accuracy']:>8.4f}{auc:>8}{row.get('agreement', 1.0):>8.4f}"
+            f"{row['p50_ms']:>9.3f}{row['p99_ms']:>9.3f}{row[batch_key]:>16.2f}"
+            f"{row['pickle_kb']:>11.1f}{row['flat_kb']:>9.1f}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--version", help="Registry version to compress (default: active)")
+    parser.add_argument("--data", help=".npz with X and y instead of the database")
+    parser.add_argument("--trees", default="", help="Tree counts to prune to, e.g. 10,25,50")
+    parser.add_argument("--depth", default="", help="Depths to cut trees at, e.g. 6,8")
+    parser.add_argument("--distill", default="", help="Student forests as TREESxDEPTH, e.g. 25x8")
+    parser.add_argument("--register", metavar="NEW_VERSION", help="Register the chosen candidate")
+    parser.add_argument("--candidate", help="Candidate to register (default: fastest within --max-auc-drop)")
+    parser.add_argument("--max-auc-drop", type=float, default=0.005)
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    from app.services import model_registry
+    from app.services.model_compression import compare_candidates, pick_candidate, register_candidate
+    from app.services.retraining_pipeline import split_holdout
+
+    version = args.version or model_registry.read_manifest()["active"]
+    model, scaler, feature_columns = model_registry.load_training_artifacts(version)
+    X, y = load_rows(args.data, feature_columns)
+    if len(np.unique(y)) < 2:
+        raise SystemExit(f"Need labelled rows of both risk classes ({len(y)} rows found)")
+    X_train, X_test, _, y_test = split_holdout(X, y)
+
+    report, models = compare_candidates(
+        model, scaler, X_train, X_test, y_test,
+        trees=parse_ints(args.trees), depths=parse_ints(args.depth), distill=parse_distill(args.distill),
+    )
+    if args.json:
+        print(json.dumps({"version": version, "holdout_rows": int(len(y_test)), "candidates": report}, indent=2))
+    else:
+        print(f"Model {version}, {len(y_test)} holdout rows")
+        print_report(report)
+
+    if args.register:
+        if args.candidate:
+            chosen = next((row for row in report if row["name"] == args.candidate), None)
+            if chosen is None:
+                raise SystemExit(f"No candidate named {args.candidate}")
+        else:
+            chosen = pick_candidate(report, args.max_auc_drop)
+            if chosen is None:
+                raise SystemExit(f"No candidate within {args.max_auc_drop} AUC of the original; nothing registered")
+        register_candidate(args.register, chosen, models[chosen["name"]], scaler, feature_columns, version)
+        print(f"Registered {chosen['name']} as version {args.register} (not promoted)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,13 @@
+-- =============================================================================
+-- ADAPTIV HEALTH - Alert Cooldown Index Migration
+-- =============================================================================
+-- Description: Adds a composite index for the alert cooldown / duplicate
+--              check, which looks up the newest alert of one type for one
+--              patient. idx_alert_user_time can't serve the alert_type filter.
+-- =============================================================================
+
+CREATE INDEX IF NOT EXISTS idx_alert_user_type_time
+    ON alerts(user_id, alert_type, created_at);
+
+-- Verify migration
+SELECT indexname FROM pg_indexes WHERE tablename = 'alerts';
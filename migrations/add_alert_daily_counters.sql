@@ -0,0 +1,36 @@
+-- =============================================================================
+-- ADAPTIV HEALTH - Alert Daily Counters Migration
+-- =============================================================================
+-- Description: Adds alert_daily_counters (per patient, UTC day, severity and
+--              acknowledged state) used by GET /api/v1/alerts/stats, and
+--              backfills it from the alerts table. The API keeps it current
+--              on alert create / acknowledge / resolve afterwards.
+-- =============================================================================
+
+CREATE TABLE IF NOT EXISTS alert_daily_counters (
+    user_id INTEGER NOT NULL REFERENCES users(user_id) ON DELETE CASCADE,
+    day DATE NOT NULL,
+    severity VARCHAR(20) NOT NULL,
+    acknowledged BOOLEAN NOT NULL,
+    alert_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, day, severity, acknowledged)
+);
+
+CREATE INDEX IF NOT EXISTS idx_alert_counter_day ON alert_daily_counters(day);
+
+-- Backfill from existing alerts
+INSERT INTO alert_daily_counters (user_id, day, severity, acknowledged, alert_count)
+SELECT user_id,
+       (created_at AT TIME ZONE 'UTC')::date,
+       COALESCE(severity, 'unknown'),
+       COALESCE(acknowledged, FALSE),
+       COUNT(*)
+FROM alerts
+WHERE created_at IS NOT NULL
+GROUP BY 1, 2, 3, 4
+ON CONFLICT (user_id, day, severity, acknowledged)
+DO UPDATE SET alert_count = EXCLUDED.alert_count;
+
+-- Verify migration
+SELECT SUM(alert_count) AS counted_alerts, (SELECT COUNT(*) FROM alerts) AS alerts
+FROM alert_daily_counters;
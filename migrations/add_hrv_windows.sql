@@ -0,0 +1,35 @@
+-- =============================================================================
+-- ADAPTIV HEALTH - HRV Windows Migration
+-- =============================================================================
+-- Description: Adds hrv_windows, filled by POST /api/v1/vitals/rr from raw
+--              RR-interval uploads: RMSSD, SDNN, pNN50 and LF/HF per
+--              5-minute window, plus the window's RR intervals as a
+--              zlib-compressed uint16 blob.
+-- =============================================================================
+
+CREATE TABLE IF NOT EXISTS hrv_windows (
+    window_id SERIAL PRIMARY KEY,
+    user_id INTEGER NOT NULL REFERENCES users(user_id) ON DELETE CASCADE,
+    window_start TIMESTAMPTZ NOT NULL,
+    window_end TIMESTAMPTZ NOT NULL,
+    beat_count INTEGER NOT NULL,
+    artifact_count INTEGER NOT NULL DEFAULT 0,
+    mean_rr_ms DOUBLE PRECISION,
+    sdnn_ms DOUBLE PRECISION,
+    rmssd_ms DOUBLE PRECISION,
+    pnn50 DOUBLE PRECISION,
+    lf_power DOUBLE PRECISION,
+    hf_power DOUBLE PRECISION,
+    lf_hf_ratio DOUBLE PRECISION,
+    rr_blob BYTEA NOT NULL,
+    source_device VARCHAR(100),
+    device_id VARCHAR(255),
+    created_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_hrv_window_user_start ON hrv_windows(user_id, window_start);
+
+-- Verify migration
+SELECT column_name, data_type
+FROM information_schema.columns
+WHERE table_name = 'hrv_windows';
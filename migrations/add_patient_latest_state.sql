@@ -0,0 +1,102 @@
+-- =============================================================================
+-- ADAPTIV HEALTH - Patient Latest State Migration
+-- =============================================================================
+-- Description: Adds the denormalized patient_latest_state table used by
+--              GET /api/v1/patients/overview, and backfills it from the
+--              vital_signs, risk_assessments, alerts and activity_sessions
+--              tables. The API keeps it current on every write afterwards.
+-- =============================================================================
+
+CREATE TABLE IF NOT EXISTS patient_latest_state (
+    user_id INTEGER PRIMARY KEY REFERENCES users(user_id) ON DELETE CASCADE,
+
+    latest_reading_id INTEGER,
+    latest_heart_rate INTEGER,
+    latest_spo2 DOUBLE PRECISION,
+    latest_systolic_bp INTEGER,
+    latest_diastolic_bp INTEGER,
+    latest_hrv DOUBLE PRECISION,
+    latest_vitals_at TIMESTAMPTZ,
+
+    latest_assessment_id INTEGER,
+    latest_risk_score DOUBLE PRECISION,
+    latest_risk_level VARCHAR(20),
+    latest_risk_at TIMESTAMPTZ,
+
+    unacknowledged_alert_count INTEGER NOT NULL DEFAULT 0,
+    last_alert_at TIMESTAMPTZ,
+    last_alert_severity VARCHAR(20),
+
+    last_session_id INTEGER,
+    last_activity_type VARCHAR(50),
+    last_activity_status VARCHAR(20),
+    last_activity_at TIMESTAMPTZ,
+
+    updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_latest_state_risk ON patient_latest_state(latest_risk_score);
+CREATE INDEX IF NOT EXISTS idx_latest_state_updated ON patient_latest_state(updated_at);
+
+-- Backfill one row per patient
+INSERT INTO patient_latest_state (user_id)
+SELECT user_id FROM users WHERE role = 'patient'
+ON CONFLICT (user_id) DO NOTHING;
+
+-- Latest vitals
+UPDATE patient_latest_state s SET
+    latest_reading_id = v.reading_id,
+    latest_heart_rate = v.heart_rate,
+    latest_spo2 = v.spo2,
+    latest_systolic_bp = v.systolic_bp,
+    latest_diastolic_bp = v.diastolic_bp,
+    latest_hrv = v.hrv,
+    latest_vitals_at = v.timestamp
+FROM (
+    SELECT DISTINCT ON (user_id) *
+    FROM vital_signs
+    ORDER BY user_id, timestamp DESC
+) v
+WHERE v.user_id = s.user_id;
+
+-- Latest risk
+UPDATE patient_latest_state s SET
+    latest_assessment_id = r.assessment_id,
+    latest_risk_score = r.risk_score,
+    latest_risk_level = r.risk_level,
+    latest_risk_at = r.assessment_date
+FROM (
+    SELECT DISTINCT ON (user_id) *
+    FROM risk_assessments
+    ORDER BY user_id, assessment_date DESC
+) r
+WHERE r.user_id = s.user_id;
+
+-- Unacknowledged alerts and most recent alert
+UPDATE patient_latest_state s SET
+    unacknowledged_alert_count = a.unack,
+    last_alert_at = a.last_at
+FROM (
+    SELECT user_id,
+           COUNT(*) FILTER (WHERE acknowledged IS NOT TRUE) AS unack,
+           MAX(created_at) AS last_at
+    FROM alerts
+    GROUP BY user_id
+) a
+WHERE a.user_id = s.user_id;
+
+-- Last activity session
+UPDATE patient_latest_state s SET
+    last_session_id = a.session_id,
+    last_activity_type = a.activity_type,
+    last_activity_status = a.status,
+    last_activity_at = COALESCE(a.end_time, a.start_time)
+FROM (
+    SELECT DISTINCT ON (user_id) *
+    FROM activity_sessions
+    ORDER BY user_id, start_time DESC
+) a
+WHERE a.user_id = s.user_id;
+
+-- Verify migration
+SELECT COUNT(*) AS patients_with_state FROM patient_latest_state;
@@ -0,0 +1,19 @@
+-- =============================================================================
+-- ADAPTIV HEALTH - Session Feature Store Migration
+-- =============================================================================
+-- Description: Adds the activity_sessions columns of the session feature
+--              store. POST /activities/end/{id} fills feature_vector (17
+--              packed float32 model features), risk_score and
+--              risk_model_version when a session ends.
+--              Existing sessions: run `python backfill_session_features.py`
+--              (features are engineered in Python, not SQL).
+-- =============================================================================
+
+ALTER TABLE activity_sessions ADD COLUMN IF NOT EXISTS feature_vector BYTEA;
+ALTER TABLE activity_sessions ADD COLUMN IF NOT EXISTS risk_model_version VARCHAR(64);
+
+-- Verify migration
+SELECT column_name, data_type
+FROM information_schema.columns
+WHERE table_name = 'activity_sessions'
+  AND column_name IN ('feature_vector', 'risk_model_version', 'risk_score');
@@ -0,0 +1,23 @@
+-- =============================================================================
+-- ADAPTIV HEALTH - Session Recovery Refresh Migration
+-- =============================================================================
+-- Description: Adds activity_sessions.recovery_pending. POST
+--              /activities/end/{id} sets it when a session is aggregated
+--              before its 15-minute cool-down has been recorded; the
+--              recovery refresher (services/session_aggregation.py)
+--              recomputes the session once the cool-down is in and clears it.
+--              Existing sessions stay as they are (flag NULL).
+-- =============================================================================
+
+ALTER TABLE activity_sessions ADD COLUMN IF NOT EXISTS recovery_pending BOOLEAN DEFAULT FALSE;
+
+-- Refresher queue: only sessions still waiting on their cool-down
+CREATE INDEX IF NOT EXISTS idx_activity_recovery_pending
+    ON activity_sessions (end_time)
+    WHERE recovery_pending;
+
+-- Verify migration
+SELECT column_name, data_type
+FROM information_schema.columns
+WHERE table_name = 'activity_sessions'
+  AND column_name = 'recovery_pending';
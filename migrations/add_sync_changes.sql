@@ -0,0 +1,53 @@
+-- =============================================================================
+-- ADAPTIV HEALTH - Sync Change Log Migration
+-- =============================================================================
+-- Description: Creates sync_changes, the log behind GET /sync/changes. The
+--              app writes one row per insert / update / delete of an alert,
+--              risk assessment, recommendation or activity session, and
+--              the mobile app pages through it by change_id.
+--              Existing rows are logged once, oldest first, so a device's
+--              first sync sees the full history. Vitals are paged by
+--              reading_id instead and only need an index.
+-- =============================================================================
+
+CREATE TABLE IF NOT EXISTS sync_changes (
+    change_id SERIAL PRIMARY KEY,
+    user_id INTEGER NOT NULL REFERENCES users(user_id) ON DELETE CASCADE,
+    entity VARCHAR(30) NOT NULL,
+    entity_id INTEGER NOT NULL,
+    operation VARCHAR(10) NOT NULL DEFAULT 'upsert',
+    changed_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_sync_change_user
+    ON sync_changes(user_id, change_id);
+
+-- Backfill (only when the log is still empty, so re-running is harmless)
+INSERT INTO sync_changes (user_id, entity, entity_id, operation, changed_at)
+SELECT user_id, entity, entity_id, 'upsert', changed_at
+FROM (
+    SELECT user_id, 'alerts' AS entity, alert_id AS entity_id,
+           COALESCE(updated_at, created_at) AS changed_at
+    FROM alerts
+    UNION ALL
+    SELECT user_id, 'risk_assessments', assessment_id, created_at
+    FROM risk_assessments
+    UNION ALL
+    SELECT user_id, 'recommendations', recommendation_id,
+           COALESCE(updated_at, created_at)
+    FROM exercise_recommendations
+    UNION ALL
+    SELECT user_id, 'activities', session_id,
+           COALESCE(updated_at, created_at)
+    FROM activity_sessions
+) existing
+WHERE NOT EXISTS (SELECT 1 FROM sync_changes)
+ORDER BY changed_at NULLS FIRST, entity, entity_id;
+
+-- New readings for one user, in reading_id order
+CREATE INDEX IF NOT EXISTS idx_vital_user_reading
+    ON vital_signs(user_id, reading_id);
+
+-- Verify migration
+SELECT COUNT(*) AS logged_changes FROM sync_changes;
+SELECT indexname FROM pg_indexes WHERE tablename IN ('sync_changes', 'vital_signs');
@@ -0,0 +1,42 @@
+-- =============================================================================
+-- ADAPTIV HEALTH - Vital Signs Natural Key Migration
+-- =============================================================================
+-- Description: Makes vitals ingest idempotent. A device reports one reading
+--              per instant, so (user_id, device_id, timestamp) identifies a
+--              reading; the API inserts with ON CONFLICT DO NOTHING against
+--              this index, and a resent offline sync stores nothing twice.
+--              Rows without a device_id are left out of the index.
+-- =============================================================================
+
+-- Point latest state at the copy that stays
+UPDATE patient_latest_state s
+SET latest_reading_id = keep.reading_id
+FROM vital_signs v
+JOIN vital_signs keep
+  ON keep.user_id = v.user_id
+ AND keep.device_id = v.device_id
+ AND keep.timestamp = v.timestamp
+WHERE s.latest_reading_id = v.reading_id
+  AND keep.reading_id = (
+      SELECT MIN(first.reading_id) FROM vital_signs first
+      WHERE first.user_id = v.user_id
+        AND first.device_id = v.device_id
+        AND first.timestamp = v.timestamp
+  )
+  AND keep.reading_id <> v.reading_id;
+
+-- Remove copies left by earlier resyncs, keeping the first one stored
+DELETE FROM vital_signs v
+USING vital_signs keep
+WHERE v.device_id IS NOT NULL
+  AND keep.user_id = v.user_id
+  AND keep.device_id = v.device_id
+  AND keep.timestamp = v.timestamp
+  AND keep.reading_id < v.reading_id;
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_vital_user_device_timestamp
+    ON vital_signs(user_id, device_id, timestamp)
+    WHERE device_id IS NOT NULL;
+
+-- Verify migration
+SELECT indexname, indexdef FROM pg_indexes WHERE tablename = 'vital_signs';
@@ -0,0 +1,227 @@
+"""
+Multi-worker launcher that loads the ML model once, before forking.
+
+Running `uvicorn --workers N` or gunicorn makes every worker load the
+model on its own. Here the master process imports the app, opens the
+model (flat arrays memory-mapped, see app/services/flat_forest.py) and
+binds the socket, then forks N uvicorn workers. The model pages stay
+shared between workers instead of being copied N times.
+
+Usage:
+    python serve.py --workers 4 --host 0.0.0.0 --port 8080
+    python serve.py --startup-profile
+
+A worker that dies is restarted. SIGTERM/SIGINT stop all workers.
+Promotions still reach every worker via the registry manifest watcher.
+
+--startup-profile prints where a worker's start-up time goes (imports
+by package, then each lifespan phase) and exits without serving.
+"""
+
+import argparse
+import asyncio
+import gc
+import logging
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+logger = logging.getLogger("serve")
+
+# Import groups reported by --startup-profile (first dotted prefix that matches)
+IMPORT_GROUPS = (
+    ("app.api", "app routers (app.api)"),
+    ("app.services", "app services"),
+    ("app.models", "app models/schemas"),
+    ("app.schemas", "app models/schemas"),
+    ("app", "app (other)"),
+    ("fastapi", "fastapi/starlette/pydantic"),
+    ("starlette", "fastapi/starlette/pydantic"),
+    ("pydantic", "fastapi/starlette/pydantic"),
+    ("pydantic_core", "fastapi/starlette/pydantic"),
+    ("pydantic_settings", "fastapi/starlette/pydantic"),
+    ("sqlalchemy", "sqlalchemy"),
+    ("numpy", "numpy"),
+    ("sklearn", "sklearn/scipy/joblib"),
+    ("scipy", "sklearn/scipy/joblib"),
+    ("joblib", "sklearn/scipy/joblib"),
+    ("jose", "auth (jose/passlib/cryptography)"),
+    ("passlib", "auth (jose/passlib/cryptography)"),
+    ("cryptography", "auth (jose/passlib/cryptography)"),
+)
+
+
+def bind_socket(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(sock: socket.socket, args: argparse.Namespace) -> None:
+    """Child process: serve the inherited socket until told to stop."""
+    # uvicorn installs its own SIGTERM/SIGINT handlers
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    import uvicorn
+    from app.main import app
+
+    config = uvicorn.Config(app, log_level=args.log_level, timeout_keep_alive=args.keep_alive)
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def spawn(sock: socket.socket, args: argparse.Namespace) -> int:
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            run_worker(sock, args)
+        except BaseException:
+            logger.exception("Worker crashed")
+            code = 1
+        finally:
+            os._exit(code)
+    logger.info(f"Started worker {pid}")
+    return pid
+
+
+def _import_group(module: str) -> str:
+    for prefix, group in IMPORT_GROUPS:
+        if module == prefix or module.startswith(prefix + "."):
+            return group
+    return "other (stdlib, etc.)"
+
+
+def profile_imports() -> None:
+    """Self time of every module imported by `import app.main`, by group."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        capture_output=True, text=True, env=dict(os.environ, PYTHONPATH=os.getcwd()),
+    )
+    groups = defaultdict(float)
+    app_modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        module = name.strip()
+        groups[_import_group(module)] += int(self_us) / 1000
+        if module.startswith("app."):
+            app_modules.append((int(cumulative_us) / 1000, module))
+    if result.returncode != 0:
+        print(result.stderr.strip().splitlines()[-1])
+
+    print(f"Imports (python -X importtime, self time): {sum(groups.values()):.0f} ms")
+    for group, ms in sorted(groups.items(), key=lambda item: -item[1]):
+        print(f"  {group:<38} {ms:8.1f} ms")
+    print("Slowest app modules (including what they import):")
+    for ms, module in sorted(app_modules, reverse=True)[:8]:
+        print(f"  {module:<38} {ms:8.1f} ms")
+
+
+def profile_startup() -> None:
+    """Wall time to import the app and run its startup, phase by phase."""
+    started = time.perf_counter()
+    from app.main import app, startup_timings
+    imported_ms = (time.perf_counter() - started) * 1000
+
+    async def start_and_stop():
+        async with app.router.lifespan_context(app):
+            pass
+
+    asyncio.run(start_and_stop())
+    print("Start-up (this process):")
+    print(f"  {'import app.main':<38} {imported_ms:8.1f} ms")
+    for name in ("init_db", "db_check", "ml_model", "model_registry", "realtime"):
+        ms = startup_timings.get(name)
+        print(f"  {name:<38} " + (f"{ms:8.1f} ms" if ms is not None else "  skipped"))
+    print(f"  {'lifespan total':<38} {startup_timings['total']:8.1f} ms"
+          f"  (ml_model runs alongside the database steps)")
+    print(f"  {'ready after':<38} {imported_ms + startup_timings['total']:8.1f} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run the API with N workers sharing one model copy")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--log-level", default="info")
+    parser.add_argument("--keep-alive", type=int, default=5)
+    parser.add_argument("--startup-profile", action="store_true",
+                        help="Print per-phase import/startup timings and exit")
+    args = parser.parse_args()
+
+    if args.startup_profile:
+        logging.basicConfig(level=logging.WARNING)
+        profile_imports()
+        profile_startup()
+        return
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+    from app.database import engine, init_db, should_create_tables
+    from app.services.ml_prediction import load_ml_model
+
+    # Create tables once here rather than racing in every worker, and
+    # don't hand open connections to the children
+    if should_create_tables():
+        init_db()
+    engine.dispose()
+
+    # Load in the master so workers inherit it; the app lifespan sees it
+    # already loaded and keeps it
+    if not load_ml_model():
+        logger.error("ML model failed to load - workers will load their own")
+    # Objects created so far are never freed, so keep the collector from
+    # touching (and un-sharing) their pages in the workers
+    gc.collect()
+    gc.freeze()
+
+    sock = bind_socket(args.host, args.port)
+    logger.info(f"Listening on {args.host}:{args.port} with {args.workers} workers")
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    workers = {spawn(sock, args) for _ in range(args.workers)}
+    while not stopping:
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            pid = 0
+        if pid and pid in workers:
+            workers.discard(pid)
+            if not stopping:
+                logger.warning(f"Worker {pid} exited ({status}); restarting")
+                workers.add(spawn(sock, args))
+        else:
+            time.sleep(0.5)
+
+    logger.info("Stopping workers...")
+    for pid in workers:
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+    for pid in workers:
+        try:
+            os.waitpid(pid, 0)
+        except ChildProcessError:
+            pass
+    sock.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,134 @@
+"""
+Tests for the alert cooldown tracker.
+
+Verifies:
+- A repeat alert of the same type is suppressed within the window
+- Other types and other patients are not affected
+- A cold tracker falls back to the newest alert in the DB
+- A sustained episode over the ingest channel stores one alert
+- An alert whose commit failed is not held in cooldown
+"""
+
+import os
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+os.environ.setdefault("SECRET_KEY", "test-secret-key-thats-long-enough-32chars")
+os.environ.setdefault("PHI_ENCRYPTION_KEY", "dGVzdC1lbmNyeXB0aW9uLWtleS0zMmJ5dGVzISEhISE=")
+os.environ.setdefault("DEBUG", "true")
+
+from app.database import Base, get_db
+from app.main import app
+from app.models.user import User, UserRole
+from app.models.alert import Alert
+from app.api.auth import auth_service
+from app.services.alert_cooldown import alert_cooldown
+
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test_alert_cooldown.db"
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def override_get_db():
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+@pytest.fixture(autouse=True)
+def setup_database():
+    app.dependency_overrides[get_db] = override_get_db
+    Base.metadata.create_all(bind=engine)
+    alert_cooldown.clear()
+    yield
+    Base.metadata.drop_all(bind=engine)
+
+
+def create_user(email, role=UserRole.PATIENT):
+    db = TestingSessionLocal()
+    user = User(email=email, full_name=email.split("@")[0], age=60, role=role)
+    db.add(user)
+    db.commit()
+    user_id = user.user_id
+    db.close()
+    return user_id
+
+
+class TestAlertCooldownTracker:
+    def test_repeat_alert_suppressed_in_memory(self):
+        from app.services.alert_cooldown import AlertCooldownTracker
+
+        tracker = AlertCooldownTracker(cooldown_minutes=5)
+        first = tracker.filter_alerts(None, [Alert(user_id=1, alert_type="high_heart_rate")])
+        repeat = tracker.filter_alerts(None, [
+            Alert(user_id=1, alert_type="high_heart_rate"),
+            Alert(user_id=1, alert_type="low_spo2"),
+            Alert(user_id=2, alert_type="high_heart_rate"),
+        ])
+
+        assert len(first) == 1
+        assert [(a.user_id, a.alert_type) for a in repeat] == [(1, "low_spo2"), (2, "high_heart_rate")]
+
+    def test_cold_tracker_reads_last_alert_from_db(self):
+        from app.services.alert_cooldown import AlertCooldownTracker
+
+        patient_id = create_user("pat@test.com")
+        db = TestingSessionLocal()
+        db.add(Alert(user_id=patient_id, alert_type="high_heart_rate",
+                     created_at=datetime.now(timezone.utc) - timedelta(minutes=2)))
+        db.add(Alert(user_id=patient_id, alert_type="low_spo2",
+                     created_at=datetime.now(timezone.utc) - timedelta(minutes=30)))
+        db.commit()
+
+        tracker = AlertCooldownTracker(cooldown_minutes=5)
+        assert tracker.is_cooling_down(db, patient_id, "high_heart_rate")
+        assert not tracker.is_cooling_down(db, patient_id, "low_spo2")
+        db.close()
+
+
+class TestCooldownOnIngest:
+    def test_sustained_episode_stores_one_alert(self, monkeypatch):
+        from app.config import settings
+
+        monkeypatch.setattr(settings, "ingest_flush_max_readings", 2)
+        patient_id = create_user("pat@test.com")
+        token = auth_service.create_access_token(data={"sub": str(patient_id), "role": "patient"})
+        client = TestClient(app)
+
+        with client.websocket_connect(f"/api/v1/ws/vitals/ingest?token={token}") as ws:
+            for _ in range(3):
+                ws.send_json([{"heart_rate": 190}, {"heart_rate": 192}])
+                ws.receive_json()
+
+        db = TestingSessionLocal()
+        assert db.query(Alert).filter_by(user_id=patient_id).count() == 1
+        db.close()
+
+    def test_failed_commit_does_not_suppress_alert(self, monkeypatch):
+        from app.schemas.vital_signs import VitalSignCreate
+        from app.services import vitals_ingest
+
+        patient_id = create_user("pat@test.com")
+        readings = [VitalSignCreate(heart_rate=190, timestamp=datetime.now(timezone.utc))]
+
+        def fail(db, alerts):
+            raise RuntimeError("commit failed")
+
+        monkeypatch.setattr(vitals_ingest, "count_alerts_created", fail)
+        db = TestingSessionLocal()
+        with pytest.raises(RuntimeError):
+            vitals_ingest.flush_readings(db, patient_id, readings)
+        db.rollback()
+        assert not alert_cooldown.is_cooling_down(db, patient_id, "high_heart_rate")
+
+        monkeypatch.undo()
+        assert vitals_ingest.flush_readings(db, patient_id, readings)["alerts"] == 1
+        db.close()
@@ -0,0 +1,132 @@
+"""
+Tests for precomputed alert counters and GET /alerts/stats.
+
+Verifies:
+- Create / acknowledge / resolve keep the counters in step with alerts
+- Stats can be limited to one patient
+- rebuild_alert_counters() reproduces the incrementally kept counters
+"""
+
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+os.environ.setdefault("SECRET_KEY", "test-secret-key-thats-long-enough-32chars")
+os.environ.setdefault("PHI_ENCRYPTION_KEY", "dGVzdC1lbmNyeXB0aW9uLWtleS0zMmJ5dGVzISEhISE=")
+os.environ.setdefault("DEBUG", "true")
+
+from app.database import Base, get_db
+from app.main import app
+from app.models.user import User, UserRole
+from app.models.alert_counter import AlertDailyCounter
+from app.api.auth import auth_service
+from app.services.alert_cooldown import alert_cooldown
+
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test_alert_counters.db"
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def override_get_db():
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+@pytest.fixture(autouse=True)
+def setup_database():
+    app.dependency_overrides[get_db] = override_get_db
+    Base.metadata.create_all(bind=engine)
+    alert_cooldown.clear()
+    yield
+    Base.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+
+def create_user(email, role):
+    db = TestingSessionLocal()
+    user = User(email=email, full_name=email.split("@")[0], age=60, role=role)
+    db.add(user)
+    db.commit()
+    user_id = user.user_id
+    db.close()
+    return user_id
+
+
+def auth_header(user_id, role):
+    token = auth_service.create_access_token(data={"sub": str(user_id), "role": role.value})
+    return {"Authorization": f"Bearer {token}"}
+
+
+def create_alert(client, patient_id, alert_type, severity):
+    resp = client.post(
+        "/api/v1/alerts",
+        json={"user_id": patient_id, "alert_type": alert_type, "severity": severity, "message": "check"},
+        headers=auth_header(patient_id, UserRole.PATIENT),
+    )
+    assert resp.status_code == 200
+    return resp.json()["alert_id"]
+
+
+class TestAlertCounters:
+    def test_stats_follow_create_acknowledge_resolve(self, client):
+        clinician_id = create_user("doc@test.com", UserRole.CLINICIAN)
+        patient_id = create_user("pat@test.com", UserRole.PATIENT)
+        other_id = create_user("other@test.com", UserRole.PATIENT)
+
+        first = create_alert(client, patient_id, "high_heart_rate", "critical")
+        create_alert(client, patient_id, "low_spo2", "critical")
+        create_alert(client, patient_id, "high_blood_pressure", "warning")
+        create_alert(client, other_id, "high_heart_rate", "critical")
+
+        client.patch(f"/api/v1/alerts/{first}/acknowledge", headers=auth_header(patient_id, UserRole.PATIENT))
+        resp = client.get("/api/v1/alerts/stats", headers=auth_header(clinician_id, UserRole.CLINICIAN))
+        stats = resp.json()
+        assert stats["severity_breakdown"] == {"critical": 3, "warning": 1}
+        assert stats["unacknowledged_count"] == 3
+        assert stats["total_alerts"] == 4
+
+        # Resolving with acknowledged=false moves the alert back
+        client.patch(
+            f"/api/v1/alerts/{first}/resolve",
+            json={"acknowledged": False},
+            headers=auth_header(patient_id, UserRole.PATIENT),
+        )
+        resp = client.get(
+            f"/api/v1/alerts/stats?user_id={patient_id}",
+            headers=auth_header(clinician_id, UserRole.CLINICIAN),
+        )
+        stats = resp.json()
+        assert stats["total_alerts"] == 3
+        assert stats["unacknowledged_count"] == 3
+
+    def test_rebuild_matches_incremental_counters(self, client):
+        from app.services.alert_counters import rebuild_alert_counters
+
+        patient_id = create_user("pat@test.com", UserRole.PATIENT)
+        first = create_alert(client, patient_id, "high_heart_rate", "critical")
+        create_alert(client, patient_id, "other", "info")
+        client.patch(f"/api/v1/alerts/{first}/acknowledge", headers=auth_header(patient_id, UserRole.PATIENT))
+
+        db = TestingSessionLocal()
+
+        def snapshot():
+            rows = db.query(AlertDailyCounter).all()
+            return sorted((r.user_id, r.day, r.severity, r.acknowledged, r.alert_count) for r in rows if r.alert_count)
+
+        incremental = snapshot()
+        rebuild_alert_counters(db)
+        db.commit()
+        assert snapshot() == incremental
+        db.close()
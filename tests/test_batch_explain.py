@@ -0,0 +1,269 @@
+"""
+Tests for POST /predict/explain/batch.
+
+Verifies:
+- Assessments and sessions stream back as NDJSON lines in request order
+- Scores match the single-row predictor and SHAP values add up to them
+- Missing ids and patients who stopped sharing get error lines
+- Vitals-window assessments cost one vitals query per patient, and each
+  gets only its own window's readings
+- Only clinicians can call it
+"""
+
+import json
+import os
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+os.environ.setdefault("SECRET_KEY", "test-secret-key-thats-long-enough-32chars")
+os.environ.setdefault("PHI_ENCRYPTION_KEY", "dGVzdC1lbmNyeXB0aW9uLWtleS0zMmJ5dGVzISEhISE=")
+os.environ.setdefault("DEBUG", "true")
+
+from app.database import Base, get_db
+from app.main import app
+from app.models.user import User, UserRole
+from app.models.activity import ActivitySession
+from app.models.risk_assessment import RiskAssessment
+from app.models.vital_signs import VitalSignRecord
+from app.api.auth import auth_service
+from app.services import ml_prediction
+from app.services.batch_explain import collect_batch_items, load_window_vitals, window_features
+from app.services.alert_cooldown import alert_cooldown
+
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test_batch_explain.db"
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def override_get_db():
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+@pytest.fixture(autouse=True)
+def setup_database():
+    app.dependency_overrides[get_db] = override_get_db
+    Base.metadata.create_all(bind=engine)
+    alert_cooldown.clear()
+    assert ml_prediction.load_ml_model()
+    yield
+    Base.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+
+def create_user(email, role, **fields):
+    db = TestingSessionLocal()
+    user = User(email=email, full_name=email.split("@")[0], age=60, role=role, **fields)
+    db.add(user)
+    db.commit()
+    user_id = user.user_id
+    db.close()
+    return user_id
+
+
+def auth_header(user_id, role):
+    token = auth_service.create_access_token(data={"sub": str(user_id), "role": role.value})
+    return {"Authorization": f"Bearer {token}"}
+
+
+def create_session(user_id, peak, duration, activity_type="jogging"):
+    db = TestingSessionLocal()
+    session = ActivitySession(
+        user_id=user_id,
+        start_time=datetime.now(timezone.utc) - timedelta(hours=2),
+        activity_type=activity_type,
+        avg_heart_rate=peak - 25,
+        peak_heart_rate=peak,
+        min_heart_rate=70,
+        avg_spo2=95,
+        duration_minutes=duration,
+        recovery_time_minutes=6,
+        risk_score=0.5,
+    )
+    db.add(session)
+    db.commit()
+    session_id = session.session_id
+    db.close()
+    return session_id
+
+
+def create_assessment(user_id, session_id=None, assessment_date=None):
+    db = TestingSessionLocal()
+    ra = RiskAssessment(
+        user_id=user_id,
+        risk_level="moderate",
+        risk_score=0.6,
+        activity_session_id=session_id,
+        assessment_date=assessment_date,
+    )
+    db.add(ra)
+    db.commit()
+    assessment_id = ra.assessment_id
+    db.close()
+    return assessment_id
+
+
+def read_lines(resp):
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("application/x-ndjson")
+    return [json.loads(line) for line in resp.text.splitlines() if line]
+
+
+class TestBatchExplain:
+    def test_streams_scores_and_attributions_in_order(self, client):
+        clinician_id = create_user("doc@test.com", UserRole.CLINICIAN)
+        patient_id = create_user("pat@test.com", UserRole.PATIENT, baseline_hr=70)
+        calm = create_session(patient_id, peak=115, duration=20, activity_type="walking")
+        hard = create_session(patient_id, peak=185, duration=75)
+        linked = create_assessment(patient_id, session_id=hard)
+
+        # Vitals-window assessment: rebuilt from the readings before it
+        end = datetime.now(timezone.utc) - timedelta(minutes=5)
+        db = TestingSessionLocal()
+        for i, hr in enumerate([100, 130, 160, 150]):
+            db.add(VitalSignRecord(
+                user_id=patient_id, heart_rate=hr, spo2=96, activity_type="cycling",
+                timestamp=end - timedelta(minutes=20 - 5 * i), is_valid=True,
+            ))
+        db.commit()
+        db.close()
+        windowed = create_assessment(patient_id, assessment_date=end)
+
+        resp = client.post(
+            "/api/v1/predict/explain/batch",
+            json={"assessment_ids": [linked, windowed, 9999], "session_ids": [calm, hard]},
+            headers=auth_header(clinician_id, UserRole.CLINICIAN),
+        )
+        lines = read_lines(resp)
+
+        assert [(line["kind"], line["id"]) for line in lines] == [
+            ("assessment", linked), ("assessment", windowed), ("assessment", 9999),
+            ("session", calm), ("session", hard),
+        ]
+        assert lines[2]["error"] == "not_found"
+        assert lines[0]["session_id"] == hard
+        assert lines[0]["risk_score"] == lines[4]["risk_score"]
+        assert lines[0]["stored_risk_score"] == 0.6
+
+        expected = ml_prediction.predict_risk(
+            age=60, baseline_hr=70, max_safe_hr=160, avg_heart_rate=160,
+            peak_heart_rate=185, min_heart_rate=70, avg_spo2=95,
+            duration_minutes=75, recovery_time_minutes=6, activity_type="jogging",
+        )
+        assert lines[4]["risk_score"] == expected["risk_score"]
+        assert lines[4]["risk_level"] == expected["risk_level"]
+
+        for line in (lines[0], lines[1], lines[3], lines[4]):
+            total = line["base_value"] + sum(line["contributions"].values())
+            assert abs(total - line["risk_score"]) < 1e-3
+            assert len(line["top_features"]) == 3
+
+    def test_patient_not_sharing_gets_error_line(self, client):
+        clinician_id = create_user("doc@test.com", UserRole.CLINICIAN)
+        sharing = create_user("on@test.com", UserRole.PATIENT)
+        private = create_user("off@test.com", UserRole.PATIENT, share_state="SHARING_OFF")
+        visible = create_session(sharing, peak=140, duration=30)
+        hidden = create_session(private, peak=140, duration=30)
+
+        resp = client.post(
+            "/api/v1/predict/explain/batch",
+            json={"session_ids": [hidden, visible]},
+            headers=auth_header(clinician_id, UserRole.CLINICIAN),
+        )
+        lines = read_lines(resp)
+
+        assert lines[0] == {"kind": "session", "id": hidden, "error": "forbidden"}
+        assert "risk_score" in lines[1]
+
+    def test_requires_clinician_and_bounded_batch(self, client):
+        patient_id = create_user("pat@test.com", UserRole.PATIENT)
+        clinician_id = create_user("doc@test.com", UserRole.CLINICIAN)
+        session_id = create_session(patient_id, peak=140, duration=30)
+
+        resp = client.post(
+            "/api/v1/predict/explain/batch",
+            json={"session_ids": [session_id]},
+            headers=auth_header(patient_id, UserRole.PATIENT),
+        )
+        assert resp.status_code == 403
+
+        resp = client.post(
+            "/api/v1/predict/explain/batch",
+            json={"session_ids": list(range(1, 1002))},
+            headers=auth_header(clinician_id, UserRole.CLINICIAN),
+        )
+        assert resp.status_code == 400
+
+        resp = client.post(
+            "/api/v1/predict/explain/batch",
+            json={},
+            headers=auth_header(clinician_id, UserRole.CLINICIAN),
+        )
+        assert resp.status_code == 400
+
+    def test_window_assessments_share_one_vitals_query(self):
+        patient_id = create_user("pat@test.com", UserRole.PATIENT, baseline_hr=70)
+        other_id = create_user("other@test.com", UserRole.PATIENT)
+        now = datetime.now(timezone.utc).replace(microsecond=0)
+        ends = [now - timedelta(hours=h) for h in (30, 6, 5.5, 1)]
+        db = TestingSessionLocal()
+        for n, end in enumerate(ends[:3]):
+            for i in range(6):
+                db.add(VitalSignRecord(
+                    user_id=patient_id, heart_rate=90 + 15 * n + 5 * i, spo2=96 - n, activity_type="walking",
+                    timestamp=end - timedelta(minutes=25 - 5 * i), is_valid=True,
+                ))
+        db.add(VitalSignRecord(user_id=other_id, heart_rate=120, timestamp=now - timedelta(minutes=10), is_valid=True))
+        db.commit()
+        db.close()
+        windowed = [create_assessment(patient_id, assessment_date=end) for end in ends]
+        other = create_assessment(other_id, assessment_date=now)
+
+        db = TestingSessionLocal()
+        statements = []
+        listener = lambda conn, cursor, statement, *args: statements.append(statement)
+        event.listen(engine, "before_cursor_execute", listener)
+        try:
+            items = collect_batch_items(db, windowed + [other], [])
+        finally:
+            event.remove(engine, "before_cursor_execute", listener)
+        assert len([sql for sql in statements if "FROM vital_signs" in sql]) == 2
+
+        # Same features as loading each window on its own
+        for item, assessment_id in zip(items[:3], windowed):
+            ra = db.get(RiskAssessment, assessment_id)
+            user = db.get(User, patient_id)
+            assert item["features"] == window_features(user, ra, *load_window_vitals(db, patient_id, [ra]))
+        assert items[0]["features"] != items[1]["features"]
+        assert items[3]["error"] == "no_input_data"
+        assert "features" in items[4]
+        db.close()
+
+
+class TestExplainFeaturesBatch:
+    def test_batch_matches_single_row_explanations(self):
+        rows = [
+            ml_prediction.engineer_features(45, 68, 175, 120, 150, 72, 97, 30, 5, "cycling"),
+            ml_prediction.engineer_features(72, 80, 148, 135, 170, 75, 91, 60, 12, "swimming"),
+            ml_prediction.engineer_features(30, 60, 190, 95, 110, 62, 99, 15, 3, "yoga"),
+        ]
+        results = ml_prediction.explain_features_batch(rows)
+
+        for features, result in zip(rows, results):
+            single = ml_prediction.explain_features(features)
+            assert abs(result["risk_score"] - single["risk_score"]) < 1e-4
+            for name, value in single["contributions"].items():
+                assert abs(result["contributions"][name] - value) < 1e-12
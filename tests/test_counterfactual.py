@@ -0,0 +1,151 @@
+"""
+Tests for the counterfactual "lower my risk" search.
+
+Verifies:
+- The suggested plan scores below target and no cheaper candidate does
+- The latency budget stops the search and reports it as incomplete
+- POST /predict/lower-risk and model-driven stored recommendations
+"""
+
+import os
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+os.environ.setdefault("SECRET_KEY", "test-secret-key-thats-long-enough-32chars")
+os.environ.setdefault("PHI_ENCRYPTION_KEY", "dGVzdC1lbmNyeXB0aW9uLWtleS0zMmJ5dGVzISEhISE=")
+os.environ.setdefault("DEBUG", "true")
+
+from app.database import Base, get_db
+from app.main import app
+from app.models.user import User, UserRole
+from app.models.vital_signs import VitalSignRecord
+from app.api.auth import auth_service
+from app.services import ml_prediction
+from app.services.alert_cooldown import alert_cooldown
+
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test_counterfactual.db"
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+HARD_SESSION = {
+    "age": 60, "baseline_hr": 72, "max_safe_hr": 160, "avg_heart_rate": 160,
+    "peak_heart_rate": 185, "min_heart_rate": 70, "avg_spo2": 95,
+    "duration_minutes": 75, "recovery_time_minutes": 6, "activity_type": "jogging",
+}
+
+
+def override_get_db():
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+@pytest.fixture(autouse=True)
+def setup_database():
+    app.dependency_overrides[get_db] = override_get_db
+    Base.metadata.create_all(bind=engine)
+    alert_cooldown.clear()
+    assert ml_prediction.load_ml_model()
+    yield
+    Base.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+
+def create_user(email, role):
+    db = TestingSessionLocal()
+    user = User(email=email, full_name=email.split("@")[0], age=60, baseline_hr=72, max_safe_hr=160, role=role)
+    db.add(user)
+    db.commit()
+    user_id = user.user_id
+    db.close()
+    return user_id
+
+
+def auth_header(user_id, role):
+    token = auth_service.create_access_token(data={"sub": str(user_id), "role": role.value})
+    return {"Authorization": f"Bearer {token}"}
+
+
+class TestCounterfactualSearch:
+    def test_plan_is_cheapest_candidate_under_target(self):
+        from app.services.counterfactual import build_candidates, find_lower_risk_plan, _score
+
+        plan = find_lower_risk_plan(HARD_SESSION, target_risk=0.5, budget_ms=10_000)
+        assert plan["current"]["risk_score"] >= 0.5
+        assert plan["found"] and plan["complete"]
+        suggestion = plan["suggestion"]
+        assert suggestion["risk_score"] < 0.5
+        assert suggestion["changes"]
+
+        # Brute force: nothing strictly cheaper reaches the target
+        candidates = build_candidates(HARD_SESSION)
+        risk = _score(HARD_SESSION, candidates["intensity"], candidates["peak"], candidates["duration"])
+        best_cost = candidates["cost"][risk < 0.5].min()
+        chosen = (
+            (candidates["peak"] == suggestion["peak_heart_rate"])
+            & (candidates["duration"] == suggestion["duration_minutes"])
+        )
+        assert np.isclose(candidates["cost"][chosen & (risk < 0.5)].min(), best_cost)
+
+    def test_current_risk_matches_predict_risk(self):
+        from app.services.counterfactual import find_lower_risk_plan
+
+        plan = find_lower_risk_plan(HARD_SESSION, budget_ms=10_000)
+        assert plan["current"]["risk_score"] == ml_prediction.predict_risk(**HARD_SESSION)["risk_score"]
+
+    def test_budget_stops_search(self):
+        from app.services.counterfactual import find_lower_risk_plan
+
+        plan = find_lower_risk_plan(HARD_SESSION, target_risk=0.5, budget_ms=0)
+        assert plan["complete"] is False
+        assert plan["found"] is False
+        assert plan["evaluated"] == 1
+
+
+class TestCounterfactualEndpoints:
+    def test_lower_risk_endpoint(self, client):
+        user_id = create_user("pat@test.com", UserRole.PATIENT)
+        resp = client.post(
+            "/api/v1/predict/lower-risk?target_risk=0.5",
+            json=HARD_SESSION,
+            headers=auth_header(user_id, UserRole.PATIENT),
+        )
+        assert resp.status_code == 200
+        data = resp.json()
+        assert data["found"]
+        assert data["suggestion"]["risk_score"] < 0.5
+
+    def test_stored_recommendation_comes_from_plan(self, client):
+        user_id = create_user("pat@test.com", UserRole.PATIENT)
+        now = datetime.now(timezone.utc)
+        db = TestingSessionLocal()
+        for i, hr in enumerate([150, 170, 185, 175, 165]):
+            db.add(VitalSignRecord(
+                user_id=user_id, heart_rate=hr, spo2=94, activity_type="jogging",
+                timestamp=now - timedelta(minutes=25 - 5 * i), is_valid=True,
+            ))
+        db.commit()
+        db.close()
+        headers = auth_header(user_id, UserRole.PATIENT)
+
+        resp = client.post("/api/v1/risk-assessments/compute", headers=headers)
+        assert resp.status_code == 200
+        assert resp.json()["risk_level"] != "low"
+
+        rec = client.get("/api/v1/recommendations/latest", headers=headers).json()
+        assert rec["title"] == "Lower-Risk Plan"
+        assert rec["target_heart_rate_max"] < 185
+        assert "Estimated risk drops to" in rec["description"]
@@ -0,0 +1,160 @@
+"""
+Tests for the edge (on-device) model bundle.
+
+Verifies:
+- The reference evaluator matches predict_risk() on random sessions
+- Array dtypes, node counts and size stay within the compact format
+- GET /model/edge-bundle revalidates with ETag / If-None-Match (304)
+- Promoting another model version changes the bundle and its ETag
+"""
+
+import os
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+os.environ.setdefault("SECRET_KEY", "test-secret-key-thats-long-enough-32chars")
+os.environ.setdefault("PHI_ENCRYPTION_KEY", "dGVzdC1lbmNyeXB0aW9uLWtleS0zMmJ5dGVzISEhISE=")
+os.environ.setdefault("DEBUG", "true")
+
+from app.database import Base, get_db
+from app.main import app
+from app.models.user import User, UserRole
+from app.api.auth import auth_service
+from app.services import ml_prediction, model_registry
+from app.services.edge_bundle import build_edge_bundle, get_edge_bundle_payload
+from app.services.edge_evaluator import EdgeForest
+
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test_edge_bundle.db"
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+ACTIVITIES = ["walking", "jogging", "cycling", "swimming", "yoga", "running", "stretching"]
+
+
+def override_get_db():
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+@pytest.fixture(autouse=True)
+def setup_database(tmp_path, monkeypatch):
+    monkeypatch.setattr(model_registry, "REGISTRY_DIR", tmp_path / "registry")
+    app.dependency_overrides[get_db] = override_get_db
+    Base.metadata.create_all(bind=engine)
+    assert ml_prediction.load_ml_model()
+    yield
+    Base.metadata.drop_all(bind=engine)
+    monkeypatch.undo()
+    assert ml_prediction.load_ml_model()
+
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+
+def auth_header(role=UserRole.PATIENT):
+    db = TestingSessionLocal()
+    user = User(email=f"{role.value}@example.com", full_name="Edge", age=60, role=role)
+    db.add(user)
+    db.commit()
+    user_id = user.user_id
+    db.close()
+    token = auth_service.create_access_token(data={"sub": str(user_id), "role": role.value})
+    return {"Authorization": f"Bearer {token}"}
+
+
+def random_sessions(n, seed=0):
+    rng = np.random.default_rng(seed)
+    for i in range(n):
+        yield {
+            "age": int(rng.integers(18, 95)),
+            "baseline_hr": int(rng.integers(45, 100)),
+            "max_safe_hr": int(rng.integers(110, 210)),
+            "avg_heart_rate": int(rng.integers(55, 180)),
+            "peak_heart_rate": int(rng.integers(70, 220)),
+            "min_heart_rate": int(rng.integers(40, 110)),
+            "avg_spo2": int(rng.integers(82, 101)),
+            "duration_minutes": int(rng.integers(1, 120)),
+            "recovery_time_minutes": int(rng.integers(1, 30)),
+            "activity_type": ACTIVITIES[i % len(ACTIVITIES)],
+        }
+
+
+class TestEdgeBundle:
+    def test_evaluator_matches_server(self):
+        payload, _ = get_edge_bundle_payload(ml_prediction.get_active_bundle())
+        edge = EdgeForest.from_json(payload)
+
+        worst = 0.0
+        for session in random_sessions(1500):
+            server = ml_prediction.predict_risk(**session)
+            device = edge.predict_risk(**session)
+            assert device["risk_level"] == server["risk_level"], session
+            assert device["high_risk"] == server["high_risk"], session
+            worst = max(worst, abs(device["risk_score"] - server["risk_score"]))
+        # Both sides round to 4 decimals
+        assert worst <= 1e-4 + 1e-12
+
+    def test_compact_array_format(self):
+        bundle = ml_prediction.get_active_bundle()
+        edge = build_edge_bundle(bundle)
+        arrays = edge["arrays"]
+        assert arrays["left"]["dtype"] == "<i2"
+        assert arrays["threshold"]["dtype"] == "<i2"
+        assert arrays["feature"]["dtype"] == "|u1"
+        assert arrays["leaf"]["dtype"] == "<u2"
+
+        n_nodes = sum(len(est.tree_.children_left) for est in bundle.model.estimators_)
+        assert edge["n_nodes"] == n_nodes
+        assert edge["n_trees"] == len(bundle.model.estimators_)
+        assert edge["feature_columns"] == list(bundle.feature_columns)
+
+        # 7 bytes per node (left, feature, threshold, leaf) before base64
+        payload, _ = get_edge_bundle_payload(bundle)
+        assert len(payload) < n_nodes * 7 * 4 / 3 + 4096
+
+    def test_etag_revalidation(self, client):
+        headers = auth_header()
+        resp = client.get("/api/v1/model/edge-bundle", headers=headers)
+        assert resp.status_code == 200
+        etag = resp.headers["etag"]
+        assert resp.json()["model_version"] == ml_prediction.get_active_bundle().version
+
+        again = client.get("/api/v1/model/edge-bundle", headers={**headers, "If-None-Match": etag})
+        assert again.status_code == 304
+        assert again.content == b""
+        assert again.headers["etag"] == etag
+
+        stale = client.get("/api/v1/model/edge-bundle", headers={**headers, "If-None-Match": '"0.1-x"'})
+        assert stale.status_code == 200
+
+    def test_requires_authentication(self, client):
+        assert client.get("/api/v1/model/edge-bundle").status_code == 401
+
+    def test_promote_changes_bundle(self, client):
+        headers = auth_header()
+        old_etag = client.get("/api/v1/model/edge-bundle", headers=headers).headers["etag"]
+
+        from sklearn.ensemble import RandomForestClassifier
+        active = ml_prediction.get_active_bundle()
+        rng = np.random.default_rng(0)
+        X = rng.normal(size=(300, len(active.feature_columns)))
+        model = RandomForestClassifier(n_estimators=5, max_depth=4, random_state=0).fit(X, X[:, 0] > 0)
+        model_registry.register_version("2.0", model, active.scaler, active.feature_columns)
+        model_registry.promote("2.0")
+
+        resp = client.get("/api/v1/model/edge-bundle", headers={**headers, "If-None-Match": old_etag})
+        assert resp.status_code == 200
+        assert resp.headers["etag"] != old_etag
+        assert resp.json()["model_version"] == "2.0"
+        assert resp.json()["n_trees"] == 5
@@ -0,0 +1,118 @@
+"""
+Tests for the flat, memory-mapped forest.
+
+Verifies:
+- predict_proba/predict match sklearn exactly, incl. on the shipped model
+- TreeSHAP built from the flat arrays matches the sklearn-built explainer
+- Arrays are memory-mapped and re-exported when the pickle is newer
+- The exported scaler transforms exactly like the pickled StandardScaler
+- MODEL_FLAT_ARTIFACTS is off by default and then loads the pickle
+- Re-exporting moves the old arrays aside, so open mappings stay readable
+"""
+
+import os
+import shutil
+
+import joblib
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+
+os.environ.setdefault("SECRET_KEY", "test-secret-key-thats-long-enough-32chars")
+os.environ.setdefault("PHI_ENCRYPTION_KEY", "dGVzdC1lbmNyeXB0aW9uLWtleS0zMmJ5dGVzISEhISE=")
+os.environ.setdefault("DEBUG", "true")
+
+
+def _forest(n_features=5, n_classes=2, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(500, n_features))
+    y = (X[:, 0] + X[:, 1] * X[:, 2] > 0).astype(int)
+    if n_classes == 3:
+        y = y + (X[:, 3] > 1)
+    model = RandomForestClassifier(n_estimators=12, max_depth=6, random_state=0).fit(X, y)
+    return model, rng.normal(size=(300, n_features)) * 1.5
+
+
+class TestFlatForest:
+    def test_matches_sklearn(self, tmp_path):
+        from app.services.flat_forest import FlatForest, export_flat
+
+        for n_classes in (2, 3):
+            model, X = _forest(n_classes=n_classes)
+            export_flat(model, tmp_path)
+            flat = FlatForest.load(tmp_path)
+            np.testing.assert_allclose(flat.predict_proba(X), model.predict_proba(X), rtol=0, atol=1e-12)
+            np.testing.assert_array_equal(flat.predict(X), model.predict(X))
+            np.testing.assert_allclose(flat.feature_importances_, model.feature_importances_)
+            # Exactly on a threshold: float32 rounding must agree with sklearn
+            tree = model.estimators_[0].tree_
+            edge = np.tile(X[:1], (1, 1))
+            edge[0, tree.feature[0]] = tree.threshold[0]
+            np.testing.assert_allclose(flat.predict_proba(edge), model.predict_proba(edge), atol=1e-12)
+
+    def test_shipped_model_and_explainer(self, tmp_path):
+        from app.services.flat_forest import FlatForest, export_flat
+        from app.services.ml_prediction import MODEL_PATH
+        from app.services.tree_shap import TreeExplainer
+
+        model = joblib.load(MODEL_PATH)
+        export_flat(model, tmp_path)
+        flat = FlatForest.load(tmp_path)
+        assert isinstance(flat.left, np.memmap)
+
+        X = np.random.default_rng(1).normal(size=(2000, model.n_features_in_)) * 2
+        np.testing.assert_allclose(flat.predict_proba(X), model.predict_proba(X), rtol=0, atol=1e-12)
+
+        reference, from_flat = TreeExplainer(model), TreeExplainer(flat)
+        assert reference.base_value == from_flat.base_value
+        np.testing.assert_allclose(from_flat.explain_batch(X[:50]), reference.explain_batch(X[:50]), atol=1e-12)
+
+    def test_bundle_uses_flat_arrays_and_refreshes(self, tmp_path, monkeypatch):
+        from app.config import settings
+        from app.services.flat_forest import FlatForest, FlatScaler
+        from app.services.ml_prediction import FEATURES_PATH, MODEL_PATH, SCALER_PATH, ModelBundle
+
+        for path in (MODEL_PATH, SCALER_PATH, FEATURES_PATH):
+            shutil.copy(path, tmp_path / path.name)
+
+        # Off by default: the pickle is served and nothing is written
+        assert settings.model_flat_artifacts is False
+        assert isinstance(ModelBundle.load(tmp_path, "t0").model, RandomForestClassifier)
+        assert not (tmp_path / "flat").exists()
+
+        monkeypatch.setattr(settings, "model_flat_artifacts", True)
+        bundle = ModelBundle.load(tmp_path, "t1")
+        assert isinstance(bundle.model, FlatForest)
+        assert (tmp_path / "flat" / "meta.json").exists()
+
+        # The scaler is served from flat/scaler.json with identical output
+        assert isinstance(bundle.scaler, FlatScaler)
+        X = np.random.default_rng(2).normal(size=(50, len(bundle.feature_columns))) * 40 + 80
+        np.testing.assert_array_equal(bundle.scaler.transform(X), joblib.load(SCALER_PATH).transform(X))
+
+        # A newer pickle invalidates the export
+        model, _ = _forest(n_features=17)
+        joblib.dump(model, tmp_path / MODEL_PATH.name)
+        meta = tmp_path / "flat" / "meta.json"
+        os.utime(meta, (meta.stat().st_mtime - 10, meta.stat().st_mtime - 10))
+        assert ModelBundle.load(tmp_path, "t2").model.n_estimators == 12
+
+        monkeypatch.setattr(settings, "model_flat_artifacts", False)
+        assert isinstance(ModelBundle.load(tmp_path, "t3").model, RandomForestClassifier)
+
+    def test_reexport_leaves_open_arrays_readable(self, tmp_path):
+        from app.services.flat_forest import SCALER_FILE, FlatForest, export_flat, export_scaler
+        from app.services.ml_prediction import SCALER_PATH
+
+        old_model, X = _forest(seed=0)
+        export_flat(old_model, tmp_path)
+        export_scaler(joblib.load(SCALER_PATH), tmp_path)
+        serving = FlatForest.load(tmp_path)
+
+        new_model, _ = _forest(seed=1)
+        export_flat(new_model, tmp_path)
+
+        # A worker still on the old arrays keeps scoring with them
+        np.testing.assert_allclose(serving.predict_proba(X), old_model.predict_proba(X), atol=1e-12)
+        np.testing.assert_allclose(FlatForest.load(tmp_path).predict_proba(X), new_model.predict_proba(X), atol=1e-12)
+        assert (tmp_path / "flat" / SCALER_FILE).exists()
+        assert sorted(p.name for p in tmp_path.iterdir()) == ["flat"]
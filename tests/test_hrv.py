@@ -0,0 +1,168 @@
+"""
+Tests for RR-interval ingest and HRV computation.
+
+Verifies:
+- RMSSD, SDNN and pNN50 match their definitions; out-of-range and
+  ectopic intervals are left out
+- LF/HF follows where the RR modulation's power is
+- A 24 h Holter-size recording (100k beats) is processed in under a second
+- POST /vitals/rr stores one row per 5-minute window with the compressed
+  raw intervals, GET /vitals/hrv reads them back, bad payloads get 400
+"""
+
+import base64
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+os.environ.setdefault("SECRET_KEY", "test-secret-key-thats-long-enough-32chars")
+os.environ.setdefault("PHI_ENCRYPTION_KEY", "dGVzdC1lbmNyeXB0aW9uLWtleS0zMmJ5dGVzISEhISE=")
+os.environ.setdefault("DEBUG", "true")
+
+from app.database import Base, get_db
+from app.main import app
+from app.models.hrv_window import HRVWindow
+from app.models.user import User, UserRole
+from app.api.auth import auth_service
+from app.services.hrv import compute_hrv_windows, decompress_rr, encode_rr
+
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test_hrv.db"
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def override_get_db():
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+@pytest.fixture(autouse=True)
+def setup_database():
+    app.dependency_overrides[get_db] = override_get_db
+    Base.metadata.create_all(bind=engine)
+    yield
+    Base.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+
+def create_patient():
+    db = TestingSessionLocal()
+    user = User(email="p@example.com", full_name="p", age=60, baseline_hr=70, role=UserRole.PATIENT)
+    db.add(user)
+    db.commit()
+    user_id = user.user_id
+    db.close()
+    return user_id
+
+
+def auth_header(user_id):
+    token = auth_service.create_access_token(data={"sub": str(user_id), "role": UserRole.PATIENT.value})
+    return {"Authorization": f"Bearer {token}"}
+
+
+def modulated_rr(n, freq_hz, amplitude=30.0, mean=800.0, seed=0):
+    """RR series whose tachogram oscillates at freq_hz."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(n) * mean / 1000.0
+    return np.round(mean + amplitude * np.sin(2 * np.pi * freq_hz * t) + rng.normal(0, 3, n)).astype(np.uint16)
+
+
+class TestHRVMetrics:
+    def test_time_domain_definitions(self):
+        rr = np.tile([800, 860], 150).astype(np.uint16)  # 249 s: one window
+        m = compute_hrv_windows(rr)
+        assert m["beat_count"].tolist() == [300]
+        assert m["rmssd_ms"][0] == pytest.approx(60.0)
+        assert m["pnn50"][0] == pytest.approx(100.0)
+        assert m["sdnn_ms"][0] == pytest.approx(np.std(rr.astype(float), ddof=1))
+        assert m["mean_rr_ms"][0] == pytest.approx(830.0)
+
+        # Differences of exactly 50 ms don't count toward pNN50
+        assert compute_hrv_windows(np.tile([800, 850], 150))["pnn50"][0] == 0.0
+
+    def test_artifacts_are_excluded(self):
+        clean = np.tile([800, 820, 810, 830], 80).astype(np.uint16)
+        noisy = clean.copy()
+        noisy[40] = 3000  # missed beat
+        noisy[120] = 520  # ectopic (premature) beat
+        m_clean, m_noisy = compute_hrv_windows(clean), compute_hrv_windows(noisy)
+        assert m_noisy["artifact_count"].tolist() == [2]
+        assert m_noisy["rmssd_ms"][0] == pytest.approx(m_clean["rmssd_ms"][0], rel=0.02)
+        assert m_noisy["sdnn_ms"][0] == pytest.approx(m_clean["sdnn_ms"][0], rel=0.02)
+
+    def test_lf_hf_follows_modulation(self):
+        lf = compute_hrv_windows(modulated_rr(1500, 0.1))
+        hf = compute_hrv_windows(modulated_rr(1500, 0.25))
+        assert len(lf["lf_hf_ratio"]) == 4
+        assert (lf["lf_hf_ratio"][:3] > 5).all()
+        assert (hf["lf_hf_ratio"][:3] < 0.2).all()
+
+    def test_windows_and_short_tail(self):
+        m = compute_hrv_windows(np.full(500, 800, dtype=np.uint16))  # 400 s
+        assert m["start_s"].tolist() == [0.0, 300.0]
+        assert m["end_s"][-1] == pytest.approx(400.0)
+        assert m["beat_count"].sum() == 500
+        assert np.isnan(m["lf_hf_ratio"][1])  # 100 s is too short for LF/HF
+
+    def test_holter_scale_under_a_second(self):
+        rr = modulated_rr(100_000, 0.1)
+        compute_hrv_windows(rr[:1000])  # warm-up
+        started = time.perf_counter()
+        m = compute_hrv_windows(rr)
+        assert time.perf_counter() - started < 1.0
+        assert m["beat_count"].sum() == 100_000
+
+
+class TestRRUpload:
+    def test_upload_stores_windows(self, client):
+        user_id = create_patient()
+        start = datetime.now(timezone.utc) - timedelta(hours=1)
+        rr = modulated_rr(800, 0.1)  # ~640 s: three windows
+        resp = client.post(
+            "/api/v1/vitals/rr",
+            json={"start_time": start.isoformat(), "rr_intervals": encode_rr(rr), "source_device": "Polar H10"},
+            headers=auth_header(user_id),
+        )
+        assert resp.status_code == 200
+        body = resp.json()
+        assert body["beat_count"] == 800 and body["artifact_count"] == 0
+        assert len(body["windows"]) == 3
+        assert body["windows"][0]["rmssd_ms"] > 0 and body["windows"][0]["lf_hf_ratio"] > 1
+
+        db = TestingSessionLocal()
+        rows = db.query(HRVWindow).filter_by(user_id=user_id).order_by(HRVWindow.window_start).all()
+        db.close()
+        assert np.array_equal(np.concatenate([decompress_rr(r.rr_blob) for r in rows]), rr)
+        assert sum(len(r.rr_blob) for r in rows) < rr.nbytes
+
+        history = client.get("/api/v1/vitals/hrv", headers=auth_header(user_id)).json()
+        assert [w["window_id"] for w in history] == [r.window_id for r in reversed(rows)]
+
+    @pytest.mark.parametrize("payload", [
+        "not base64!",
+        base64.b64encode(b"\x01\x02\x03").decode(),
+        "",
+    ])
+    def test_bad_payload_rejected(self, client, payload):
+        user_id = create_patient()
+        resp = client.post(
+            "/api/v1/vitals/rr",
+            json={"start_time": datetime.now(timezone.utc).isoformat(), "rr_intervals": payload},
+            headers=auth_header(user_id),
+        )
+        assert resp.status_code == 400
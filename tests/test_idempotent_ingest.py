@@ -0,0 +1,208 @@
+"""
+Tests for idempotent vitals ingest.
+
+Verifies:
+- Resending a JSON batch stores nothing new and reports the readings as
+  duplicates; a partly new batch stores only the new readings
+- Copies inside one batch are stored once
+- Readings without a device_id are never treated as duplicates
+- Readings sent without a timestamp are all kept, not merged as
+  duplicates of one receive time
+- The binary batch, WebSocket flush and single-reading paths skip
+  readings already stored too
+"""
+
+import json
+import os
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+os.environ.setdefault("SECRET_KEY", "test-secret-key-thats-long-enough-32chars")
+os.environ.setdefault("PHI_ENCRYPTION_KEY", "dGVzdC1lbmNyeXB0aW9uLWtleS0zMmJ5dGVzISEhISE=")
+os.environ.setdefault("DEBUG", "true")
+
+from app.database import Base, get_db
+from app.main import app
+from app.models.patient_latest_state import PatientLatestState
+from app.models.user import User, UserRole
+from app.models.vital_signs import VitalSignRecord
+from app.api.auth import auth_service
+from app.schemas.vital_signs import VitalSignCreate
+from app.services.alert_cooldown import alert_cooldown
+from app.services.vitals_ingest import flush_readings, parse_readings
+from app.services.vitals_wire import encode_vitals_batch
+
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test_idempotent_ingest.db"
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def override_get_db():
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+@pytest.fixture(autouse=True)
+def setup_database():
+    app.dependency_overrides[get_db] = override_get_db
+    Base.metadata.create_all(bind=engine)
+    alert_cooldown.clear()
+    yield
+    Base.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+
+def create_patient():
+    db = TestingSessionLocal()
+    user = User(email="p@example.com", full_name="p", age=60, baseline_hr=70, role=UserRole.PATIENT)
+    db.add(user)
+    db.commit()
+    user_id = user.user_id
+    db.close()
+    return user_id
+
+
+def auth_header(user_id):
+    token = auth_service.create_access_token(data={"sub": str(user_id), "role": UserRole.PATIENT.value})
+    return {"Authorization": f"Bearer {token}"}
+
+
+START = datetime.now(timezone.utc).replace(microsecond=0) - timedelta(hours=1)
+
+
+def readings(n, offset=0, device_id="watch-1"):
+    return [
+        {
+            "heart_rate": 72 + (i % 3),
+            "spo2": 97.0,
+            "device_id": device_id,
+            "timestamp": (START + timedelta(seconds=5 * (offset + i))).isoformat(),
+        }
+        for i in range(n)
+    ]
+
+
+def post_batch(client, user_id, vitals):
+    resp = client.post("/api/v1/vitals/batch", json={"vitals": vitals}, headers=auth_header(user_id))
+    assert resp.status_code == 200
+    return resp.json()
+
+
+def stored_count(user_id):
+    db = TestingSessionLocal()
+    count = db.query(VitalSignRecord).filter_by(user_id=user_id).count()
+    db.close()
+    return count
+
+
+class TestJSONBatch:
+    def test_resend_is_idempotent(self, client):
+        user_id = create_patient()
+        first = post_batch(client, user_id, readings(5))
+        assert (first["records_created"], first["records_duplicate"]) == (5, 0)
+
+        again = post_batch(client, user_id, readings(5))
+        assert (again["records_created"], again["records_duplicate"]) == (0, 5)
+
+        # Offline backlog grew since the failed sync: only the tail is new
+        grown = post_batch(client, user_id, readings(8))
+        assert (grown["records_created"], grown["records_duplicate"]) == (3, 5)
+        assert stored_count(user_id) == 8
+
+    def test_copies_within_one_batch(self, client):
+        user_id = create_patient()
+        body = post_batch(client, user_id, readings(3) + readings(1))
+        assert (body["records_created"], body["records_duplicate"]) == (3, 1)
+        assert stored_count(user_id) == 3
+
+    def test_without_device_id_is_not_deduped(self, client):
+        user_id = create_patient()
+        post_batch(client, user_id, readings(2, device_id=None))
+        body = post_batch(client, user_id, readings(2, device_id=None))
+        assert (body["records_created"], body["records_duplicate"]) == (2, 0)
+        assert stored_count(user_id) == 4
+
+    def test_unstamped_readings_are_all_kept(self, client):
+        user_id = create_patient()
+        vitals = [{"heart_rate": 70 + i, "device_id": "watch-1"} for i in range(5)]
+        body = post_batch(client, user_id, vitals)
+        assert (body["records_created"], body["records_duplicate"]) == (5, 0)
+        assert stored_count(user_id) == 5
+
+    def test_same_time_on_another_device_is_kept(self, client):
+        user_id = create_patient()
+        post_batch(client, user_id, readings(2, device_id="watch-1"))
+        body = post_batch(client, user_id, readings(2, device_id="ring-1"))
+        assert body["records_created"] == 2
+        assert stored_count(user_id) == 4
+
+
+class TestOtherIngestPaths:
+    def test_binary_resend(self, client):
+        user_id = create_patient()
+        times = int(START.timestamp() * 1000) + np.arange(20, dtype=np.int64) * 5000
+        body = encode_vitals_batch(times, np.full(20, 75), np.full(20, 97))
+        headers = {**auth_header(user_id), "Content-Type": "application/octet-stream"}
+
+        def send():
+            resp = client.post(
+                "/api/v1/vitals/batch/binary", content=body, params={"device_id": "strap-1"}, headers=headers
+            )
+            assert resp.status_code == 200
+            return resp.json()
+
+        assert (send()["records_created"], send()["records_duplicate"]) == (20, 20)
+        assert stored_count(user_id) == 20
+
+    def test_stream_flush_resend_keeps_latest_state(self):
+        user_id = create_patient()
+        batch = [VitalSignCreate.model_validate(r) for r in readings(4)]
+        db = TestingSessionLocal()
+        try:
+            assert flush_readings(db, user_id, batch)["stored"] == 4
+            latest = db.query(PatientLatestState).filter_by(user_id=user_id).one().latest_reading_id
+
+            result = flush_readings(db, user_id, batch)
+            assert (result["stored"], result["duplicates"]) == (0, 4)
+            db.expire_all()
+            assert db.query(PatientLatestState).filter_by(user_id=user_id).one().latest_reading_id == latest
+        finally:
+            db.close()
+        assert stored_count(user_id) == 4
+
+    def test_unstamped_stream_frame_is_all_kept(self):
+        user_id = create_patient()
+        frame = json.dumps([{"heart_rate": 70 + i, "device_id": "watch-1"} for i in range(5)])
+        batch, rejected = parse_readings(frame)
+        assert rejected == 0
+        assert len({r.timestamp for r in batch}) == 5
+        db = TestingSessionLocal()
+        try:
+            result = flush_readings(db, user_id, batch)
+        finally:
+            db.close()
+        assert (result["stored"], result["duplicates"]) == (5, 0)
+        assert stored_count(user_id) == 5
+
+    def test_single_reading_retry_returns_original(self, client):
+        user_id = create_patient()
+        [reading] = readings(1)
+        first = client.post("/api/v1/vitals", json=reading, headers=auth_header(user_id))
+        retry = client.post("/api/v1/vitals", json=reading, headers=auth_header(user_id))
+        assert first.status_code == retry.status_code == 200
+        assert retry.json()["id"] == first.json()["id"]
+        assert stored_count(user_id) == 1
@@ -0,0 +1,126 @@
+"""
+Tests for the pluggable inference backends.
+
+Verifies:
+- The default backend is sklearn and scores like scaler + model
+- The ONNX backend (built from the flat arrays) returns the same
+  probabilities as the sklearn pickle
+- risk_model.onnx is written on first load and reused afterwards
+- An unknown backend name or a failed ONNX export falls back to sklearn
+- GET /predict/status reports the backend
+"""
+
+import os
+import shutil
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+os.environ.setdefault("SECRET_KEY", "test-secret-key-thats-long-enough-32chars")
+os.environ.setdefault("PHI_ENCRYPTION_KEY", "dGVzdC1lbmNyeXB0aW9uLWtleS0zMmJ5dGVzISEhISE=")
+os.environ.setdefault("DEBUG", "true")
+
+from app.config import settings
+from app.main import app
+from app.services import inference_backend, ml_prediction, model_registry
+from app.services.inference_backend import ONNX_FILE, InferenceBackend, create_backend
+from app.services.ml_prediction import ModelBundle, engineer_feature_arrays
+
+
+@pytest.fixture(autouse=True)
+def setup_model(tmp_path, monkeypatch):
+    monkeypatch.setattr(model_registry, "REGISTRY_DIR", tmp_path / "registry")
+    assert ml_prediction.load_ml_model()
+    yield
+    monkeypatch.undo()
+    assert ml_prediction.load_ml_model()
+
+
+@pytest.fixture
+def model_copy(tmp_path):
+    """The shipped model files in a scratch directory (ONNX files land here)."""
+    directory = tmp_path / "model"
+    directory.mkdir()
+    for path in model_registry.MODEL_DIR.iterdir():
+        if path.is_file():
+            shutil.copy2(path, directory / path.name)
+    return directory
+
+
+def random_rows(bundle, n=2000, seed=0):
+    rng = np.random.default_rng(seed)
+    return engineer_feature_arrays(
+        rng.integers(20, 90, n), rng.integers(50, 100, n), rng.integers(120, 200, n),
+        rng.integers(60, 170, n), rng.integers(80, 210, n), rng.integers(40, 100, n),
+        rng.integers(85, 100, n), rng.integers(5, 90, n), rng.integers(1, 20, n),
+        activity_intensity=rng.integers(1, 4, n), bundle=bundle,
+    )
+
+
+class TestInferenceBackend:
+    def test_default_backend_is_sklearn(self):
+        bundle = ml_prediction.get_active_bundle()
+        assert bundle.backend.backend == "sklearn"
+        X = random_rows(bundle, n=200)
+        expected = bundle.model.predict_proba(bundle.scaler.transform(X))
+        assert np.array_equal(bundle.backend.predict_proba(X), expected)
+
+    def test_onnx_matches_sklearn(self, model_copy, monkeypatch):
+        pytest.importorskip("onnxruntime")
+        pytest.importorskip("onnx")
+        import joblib
+
+        monkeypatch.setattr(settings, "inference_backend", "onnx")
+        bundle = ModelBundle.load(model_copy, "onnx-test")
+        assert bundle.backend.backend == "onnx"
+        assert bundle.backend.describe()["threads"] == settings.onnx_threads
+
+        X = random_rows(bundle)
+        model = joblib.load(model_copy / "risk_model.pkl")
+        scaler = joblib.load(model_copy / "scaler.pkl")
+        expected = model.predict_proba(scaler.transform(X))
+        got = bundle.backend.predict_proba(X)
+        assert got.shape == expected.shape
+        assert np.abs(got - expected).max() < 1e-9
+        # Same decisions at the 0.5 boundary, not just close scores
+        assert np.array_equal(got[:, 1] >= 0.5, expected[:, 1] >= 0.5)
+        # A single 1-D row is accepted too
+        assert np.allclose(bundle.backend.predict_proba(X[0]), expected[:1])
+
+    def test_onnx_file_written_once(self, model_copy, monkeypatch):
+        pytest.importorskip("onnxruntime")
+        pytest.importorskip("onnx")
+        monkeypatch.setattr(settings, "inference_backend", "onnx")
+
+        ModelBundle.load(model_copy, "onnx-test")
+        onnx_file = model_copy / ONNX_FILE
+        assert onnx_file.exists()
+
+        def fail(*args, **kwargs):
+            raise AssertionError("graph rebuilt although risk_model.onnx is current")
+
+        monkeypatch.setattr(inference_backend, "build_onnx_model", fail)
+        bundle = ModelBundle.load(model_copy, "onnx-test")
+        assert bundle.backend.backend == "onnx"
+
+    def test_fallback_to_sklearn(self, model_copy, monkeypatch):
+        bundle = ml_prediction.get_active_bundle()
+        assert type(create_backend(model_copy, bundle.model, bundle.scaler, name="tpu")) is InferenceBackend
+
+        def fail(*args, **kwargs):
+            raise ImportError("No module named 'onnx'")
+
+        monkeypatch.setattr(inference_backend, "build_onnx_model", fail)
+        backend = create_backend(model_copy, bundle.model, bundle.scaler, name="onnx")
+        assert type(backend) is InferenceBackend
+        assert not (model_copy / ONNX_FILE).exists()
+
+        # Loading a version falls back the same way
+        monkeypatch.setattr(settings, "inference_backend", "onnx")
+        fallback = ModelBundle.load(model_copy, "fallback")
+        assert fallback.backend.backend == "sklearn"
+
+    def test_status_reports_backend(self):
+        data = TestClient(app).get("/api/v1/predict/status").json()
+        assert data["inference_backend"]["backend"] == "sklearn"
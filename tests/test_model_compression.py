@@ -0,0 +1,148 @@
+"""
+Tests for forest compression.
+
+Verifies:
+- Cutting trees at a depth keeps the class fractions of the cut nodes,
+  and a limit at or past the real depth changes nothing
+- Pruning keeps a subset of the original trees that tracks its scores
+- A distilled forest follows the original's predictions
+- The report covers metrics, latency and size, and the chosen candidate
+  registers as a loadable, promotable version
+"""
+
+import os
+
+import numpy as np
+import pytest
+
+os.environ.setdefault("SECRET_KEY", "test-secret-key-thats-long-enough-32chars")
+os.environ.setdefault("PHI_ENCRYPTION_KEY", "dGVzdC1lbmNyeXB0aW9uLWtleS0zMmJ5dGVzISEhISE=")
+os.environ.setdefault("DEBUG", "true")
+
+from app.services import ml_prediction, model_registry
+from app.services.ml_prediction import engineer_feature_arrays
+from app.services.model_compression import (
+    compare_candidates,
+    distill_forest,
+    limit_depth,
+    pick_candidate,
+    prune_trees,
+    register_candidate,
+)
+from app.services.retraining_pipeline import split_holdout
+
+
+@pytest.fixture(autouse=True)
+def setup_model(tmp_path, monkeypatch):
+    monkeypatch.setattr(model_registry, "REGISTRY_DIR", tmp_path / "registry")
+    assert ml_prediction.load_ml_model()
+    yield
+    monkeypatch.undo()
+    assert ml_prediction.load_ml_model()
+
+
+@pytest.fixture(scope="module")
+def original():
+    return model_registry.load_training_artifacts(model_registry.LEGACY_VERSION)
+
+
+def labelled_rows(model, scaler, feature_columns, n=1000, seed=0):
+    """Random sessions labelled by the shipped model, 5% of labels flipped."""
+    rng = np.random.default_rng(seed)
+    X = engineer_feature_arrays(
+        rng.integers(20, 90, n), rng.integers(50, 100, n), rng.integers(120, 200, n),
+        rng.integers(60, 170, n), rng.integers(80, 210, n), rng.integers(40, 100, n),
+        rng.integers(85, 100, n), rng.integers(5, 90, n), rng.integers(1, 20, n),
+        activity_intensity=rng.integers(1, 4, n), feature_columns=feature_columns,
+    ).astype(np.float32)
+    y = model.predict(scaler.transform(X)).astype(np.int8)
+    flip = rng.random(n) < 0.05
+    y[flip] = 1 - y[flip]
+    return X, y
+
+
+class TestModelCompression:
+    def test_limit_depth(self, original):
+        model, scaler, columns = original
+        X, _ = labelled_rows(model, scaler, columns, n=300)
+        X_scaled = scaler.transform(X).astype(np.float32)
+
+        unchanged = limit_depth(model, model.max_depth)
+        assert np.array_equal(unchanged.predict_proba(X_scaled), model.predict_proba(X_scaled))
+
+        cut = limit_depth(model, 3)
+        assert all(est.tree_.max_depth <= 3 for est in cut.estimators_)
+        assert model.estimators_[0].tree_.max_depth > 3  # the original is untouched
+        # Each row lands on the node its original path passed at depth 3
+        tree, short = model.estimators_[0].tree_, cut.estimators_[0]
+        paths = model.estimators_[0].decision_path(X_scaled)
+        depth = np.zeros(tree.node_count, dtype=int)
+        for node in range(tree.node_count):
+            for child in (tree.children_left[node], tree.children_right[node]):
+                if child != -1:
+                    depth[child] = depth[node] + 1
+        for i in range(20):
+            nodes = paths[i].indices
+            node = nodes[np.argmax(depth[nodes] == min(3, depth[nodes].max()))]
+            assert np.allclose(short.predict_proba(X_scaled[i:i + 1])[0], tree.value[node, 0])
+
+    def test_prune_trees(self, original):
+        model, scaler, columns = original
+        X, _ = labelled_rows(model, scaler, columns)
+        X_scaled = scaler.transform(X)
+
+        pruned = prune_trees(model, 20, X_scaled)
+        assert len(pruned.estimators_) == 20 and len(model.estimators_) == 100
+        assert all(any(est is kept for kept in model.estimators_) for est in pruned.estimators_)
+        diff = np.abs(pruned.predict_proba(X_scaled)[:, 1] - model.predict_proba(X_scaled)[:, 1])
+        assert diff.mean() < 0.06
+
+        with pytest.raises(ValueError):
+            prune_trees(model, 0, X_scaled)
+
+    def test_distill_forest(self, original):
+        model, scaler, columns = original
+        X, _ = labelled_rows(model, scaler, columns, n=1500)
+        X_scaled = scaler.transform(X)
+
+        student = distill_forest(model, X_scaled[:1000], n_estimators=10, max_depth=6)
+        assert len(student.estimators_) == 10
+        assert all(est.tree_.max_depth <= 6 for est in student.estimators_)
+        held_out = X_scaled[1000:]
+        agreement = np.mean(student.predict(held_out) == model.predict(held_out))
+        assert agreement > 0.9
+
+    def test_report_and_register(self, original):
+        model, scaler, columns = original
+        X, y = labelled_rows(model, scaler, columns)
+        X_train, X_test, _, y_test = split_holdout(X, y)
+
+        report, models = compare_candidates(
+            model, scaler, X_train, X_test, y_test, trees=[25], depths=[6], distill=[(10, 6)],
+        )
+        assert [row["name"] for row in report] == ["original", "prune-25", "depth-6", "distill-10x6"]
+        for row in report:
+            for key in ("accuracy", "roc_auc", "p50_ms", "p99_ms", "batch_1024_ms", "pickle_kb", "flat_kb"):
+                assert row[key] is not None, key
+        assert report[0]["agreement"] == 1.0
+        assert report[1]["n_trees"] == 25 and report[1]["flat_kb"] < report[0]["flat_kb"]
+
+        chosen = pick_candidate(report, max_auc_drop=1.0)
+        assert chosen["name"] != "original"
+        assert pick_candidate(report, max_auc_drop=-1.0) is None
+
+        register_candidate("1.0-small", chosen, models[chosen["name"]], scaler, columns, "1.0")
+        entry = next(v for v in model_registry.list_versions()["versions"] if v["version"] == "1.0-small")
+        assert entry["active"] is False
+        assert entry["metrics"]["compressed_from"] == "1.0"
+        assert entry["metrics"]["n_trees"] == chosen["n_trees"]
+
+        model_registry.promote("1.0-small")
+        bundle = ml_prediction.get_active_bundle()
+        assert bundle.version == "1.0-small"
+        assert bundle.model.n_estimators == chosen["n_trees"]
+        result = ml_prediction.predict_risk(
+            age=60, baseline_hr=72, max_safe_hr=160, avg_heart_rate=120, peak_heart_rate=150,
+            min_heart_rate=70, avg_spo2=96, duration_minutes=30, recovery_time_minutes=6,
+        )
+        assert result["model_info"]["version"] == "1.0-small"
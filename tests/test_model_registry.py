@@ -0,0 +1,209 @@
+"""
+Tests for the versioned model registry and hot-swap.
+
+Verifies:
+- A registered version can be promoted and rolled back without a restart
+- Stored risk assessments record the model version that scored them
+- A bundle taken before a swap keeps predicting with its own version
+- Promote/rollback/list are admin-only; unknown versions are 404
+"""
+
+import os
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+os.environ.setdefault("SECRET_KEY", "test-secret-key-thats-long-enough-32chars")
+os.environ.setdefault("PHI_ENCRYPTION_KEY", "dGVzdC1lbmNyeXB0aW9uLWtleS0zMmJ5dGVzISEhISE=")
+os.environ.setdefault("DEBUG", "true")
+
+from app.database import Base, get_db
+from app.main import app
+from app.models.user import User, UserRole
+from app.models.vital_signs import VitalSignRecord
+from app.models.risk_assessment import RiskAssessment
+from app.api.auth import auth_service
+from app.services import ml_prediction, model_registry
+from app.services.alert_cooldown import alert_cooldown
+
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test_model_registry.db"
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+SESSION = {
+    "age": 60, "baseline_hr": 72, "max_safe_hr": 160, "avg_heart_rate": 120,
+    "peak_heart_rate": 150, "min_heart_rate": 70, "avg_spo2": 96,
+    "duration_minutes": 30, "recovery_time_minutes": 6, "activity_type": "jogging",
+}
+
+
+def override_get_db():
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+@pytest.fixture(autouse=True)
+def setup_database(tmp_path, monkeypatch):
+    # Each test gets an empty registry; the shipped model stays version 1.0
+    monkeypatch.setattr(model_registry, "REGISTRY_DIR", tmp_path / "registry")
+    app.dependency_overrides[get_db] = override_get_db
+    Base.metadata.create_all(bind=engine)
+    alert_cooldown.clear()
+    assert ml_prediction.load_ml_model()
+    yield
+    Base.metadata.drop_all(bind=engine)
+    monkeypatch.undo()
+    assert ml_prediction.load_ml_model()
+
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+
+def create_user(email, role):
+    db = TestingSessionLocal()
+    user = User(email=email, full_name=email.split("@")[0], age=60, role=role)
+    db.add(user)
+    db.commit()
+    user_id = user.user_id
+    db.close()
+    return user_id
+
+
+def auth_header(user_id, role):
+    token = auth_service.create_access_token(data={"sub": str(user_id), "role": role.value})
+    return {"Authorization": f"Bearer {token}"}
+
+
+def register_small_model(version):
+    """A 5-tree forest on synthetic data, reusing the shipped scaler and feature order."""
+    from sklearn.ensemble import RandomForestClassifier
+
+    active = ml_prediction.get_active_bundle()
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(400, len(active.feature_columns)))
+    y = (X[:, 0] + X[:, 3] > 0).astype(int)
+    model = RandomForestClassifier(n_estimators=5, max_depth=4, random_state=0).fit(X, y)
+    return model_registry.register_version(
+        version, model, active.scaler, active.feature_columns,
+        metrics={"accuracy": 0.9}, notes="test model",
+    )
+
+
+class TestModelRegistry:
+    def test_bootstrap_is_legacy_version(self):
+        listing = model_registry.list_versions()
+        assert listing["active"] == "1.0"
+        assert listing["loaded"] == "1.0"
+        assert [v["version"] for v in listing["versions"]] == ["1.0"]
+        assert ml_prediction.predict_risk(**SESSION)["model_info"]["version"] == "1.0"
+
+    def test_promote_and_rollback_swap_in_place(self):
+        register_small_model("2.0")
+        before = ml_prediction.get_active_bundle()
+
+        assert model_registry.promote("2.0") == {"active": "2.0", "previous": "1.0"}
+        after = ml_prediction.get_active_bundle()
+        assert after.version == "2.0"
+        assert ml_prediction.predict_risk(**SESSION)["model_info"]["version"] == "2.0"
+
+        # A request holding the old bundle finishes on the old model
+        old = ml_prediction.predict_risk(**SESSION, bundle=before)
+        assert old["model_info"]["version"] == "1.0"
+        assert old["risk_score"] != ml_prediction.predict_risk(**SESSION)["risk_score"]
+
+        assert model_registry.rollback() == {"active": "1.0", "previous": "2.0"}
+        assert ml_prediction.get_active_bundle().version == "1.0"
+        assert model_registry.read_manifest()["active"] == "1.0"
+
+    def test_failed_load_keeps_current_model(self):
+        register_small_model("broken")
+        (model_registry.REGISTRY_DIR / "broken" / "risk_model.pkl").write_bytes(b"not a model")
+
+        with pytest.raises(Exception):
+            model_registry.promote("broken")
+        assert ml_prediction.get_active_bundle().version == "1.0"
+        assert model_registry.read_manifest()["active"] == "1.0"
+
+    def test_rejects_bad_and_duplicate_versions(self):
+        with pytest.raises(ValueError):
+            register_small_model("../escape")
+        register_small_model("2.0")
+        with pytest.raises(ValueError):
+            register_small_model("2.0")
+
+    def test_sync_follows_manifest(self):
+        register_small_model("2.0")
+        manifest = model_registry.read_manifest()
+        manifest["active"], manifest["previous"] = "2.0", "1.0"
+        model_registry._write_manifest(manifest)
+
+        assert model_registry.sync_with_manifest() is True
+        assert ml_prediction.get_active_bundle().version == "2.0"
+        assert model_registry.sync_with_manifest() is False
+
+
+class TestModelRegistryEndpoints:
+    def test_assessment_records_promoted_version(self, client):
+        admin_id = create_user("admin@test.com", UserRole.ADMIN)
+        patient_id = create_user("pat@test.com", UserRole.PATIENT)
+        register_small_model("2.0")
+
+        now = datetime.now(timezone.utc)
+        db = TestingSessionLocal()
+        for i, hr in enumerate([110, 130, 150, 140]):
+            db.add(VitalSignRecord(
+                user_id=patient_id, heart_rate=hr, spo2=96, activity_type="walking",
+                timestamp=now - timedelta(minutes=20 - 5 * i), is_valid=True,
+            ))
+        db.commit()
+        db.close()
+
+        resp = client.post(
+            "/api/v1/model/versions/2.0/promote", headers=auth_header(admin_id, UserRole.ADMIN)
+        )
+        assert resp.status_code == 200
+        assert resp.json()["active"] == "2.0"
+
+        resp = client.post(
+            "/api/v1/risk-assessments/compute", headers=auth_header(patient_id, UserRole.PATIENT)
+        )
+        assert resp.status_code == 200
+        db = TestingSessionLocal()
+        assert db.query(RiskAssessment).one().model_version == "2.0"
+        db.close()
+
+        resp = client.get("/api/v1/model/versions", headers=auth_header(admin_id, UserRole.ADMIN))
+        assert resp.json()["active"] == "2.0"
+        assert resp.json()["previous"] == "1.0"
+
+        resp = client.post("/api/v1/model/rollback", headers=auth_header(admin_id, UserRole.ADMIN))
+        assert resp.status_code == 200
+        assert ml_prediction.get_active_bundle().version == "1.0"
+
+    def test_admin_only_and_unknown_version(self, client):
+        admin_id = create_user("admin@test.com", UserRole.ADMIN)
+        clinician_id = create_user("doc@test.com", UserRole.CLINICIAN)
+
+        resp = client.post(
+            "/api/v1/model/versions/1.0/promote", headers=auth_header(clinician_id, UserRole.CLINICIAN)
+        )
+        assert resp.status_code == 403
+
+        resp = client.post(
+            "/api/v1/model/versions/9.9/promote", headers=auth_header(admin_id, UserRole.ADMIN)
+        )
+        assert resp.status_code == 404
+
+        resp = client.post("/api/v1/model/rollback", headers=auth_header(admin_id, UserRole.ADMIN))
+        assert resp.status_code == 409
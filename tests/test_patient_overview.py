@@ -0,0 +1,186 @@
+"""
+Tests for the clinician patient overview and the patient_latest_state table.
+
+Verifies:
+- Writes (vitals, alerts, acknowledge) keep the state row current
+- Overview lists patients in one request and hides SHARING_OFF patients
+- Out-of-order vitals never overwrite a newer reading
+- A rebuild picks the newest valid reading, like the write path
+- Concurrent alert writes and acknowledgements all reach the counter
+"""
+
+import os
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+os.environ.setdefault("SECRET_KEY", "test-secret-key-thats-long-enough-32chars")
+os.environ.setdefault("PHI_ENCRYPTION_KEY", "dGVzdC1lbmNyeXB0aW9uLWtleS0zMmJ5dGVzISEhISE=")
+os.environ.setdefault("DEBUG", "true")
+
+from app.database import Base, get_db
+from app.main import app
+from app.models.user import User, UserRole
+from app.models.alert import Alert
+from app.models.vital_signs import VitalSignRecord
+from app.models.patient_latest_state import PatientLatestState
+from app.api.auth import auth_service
+from app.services.alert_cooldown import alert_cooldown
+
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test_patient_overview.db"
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def override_get_db():
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+@pytest.fixture(autouse=True)
+def setup_database():
+    app.dependency_overrides[get_db] = override_get_db
+    Base.metadata.create_all(bind=engine)
+    alert_cooldown.clear()
+    yield
+    Base.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+
+def create_user(email, role, share_state="SHARING_ON"):
+    db = TestingSessionLocal()
+    user = User(email=email, full_name=email.split("@")[0], age=60, role=role, share_state=share_state)
+    db.add(user)
+    db.commit()
+    user_id = user.user_id
+    db.close()
+    return user_id
+
+
+def auth_header(user_id, role):
+    token = auth_service.create_access_token(data={"sub": str(user_id), "role": role.value})
+    return {"Authorization": f"Bearer {token}"}
+
+
+class TestPatientOverview:
+    def test_overview_reflects_writes(self, client):
+        clinician_id = create_user("doc@test.com", UserRole.CLINICIAN)
+        patient_id = create_user("pat@test.com", UserRole.PATIENT)
+
+        resp = client.post(
+            "/api/v1/vitals",
+            json={"heart_rate": 88, "spo2": 97},
+            headers=auth_header(patient_id, UserRole.PATIENT),
+        )
+        assert resp.status_code == 200
+
+        resp = client.post(
+            "/api/v1/alerts",
+            json={"user_id": patient_id, "alert_type": "other", "severity": "warning", "message": "check"},
+            headers=auth_header(patient_id, UserRole.PATIENT),
+        )
+        assert resp.status_code == 200
+        alert_id = resp.json()["alert_id"]
+
+        resp = client.get("/api/v1/patients/overview", headers=auth_header(clinician_id, UserRole.CLINICIAN))
+        assert resp.status_code == 200
+        row = resp.json()["patients"][0]
+        assert row["user_id"] == patient_id
+        assert row["latest_heart_rate"] == 88
+        assert row["unacknowledged_alert_count"] == 1
+
+        client.patch(f"/api/v1/alerts/{alert_id}/acknowledge", headers=auth_header(patient_id, UserRole.PATIENT))
+        resp = client.get("/api/v1/patients/overview", headers=auth_header(clinician_id, UserRole.CLINICIAN))
+        assert resp.json()["patients"][0]["unacknowledged_alert_count"] == 0
+
+    def test_sharing_off_patients_hidden(self, client):
+        clinician_id = create_user("doc@test.com", UserRole.CLINICIAN)
+        create_user("visible@test.com", UserRole.PATIENT)
+        create_user("hidden@test.com", UserRole.PATIENT, share_state="SHARING_OFF")
+
+        resp = client.get("/api/v1/patients/overview", headers=auth_header(clinician_id, UserRole.CLINICIAN))
+        emails = [p["email"] for p in resp.json()["patients"]]
+        assert emails == ["visible@test.com"]
+
+    def test_patient_cannot_view_overview(self, client):
+        patient_id = create_user("pat@test.com", UserRole.PATIENT)
+        resp = client.get("/api/v1/patients/overview", headers=auth_header(patient_id, UserRole.PATIENT))
+        assert resp.status_code == 403
+
+
+class TestPatientStateService:
+    def test_older_vitals_do_not_overwrite(self):
+        from app.services.patient_state import record_vitals
+
+        patient_id = create_user("pat@test.com", UserRole.PATIENT)
+        db = TestingSessionLocal()
+        now = datetime.now(timezone.utc)
+        newer = VitalSignRecord(user_id=patient_id, heart_rate=90, timestamp=now)
+        older = VitalSignRecord(user_id=patient_id, heart_rate=70, timestamp=now - timedelta(hours=1))
+        db.add_all([newer, older])
+        db.flush()
+
+        record_vitals(db, patient_id, [newer])
+        record_vitals(db, patient_id, [older])
+        db.commit()
+
+        state = db.get(PatientLatestState, patient_id)
+        assert state.latest_heart_rate == 90
+        db.close()
+
+    def test_rebuild_skips_flagged_reading(self):
+        from app.services.patient_state import rebuild_patient_state
+
+        patient_id = create_user("pat@test.com", UserRole.PATIENT)
+        db = TestingSessionLocal()
+        now = datetime.now(timezone.utc)
+        valid = VitalSignRecord(user_id=patient_id, heart_rate=80, spo2=97, timestamp=now - timedelta(minutes=1))
+        flagged = VitalSignRecord(user_id=patient_id, heart_rate=230, spo2=70, timestamp=now, is_valid=False)
+        db.add_all([valid, flagged])
+        db.commit()
+
+        rebuild_patient_state(db, patient_id)
+        db.commit()
+
+        state = db.get(PatientLatestState, patient_id)
+        assert state.latest_reading_id == valid.reading_id
+        assert (state.latest_heart_rate, state.latest_spo2) == (80, 97)
+        db.close()
+
+    def test_concurrent_counter_updates_are_not_lost(self):
+        from app.services.patient_state import adjust_unacknowledged_alerts, record_alerts_created
+
+        patient_id = create_user("pat@test.com", UserRole.PATIENT)
+        db = TestingSessionLocal()
+        db.add(PatientLatestState(user_id=patient_id, unacknowledged_alert_count=1))
+        db.commit()
+        db.close()
+
+        # Both writers read the row before either commits
+        ingest, ack = TestingSessionLocal(), TestingSessionLocal()
+        seen = [db.get(PatientLatestState, patient_id) for db in (ingest, ack)]
+        assert [state.unacknowledged_alert_count for state in seen] == [1, 1]
+        record_alerts_created(ingest, patient_id, [Alert(acknowledged=False, severity="critical")] * 2)
+        ingest.commit()
+        adjust_unacknowledged_alerts(ack, patient_id, -1)
+        ack.commit()
+        assert ack.get(PatientLatestState, patient_id).unacknowledged_alert_count == 2
+
+        # Never below zero
+        adjust_unacknowledged_alerts(ack, patient_id, -5)
+        ack.commit()
+        assert ack.get(PatientLatestState, patient_id).unacknowledged_alert_count == 0
+        ingest.close()
+        ack.close()
@@ -0,0 +1,132 @@
+"""
+Tests for the prediction result cache.
+
+Verifies:
+- A repeated prediction skips feature engineering and the model
+- Callers get copies, so changing a result doesn't change the cache
+- Promoting another model version empties the cache
+- LRU eviction and hit-rate stats (also on GET /predict/status)
+"""
+
+import os
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+os.environ.setdefault("SECRET_KEY", "test-secret-key-thats-long-enough-32chars")
+os.environ.setdefault("PHI_ENCRYPTION_KEY", "dGVzdC1lbmNyeXB0aW9uLWtleS0zMmJ5dGVzISEhISE=")
+os.environ.setdefault("DEBUG", "true")
+
+from app.main import app
+from app.services import ml_prediction, model_registry
+from app.services.prediction_cache import PredictionCache, prediction_cache
+
+SESSION = {
+    "age": 60, "baseline_hr": 72, "max_safe_hr": 160, "avg_heart_rate": 120,
+    "peak_heart_rate": 150, "min_heart_rate": 70, "avg_spo2": 96,
+    "duration_minutes": 30, "recovery_time_minutes": 6, "activity_type": "jogging",
+}
+
+
+@pytest.fixture(autouse=True)
+def setup_model(tmp_path, monkeypatch):
+    monkeypatch.setattr(model_registry, "REGISTRY_DIR", tmp_path / "registry")
+    assert ml_prediction.load_ml_model()
+    yield
+    monkeypatch.undo()
+    assert ml_prediction.load_ml_model()
+
+
+def counting(monkeypatch, owner, name):
+    calls = []
+    original = getattr(owner, name)
+
+    def wrapper(*args, **kwargs):
+        calls.append(1)
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(owner, name, wrapper)
+    return calls
+
+
+class TestPredictionCache:
+    def test_repeat_skips_engineering_and_inference(self, monkeypatch):
+        bundle = ml_prediction.get_active_bundle()
+        engineered = counting(monkeypatch, ml_prediction, "engineer_features")
+        scored = counting(monkeypatch, bundle.model, "predict_proba")
+        before = prediction_cache.stats()
+
+        first = ml_prediction.predict_risk(**SESSION)
+        second = ml_prediction.predict_risk(**SESSION)
+        assert first == second
+        assert len(engineered) == 1 and len(scored) == 1
+
+        stats = prediction_cache.stats()
+        assert stats["hits"] == before["hits"] + 1
+        assert stats["misses"] == before["misses"] + 1
+
+        # Different input is a different entry
+        ml_prediction.predict_risk(**{**SESSION, "peak_heart_rate": 151})
+        assert len(scored) == 2
+
+    def test_results_are_copies(self):
+        result = ml_prediction.predict_risk(**SESSION)
+        result["risk_score"] = -1
+        result["features_used"]["age"] = -1
+        result["inference_time_ms"] = 3.0
+
+        again = ml_prediction.predict_risk(**SESSION)
+        assert again["risk_score"] >= 0
+        assert again["features_used"]["age"] == 60
+        assert "inference_time_ms" not in again
+
+    def test_explanations_cached_per_feature_vector(self, monkeypatch):
+        bundle = ml_prediction.get_active_bundle()
+        explained = counting(monkeypatch, bundle.tree_explainer, "explain")
+        features = ml_prediction.predict_risk(**SESSION)["features_used"]
+
+        first = ml_prediction.explain_features(features)
+        second = ml_prediction.explain_features(dict(features))
+        assert first == second
+        assert len(explained) == 1
+
+    def test_promote_invalidates(self):
+        ml_prediction.predict_risk(**SESSION)
+        assert prediction_cache.stats()["size"] > 0
+
+        active = ml_prediction.get_active_bundle()
+        rng = np.random.default_rng(0)
+        from sklearn.ensemble import RandomForestClassifier
+        X = rng.normal(size=(300, len(active.feature_columns)))
+        model = RandomForestClassifier(n_estimators=5, max_depth=4, random_state=0).fit(X, X[:, 0] > 0)
+        model_registry.register_version("2.0", model, active.scaler, active.feature_columns)
+        model_registry.promote("2.0")
+
+        assert prediction_cache.stats()["size"] == 0
+        assert ml_prediction.predict_risk(**SESSION)["model_info"]["version"] == "2.0"
+
+    def test_lru_eviction_and_disabled(self):
+        cache = PredictionCache(2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        assert cache.get("a") == 1  # "b" is now the oldest
+        cache.put("c", 3)
+        assert cache.get("b") is None
+        assert cache.get("a") == 1 and cache.get("c") == 3
+        stats = cache.stats()
+        assert (stats["hits"], stats["misses"], stats["evictions"]) == (3, 1, 1)
+        assert stats["hit_rate"] == 0.75
+
+        off = PredictionCache(0)
+        off.put("a", 1)
+        assert off.get("a") is None
+        assert off.stats()["enabled"] is False
+
+    def test_status_endpoint_reports_cache(self):
+        ml_prediction.predict_risk(**SESSION)
+        ml_prediction.predict_risk(**SESSION)
+        data = TestClient(app).get("/api/v1/predict/status").json()
+        assert data["prediction_cache"]["enabled"] is True
+        assert data["prediction_cache"]["hits"] >= 1
+        assert 0 < data["prediction_cache"]["hit_rate"] <= 1
@@ -0,0 +1,268 @@
+"""
+Tests for real-time push (WebSocket / SSE).
+
+Verifies:
+- The hub delivers events only to listeners on the right patient
+- Redis publishes don't wait on Redis and go out in order
+- A patient's WebSocket receives vitals as soon as they are stored
+- Clinicians are refused when the patient has SHARING_OFF
+- Open clinician streams close once consent, the account or the token goes away
+- The ingest channel writes buffered readings in batches with one alert per type
+"""
+
+import asyncio
+import os
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from starlette.websockets import WebSocketDisconnect
+
+os.environ.setdefault("SECRET_KEY", "test-secret-key-thats-long-enough-32chars")
+os.environ.setdefault("PHI_ENCRYPTION_KEY", "dGVzdC1lbmNyeXB0aW9uLWtleS0zMmJ5dGVzISEhISE=")
+os.environ.setdefault("DEBUG", "true")
+
+from app.database import Base, get_db
+from app.main import app
+from app.models.user import User, UserRole
+from app.api.auth import auth_service
+from app.services.alert_cooldown import alert_cooldown
+
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test_realtime.db"
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def override_get_db():
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+@pytest.fixture(autouse=True)
+def setup_database():
+    app.dependency_overrides[get_db] = override_get_db
+    Base.metadata.create_all(bind=engine)
+    alert_cooldown.clear()
+    yield
+    Base.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+
+def create_user(email, role, share_state="SHARING_ON"):
+    db = TestingSessionLocal()
+    user = User(email=email, full_name=email.split("@")[0], age=60, role=role, share_state=share_state)
+    db.add(user)
+    db.commit()
+    user_id = user.user_id
+    db.close()
+    return user_id
+
+
+def token_for(user_id, role, expires_delta=None):
+    return auth_service.create_access_token(data={"sub": str(user_id), "role": role.value}, expires_delta=expires_delta)
+
+
+def update_user(user_id, **fields):
+    db = TestingSessionLocal()
+    user = db.get(User, user_id)
+    for name, value in fields.items():
+        setattr(user, name, value)
+    db.commit()
+    db.close()
+
+
+class TestRealtimeHub:
+    def test_publish_reaches_only_matching_subscribers(self):
+        from app.services.realtime_hub import RealtimeHub
+
+        async def scenario():
+            hub = RealtimeHub()
+            mine = hub.subscribe(1)
+            other = hub.subscribe(2)
+            hub.publish(1, {"type": "vitals", "user_id": 1})
+            received = await mine.get(timeout=1.0)
+            missed = await other.get(timeout=0.05)
+            hub.unsubscribe(mine)
+            hub.unsubscribe(other)
+            return received, missed, hub.subscriber_count()
+
+        received, missed, remaining = asyncio.run(scenario())
+        assert received["user_id"] == 1
+        assert missed is None
+        assert remaining == 0
+
+    def test_redis_publish_does_not_wait_on_redis(self):
+        from app.services.realtime_hub import REDIS_CHANNEL_PREFIX, RedisRealtimeHub
+
+        release = threading.Event()
+        sent = []
+
+        class SlowRedis:
+            def publish(self, channel, message):
+                release.wait(5.0)
+                sent.append((channel, message))
+
+        async def scenario():
+            hub = RedisRealtimeHub("redis://unused")
+            hub._publisher = SlowRedis()
+            started = time.perf_counter()
+            for i in range(3):
+                hub.publish(7, {"seq": i})
+            elapsed = time.perf_counter() - started
+            release.set()
+            await hub.stop()
+            return elapsed
+
+        elapsed = asyncio.run(scenario())
+        assert elapsed < 0.5
+        assert [channel for channel, _ in sent] == [f"{REDIS_CHANNEL_PREFIX}7"] * 3
+        assert [message for _, message in sent] == ['{"seq": 0}', '{"seq": 1}', '{"seq": 2}']
+
+
+class TestRealtimeEndpoints:
+    def test_patient_websocket_receives_new_vitals(self, client):
+        patient_id = create_user("pat@test.com", UserRole.PATIENT)
+        token = token_for(patient_id, UserRole.PATIENT)
+
+        with client.websocket_connect(f"/api/v1/ws/vitals?token={token}") as ws:
+            resp = client.post(
+                "/api/v1/vitals",
+                json={"heart_rate": 91, "spo2": 97},
+                headers={"Authorization": f"Bearer {token}"},
+            )
+            assert resp.status_code == 200
+            event = ws.receive_json()
+
+        assert event["type"] == "vitals"
+        assert event["user_id"] == patient_id
+        assert event["data"]["heart_rate"] == 91
+
+    def test_websocket_rejects_missing_token(self, client):
+        with pytest.raises(WebSocketDisconnect):
+            with client.websocket_connect("/api/v1/ws/vitals") as ws:
+                ws.receive_json()
+
+    def test_clinician_blocked_when_sharing_off(self, client):
+        clinician_id = create_user("doc@test.com", UserRole.CLINICIAN)
+        patient_id = create_user("pat@test.com", UserRole.PATIENT, share_state="SHARING_OFF")
+        token = token_for(clinician_id, UserRole.CLINICIAN)
+
+        with pytest.raises(WebSocketDisconnect):
+            with client.websocket_connect(f"/api/v1/ws/patients/{patient_id}?token={token}") as ws:
+                ws.receive_json()
+
+
+    def test_open_websocket_closes_when_consent_revoked(self, client):
+        from app.services.realtime_hub import get_realtime_hub
+
+        clinician_id = create_user("doc@test.com", UserRole.CLINICIAN)
+        patient_id = create_user("pat@test.com", UserRole.PATIENT)
+        token = token_for(clinician_id, UserRole.CLINICIAN)
+        hub = get_realtime_hub()
+
+        with client.websocket_connect(f"/api/v1/ws/patients/{patient_id}?token={token}") as ws:
+            hub.publish(patient_id, {"type": "vitals", "user_id": patient_id, "data": {"heart_rate": 80}})
+            assert ws.receive_json()["data"]["heart_rate"] == 80
+
+            update_user(patient_id, share_state="SHARING_OFF")
+            hub.publish(patient_id, {"type": "vitals", "user_id": patient_id, "data": {"heart_rate": 81}})
+            with pytest.raises(WebSocketDisconnect) as closed:
+                ws.receive_json()
+
+        assert closed.value.code == 1008
+
+    def test_open_websocket_closes_when_token_expires(self, client):
+        from datetime import timedelta
+        from app.services.realtime_hub import get_realtime_hub
+
+        clinician_id = create_user("doc@test.com", UserRole.CLINICIAN)
+        patient_id = create_user("pat@test.com", UserRole.PATIENT)
+        token = token_for(clinician_id, UserRole.CLINICIAN, expires_delta=timedelta(seconds=2))
+
+        with client.websocket_connect(f"/api/v1/ws/patients/{patient_id}?token={token}") as ws:
+            time.sleep(2.5)
+            get_realtime_hub().publish(patient_id, {"type": "vitals", "user_id": patient_id, "data": {}})
+            with pytest.raises(WebSocketDisconnect):
+                ws.receive_json()
+
+    def test_open_sse_stream_ends_when_clinician_deactivated(self, client, monkeypatch):
+        from app.api import realtime
+        from app.services.realtime_hub import get_realtime_hub
+
+        monkeypatch.setattr(realtime, "HEARTBEAT_SECONDS", 0.1)
+        clinician_id = create_user("doc@test.com", UserRole.CLINICIAN)
+        patient_id = create_user("pat@test.com", UserRole.PATIENT)
+        token = token_for(clinician_id, UserRole.CLINICIAN)
+        hub = get_realtime_hub()
+        result = {}
+
+        def open_stream():
+            result["response"] = client.get(
+                f"/api/v1/stream/patients/{patient_id}", headers={"Authorization": f"Bearer {token}"}
+            )
+
+        reader = threading.Thread(target=open_stream, daemon=True)
+        reader.start()
+        deadline = time.time() + 5
+        while hub.subscriber_count(patient_id) == 0 and time.time() < deadline:
+            time.sleep(0.02)
+        assert hub.subscriber_count(patient_id) == 1
+
+        update_user(clinician_id, is_active=False)
+        reader.join(timeout=5)
+
+        # The generator returned on its own; the full body came back
+        assert not reader.is_alive()
+        assert result["response"].status_code == 200
+        assert hub.subscriber_count(patient_id) == 0
+
+
+class TestVitalsIngest:
+    def test_ingest_flushes_batch_with_single_alert(self, client, monkeypatch):
+        from app.config import settings
+        from app.models.alert import Alert
+        from app.models.vital_signs import VitalSignRecord
+
+        monkeypatch.setattr(settings, "ingest_flush_max_readings", 3)
+        monkeypatch.setattr(settings, "ingest_flush_interval_ms", 60000)
+        patient_id = create_user("pat@test.com", UserRole.PATIENT)
+        token = token_for(patient_id, UserRole.PATIENT)
+
+        with client.websocket_connect(f"/api/v1/ws/vitals/ingest?token={token}") as ws:
+            ws.send_json({"heart_rate": 185, "spo2": 97})
+            ws.send_json([{"heart_rate": 190}, {"heart_rate": 20}, {"heart_rate": 120}])
+            ack = ws.receive_json()
+
+        assert ack == {"type": "ack", "stored": 3, "duplicates": 0, "alerts": 1, "rejected": 1}
+        db = TestingSessionLocal()
+        assert db.query(VitalSignRecord).filter_by(user_id=patient_id).count() == 3
+        alert = db.query(Alert).filter_by(user_id=patient_id).one()
+        assert alert.trigger_value == "190 BPM"
+        db.close()
+
+    def test_ingest_flushes_on_interval(self, client, monkeypatch):
+        from app.config import settings
+
+        monkeypatch.setattr(settings, "ingest_flush_max_readings", 1000)
+        monkeypatch.setattr(settings, "ingest_flush_interval_ms", 50)
+        patient_id = create_user("pat@test.com", UserRole.PATIENT)
+        token = token_for(patient_id, UserRole.PATIENT)
+
+        with client.websocket_connect(f"/api/v1/ws/vitals/ingest?token={token}") as ws:
+            ws.send_json({"heart_rate": 80})
+            ack = ws.receive_json()
+
+        assert ack["stored"] == 1
+        assert ack["alerts"] == 0
@@ -0,0 +1,251 @@
+"""
+Tests for the database-backed retraining job.
+
+Verifies:
+- Streamed, preallocated training matrices match engineer_features()
+- A retrained forest is evaluated on a holdout and saved as a registry version
+- Labels come from threshold alerts in the window after the session's
+  cool-down, not from alerts on the session's own readings or the
+  model's risk assessments; sessions with an open window are left out
+- Too little or one-class data is rejected
+- POST /model/retrain runs in the background and is admin-only
+"""
+
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+os.environ.setdefault("SECRET_KEY", "test-secret-key-thats-long-enough-32chars")
+os.environ.setdefault("PHI_ENCRYPTION_KEY", "dGVzdC1lbmNyeXB0aW9uLWtleS0zMmJ5dGVzISEhISE=")
+os.environ.setdefault("DEBUG", "true")
+
+import app.database
+from app.database import Base, get_db
+from app.main import app as fastapi_app
+from app.models.user import User, UserRole
+from app.models.activity import ActivitySession
+from app.models.alert import Alert
+from app.models.risk_assessment import RiskAssessment
+from app.api.auth import auth_service
+from app.services import ml_prediction, model_registry, retraining_pipeline
+from app.services.alert_cooldown import alert_cooldown
+
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test_retraining_job.db"
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def override_get_db():
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+@pytest.fixture(autouse=True)
+def setup_database(tmp_path, monkeypatch):
+    monkeypatch.setattr(model_registry, "REGISTRY_DIR", tmp_path / "registry")
+    monkeypatch.setattr(retraining_pipeline, "MODEL_DIR", tmp_path)
+    monkeypatch.setattr(app.database, "SessionLocal", TestingSessionLocal)
+    fastapi_app.dependency_overrides[get_db] = override_get_db
+    Base.metadata.create_all(bind=engine)
+    alert_cooldown.clear()
+    assert ml_prediction.load_ml_model()
+    yield
+    Base.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture
+def client():
+    return TestClient(fastapi_app)
+
+
+def create_user(email, role, **fields):
+    db = TestingSessionLocal()
+    user = User(email=email, full_name=email.split("@")[0], role=role, **fields)
+    db.add(user)
+    db.commit()
+    user_id = user.user_id
+    db.close()
+    return user_id
+
+
+def auth_header(user_id, role):
+    token = auth_service.create_access_token(data={"sub": str(user_id), "role": role.value})
+    return {"Authorization": f"Bearer {token}"}
+
+
+def seed_sessions(n, seed=0):
+    """
+    n ended sessions two days apart: a high HR alert follows a couple of
+    hours after the ones whose peak HR was far above the safe max.
+    """
+    rng = np.random.default_rng(seed)
+    older = create_user("old@test.com", UserRole.PATIENT, age=70, baseline_hr=75, max_safe_hr=150)
+    unknown = create_user("anon@test.com", UserRole.PATIENT)  # no age/baseline: defaults
+    activities = ["walking", "jogging", "cycling", "yoga", None]
+    db = TestingSessionLocal()
+    start = datetime.now(timezone.utc) - timedelta(days=2 * n + 2)
+    for i in range(n):
+        peak = int(rng.integers(100, 200))
+        duration = int(rng.integers(10, 90))
+        session_start = start + timedelta(days=2 * i)
+        session = ActivitySession(
+            user_id=older if i % 2 else unknown,
+            start_time=session_start,
+            end_time=session_start + timedelta(minutes=duration),
+            activity_type=activities[i % len(activities)],
+            avg_heart_rate=peak - int(rng.integers(10, 30)),
+            peak_heart_rate=peak,
+            min_heart_rate=None if i % 7 == 0 else 70,
+            avg_spo2=int(rng.integers(90, 99)),
+            duration_minutes=duration,
+            recovery_time_minutes=int(rng.integers(2, 15)),
+        )
+        db.add(session)
+        if peak > 160:
+            db.add(Alert(
+                user_id=session.user_id,
+                alert_type="high_heart_rate",
+                severity="critical",
+                created_at=session.end_time + timedelta(hours=2),
+            ))
+    db.commit()
+    db.close()
+
+
+class TestTrainingMatrix:
+    def test_streamed_matrix_matches_engineer_features(self):
+        seed_sessions(40)
+        columns = ml_prediction.get_active_bundle().feature_columns
+        db = TestingSessionLocal()
+        X, y = retraining_pipeline.load_training_matrix(db, columns, batch_size=7)
+        sessions = db.query(ActivitySession).order_by(ActivitySession.session_id.desc()).all()
+        users = {u.user_id: u for u in db.query(User)}
+        db.close()
+
+        assert X.dtype == np.float32 and X.shape == (40, len(columns))
+        from app.services.batch_explain import session_features
+
+        for row, label, session in zip(X, y, sessions):
+            expected = ml_prediction.build_feature_matrix([session_features(users[session.user_id], session)])[0]
+            np.testing.assert_allclose(row, expected, rtol=1e-6)
+            assert label == (session.peak_heart_rate > 160)
+
+    def test_labels_ignore_assessments_and_other_times(self):
+        seed_sessions(10)
+        db = TestingSessionLocal()
+        db.query(Alert).delete()
+        sessions = db.query(ActivitySession).order_by(ActivitySession.session_id.desc()).all()
+        newest, second, third, fourth = sessions[:4]
+        # The model's own verdict is not a label
+        db.add(RiskAssessment(
+            user_id=newest.user_id, activity_session_id=newest.session_id, risk_level="critical", risk_score=0.95
+        ))
+        # Threshold alerts during the session or its cool-down come from the
+        # readings behind the features, so they aren't labels; nor is a
+        # non-vitals alert afterwards
+        db.add(Alert(user_id=second.user_id, alert_type="low_spo2", created_at=second.start_time + timedelta(minutes=1)))
+        db.add(Alert(user_id=second.user_id, alert_type="high_heart_rate", created_at=second.end_time + timedelta(minutes=5)))
+        db.add(Alert(user_id=second.user_id, alert_type="other", created_at=second.end_time + timedelta(hours=3)))
+        # One within the outcome window is; one past it isn't
+        db.add(Alert(user_id=third.user_id, alert_type="low_spo2", created_at=third.end_time + timedelta(hours=3)))
+        db.add(Alert(user_id=fourth.user_id, alert_type="low_spo2", created_at=fourth.end_time + timedelta(hours=30)))
+        # Sessions still running, or whose outcome window is still open, aren't rows yet
+        now = datetime.now(timezone.utc)
+        db.add(ActivitySession(
+            user_id=newest.user_id, start_time=now, activity_type="walking",
+            avg_heart_rate=100, peak_heart_rate=120, duration_minutes=5,
+        ))
+        db.add(ActivitySession(
+            user_id=newest.user_id, start_time=now - timedelta(hours=3), end_time=now - timedelta(hours=2),
+            activity_type="walking", avg_heart_rate=100, peak_heart_rate=190, duration_minutes=60,
+        ))
+        db.add(Alert(user_id=newest.user_id, alert_type="low_spo2", created_at=now - timedelta(hours=1)))
+        db.commit()
+
+        columns = ml_prediction.get_active_bundle().feature_columns
+        _, y = retraining_pipeline.load_training_matrix(db, columns)
+        db.close()
+        assert y.tolist() == [0, 0, 1, 0] + [0] * 6
+
+    def test_max_rows_keeps_newest(self):
+        seed_sessions(30)
+        columns = ml_prediction.get_active_bundle().feature_columns
+        db = TestingSessionLocal()
+        X, y = retraining_pipeline.load_training_matrix(db, columns, batch_size=4, max_rows=10)
+        db.close()
+        assert X.shape[0] == 10
+
+
+class TestRunRetraining:
+    def test_registers_evaluated_version(self):
+        seed_sessions(300)
+        db = TestingSessionLocal()
+        entry = retraining_pipeline.run_retraining(db, version="r1")
+        db.close()
+
+        metrics = entry["metrics"]
+        assert metrics["train_rows"] + metrics["holdout_rows"] == 300
+        assert metrics["accuracy"] > 0.8
+        assert metrics["roc_auc"] is not None
+        assert metrics["active_version"] == "1.0"
+        assert "accuracy" in metrics["active_holdout"]
+
+        # Saved but not promoted; loads and scores like any version
+        assert model_registry.read_manifest()["active"] == "1.0"
+        bundle = model_registry.load_bundle("r1")
+        result = ml_prediction.predict_risk(60, 72, 150, 170, 190, 70, 95, 40, 5, "jogging", bundle=bundle)
+        assert result["model_info"]["version"] == "r1"
+        assert result["risk_level"] != "low"
+
+    def test_rejects_small_or_one_class_data(self):
+        seed_sessions(20)
+        db = TestingSessionLocal()
+        with pytest.raises(ValueError):
+            retraining_pipeline.run_retraining(db, version="small")
+
+        db.close()
+        Base.metadata.drop_all(bind=engine)
+        Base.metadata.create_all(bind=engine)
+        seed_sessions(60)
+        db = TestingSessionLocal()
+        db.query(Alert).delete()
+        db.commit()
+        with pytest.raises(ValueError):
+            retraining_pipeline.run_retraining(db, version="one-class")
+        db.close()
+        assert "one-class" not in model_registry.read_manifest()["versions"]
+
+
+class TestRetrainEndpoint:
+    def test_background_job_registers_version(self, client):
+        admin_id = create_user("admin@test.com", UserRole.ADMIN)
+        seed_sessions(120)
+
+        resp = client.post(
+            "/api/v1/model/retrain", json={"version": "bg1"}, headers=auth_header(admin_id, UserRole.ADMIN)
+        )
+        assert resp.status_code == 202
+        assert resp.json()["status"] == "running"
+
+        deadline = time.time() + 60
+        while retraining_pipeline.get_retraining_job()["status"] == "running" and time.time() < deadline:
+            time.sleep(0.1)
+        job = retraining_pipeline.get_retraining_job()
+        assert job["status"] == "completed", job.get("error")
+        assert "bg1" in model_registry.read_manifest()["versions"]
+
+    def test_admin_only(self, client):
+        clinician_id = create_user("doc@test.com", UserRole.CLINICIAN)
+        resp = client.post("/api/v1/model/retrain", headers=auth_header(clinician_id, UserRole.CLINICIAN))
+        assert resp.status_code == 403
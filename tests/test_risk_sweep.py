@@ -0,0 +1,157 @@
+"""
+Tests for the what-if risk sweep (POST /predict/what-if).
+
+Verifies:
+- Vectorized features match engineer_features() row for row
+- Grid scores match single /predict/risk-style predictions
+- Boundary interpolation and request validation
+"""
+
+import os
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+os.environ.setdefault("SECRET_KEY", "test-secret-key-thats-long-enough-32chars")
+os.environ.setdefault("PHI_ENCRYPTION_KEY", "dGVzdC1lbmNyeXB0aW9uLWtleS0zMmJ5dGVzISEhISE=")
+os.environ.setdefault("DEBUG", "true")
+
+from app.database import Base, get_db
+from app.main import app
+from app.models.user import User, UserRole
+from app.api.auth import auth_service
+from app.services import ml_prediction
+from app.services.alert_cooldown import alert_cooldown
+
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test_risk_sweep.db"
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+BASE = {
+    "age": 60, "baseline_hr": 72, "max_safe_hr": 160, "avg_heart_rate": 120,
+    "peak_heart_rate": 150, "min_heart_rate": 70, "avg_spo2": 96,
+    "duration_minutes": 30, "recovery_time_minutes": 6, "activity_type": "jogging",
+}
+
+
+def override_get_db():
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+@pytest.fixture(autouse=True)
+def setup_database():
+    app.dependency_overrides[get_db] = override_get_db
+    Base.metadata.create_all(bind=engine)
+    alert_cooldown.clear()
+    assert ml_prediction.load_ml_model()
+    yield
+    Base.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+
+def create_user(email, role):
+    db = TestingSessionLocal()
+    user = User(email=email, full_name=email.split("@")[0], age=60, role=role)
+    db.add(user)
+    db.commit()
+    user_id = user.user_id
+    db.close()
+    return user_id
+
+
+def auth_header(user_id, role):
+    token = auth_service.create_access_token(data={"sub": str(user_id), "role": role.value})
+    return {"Authorization": f"Bearer {token}"}
+
+
+class TestSweepService:
+    def test_feature_arrays_match_engineer_features(self):
+        peaks = np.array([100, 150, 200])
+        matrix = ml_prediction.engineer_feature_arrays(**{**BASE, "peak_heart_rate": peaks})
+        for row, peak in zip(matrix, peaks):
+            expected = ml_prediction.build_feature_matrix(
+                [ml_prediction.engineer_features(**{**BASE, "peak_heart_rate": int(peak)})]
+            )[0]
+            np.testing.assert_allclose(row, expected)
+
+    def test_grid_matches_single_predictions(self):
+        from app.services.risk_sweep import run_sweep
+
+        result = run_sweep(BASE, [
+            {"feature": "peak_heart_rate", "start": 100, "stop": 200, "step": 25},
+            {"feature": "duration_minutes", "start": 10, "stop": 90, "step": 40},
+        ])
+
+        assert result["axes"][0]["values"] == [100, 125, 150, 175, 200]
+        assert result["axes"][1]["values"] == [10, 50, 90]
+        assert result["grid_points"] == 15
+        for i, peak in enumerate(result["axes"][0]["values"]):
+            for j, duration in enumerate(result["axes"][1]["values"]):
+                single = ml_prediction.predict_risk(
+                    **{**BASE, "peak_heart_rate": peak, "duration_minutes": duration}
+                )
+                assert abs(result["risk"][i][j] - single["risk_score"]) < 1e-4
+        assert len(result["boundaries"]["0.5"]) == 3
+
+    def test_first_crossing_interpolates(self):
+        from app.services.risk_sweep import first_crossing
+
+        values = np.array([100.0, 110.0, 120.0, 130.0])
+        risks = np.array([0.2, 0.4, 0.6, 0.9])
+        assert first_crossing(values, risks, 0.5) == pytest.approx(115.0)
+        assert first_crossing(values, risks, 0.8) == pytest.approx(126.6666, rel=1e-4)
+        assert first_crossing(values, risks, 0.95) is None
+        assert first_crossing(values, risks, 0.1) == 100.0
+
+
+class TestSweepEndpoint:
+    def test_one_axis_curve(self, client):
+        user_id = create_user("pat@test.com", UserRole.PATIENT)
+        resp = client.post(
+            "/api/v1/predict/what-if",
+            json={"base": BASE, "axes": [{"feature": "peak_heart_rate", "start": 100, "stop": 200, "step": 5}]},
+            headers=auth_header(user_id, UserRole.PATIENT),
+        )
+        assert resp.status_code == 200
+        data = resp.json()
+        assert len(data["risk"]) == 21
+        crossing = data["boundaries"]["0.5"]
+        assert crossing is None or 100 <= crossing <= 200
+        assert "inference_time_ms" in data
+
+    def test_rejects_bad_axes(self, client):
+        user_id = create_user("pat@test.com", UserRole.PATIENT)
+        headers = auth_header(user_id, UserRole.PATIENT)
+
+        resp = client.post(
+            "/api/v1/predict/what-if",
+            json={"base": BASE, "axes": [{"feature": "activity_type", "start": 1, "stop": 3}]},
+            headers=headers,
+        )
+        assert resp.status_code == 400
+
+        resp = client.post(
+            "/api/v1/predict/what-if",
+            json={"base": BASE, "axes": [
+                {"feature": "peak_heart_rate", "start": 0, "stop": 400, "step": 1},
+                {"feature": "duration_minutes", "start": 0, "stop": 300, "step": 1},
+            ]},
+            headers=headers,
+        )
+        assert resp.status_code == 400
+
+        resp = client.post("/api/v1/predict/what-if", json={"base": BASE, "axes": []}, headers=headers)
+        assert resp.status_code == 422
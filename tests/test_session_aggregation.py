@@ -0,0 +1,225 @@
+"""
+Tests for server-side session aggregation.
+
+Verifies:
+- The post-peak decay fit recovers the time constant of a noisy
+  exponential HR decay, ignores an exercise plateau, and gives up on
+  flat, rising or too-short traces
+- Ending a session replaces client-sent HR/SpO2/recovery with values
+  from its vitals (cool-down readings after end only feed recovery),
+  and the stored features use them
+- Sessions without vitals keep the client's values
+- A session ended now is aggregated again, features included, once its
+  cool-down readings are in
+- The vitals-window helper no longer hardcodes recovery time
+"""
+
+import math
+import os
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+os.environ.setdefault("SECRET_KEY", "test-secret-key-thats-long-enough-32chars")
+os.environ.setdefault("PHI_ENCRYPTION_KEY", "dGVzdC1lbmNyeXB0aW9uLWtleS0zMmJ5dGVzISEhISE=")
+os.environ.setdefault("DEBUG", "true")
+
+from app.database import Base, get_db
+from app.main import app
+from app.models.activity import ActivitySession
+from app.models.user import User, UserRole
+from app.models.vital_signs import VitalSignRecord
+from app.api.auth import auth_service
+from app.api.predict import _aggregate_session_features_from_vitals
+from app.services import ml_prediction
+from app.services.session_aggregation import RECOVERY_TAIL_MINUTES, estimate_recovery_minutes, refresh_recovery_tails
+from app.services.session_features import stored_features
+
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test_session_aggregation.db"
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def override_get_db():
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+@pytest.fixture(autouse=True)
+def setup_database():
+    app.dependency_overrides[get_db] = override_get_db
+    Base.metadata.create_all(bind=engine)
+    assert ml_prediction.load_ml_model()
+    yield
+    Base.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+
+def workout_trace(tau=90.0, step=10, plateau_s=900, decay_s=600, seed=0):
+    """HR plateau at ~150 bpm, then an exponential decay to 70 bpm with time constant tau."""
+    rng = np.random.default_rng(seed)
+    t_plateau = np.arange(0, plateau_s, step, dtype=float)
+    t_decay = np.arange(0, decay_s, step, dtype=float)
+    hr = np.concatenate([
+        150 + rng.normal(0, 1, len(t_plateau)),
+        70 + 80 * np.exp(-t_decay / tau) + rng.normal(0, 2, len(t_decay)),
+    ])
+    return np.concatenate([t_plateau, plateau_s + t_decay]), np.round(hr)
+
+
+def create_patient():
+    db = TestingSessionLocal()
+    user = User(email="p@example.com", full_name="p", age=62, baseline_hr=70, role=UserRole.PATIENT)
+    db.add(user)
+    db.commit()
+    user_id = user.user_id
+    db.close()
+    return user_id
+
+
+def auth_header(user_id):
+    token = auth_service.create_access_token(data={"sub": str(user_id), "role": UserRole.PATIENT.value})
+    return {"Authorization": f"Bearer {token}"}
+
+
+def start_session(user_id, start):
+    db = TestingSessionLocal()
+    session = ActivitySession(user_id=user_id, start_time=start, activity_type="cycling", status="active")
+    db.add(session)
+    db.commit()
+    session_id = session.session_id
+    db.close()
+    return session_id
+
+
+def add_vitals(user_id, start, seconds, heart_rates, spo2=96.0):
+    db = TestingSessionLocal()
+    for t, hr in zip(seconds, heart_rates):
+        db.add(VitalSignRecord(
+            user_id=user_id, timestamp=start + timedelta(seconds=float(t)),
+            heart_rate=int(hr), spo2=spo2, is_valid=True,
+        ))
+    db.commit()
+    db.close()
+
+
+def end_session(client, user_id, session_id, **fields):
+    resp = client.post(f"/api/v1/activities/end/{session_id}", json=fields, headers=auth_header(user_id))
+    assert resp.status_code == 200
+    return resp.json()
+
+
+class TestRecoveryEstimate:
+    @pytest.mark.parametrize("tau", [45, 90, 180])
+    def test_fits_exponential_decay(self, tau):
+        t, hr = workout_trace(tau=tau, plateau_s=0)
+        expected = tau * math.log(10) / 60
+        assert estimate_recovery_minutes(t, hr, resting_hr=70) == pytest.approx(expected, rel=0.1)
+
+    def test_plateau_is_not_recovery(self):
+        t, hr = workout_trace(tau=90, plateau_s=1200)
+        assert estimate_recovery_minutes(t, hr, resting_hr=70) == pytest.approx(90 * math.log(10) / 60, rel=0.1)
+
+    def test_no_estimate_without_decay(self):
+        t = np.arange(0, 600, 10.0)
+        assert estimate_recovery_minutes(t, np.full(len(t), 75.0), resting_hr=70) is None  # never elevated
+        assert estimate_recovery_minutes(t, 80 + t / 10, resting_hr=70) is None  # still rising at the end
+        assert estimate_recovery_minutes([0, 10], [150, 100], resting_hr=70) is None  # too few readings
+        assert estimate_recovery_minutes([], []) is None
+
+
+class TestEndSessionAggregation:
+    def test_vitals_replace_client_values(self, client):
+        user_id = create_patient()
+        start = datetime.now(timezone.utc) - timedelta(hours=1)
+        session_id = start_session(user_id, start)
+        t, hr = workout_trace(tau=90, plateau_s=1200, decay_s=900)
+        add_vitals(user_id, start, t, hr)
+        # Cool-down after end_time: counts toward recovery, not the averages
+        end = start + timedelta(seconds=1500)
+        in_session = t <= 1500
+
+        body = end_session(
+            client, user_id, session_id, end_time=end.isoformat(),
+            avg_heart_rate=60, peak_heart_rate=61, min_heart_rate=59, avg_spo2=80, recovery_time_minutes=30,
+        )
+        assert body["avg_heart_rate"] == int(hr[in_session].mean())
+        assert body["peak_heart_rate"] == int(hr[in_session].max())
+        assert body["min_heart_rate"] == int(hr[in_session].min())
+        assert body["avg_spo2"] == 96
+        assert body["duration_minutes"] == 25
+        # Stored as whole minutes; the fit itself is checked above
+        assert body["recovery_time_minutes"] == pytest.approx(90 * math.log(10) / 60, abs=1)
+
+        db = TestingSessionLocal()
+        session = db.query(ActivitySession).filter(ActivitySession.session_id == session_id).one()
+        db.close()
+        features = stored_features(session)
+        assert features["peak_heart_rate"] == body["peak_heart_rate"]
+        assert features["recovery_time_minutes"] == body["recovery_time_minutes"]
+
+    def test_without_vitals_client_values_stay(self, client):
+        user_id = create_patient()
+        session_id = start_session(user_id, datetime.now(timezone.utc) - timedelta(minutes=30))
+
+        body = end_session(
+            client, user_id, session_id,
+            avg_heart_rate=118, peak_heart_rate=141, min_heart_rate=72, avg_spo2=97, recovery_time_minutes=7,
+        )
+        assert (body["avg_heart_rate"], body["peak_heart_rate"], body["recovery_time_minutes"]) == (118, 141, 7)
+
+    def test_cool_down_is_fitted_after_the_tail(self, client):
+        user_id = create_patient()
+        end = datetime.now(timezone.utc)
+        start = end - timedelta(seconds=1200)
+        session_id = start_session(user_id, start)
+        t, hr = workout_trace(tau=90, plateau_s=1200, decay_s=900)
+        in_session = t < 1200
+        add_vitals(user_id, start, t[in_session], hr[in_session])
+
+        # Ended now: no cool-down yet, so no decay to fit
+        body = end_session(client, user_id, session_id, end_time=end.isoformat(), recovery_time_minutes=30)
+        assert body["recovery_time_minutes"] == 30
+        db = TestingSessionLocal()
+        assert refresh_recovery_tails(db) == 0  # tail still running
+        assert db.get(ActivitySession, session_id).recovery_pending is True
+
+        add_vitals(user_id, start, t[~in_session], hr[~in_session])
+        tail_over = end + timedelta(minutes=RECOVERY_TAIL_MINUTES + 1)
+        assert refresh_recovery_tails(db, now=tail_over) == 1
+        assert refresh_recovery_tails(db, now=tail_over) == 0
+        db.expire_all()
+        session = db.get(ActivitySession, session_id)
+        db.close()
+
+        assert session.recovery_pending is False
+        assert session.recovery_time_minutes == pytest.approx(90 * math.log(10) / 60, abs=1)
+        assert session.avg_heart_rate == body["avg_heart_rate"]  # cool-down isn't averaged in
+        assert stored_features(session)["recovery_time_minutes"] == session.recovery_time_minutes
+
+    def test_window_helper_estimates_recovery(self):
+        start = datetime.now(timezone.utc) - timedelta(minutes=25)
+        t, hr = workout_trace(tau=180, plateau_s=300, decay_s=1200, step=30)
+        vitals = [
+            VitalSignRecord(user_id=1, timestamp=start + timedelta(seconds=float(s)), heart_rate=int(h), spo2=97.0)
+            for s, h in zip(t, hr)
+        ]
+        features = _aggregate_session_features_from_vitals(vitals, resting_hr=70)
+        assert features["recovery_time_minutes"] == pytest.approx(180 * math.log(10) / 60, abs=1)
+        assert features["peak_heart_rate"] == int(hr.max())
+        # No decay to fit: the old default
+        flat = _aggregate_session_features_from_vitals(vitals[:5], resting_hr=70)
+        assert flat["recovery_time_minutes"] == 5
@@ -0,0 +1,243 @@
+"""
+Tests for the session feature store.
+
+Verifies:
+- Ending a session stores its 17 features (packed float32), risk score
+  and model version, matching the single-row predictor
+- GET /predict/user/{id}/risk reads the stored score, re-scores stored
+  features after a model change and engineers older sessions as before
+- A stored score of exactly 0.5 is not high risk, as in predict_risk
+- Retraining reads stored vectors and gets the same matrix as engineering
+- The backfill fills older ended sessions in batches
+"""
+
+import os
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+os.environ.setdefault("SECRET_KEY", "test-secret-key-thats-long-enough-32chars")
+os.environ.setdefault("PHI_ENCRYPTION_KEY", "dGVzdC1lbmNyeXB0aW9uLWtleS0zMmJ5dGVzISEhISE=")
+os.environ.setdefault("DEBUG", "true")
+
+from app.database import Base, get_db
+from app.main import app
+from app.models.activity import ActivitySession
+from app.models.alert import Alert
+from app.models.user import User, UserRole
+from app.api.auth import auth_service
+from app.services import ml_prediction, model_registry
+from app.services.retraining_pipeline import load_training_matrix
+from app.services.session_features import (
+    FEATURE_BYTES,
+    SESSION_FEATURES,
+    backfill_session_features,
+    session_inputs,
+    session_risk,
+    stored_features,
+)
+
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test_session_features.db"
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def override_get_db():
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+@pytest.fixture(autouse=True)
+def setup_database(tmp_path, monkeypatch):
+    monkeypatch.setattr(model_registry, "REGISTRY_DIR", tmp_path / "registry")
+    app.dependency_overrides[get_db] = override_get_db
+    Base.metadata.create_all(bind=engine)
+    assert ml_prediction.load_ml_model()
+    yield
+    Base.metadata.drop_all(bind=engine)
+    monkeypatch.undo()
+    assert ml_prediction.load_ml_model()
+
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+
+def create_user(email, role, **fields):
+    db = TestingSessionLocal()
+    user = User(email=email, full_name=email.split("@")[0], age=64, baseline_hr=70, role=role, **fields)
+    db.add(user)
+    db.commit()
+    user_id = user.user_id
+    db.close()
+    return user_id
+
+
+def auth_header(user_id, role):
+    token = auth_service.create_access_token(data={"sub": str(user_id), "role": role.value})
+    return {"Authorization": f"Bearer {token}"}
+
+
+def create_session(user_id, peak=150, duration=35, ended=False, hours_ago=2):
+    db = TestingSessionLocal()
+    start = datetime.now(timezone.utc) - timedelta(hours=hours_ago)
+    session = ActivitySession(
+        user_id=user_id,
+        start_time=start,
+        end_time=start + timedelta(minutes=duration) if ended else None,
+        activity_type="jogging",
+        avg_heart_rate=peak - 25,
+        peak_heart_rate=peak,
+        min_heart_rate=70,
+        avg_spo2=95,
+        duration_minutes=duration,
+        recovery_time_minutes=6,
+        status="completed" if ended else "active",
+    )
+    db.add(session)
+    db.commit()
+    session_id = session.session_id
+    db.close()
+    return session_id
+
+
+def end_session(client, patient_id, session_id):
+    resp = client.post(
+        f"/api/v1/activities/end/{session_id}",
+        json={"recovery_time_minutes": 6},
+        headers=auth_header(patient_id, UserRole.PATIENT),
+    )
+    assert resp.status_code == 200
+    return resp.json()
+
+
+def load(session_id):
+    db = TestingSessionLocal()
+    session = db.query(ActivitySession).filter(ActivitySession.session_id == session_id).one()
+    user = db.query(User).filter(User.user_id == session.user_id).one()
+    db.close()
+    return user, session
+
+
+class TestSessionFeatureStore:
+    def test_end_session_stores_features_and_score(self, client):
+        patient = create_user("p@example.com", UserRole.PATIENT)
+        session_id = create_session(patient)
+
+        body = end_session(client, patient, session_id)
+        user, session = load(session_id)
+        assert len(session.feature_vector) == FEATURE_BYTES == 68
+        assert session.risk_model_version == ml_prediction.get_active_bundle().version
+        assert body["risk_model_version"] == session.risk_model_version
+        assert "feature_vector" not in body
+
+        expected = ml_prediction.predict_risk(**session_inputs(user, session))
+        assert round(session.risk_score, 4) == expected["risk_score"]
+        features = stored_features(session)
+        assert list(features) == list(SESSION_FEATURES)
+        for name, value in expected["features_used"].items():
+            assert features[name] == pytest.approx(value, rel=1e-6)
+
+    def test_clinician_risk_reads_the_store(self, client, monkeypatch):
+        patient = create_user("p@example.com", UserRole.PATIENT)
+        doctor = create_user("d@example.com", UserRole.CLINICIAN)
+        session_id = create_session(patient)
+        end_session(client, patient, session_id)
+        _, session = load(session_id)
+
+        def fail(*args, **kwargs):
+            raise AssertionError("features re-engineered for a stored session")
+
+        monkeypatch.setattr(ml_prediction, "engineer_features", fail)
+        resp = client.get(f"/api/v1/predict/user/{patient}/risk", headers=auth_header(doctor, UserRole.CLINICIAN))
+        assert resp.status_code == 200
+        data = resp.json()
+        assert data["score_source"] == "stored_score"
+        assert data["session_id"] == session_id
+        assert data["prediction"]["risk_score"] == round(session.risk_score, 4)
+
+        # A score from another model version isn't reused; the features are
+        db = TestingSessionLocal()
+        db.query(ActivitySession).filter(ActivitySession.session_id == session_id).update(
+            {"risk_model_version": "0.9", "risk_score": 0.0}
+        )
+        db.commit()
+        db.close()
+        data = client.get(
+            f"/api/v1/predict/user/{patient}/risk", headers=auth_header(doctor, UserRole.CLINICIAN)
+        ).json()
+        assert data["score_source"] == "stored_features"
+        assert data["prediction"]["risk_score"] == pytest.approx(session.risk_score, abs=1e-3)
+
+    def test_tied_stored_score_is_not_high_risk(self):
+        bundle = ml_prediction.get_active_bundle()
+        for score, high in ((0.5, False), (0.5001, True)):
+            session = ActivitySession(risk_score=score, risk_model_version=bundle.version)
+            assert session_risk(session, bundle)["high_risk"] is high
+
+    def test_older_sessions_are_recomputed(self, client):
+        patient = create_user("p@example.com", UserRole.PATIENT)
+        doctor = create_user("d@example.com", UserRole.CLINICIAN)
+        session_id = create_session(patient, ended=True)
+        user, session = load(session_id)
+
+        data = client.get(
+            f"/api/v1/predict/user/{patient}/risk", headers=auth_header(doctor, UserRole.CLINICIAN)
+        ).json()
+        assert data["score_source"] == "recomputed"
+        expected = ml_prediction.predict_risk(**session_inputs(user, session))
+        assert data["prediction"]["risk_score"] == expected["risk_score"]
+
+    def test_retraining_reads_stored_vectors(self, client):
+        patient = create_user("p@example.com", UserRole.PATIENT)
+        stored_ids = [create_session(patient, peak=120 + 7 * i, hours_ago=i + 1) for i in range(4)]
+        for session_id in stored_ids:
+            end_session(client, patient, session_id)
+        older_ids = [create_session(patient, peak=125 + 9 * i, ended=True, hours_ago=i + 10) for i in range(3)]
+
+        db = TestingSessionLocal()
+        for session in db.query(ActivitySession).filter(ActivitySession.session_id.in_(stored_ids + older_ids)):
+            # Old enough for the outcome window to have passed, with an outcome in it
+            session.start_time -= timedelta(days=3)
+            session.end_time -= timedelta(days=3)
+            db.add(Alert(user_id=patient, alert_type="high_heart_rate", created_at=session.end_time + timedelta(hours=1)))
+        db.commit()
+
+        columns = ml_prediction.get_active_bundle().feature_columns
+        X, y = load_training_matrix(db, columns, batch_size=3)
+        assert X.shape == (7, len(columns)) and y.all()
+
+        # Same matrix as engineering every row from scratch
+        db.query(ActivitySession).update({"feature_vector": None})
+        db.commit()
+        X_engineered, _ = load_training_matrix(db, columns, batch_size=3)
+        db.close()
+        assert np.array_equal(X, X_engineered)
+
+    def test_backfill(self):
+        patient = create_user("p@example.com", UserRole.PATIENT)
+        ended = [create_session(patient, peak=110 + 10 * i, ended=True) for i in range(5)]
+        active = create_session(patient)
+
+        db = TestingSessionLocal()
+        assert backfill_session_features(db, limit=2, batch_size=1) == 2
+        assert backfill_session_features(db, batch_size=2) == 3
+        assert backfill_session_features(db) == 0
+        db.close()
+
+        for session_id in ended:
+            user, session = load(session_id)
+            expected = ml_prediction.predict_risk(**session_inputs(user, session))
+            assert len(session.feature_vector) == FEATURE_BYTES
+            assert round(session.risk_score, 4) == expected["risk_score"]
+        assert load(active)[1].feature_vector is None
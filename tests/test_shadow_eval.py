@@ -0,0 +1,205 @@
+"""
+Tests for shadow-model evaluation.
+
+Verifies:
+- Sampled /predict/risk and risk-compute calls are re-scored by the candidate
+- The append-only store and the comparison report (deltas, latency)
+- Sample rate 0 and a full queue skip the comparison
+- PUT /model/shadow and the report are admin-only; a report for a
+  version name that isn't one (glob patterns included) is a 400
+"""
+
+import os
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+os.environ.setdefault("SECRET_KEY", "test-secret-key-thats-long-enough-32chars")
+os.environ.setdefault("PHI_ENCRYPTION_KEY", "dGVzdC1lbmNyeXB0aW9uLWtleS0zMmJ5dGVzISEhISE=")
+os.environ.setdefault("DEBUG", "true")
+
+from app.database import Base, get_db
+from app.main import app
+from app.models.user import User, UserRole
+from app.models.vital_signs import VitalSignRecord
+from app.api.auth import auth_service
+from app.services import ml_prediction, model_registry, shadow_eval
+from app.services.alert_cooldown import alert_cooldown
+
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test_shadow_eval.db"
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+SESSION = {
+    "age": 60, "baseline_hr": 72, "max_safe_hr": 160, "avg_heart_rate": 120,
+    "peak_heart_rate": 150, "min_heart_rate": 70, "avg_spo2": 96,
+    "duration_minutes": 30, "recovery_time_minutes": 6, "activity_type": "jogging",
+}
+
+
+def override_get_db():
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+@pytest.fixture(autouse=True)
+def setup_database(tmp_path, monkeypatch):
+    monkeypatch.setattr(model_registry, "REGISTRY_DIR", tmp_path / "registry")
+    app.dependency_overrides[get_db] = override_get_db
+    Base.metadata.create_all(bind=engine)
+    alert_cooldown.clear()
+    assert ml_prediction.load_ml_model()
+    yield
+    shadow_eval.drain()
+    shadow_eval._activate(None, 0.0)
+    Base.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+
+def create_user(email, role):
+    db = TestingSessionLocal()
+    user = User(email=email, full_name=email.split("@")[0], age=60, role=role)
+    db.add(user)
+    db.commit()
+    user_id = user.user_id
+    db.close()
+    return user_id
+
+
+def auth_header(user_id, role):
+    token = auth_service.create_access_token(data={"sub": str(user_id), "role": role.value})
+    return {"Authorization": f"Bearer {token}"}
+
+
+def register_small_model(version):
+    from sklearn.ensemble import RandomForestClassifier
+
+    active = ml_prediction.get_active_bundle()
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(400, len(active.feature_columns)))
+    y = (X[:, 0] + X[:, 3] > 0).astype(int)
+    model = RandomForestClassifier(n_estimators=5, max_depth=4, random_state=0).fit(X, y)
+    model_registry.register_version(version, model, active.scaler, active.feature_columns)
+
+
+class TestShadowService:
+    def test_comparison_matches_both_models(self):
+        register_small_model("2.0")
+        shadow_eval.configure("2.0", sample_rate=1.0)
+        assert model_registry.read_manifest()["shadow"] == {"version": "2.0", "sample_rate": 1.0}
+
+        active = ml_prediction.get_active_bundle()
+        result = ml_prediction.predict_risk(**SESSION)
+        assert shadow_eval.submit(result["features_used"], active)
+        shadow_eval.drain()
+
+        records = shadow_eval.read_records("1.0", "2.0")
+        assert len(records) == 1
+        candidate = model_registry.load_bundle("2.0")
+        expected = ml_prediction.predict_risk(**SESSION, bundle=candidate)["risk_score"]
+        assert abs(float(records["active_score"][0]) - result["risk_score"]) < 1e-4
+        assert abs(float(records["shadow_score"][0]) - expected) < 1e-4
+        assert records["active_ms"][0] > 0 and records["shadow_ms"][0] > 0
+
+    def test_rate_zero_and_full_queue_skip(self, monkeypatch):
+        register_small_model("2.0")
+        active = ml_prediction.get_active_bundle()
+        features = ml_prediction.predict_risk(**SESSION)["features_used"]
+
+        shadow_eval.configure("2.0", sample_rate=0.0)
+        assert not shadow_eval.submit(features, active)
+
+        shadow_eval.configure("2.0", sample_rate=1.0)
+        monkeypatch.setattr(shadow_eval, "_pending", shadow_eval.MAX_PENDING)
+        dropped = shadow_eval.get_status()["dropped"]
+        assert not shadow_eval.submit(features, active)
+        assert shadow_eval.get_status()["dropped"] == dropped + 1
+
+    def test_sync_follows_manifest(self):
+        register_small_model("2.0")
+        model_registry.set_shadow({"version": "2.0", "sample_rate": 0.25})
+        model_registry.sync_with_manifest()
+        assert shadow_eval.get_status()["candidate"] == "2.0"
+        assert shadow_eval.get_status()["sample_rate"] == 0.25
+
+        model_registry.set_shadow(None)
+        model_registry.sync_with_manifest()
+        assert shadow_eval.get_status()["candidate"] is None
+
+
+class TestShadowEndpoints:
+    def test_sampled_predictions_show_in_report(self, client):
+        admin_id = create_user("admin@test.com", UserRole.ADMIN)
+        patient_id = create_user("pat@test.com", UserRole.PATIENT)
+        register_small_model("2.0")
+        admin = auth_header(admin_id, UserRole.ADMIN)
+        patient = auth_header(patient_id, UserRole.PATIENT)
+
+        resp = client.put("/api/v1/model/shadow", json={"version": "2.0", "sample_rate": 1.0}, headers=admin)
+        assert resp.status_code == 200
+        assert resp.json()["candidate"] == "2.0"
+
+        for peak in (110, 150, 190):
+            resp = client.post("/api/v1/predict/risk", json={**SESSION, "peak_heart_rate": peak}, headers=patient)
+            assert resp.status_code == 200
+            assert resp.json()["model_info"]["version"] == "1.0"
+
+        now = datetime.now(timezone.utc)
+        db = TestingSessionLocal()
+        for i, hr in enumerate([110, 130, 150, 140]):
+            db.add(VitalSignRecord(
+                user_id=patient_id, heart_rate=hr, spo2=96, activity_type="walking",
+                timestamp=now - timedelta(minutes=20 - 5 * i), is_valid=True,
+            ))
+        db.commit()
+        db.close()
+        assert client.post("/api/v1/risk-assessments/compute", headers=patient).status_code == 200
+        shadow_eval.drain()
+
+        report = client.get("/api/v1/model/shadow/report?hours=1", headers=admin).json()
+        assert report["candidate"] == "2.0"
+        pair = report["pairs"][0]
+        assert pair["active_version"] == "1.0"
+        assert pair["samples"] == 4
+        assert 0.0 <= pair["disagreement_rate"] <= 1.0
+        assert pair["score_delta"]["max_abs"] >= pair["score_delta"]["mean_abs"]
+        assert set(pair["latency_ms"]) == {"active", "candidate"}
+
+        resp = client.put("/api/v1/model/shadow", json={"version": None}, headers=admin)
+        assert resp.json()["candidate"] is None
+
+    def test_admin_only_and_unknown_version(self, client):
+        admin_id = create_user("admin@test.com", UserRole.ADMIN)
+        clinician_id = create_user("doc@test.com", UserRole.CLINICIAN)
+
+        resp = client.put(
+            "/api/v1/model/shadow", json={"version": "1.0"}, headers=auth_header(clinician_id, UserRole.CLINICIAN)
+        )
+        assert resp.status_code == 403
+        resp = client.get("/api/v1/model/shadow/report", headers=auth_header(clinician_id, UserRole.CLINICIAN))
+        assert resp.status_code == 403
+
+        resp = client.put(
+            "/api/v1/model/shadow", json={"version": "9.9"}, headers=auth_header(admin_id, UserRole.ADMIN)
+        )
+        assert resp.status_code == 404
+
+        for candidate in ("*", "1.[0-9]", "../2.0", "?"):
+            resp = client.get(
+                "/api/v1/model/shadow/report", params={"candidate": candidate},
+                headers=auth_header(admin_id, UserRole.ADMIN),
+            )
+            assert resp.status_code == 400
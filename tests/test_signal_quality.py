@@ -0,0 +1,247 @@
+"""
+Tests for ingest-time signal quality scoring.
+
+Verifies:
+- Clean traces (including fast but physiological changes) keep
+  confidence 1.0
+- Flat-lines, two-sided spikes, motion zig-zags and SpO2 spikes are
+  marked invalid; one-way steps and SpO2 dropouts only lower confidence
+- POST /vitals/batch and POST /vitals store the scores, judge single
+  readings against earlier ones, and keep invalid readings out of the
+  patient's latest vitals
+- GET /vitals/latest and the clinician's /vitals/user/{id}/latest skip
+  flagged readings; history still returns them with is_valid
+- The WebSocket ingest raises no alert for a spike
+"""
+
+import os
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+os.environ.setdefault("SECRET_KEY", "test-secret-key-thats-long-enough-32chars")
+os.environ.setdefault("PHI_ENCRYPTION_KEY", "dGVzdC1lbmNyeXB0aW9uLWtleS0zMmJ5dGVzISEhISE=")
+os.environ.setdefault("DEBUG", "true")
+
+from app.database import Base, get_db
+from app.main import app
+from app.models.alert import Alert
+from app.models.patient_latest_state import PatientLatestState
+from app.models.user import User, UserRole
+from app.models.vital_signs import VitalSignRecord
+from app.api.auth import auth_service
+from app.services.alert_cooldown import alert_cooldown
+from app.services.signal_quality import flag_names, score_signal
+
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test_signal_quality.db"
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def override_get_db():
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+@pytest.fixture(autouse=True)
+def setup_database():
+    app.dependency_overrides[get_db] = override_get_db
+    Base.metadata.create_all(bind=engine)
+    alert_cooldown.clear()
+    yield
+    Base.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+
+def create_patient():
+    db = TestingSessionLocal()
+    user = User(email="p@example.com", full_name="p", age=60, baseline_hr=70, role=UserRole.PATIENT)
+    db.add(user)
+    db.commit()
+    user_id = user.user_id
+    db.close()
+    return user_id
+
+
+def auth_header(user_id):
+    token = auth_service.create_access_token(data={"sub": str(user_id), "role": UserRole.PATIENT.value})
+    return {"Authorization": f"Bearer {token}"}
+
+
+def clean_trace(n=60, step=5.0, seed=0):
+    rng = np.random.default_rng(seed)
+    t = np.arange(n) * step
+    return t, np.round(75 + 8 * np.sin(t / 60) + rng.normal(0, 1.5, n)), np.round(97 + rng.normal(0, 0.5, n))
+
+
+def flags_at(result, i):
+    return flag_names(int(result["flags"][i]))
+
+
+def batch(start, heart_rates, step=5, spo2=97.0):
+    return {"vitals": [
+        {"heart_rate": hr, "spo2": spo2, "timestamp": (start + timedelta(seconds=step * i)).isoformat()}
+        for i, hr in enumerate(heart_rates)
+    ]}
+
+
+def stored_readings(user_id):
+    db = TestingSessionLocal()
+    rows = db.query(VitalSignRecord).filter_by(user_id=user_id).order_by(VitalSignRecord.timestamp).all()
+    db.close()
+    return rows
+
+
+class TestScoreSignal:
+    def test_clean_trace_is_fully_trusted(self):
+        t, hr, spo2 = clean_trace()
+        result = score_signal(t, hr, spo2)
+        assert result["confidence"].tolist() == [1.0] * len(t)
+        assert result["is_valid"].all()
+
+        # Exercise onset: +40 bpm over 20 s is fast but possible
+        ramp = score_signal(np.arange(0, 60, 5.0), [80, 80, 80, 90, 100, 110, 120, 120, 120, 121, 120, 121])
+        assert ramp["confidence"].min() == 1.0
+
+    def test_flatline(self):
+        t = np.arange(20) * 10.0
+        hr = np.r_[72, 74, 73, np.full(12, 80), 76, 75, 74, 77, 75]
+        result = score_signal(t, hr)
+        assert not result["is_valid"][3:15].any()
+        assert flags_at(result, 3) == ["flatline"]
+        assert result["is_valid"][:3].all() and result["is_valid"][15:].all()
+
+        # A few identical readings in a row are normal
+        short = score_signal(t[:8], np.r_[72, 74, np.full(6, 80)])
+        assert short["is_valid"].all()
+
+    def test_spike_and_step(self):
+        t = np.arange(12.0)
+        hr = np.r_[75, 76, 75, 160, 76, 75, 76, 75, 76, 130, 131, 130]
+        result = score_signal(t, hr)
+        assert flags_at(result, 3) == ["spike"] and not result["is_valid"][3]
+        assert result["confidence"][4] == 1.0  # the return to normal is fine
+        # A sudden sustained change is suspicious but kept
+        assert flags_at(result, 9) == ["step"]
+        assert result["is_valid"][9] and result["confidence"][9] == pytest.approx(0.7)
+
+    def test_motion_artifact(self):
+        t = np.arange(16) * 2.0
+        hr = np.r_[80, 81, 80, 81, 95, 78, 97, 76, 96, 79, 82, 81, 80, 81, 80, 81]
+        result = score_signal(t, hr)
+        assert all("motion" in flags_at(result, i) for i in range(4, 9))
+        assert not result["is_valid"][4:9].any()
+        assert result["is_valid"][:2].all() and result["is_valid"][-3:].all()
+
+    def test_spo2_checks(self):
+        t = np.arange(8) * 2.0
+        hr = np.full(8, 75.0) + np.arange(8) % 2
+        spo2 = np.array([97, 97, 88, 97, np.nan, 96, 97, 97])
+        result = score_signal(t, hr, spo2)
+        assert flags_at(result, 2) == ["spo2_spike"] and not result["is_valid"][2]
+        assert flags_at(result, 4) == ["spo2_dropout"] and result["is_valid"][4]
+        assert result["confidence"][4] == pytest.approx(0.9)
+
+        # A device that never reports SpO2 isn't penalised
+        assert score_signal(t, hr)["confidence"].min() == 1.0
+
+
+class TestIngestQuality:
+    def test_batch_stores_scores(self, client):
+        user_id = create_patient()
+        start = datetime.now(timezone.utc) - timedelta(minutes=5)
+        heart_rates = [76, 77, 76, 78, 77, 78, 179, 77, 78, 77]
+        resp = client.post("/api/v1/vitals/batch", json=batch(start, heart_rates, step=1), headers=auth_header(user_id))
+        assert resp.status_code == 200
+        assert resp.json()["records_created"] == 10
+        assert resp.json()["records_invalid"] == 1
+
+        rows = stored_readings(user_id)
+        assert [r.is_valid for r in rows] == [hr != 179 for hr in heart_rates]
+        assert rows[6].confidence_score < 0.5
+        assert all(r.confidence_score == 1.0 for i, r in enumerate(rows) if i != 6)
+
+    def test_single_reading_judged_in_context(self, client):
+        user_id = create_patient()
+        start = datetime.now(timezone.utc) - timedelta(minutes=10)
+        client.post("/api/v1/vitals/batch", json=batch(start, [88] * 9, step=10), headers=auth_header(user_id))
+        assert all(r.is_valid for r in stored_readings(user_id))
+
+        # The tenth identical reading in 90 s makes the run a flat-line
+        resp = client.post(
+            "/api/v1/vitals",
+            json={"heart_rate": 88, "spo2": 97, "timestamp": (start + timedelta(seconds=90)).isoformat()},
+            headers=auth_header(user_id),
+        )
+        assert resp.status_code == 200
+        assert resp.json()["is_valid"] is False
+
+        db = TestingSessionLocal()
+        state = db.query(PatientLatestState).filter_by(user_id=user_id).one()
+        db.close()
+        # Latest vitals still point at the last trustworthy reading
+        assert state.latest_reading_id == stored_readings(user_id)[8].reading_id
+
+    def test_latest_endpoints_skip_flagged_reading(self, client):
+        user_id = create_patient()
+        db = TestingSessionLocal()
+        clinician = User(email="doc@example.com", full_name="doc", age=45, role=UserRole.CLINICIAN)
+        db.add(clinician)
+        db.commit()
+        doc_header = {"Authorization": "Bearer " + auth_service.create_access_token(
+            data={"sub": str(clinician.user_id), "role": UserRole.CLINICIAN.value}
+        )}
+        db.close()
+        start = datetime.now(timezone.utc) - timedelta(minutes=10)
+        client.post("/api/v1/vitals/batch", json=batch(start, [88] * 9, step=10), headers=auth_header(user_id))
+        # The newest reading completes a flat-line and is flagged
+        client.post(
+            "/api/v1/vitals",
+            json={"heart_rate": 88, "spo2": 97, "timestamp": (start + timedelta(seconds=90)).isoformat()},
+            headers=auth_header(user_id),
+        )
+        rows = stored_readings(user_id)
+        assert rows[-1].is_valid is False
+
+        for path, header in (
+            ("/api/v1/vitals/latest", auth_header(user_id)),
+            (f"/api/v1/vitals/user/{user_id}/latest", doc_header),
+        ):
+            resp = client.get(path, headers=header)
+            assert resp.status_code == 200
+            assert resp.json()["id"] == rows[-2].reading_id
+            assert resp.json()["is_valid"] is True
+
+        history = client.get("/api/v1/vitals/history", headers=auth_header(user_id)).json()
+        assert [v["is_valid"] for v in history["vitals"]].count(False) == 1
+
+    def test_ingest_spike_raises_no_alert(self, client, monkeypatch):
+        from app.config import settings
+
+        monkeypatch.setattr(settings, "ingest_flush_max_readings", 4)
+        user_id = create_patient()
+        token = auth_service.create_access_token(data={"sub": str(user_id), "role": UserRole.PATIENT.value})
+        start = datetime.now(timezone.utc) - timedelta(minutes=1)
+
+        with client.websocket_connect(f"/api/v1/ws/vitals/ingest?token={token}") as ws:
+            ws.send_json(batch(start, [78, 79, 195, 78], step=1)["vitals"])
+            ack = ws.receive_json()
+
+        assert ack["stored"] == 4 and ack["alerts"] == 0
+        db = TestingSessionLocal()
+        assert db.query(Alert).filter_by(user_id=user_id).count() == 0
+        db.close()
+        assert [r.is_valid for r in stored_readings(user_id)] == [True, True, False, True]
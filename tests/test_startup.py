@@ -0,0 +1,82 @@
+"""
+Tests for worker start-up.
+
+Verifies:
+- Importing the app loads no sklearn/joblib/jose/passlib and works
+  without PHI_ENCRYPTION_KEY
+- Startup skips create_all outside development, loads the model and
+  records per-phase timings
+- Lazily created helpers (pwd_context, encryption_service) still import
+"""
+
+import os
+import subprocess
+import sys
+
+import pytest
+from fastapi.testclient import TestClient
+
+os.environ.setdefault("SECRET_KEY", "test-secret-key-thats-long-enough-32chars")
+os.environ.setdefault("PHI_ENCRYPTION_KEY", "dGVzdC1lbmNyeXB0aW9uLWtleS0zMmJ5dGVzISEhISE=")
+os.environ.setdefault("DEBUG", "true")
+
+import app.main as main_module
+from app.config import settings
+from app.main import app, startup_timings
+from app.services import ml_prediction
+
+HEAVY_MODULES = ("sklearn", "joblib", "jose", "passlib")
+
+
+@pytest.fixture(autouse=True)
+def setup_model(monkeypatch):
+    assert ml_prediction.load_ml_model()
+    # Startup must not touch the real database file
+    monkeypatch.setattr(main_module, "check_db_connection", lambda: True)
+    yield
+
+
+def run_lifespan(monkeypatch, environment):
+    created = []
+    monkeypatch.setattr(settings, "environment", environment)
+    monkeypatch.setattr(main_module, "init_db", lambda: created.append(True))
+    with TestClient(app):
+        pass
+    return created
+
+
+class TestStartup:
+    def test_import_is_light_and_needs_no_phi_key(self):
+        env = {k: v for k, v in os.environ.items() if k != "PHI_ENCRYPTION_KEY"}
+        code = (
+            "import sys, app.main; "
+            f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+        )
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, env=env)
+        assert result.returncode == 0, result.stderr
+        assert result.stdout.strip() == ""
+
+    def test_create_all_only_in_development(self, monkeypatch):
+        assert run_lifespan(monkeypatch, "production") == []
+        assert "init_db" not in startup_timings
+
+        assert run_lifespan(monkeypatch, "development") == [True]
+        assert "init_db" in startup_timings
+
+        monkeypatch.setattr(settings, "auto_create_tables", True)
+        assert run_lifespan(monkeypatch, "production") == [True]
+
+    def test_lifespan_loads_model_and_records_phases(self, monkeypatch):
+        monkeypatch.setattr(ml_prediction, "_active_bundle", None)
+        run_lifespan(monkeypatch, "production")
+        assert ml_prediction.is_model_loaded()
+        assert {"ml_model", "db_check", "model_registry", "realtime", "total"} <= set(startup_timings)
+        assert startup_timings["total"] >= startup_timings["db_check"]
+
+    def test_lazy_helpers_still_importable(self):
+        from app.services.auth_service import pwd_context
+        from app.services.encryption import encryption_service
+
+        assert pwd_context.verify("Password123", pwd_context.hash("Password123"))
+        token = encryption_service.encrypt_json({"conditions": ["asthma"]})
+        assert encryption_service.decrypt_json(token) == {"conditions": ["asthma"]}
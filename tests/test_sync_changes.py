@@ -0,0 +1,256 @@
+"""
+Tests for GET /sync/changes (mobile delta sync).
+
+Verifies:
+- A first sync returns everything; a sync with the returned cursor
+  returns only what was created, updated or deleted since
+- Rows changed several times come back once, as they are now
+- Pages follow the cursor until has_more is false, with nothing skipped
+- A sync with nothing new is two queries, whatever the history size
+- Rows newer than the commit lag wait, so a lower id that commits late
+  is still delivered
+- Other patients' changes and bad cursors are refused
+"""
+
+import os
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+os.environ.setdefault("SECRET_KEY", "test-secret-key-thats-long-enough-32chars")
+os.environ.setdefault("PHI_ENCRYPTION_KEY", "dGVzdC1lbmNyeXB0aW9uLWtleS0zMmJ5dGVzISEhISE=")
+os.environ.setdefault("DEBUG", "true")
+
+from app.database import Base, get_db
+from app.main import app
+from app.models.activity import ActivitySession
+from app.models.alert import Alert
+from app.models.recommendation import ExerciseRecommendation
+from app.models.risk_assessment import RiskAssessment
+from app.models.sync_change import SyncChange
+from app.models.user import User, UserRole
+from app.models.vital_signs import VitalSignRecord
+from app.api.auth import auth_service
+from app.services.sync_changes import fetch_changes
+
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test_sync_changes.db"
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def override_get_db():
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+@pytest.fixture(autouse=True)
+def setup_database(monkeypatch):
+    from app.config import settings
+
+    # Rows are synced straight after they are written here
+    monkeypatch.setattr(settings, "sync_commit_lag_seconds", 0)
+    app.dependency_overrides[get_db] = override_get_db
+    Base.metadata.create_all(bind=engine)
+    yield
+    Base.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+
+def create_patient(email="p@example.com"):
+    db = TestingSessionLocal()
+    user = User(email=email, full_name="p", age=60, baseline_hr=70, role=UserRole.PATIENT)
+    db.add(user)
+    db.commit()
+    user_id = user.user_id
+    db.close()
+    return user_id
+
+
+def auth_header(user_id):
+    token = auth_service.create_access_token(data={"sub": str(user_id), "role": UserRole.PATIENT.value})
+    return {"Authorization": f"Bearer {token}"}
+
+
+def add_vitals(user_id, n):
+    db = TestingSessionLocal()
+    start = datetime.now(timezone.utc) - timedelta(hours=1)
+    db.add_all([
+        VitalSignRecord(user_id=user_id, heart_rate=70 + i, timestamp=start + timedelta(seconds=i))
+        for i in range(n)
+    ])
+    db.commit()
+    db.close()
+
+
+def add_history(user_id):
+    """One row of each logged entity; returns their ids."""
+    db = TestingSessionLocal()
+    alert = Alert(user_id=user_id, alert_type="high_heart_rate", severity="critical", acknowledged=False)
+    risk = RiskAssessment(user_id=user_id, risk_level="low", risk_score=0.2)
+    rec = ExerciseRecommendation(user_id=user_id, title="Walk", suggested_activity="walking", duration_minutes=20)
+    session = ActivitySession(user_id=user_id, activity_type="walking", start_time=datetime.now(timezone.utc))
+    db.add_all([alert, risk, rec, session])
+    db.commit()
+    ids = {
+        "alerts": alert.alert_id,
+        "risk_assessments": risk.assessment_id,
+        "recommendations": rec.recommendation_id,
+        "activities": session.session_id,
+    }
+    db.close()
+    return ids
+
+
+def sync(client, user_id, since=None, **params):
+    if since is not None:
+        params["since"] = since
+    resp = client.get("/api/v1/sync/changes", params=params, headers=auth_header(user_id))
+    assert resp.status_code == 200
+    return resp.json()
+
+
+class TestDeltaSync:
+    def test_first_sync_then_only_new(self, client):
+        user_id = create_patient()
+        add_vitals(user_id, 3)
+        ids = add_history(user_id)
+
+        first = sync(client, user_id)
+        assert len(first["vitals"]) == 3
+        assert [a["alert_id"] for a in first["alerts"]] == [ids["alerts"]]
+        assert [r["assessment_id"] for r in first["risk_assessments"]] == [ids["risk_assessments"]]
+        assert [r["recommendation_id"] for r in first["recommendations"]] == [ids["recommendations"]]
+        assert [s["session_id"] for s in first["activities"]] == [ids["activities"]]
+        assert first["has_more"] is False
+
+        # Nothing new: same cursor, empty lists
+        idle = sync(client, user_id, first["cursor"])
+        assert idle["cursor"] == first["cursor"]
+        entities = ("vitals", "alerts", "risk_assessments", "recommendations", "activities", "deleted")
+        assert all(idle[key] == [] for key in entities)
+
+        add_vitals(user_id, 1)
+        later = sync(client, user_id, first["cursor"])
+        assert [v["heart_rate"] for v in later["vitals"]] == [70]
+        assert later["alerts"] == [] and later["activities"] == []
+
+    def test_updates_and_deletes(self, client):
+        user_id = create_patient()
+        ids = add_history(user_id)
+        cursor = sync(client, user_id)["cursor"]
+
+        db = TestingSessionLocal()
+        alert = db.get(Alert, ids["alerts"])
+        alert.acknowledged = True
+        db.commit()
+        alert.resolution_notes = "Rested, HR back to normal"
+        db.commit()
+        db.delete(db.get(ExerciseRecommendation, ids["recommendations"]))
+        db.commit()
+        db.close()
+
+        changes = sync(client, user_id, cursor)
+        assert len(changes["alerts"]) == 1
+        assert changes["alerts"][0]["acknowledged"] is True
+        assert changes["alerts"][0]["resolution_notes"] == "Rested, HR back to normal"
+        assert changes["deleted"] == [{"entity": "recommendations", "id": ids["recommendations"]}]
+        assert changes["recommendations"] == [] and changes["activities"] == []
+
+    def test_pages_follow_cursor(self, client):
+        user_id = create_patient()
+        add_vitals(user_id, 5)
+        add_history(user_id)
+
+        seen, pages, cursor = [], 0, None
+        while True:
+            page = sync(client, user_id, cursor, limit=2)
+            seen.extend(v["id"] for v in page["vitals"])
+            cursor, pages = page["cursor"], pages + 1
+            if not page["has_more"]:
+                break
+        assert pages == 3
+        assert len(seen) == len(set(seen)) == 5
+        assert seen == sorted(seen)
+
+    def test_idle_sync_is_two_queries(self):
+        user_id = create_patient()
+        add_vitals(user_id, 50)
+        add_history(user_id)
+        db = TestingSessionLocal()
+        cursor = fetch_changes(db, user_id)["cursor"]
+
+        statements = []
+        listener = lambda conn, cursor_, statement, *args: statements.append(statement)
+        event.listen(engine, "before_cursor_execute", listener)
+        try:
+            assert fetch_changes(db, user_id, cursor)["cursor"] == cursor
+        finally:
+            event.remove(engine, "before_cursor_execute", listener)
+            db.close()
+        assert len(statements) == 2
+
+    def test_late_commit_of_lower_id_is_not_skipped(self, client, monkeypatch):
+        from app.config import settings
+
+        monkeypatch.setattr(settings, "sync_commit_lag_seconds", 5)
+        user_id = create_patient()
+        now = datetime.now(timezone.utc)
+
+        def write(reading_id, written_ago):
+            db = TestingSessionLocal()
+            db.add(VitalSignRecord(
+                reading_id=reading_id, user_id=user_id, heart_rate=70 + reading_id,
+                timestamp=now - timedelta(minutes=reading_id), created_at=now - timedelta(seconds=written_ago),
+            ))
+            db.commit()
+            db.close()
+
+        def age_all():
+            db = TestingSessionLocal()
+            db.query(VitalSignRecord).update({"created_at": now - timedelta(seconds=60)})
+            db.commit()
+            db.close()
+
+        # The watch's transaction took id 1 but the phone's (id 2) commits first
+        write(2, written_ago=1)
+        first = sync(client, user_id)
+        assert first["vitals"] == []
+        write(1, written_ago=1.5)
+        age_all()
+        second = sync(client, user_id, first["cursor"])
+        assert [v["id"] for v in second["vitals"]] == [1, 2]
+
+        # A settled row behind a recent lower id waits with it
+        write(3, written_ago=0)
+        write(4, written_ago=60)
+        third = sync(client, user_id, second["cursor"])
+        assert third["vitals"] == [] and third["cursor"] == second["cursor"]
+
+    def test_other_patients_changes_are_not_visible(self, client):
+        user_id, other_id = create_patient(), create_patient("other@example.com")
+        add_vitals(other_id, 2)
+        add_history(other_id)
+        changes = sync(client, user_id)
+        assert changes["vitals"] == [] and changes["alerts"] == []
+
+        db = TestingSessionLocal()
+        assert db.query(SyncChange).filter_by(user_id=other_id).count() == 4
+        db.close()
+
+    @pytest.mark.parametrize("cursor", ["not-a-cursor", "MTIz", "LTEuMA"])
+    def test_bad_cursor_is_400(self, client, cursor):
+        user_id = create_patient()
+        resp = client.get("/api/v1/sync/changes", params={"since": cursor}, headers=auth_header(user_id))
+        assert resp.status_code == 400
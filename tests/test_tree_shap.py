@@ -0,0 +1,91 @@
+"""
+Tests for the TreeSHAP explainer.
+
+Verifies:
+- Values match brute-force Shapley values of the path-dependent game
+- base_value + sum(phi) reproduces the forest's predicted probability
+- load_ml_model() caches importances and the explainer with the model
+"""
+
+import itertools
+from math import factorial
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+
+
+def _expected_value(tree, x, present, class_index=1):
+    """E[f(x) | x_S] using training cover for absent features (reference)."""
+    t = tree.tree_
+
+    def walk(node):
+        if t.children_left[node] == -1:
+            value = t.value[node, 0]
+            return value[class_index] / value.sum()
+        left, right = t.children_left[node], t.children_right[node]
+        if t.feature[node] in present:
+            return walk(left) if np.float32(x[t.feature[node]]) <= t.threshold[node] else walk(right)
+        cover = t.weighted_n_node_samples
+        return (cover[left] * walk(left) + cover[right] * walk(right)) / cover[node]
+
+    return walk(0)
+
+
+def _brute_force_shap(model, x):
+    n = model.n_features_in_
+
+    def value(present):
+        return np.mean([_expected_value(est, x, present) for est in model.estimators_])
+
+    phi = np.zeros(n)
+    for i in range(n):
+        others = [j for j in range(n) if j != i]
+        for size in range(n):
+            weight = factorial(size) * factorial(n - size - 1) / factorial(n)
+            for subset in itertools.combinations(others, size):
+                phi[i] += weight * (value(set(subset) | {i}) - value(set(subset)))
+    return phi
+
+
+class TestTreeExplainer:
+    def _small_forest(self):
+        rng = np.random.default_rng(0)
+        X = rng.normal(size=(300, 4))
+        y = (X[:, 0] + X[:, 1] * X[:, 2] + rng.normal(size=300) * 0.3 > 0).astype(int)
+        model = RandomForestClassifier(n_estimators=4, max_depth=4, random_state=0).fit(X, y)
+        return model, X
+
+    def test_matches_brute_force_shapley(self):
+        from app.services.tree_shap import TreeExplainer
+
+        model, X = self._small_forest()
+        explainer = TreeExplainer(model)
+        for x in X[:3]:
+            phi, _ = explainer.explain(x)
+            np.testing.assert_allclose(phi, _brute_force_shap(model, x), atol=1e-10)
+
+    def test_values_sum_to_prediction(self):
+        from app.services.tree_shap import TreeExplainer
+
+        model, X = self._small_forest()
+        explainer = TreeExplainer(model)
+        for x in X[:10]:
+            phi, base = explainer.explain(x)
+            assert abs(base + phi.sum() - model.predict_proba(x[None])[0, 1]) < 1e-10
+
+
+class TestModelExplanations:
+    def test_load_caches_importances_and_explainer(self):
+        from app.services import ml_prediction
+
+        assert ml_prediction.load_ml_model()
+        assert set(ml_prediction.feature_importances) == set(ml_prediction.feature_columns)
+
+        prediction = ml_prediction.predict_risk(
+            age=62, baseline_hr=70, max_safe_hr=150, avg_heart_rate=128,
+            peak_heart_rate=148, min_heart_rate=85, avg_spo2=94,
+            duration_minutes=35, recovery_time_minutes=9, activity_type="jogging",
+        )
+        shap = ml_prediction.explain_features(prediction["features_used"])
+        assert abs(shap["risk_score"] - prediction["risk_score"]) < 1e-4
+        assert abs(shap["base_value"] + sum(shap["contributions"].values()) - shap["risk_score"]) < 1e-9
@@ -0,0 +1,192 @@
+"""
+Tests for the binary columnar batch vitals format.
+
+Verifies:
+- encode/decode round-trips every column, including missing values
+- Malformed payloads and out-of-range readings are rejected
+- POST /vitals/batch/binary stores the same rows as the JSON batch path
+  (values, timestamps, quality scores) and updates latest state
+- A binary batch raises at most one alert per type
+"""
+
+import os
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+os.environ.setdefault("SECRET_KEY", "test-secret-key-thats-long-enough-32chars")
+os.environ.setdefault("PHI_ENCRYPTION_KEY", "dGVzdC1lbmNyeXB0aW9uLWtleS0zMmJ5dGVzISEhISE=")
+os.environ.setdefault("DEBUG", "true")
+
+from app.database import Base, get_db
+from app.main import app
+from app.models.alert import Alert
+from app.models.patient_latest_state import PatientLatestState
+from app.models.user import User, UserRole
+from app.models.vital_signs import VitalSignRecord
+from app.api.auth import auth_service
+from app.services.alert_cooldown import alert_cooldown
+from app.services.vitals_wire import HEADER, decode_vitals_batch, encode_vitals_batch
+
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test_vitals_wire.db"
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def override_get_db():
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+@pytest.fixture(autouse=True)
+def setup_database():
+    app.dependency_overrides[get_db] = override_get_db
+    Base.metadata.create_all(bind=engine)
+    alert_cooldown.clear()
+    yield
+    Base.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+
+def create_patient(email="p@example.com"):
+    db = TestingSessionLocal()
+    user = User(email=email, full_name="p", age=60, baseline_hr=70, role=UserRole.PATIENT)
+    db.add(user)
+    db.commit()
+    user_id = user.user_id
+    db.close()
+    return user_id
+
+
+def auth_header(user_id):
+    token = auth_service.create_access_token(data={"sub": str(user_id), "role": UserRole.PATIENT.value})
+    return {"Authorization": f"Bearer {token}"}
+
+
+def sample(n=40, start=None):
+    start = start or datetime.now(timezone.utc).replace(microsecond=0) - timedelta(hours=1)
+    rng = np.random.default_rng(1)
+    times = int(start.timestamp() * 1000) + np.arange(n, dtype=np.int64) * 5000
+    hr = np.round(80 + rng.normal(0, 2, n))
+    if n > 17:
+        hr[17] = 175  # spike: stored but invalid
+    spo2 = np.round(97 + rng.normal(0, 0.5, n))
+    spo2[5] = np.nan
+    return times, hr, spo2
+
+
+def post_binary(client, user_id, body, **params):
+    return client.post(
+        "/api/v1/vitals/batch/binary", content=body, params=params,
+        headers={**auth_header(user_id), "Content-Type": "application/octet-stream"},
+    )
+
+
+def stored(user_id):
+    db = TestingSessionLocal()
+    rows = db.query(VitalSignRecord).filter_by(user_id=user_id).order_by(VitalSignRecord.timestamp).all()
+    db.close()
+    return rows
+
+
+class TestWireFormat:
+    def test_round_trip(self):
+        times, hr, spo2 = sample()
+        systolic = np.full(len(times), np.nan)
+        systolic[3] = 142
+        diastolic = np.full(len(times), np.nan)
+        diastolic[3] = 91
+        hrv = np.full(len(times), 41.0)
+        body = encode_vitals_batch(times, hr, spo2, systolic, diastolic, hrv)
+        assert len(body) == HEADER.size + len(times) * (4 + 1 + 1 + 1 + 1 + 2)
+
+        columns = decode_vitals_batch(body)
+        assert np.array_equal(columns["timestamp_ms"], times)
+        assert np.array_equal(columns["heart_rate"], hr)
+        assert np.array_equal(columns["spo2"], spo2, equal_nan=True)
+        assert np.array_equal(columns["systolic_bp"], systolic, equal_nan=True)
+        assert np.array_equal(columns["diastolic_bp"], diastolic, equal_nan=True)
+        assert np.array_equal(columns["hrv"], hrv)
+
+        # Left-out columns decode as missing; out-of-order times survive the deltas
+        minimal = decode_vitals_batch(encode_vitals_batch(times[::-1], hr))
+        assert np.array_equal(minimal["timestamp_ms"], times[::-1])
+        assert np.isnan(minimal["spo2"]).all() and np.isnan(minimal["hrv"]).all()
+
+    @pytest.mark.parametrize("mutate, message", [
+        (lambda body: b"JSON" + body[4:], "magic"),
+        (lambda body: body[:-1], "expected"),
+        (lambda body: body[:10], "header"),
+        (lambda body: body[:HEADER.size + 40 * 4] + b"\x14" + body[HEADER.size + 40 * 4 + 1:], "heart_rate"),
+    ])
+    def test_malformed_payloads(self, mutate, message):
+        times, hr, spo2 = sample()
+        with pytest.raises(ValueError, match=message):
+            decode_vitals_batch(mutate(encode_vitals_batch(times, hr, spo2)))
+
+    def test_batch_limit(self):
+        times, hr, _ = sample(n=20)
+        with pytest.raises(ValueError, match="limited"):
+            decode_vitals_batch(encode_vitals_batch(times, hr), max_readings=10)
+
+
+class TestBinaryUpload:
+    def test_matches_json_batch(self, client):
+        times, hr, spo2 = sample()
+        json_user, binary_user = create_patient("j@example.com"), create_patient("b@example.com")
+        vitals = [
+            {
+                "heart_rate": int(h),
+                "spo2": None if np.isnan(s) else float(s),
+                "device_id": "dev-1",
+                "timestamp": datetime.fromtimestamp(t / 1000, timezone.utc).isoformat(),
+            }
+            for t, h, s in zip(times.tolist(), hr, spo2)
+        ]
+        assert client.post("/api/v1/vitals/batch", json={"vitals": vitals}, headers=auth_header(json_user)).status_code == 200
+
+        resp = post_binary(client, binary_user, encode_vitals_batch(times, hr, spo2), device_id="dev-1")
+        assert resp.status_code == 200
+        assert resp.json()["records_created"] == len(times)
+        assert resp.json()["records_invalid"] == 1
+
+        fields = ("timestamp", "heart_rate", "spo2", "device_id", "is_valid", "confidence_score")
+        as_json = [tuple(getattr(r, f) for f in fields) for r in stored(json_user)]
+        as_binary = [tuple(getattr(r, f) for f in fields) for r in stored(binary_user)]
+        assert as_binary == as_json
+
+        db = TestingSessionLocal()
+        state = db.query(PatientLatestState).filter_by(user_id=binary_user).one()
+        db.close()
+        assert state.latest_reading_id == stored(binary_user)[-1].reading_id
+
+    def test_one_alert_per_type(self, client):
+        user_id = create_patient()
+        times, _, spo2 = sample(n=10)
+        hr = np.array([150, 160, 170, 182, 185, 188, 186, 184, 181, 179])
+        spo2[:] = 88
+        resp = post_binary(client, user_id, encode_vitals_batch(times, hr, spo2))
+        assert resp.status_code == 200
+
+        db = TestingSessionLocal()
+        alerts = {a.alert_type: a.trigger_value for a in db.query(Alert).filter_by(user_id=user_id)}
+        db.close()
+        assert alerts == {"high_heart_rate": "188 BPM", "low_spo2": "88.0%"}
+
+    def test_bad_payload_is_400(self, client):
+        user_id = create_patient()
+        assert post_binary(client, user_id, b"not a batch").status_code == 400
+        assert stored(user_id) == []